@@ -13,6 +13,8 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 
+from first_touch import HIT_SL, HIT_TP, simulate_exits, window_bounds
+
 
 def _parse_time_to_minutes(t: str) -> int:
 	hh, mm = t.split(':')
@@ -143,79 +145,46 @@ def build_intraday_dataset(
 	df['range_to_atr_x_directional'] = df['range_to_atr'] * df['is_directional']
 
 	# === Labeling ===
-	# Preindex bars por (ticker, date_key) para búsqueda rápida
-	bars = bars.sort_values(['ticker', 'datetime'])
-	bars_grouped = {k: g for k, g in bars.groupby(['ticker', 'date_key'])}
-
-	labels = []
-	outcomes = []
-	vwap_dists = []
+	# Primer toque TP/SL de todas las filas en una corrida del kernel (first_touch.py): barras del
+	# mismo día posteriores a la entrada, máximo time_stop_bars; si toca ambos cuenta SL (conservador)
+	bars = bars.sort_values(['ticker', 'datetime']).reset_index(drop=True)
+	bar_keys, day_keys = pd.factorize(pd.MultiIndex.from_arrays([bars['ticker'], bars['date_key']]))
+	row_keys = day_keys.get_indexer(pd.MultiIndex.from_arrays([df['ticker'], df['date_key']]))
+	has_day = row_keys >= 0
+	bar_ts = bars['datetime'].dt.tz_convert('UTC').dt.tz_localize(None).to_numpy()
+
+	dates = pd.to_datetime(df['date'])
+	entry_time = dates + pd.to_timedelta(df['start_time'].map(_parse_time_to_minutes).to_numpy(), unit='min')
+	end_time = dates + pd.to_timedelta(df['end_time'].map(_parse_time_to_minutes).to_numpy(), unit='min')
+	entry_ts = entry_time.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy()
+	end_ts = end_time.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy()
 
 	print(f"[03] Generando labels (tp={tp_mult}, sl={sl_mult}, time_stop={time_stop_bars} bars)...")
-	for row in df.itertuples(index=False):
-		ticker = row.ticker
-		date_key = row.date_key
-		window = row.window
-		side = row.side
-
-		entry_price = row.w_open
-		entry_time = _combine_date_time(pd.Timestamp(row.date), row.start_time)
-		end_time = _combine_date_time(pd.Timestamp(row.date), row.end_time)
-
-		# Obtener barras del día
-		key = (ticker, date_key)
-		if key not in bars_grouped:
-			labels.append(np.nan)
-			outcomes.append('NO_DATA')
-			vwap_dists.append(np.nan)
-			continue
-
-		day_bars = bars_grouped[key]
-
-		# VWAP dentro de la ventana (no leakage)
-		window_bars = day_bars[(day_bars['datetime'] >= entry_time) & (day_bars['datetime'] <= end_time)]
-		if window_bars.empty or window_bars['volume'].sum() == 0:
-			vwap_dists.append(np.nan)
-		else:
-			vwap = (window_bars['close'] * window_bars['volume']).sum() / window_bars['volume'].sum()
-			vwap_dists.append((row.w_close - vwap) / vwap)
-
-		# Filtrar barras posteriores a la entrada
-		future = day_bars[day_bars['datetime'] > entry_time].head(time_stop_bars)
-		if future.empty:
-			labels.append(np.nan)
-			outcomes.append('TIMEOUT')
-			continue
-
-		# Definir TP/SL (BUY only)
-		tp = entry_price + tp_mult * row.atr14
-		sl = entry_price - sl_mult * row.atr14
-
-		hit = None
-		for b in future.itertuples(index=False):
-			high = b.high
-			low = b.low
-
-			hit_tp = high >= tp
-			hit_sl = low <= sl
-
-			# Si toca ambos, contar como SL (conservador)
-			if hit_sl and hit_tp:
-				hit = 0
-				break
-			if hit_tp:
-				hit = 1
-				break
-			if hit_sl:
-				hit = 0
-				break
-
-		if hit is None:
-			labels.append(np.nan)
-			outcomes.append('TIMEOUT')
-		else:
-			labels.append(hit)
-			outcomes.append('TP' if hit == 1 else 'SL')
+	entry_price = df['w_open'].to_numpy(dtype=float)
+	atr14 = df['atr14'].to_numpy(dtype=float)
+	start, length = window_bounds(bar_keys, bar_ts, row_keys, entry_ts, after=True)
+	out = simulate_exits(
+		bars['open'].to_numpy(dtype=float), bars['high'].to_numpy(dtype=float),
+		bars['low'].to_numpy(dtype=float), bars['close'].to_numpy(dtype=float),
+		start, np.minimum(length, time_stop_bars), True,
+		entry_price + tp_mult * atr14, entry_price - sl_mult * atr14,  # BUY only
+		entry=entry_price, tie='sl_first'
+	)
+	reason = out['reason']
+	labels = np.where(reason == HIT_TP, 1.0, np.where(reason == HIT_SL, 0.0, np.nan))
+	outcomes = np.select([~has_day, reason == HIT_TP, reason == HIT_SL], ['NO_DATA', 'TP', 'SL'], 'TIMEOUT')
+
+	# VWAP dentro de la ventana [start_time, end_time] (no leakage)
+	v_start, v_len = window_bounds(bar_keys, bar_ts, row_keys, entry_ts, end_ts)
+	volume = bars['volume'].to_numpy(dtype=float)
+	cuts = np.empty(2 * len(df), dtype=np.int64)
+	cuts[0::2], cuts[1::2] = v_start, v_start + v_len
+	pv = np.add.reduceat(np.r_[bars['close'].to_numpy(dtype=float) * volume, 0.0], cuts)[0::2] if len(df) else np.zeros(0)
+	vol_sum = np.add.reduceat(np.r_[volume, 0.0], cuts)[0::2] if len(df) else np.zeros(0)
+	ok = (v_len > 0) & (vol_sum != 0)
+	with np.errstate(invalid='ignore', divide='ignore'):
+		vwap = np.where(ok, pv / np.where(ok, vol_sum, 1.0), np.nan)
+		vwap_dists = (df['w_close'].to_numpy(dtype=float) - vwap) / vwap
 
 	df['y'] = labels
 	df['outcome'] = outcomes
@@ -15,6 +15,8 @@ import numpy as np
 import json
 from pathlib import Path
 
+from first_touch import HIT_SL, HIT_TP, simulate_exits, window_bounds
+
 # === DAILY STOP PARAMETERS ===
 DAILY_STOP_MAX_SL = 2           # Stop after 2 SL in same day
 DAILY_STOP_R_LIMIT = -1.0       # Stop if daily R-multiple <= -1R
@@ -56,12 +58,29 @@ def execute_intraday_backtest(
     plan['entry_time'] = pd.to_datetime(plan['entry_time'], utc=True).dt.tz_convert(timezone_target)
     
     # Sort bars para búsqueda
-    bars = bars.sort_values(['ticker', 'datetime'])
-    bars_grouped = {k: g for k, g in bars.groupby('ticker')}
+    bars = bars.sort_values(['ticker', 'datetime']).reset_index(drop=True)
     
     # Sort plan by date and entry_time for daily stop logic
     plan = plan.sort_values('entry_time')
     
+    # Salidas TP/SL de todo el plan en una corrida del kernel (first_touch.py): barras del ticker
+    # posteriores a la entrada, máximo time_stop_bars; si toca ambos → SL (conservador).
+    # El loop de abajo solo aplica el daily stop, que depende del orden de los trades.
+    bar_codes, bar_tickers = pd.factorize(bars['ticker'])
+    plan_codes = bar_tickers.get_indexer(plan['ticker'])
+    bar_ts = bars['datetime'].dt.tz_convert('UTC').dt.tz_localize(None).to_numpy()
+    entry_ts = plan['entry_time'].dt.tz_convert('UTC').dt.tz_localize(None).to_numpy()
+    start, length = window_bounds(bar_codes, bar_ts, plan_codes, entry_ts, after=True)
+    exits = simulate_exits(
+        bars['open'].to_numpy(dtype=float), bars['high'].to_numpy(dtype=float),
+        bars['low'].to_numpy(dtype=float), bars['close'].to_numpy(dtype=float),
+        start, np.minimum(length, plan['time_stop_bars'].to_numpy(dtype=np.int64)),
+        plan['side'].to_numpy() == 'BUY', plan['tp_price'].to_numpy(dtype=float),
+        plan['sl_price'].to_numpy(dtype=float), entry=plan['entry_price'].to_numpy(dtype=float),
+        tie='sl_first'
+    )
+    exit_names = {HIT_TP: 'TP', HIT_SL: 'SL'}
+    
     print(f"\n[06] Ejecutando backtest de {len(plan)} trades...")
     if ENABLE_DAILY_STOP:
         print(f"[06] Daily stop enabled: max_sl={DAILY_STOP_MAX_SL}, r_limit={DAILY_STOP_R_LIMIT}")
@@ -74,14 +93,13 @@ def execute_intraday_backtest(
     daily_stopped_count = 0  # Count how many trades were blocked
     
     results = []
-    for row in plan.itertuples(index=False):
+    for i, row in enumerate(plan.itertuples(index=False)):
         ticker = row.ticker
         side = row.side
         entry_time = row.entry_time
         entry_price = row.entry_price
         tp_price = row.tp_price
         sl_price = row.sl_price
-        time_stop_bars = int(row.time_stop_bars)
         
         # === DAILY STOP: Reset & Gate ===
         trade_day = entry_time.date()
@@ -140,7 +158,7 @@ def execute_intraday_backtest(
                 continue
         
         # Obtener barras del ticker
-        if ticker not in bars_grouped:
+        if plan_codes[i] < 0:
             results.append({
                 'ticker': ticker,
                 'entry_time': entry_time,
@@ -159,12 +177,7 @@ def execute_intraday_backtest(
             })
             continue
         
-        ticker_bars = bars_grouped[ticker]
-        
-        # Filtrar barras futuras
-        future = ticker_bars[ticker_bars['datetime'] > entry_time].head(time_stop_bars)
-        
-        if future.empty:
+        if exits['exit_bar'][i] < 0:  # sin barras futuras
             results.append({
                 'ticker': ticker,
                 'entry_time': entry_time,
@@ -183,40 +196,10 @@ def execute_intraday_backtest(
             })
             continue
         
-        # Evaluar TP/SL
-        hit = None
-        exit_price = None
-        bars_held = 0
-        
-        for b in future.itertuples(index=False):
-            bars_held += 1
-            high = b.high
-            low = b.low
-            
-            if side == 'BUY':
-                hit_tp = high >= tp_price
-                hit_sl = low <= sl_price
-            else:  # SELL
-                hit_tp = low <= tp_price
-                hit_sl = high >= sl_price
-            
-            # Si toca ambos, conservador → SL
-            if hit_sl and hit_tp:
-                hit = 'SL'
-                exit_price = sl_price
-                break
-            if hit_tp:
-                hit = 'TP'
-                exit_price = tp_price
-                break
-            if hit_sl:
-                hit = 'SL'
-                exit_price = sl_price
-                break
-        
-        if hit is None:
-            hit = 'TIMEOUT'
-            exit_price = future.iloc[-1].close
+        # Resultado TP/SL precalculado
+        hit = exit_names.get(exits['reason'][i], 'TIMEOUT')
+        exit_price = exits['exit_price'][i]
+        bars_held = int(exits['exit_bar'][i]) + 1
         
         # Calcular PnL
         if side == 'BUY':
@@ -22,6 +22,8 @@ import importlib.util
 import math
 import joblib
 
+from first_touch import HIT_SL, HIT_TP, simulate_exits, window_bounds
+
 CORE_TICKERS = {'SPY', 'QQQ', 'GS', 'JPM', 'CAT'}
 PROBWIN_ALWAYS = {'NVDA', 'AMD'}
 PROBWIN_VERSION = 'probwin_v1'
@@ -93,70 +95,80 @@ def _is_core_open(ts: pd.Timestamp) -> bool:
     return (minutes >= 9 * 60 + 30) and (minutes <= 10 * 60 + 30)
 
 
+def _utc_ns(ts: pd.Series) -> np.ndarray:
+    return ts.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy()
+
+
+def _evaluate_windows(
+    bars: pd.DataFrame,
+    start: np.ndarray,
+    length: np.ndarray,
+    entry_price: np.ndarray,
+    atr14: np.ndarray
+) -> list[dict | None]:
+    """
+    SL = entry - ATR, TP = entry + 1.5 ATR sobre las barras bars[start:start+length] de cada
+    trade, en una corrida del kernel (first_touch.py). Si toca ambos → SL; sin toque → EOD
+    al close de la última barra. None si atr14 <= 0 o la ventana está vacía.
+    """
+    sl = entry_price - atr14
+    tp = entry_price + 1.5 * atr14
+    out = simulate_exits(
+        bars['open'].to_numpy(dtype=float), bars['high'].to_numpy(dtype=float),
+        bars['low'].to_numpy(dtype=float), bars['close'].to_numpy(dtype=float),
+        start, length, True, tp, sl, entry=entry_price, tie='sl_first'
+    )
+    exit_times = bars['datetime'].to_numpy(dtype=object)
+    names = {HIT_SL: 'SL', HIT_TP: 'TP'}
+
+    results = []
+    for i in range(len(start)):
+        if atr14[i] <= 0 or out['exit_bar'][i] < 0:
+            results.append(None)
+            continue
+        exit_price = float(out['exit_price'][i])
+        pnl_per_share = exit_price - entry_price[i]
+        risk_per_share = float(atr14[i])
+        results.append({
+            'sl': float(sl[i]),
+            'tp': float(tp[i]),
+            'exit_time': exit_times[start[i] + out['exit_bar'][i]],
+            'exit_price': exit_price,
+            'exit_reason': names.get(out['reason'][i], 'EOD'),
+            'pnl_per_share': pnl_per_share,
+            'risk_per_share': risk_per_share,
+            'r_mult': pnl_per_share / risk_per_share if risk_per_share > 0 else 0.0
+        })
+    return results
+
+
+def _evaluate_trades(bars: pd.DataFrame, signals: pd.DataFrame) -> list[dict | None]:
+    """
+    _evaluate_trade_per_share para todas las señales: cada una usa las barras de su
+    (ticker, día de entry_time) desde entry_time inclusive. bars ordenadas por ticker/datetime.
+    """
+    entry_time = pd.to_datetime(signals['entry_time'])
+    bar_keys, day_keys = pd.factorize(pd.MultiIndex.from_arrays([bars['ticker'], bars['datetime'].dt.date]))
+    sig_keys = day_keys.get_indexer(pd.MultiIndex.from_arrays([signals['ticker'], entry_time.dt.date]))
+    start, length = window_bounds(bar_keys, _utc_ns(bars['datetime']), sig_keys, _utc_ns(entry_time))
+    return _evaluate_windows(
+        bars, start, length,
+        signals['entry_price'].to_numpy(dtype=float), signals['atr14'].to_numpy(dtype=float)
+    )
+
+
 def _evaluate_trade_per_share(
     bars_for_day: pd.DataFrame,
     entry_time: pd.Timestamp,
     entry_price: float,
     atr14: float
 ) -> dict | None:
-    if atr14 <= 0:
-        return None
-
-    sl = entry_price - atr14
-    tp = entry_price + 1.5 * atr14
-
-    # Filtrar barras desde entry_time (inclusive)
-    future = bars_for_day[bars_for_day['datetime'] >= entry_time]
-    if future.empty:
-        return None
-
-    exit_time = None
-    exit_price = None
-    exit_reason = None
-
-    for row in future.itertuples(index=False):
-        high = row.high
-        low = row.low
-
-        hit_sl = low <= sl
-        hit_tp = high >= tp
-
-        if hit_sl and hit_tp:
-            exit_reason = 'SL'
-            exit_price = sl
-            exit_time = row.datetime
-            break
-        if hit_sl:
-            exit_reason = 'SL'
-            exit_price = sl
-            exit_time = row.datetime
-            break
-        if hit_tp:
-            exit_reason = 'TP'
-            exit_price = tp
-            exit_time = row.datetime
-            break
-
-    if exit_reason is None:
-        last_bar = bars_for_day.iloc[-1]
-        exit_reason = 'EOD'
-        exit_price = last_bar.close
-        exit_time = last_bar.datetime
-
-    pnl_per_share = exit_price - entry_price
-    risk_per_share = atr14
-    r_mult = pnl_per_share / risk_per_share if risk_per_share > 0 else 0.0
-
-    return {
-        'sl': sl,
-        'tp': tp,
-        'exit_time': exit_time,
-        'exit_price': exit_price,
-        'exit_reason': exit_reason,
-        'pnl_per_share': pnl_per_share,
-        'risk_per_share': risk_per_share,
-        'r_mult': r_mult
-    }
+    # Barras desde entry_time (inclusive) hasta el fin del día
+    start = int(bars_for_day['datetime'].searchsorted(entry_time))
+    return _evaluate_windows(
+        bars_for_day, np.array([start]), np.array([len(bars_for_day) - start]),
+        np.array([entry_price], dtype=float), np.array([atr14], dtype=float)
+    )[0]
 
 
 def execute_baseline_backtest(
@@ -243,8 +255,10 @@ def execute_baseline_backtest(
 
     signals = signals.sort_values(['entry_time', 'ticker']).reset_index(drop=True)
 
-    # Preindex bars por (ticker, date)
-    bars_grouped = {k: g for k, g in bars.groupby(['ticker', 'date_ny'])}
+    # (ticker, date) con barras y evaluación TP/SL de todas las señales (antes del loop de
+    # max_open/daily stop, que solo decide cuáles se toman)
+    bar_days = set(zip(bars['ticker'], bars['date_ny']))
+    evals = _evaluate_trades(bars, signals)
 
     # Preindex features por (ticker, datetime)
     feature_cols = ['ret1_prev', 'ret4_prev', 'vol4', 'vol_z20', 'atr_ratio', 'body_pct']
@@ -285,7 +299,7 @@ def execute_baseline_backtest(
                 remaining.append(pos)
         return remaining
 
-    for row in signals.itertuples(index=False):
+    for i, row in enumerate(signals.itertuples(index=False)):
         entry_time = row.entry_time
         ticker = row.ticker
         entry_price = float(row.entry_price)
@@ -355,18 +369,13 @@ def execute_baseline_backtest(
 
         # Obtener barras del día
         key = (ticker, date_ny)
-        if key not in bars_grouped:
+        if key not in bar_days:
             allowed = False
             if not block_reason:
                 block_reason = 'NO_DATA'
 
         if allowed:
-            eval_result = _evaluate_trade_per_share(
-                bars_grouped[key],
-                entry_time,
-                entry_price,
-                atr14
-            )
+            eval_result = evals[i]
             if not eval_result:
                 allowed = False
                 block_reason = 'NO_EVAL'
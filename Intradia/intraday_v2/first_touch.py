@@ -0,0 +1,350 @@
+"""
+Motor de primer toque (TP/SL) sobre barras, vectorizado; kernel común para
+targets, evaluación y simuladores de trades.
+
+En lugar de recorrer barra por barra hacia adelante desde cada entrada, avanza
+un desplazamiento m = 1..M a la vez para TODAS las entradas (y todos los pares
+tp/sl) con arrays contiguos de NumPy: M ≤ horizonte + 1 iteraciones en total.
+
+Semántica (la de intraday/scripts/09_make_targets_intraday.calculate_targets):
+- entrada al close de la barra i; se revisan las barras i+1, i+2, ...
+- fin de la serie del grupo (ticker)  → NONE (tte NaN)
+- cambio de día                       → EOD  (tte = barras ya revisadas)
+- más de horizon_bars barras          → HORIZON (tte = horizon_bars + 1)
+- TP antes que SL en la misma barra   → TP / SL (tte = m)
+- más de max_bars barras sin toque    → EOD  (tte = max_bars + 1)
+
+simulate_exits() es la versión por trade: cada trade recorre su ventana de
+barras [start, start + length) con niveles absolutos de TP/SL, política de
+empate en la misma barra, relleno por gap, trailing/break-even escalados por
+ATR y MFE/MAE. También itera por desplazamiento de barra (vectorizado sobre
+todos los trades). `_reference_exits` es el equivalente escalar, usado por el
+benchmark:
+
+    python first_touch.py bench --trades 20000 --bars 78
+
+Copia canónica: usa_hybrid_clean_v1/utils/first_touch.py. bmv_hybrid_clean_v3
+(src/execution/ y wf_box/scripts/) e Intradia/intraday_v2 se despliegan por
+separado y llevan copias idénticas de este archivo: editar aquí y copiar
+(tests/test_first_touch.py verifica que no diverjan).
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+HIT_NONE, HIT_TP, HIT_SL, HIT_EOD, HIT_HORIZON, HIT_TRAIL = 0, 1, 2, 3, 4, 5
+HIT_LABELS = np.array(["NONE", "TP", "SL", "EOD", "HORIZON", "TRAIL_SL"], dtype=object)
+_PENDING = -1
+
+
+def session_first_touch(high, low, entry, is_long, tp_pct, sl_pct, day, group=None,
+                        horizon_bars=None, max_bars: int = 26):
+    """
+    Primer toque para cada barra como entrada y cada par (tp_pct[p], sl_pct[p]).
+
+    high, low, entry, is_long, day, group: arrays de largo n, ordenados por
+    (grupo, timestamp) y contiguos por grupo. day: clave de sesión (p.ej. fecha como
+    int). group: id de serie (ticker); None = una sola serie.
+    tp_pct, sl_pct: escalares o arrays de largo P.
+
+    Retorna (hit, tte) de forma (n, P): hit con códigos HIT_*, tte en barras (NaN si NONE).
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    entry = np.asarray(entry, dtype=float)
+    is_long = np.asarray(is_long, dtype=bool)
+    day = np.asarray(day)
+    tp_pct = np.atleast_1d(np.asarray(tp_pct, dtype=float))
+    sl_pct = np.atleast_1d(np.asarray(sl_pct, dtype=float))
+    n, P = len(entry), len(tp_pct)
+
+    # Niveles (n, P): LONG TP arriba/SL abajo; SHORT invertido
+    tp_level = np.where(is_long[:, None], entry[:, None] * (1 + tp_pct), entry[:, None] * (1 - tp_pct))
+    sl_level = np.where(is_long[:, None], entry[:, None] * (1 - sl_pct), entry[:, None] * (1 + sl_pct))
+
+    hit = np.full((n, P), _PENDING, dtype=np.int8)
+    tte = np.full((n, P), np.nan)
+    last = n - 1
+    idx = np.arange(n)
+    if group is not None:
+        group = np.asarray(group)
+        # última posición de cada grupo contiguo
+        ends = np.flatnonzero(np.r_[group[1:] != group[:-1], True])
+        last = np.repeat(ends, np.diff(np.r_[-1, ends]))
+
+    M = max_bars + 1 if horizon_bars is None else min(horizon_bars, max_bars) + 1
+    for m in range(1, M + 1):
+        pending = hit == _PENDING
+        if not pending.any():
+            break
+        j = idx + m
+        inb = j <= last
+        jc = np.minimum(j, n - 1)
+
+        def resolve(mask, code, bars):
+            mask = mask & (hit == _PENDING)
+            hit[mask] = code
+            tte[mask] = bars
+
+        resolve(~inb[:, None], HIT_NONE, np.nan)
+        resolve((inb & (day[jc] != day))[:, None], HIT_EOD, m - 1)
+        if horizon_bars is not None and m > horizon_bars:
+            resolve(np.ones((n, 1), dtype=bool), HIT_HORIZON, m)
+            break
+        h, lo = high[jc][:, None], low[jc][:, None]
+        with np.errstate(invalid="ignore"):
+            tp_hit = np.where(is_long[:, None], h >= tp_level, lo <= tp_level)
+            sl_hit = np.where(is_long[:, None], lo <= sl_level, h >= sl_level)
+        resolve(tp_hit, HIT_TP, m)
+        resolve(sl_hit, HIT_SL, m)
+        if m > max_bars:
+            resolve(np.ones((n, 1), dtype=bool), HIT_EOD, m)
+
+    hit[hit == _PENDING] = HIT_NONE
+    return hit, tte
+
+
+def window_bounds(bar_group, bar_ts, trade_group, start_ts, end_ts=None, after: bool = False):
+    """
+    Ventana de barras de cada trade sobre un array largo ordenado por (grupo, ts).
+
+    start = primera barra del grupo con ts >= start_ts (ts > start_ts si after=True);
+    fin = última con ts <= end_ts (o fin del grupo). Retorna (start, length) listos
+    para simulate_exits.
+    """
+    bar_group = np.asarray(bar_group)
+    bar_ts = np.asarray(bar_ts)
+    trade_group = np.asarray(trade_group)
+    start_ts = np.asarray(start_ts)
+    n = len(trade_group)
+    start = np.zeros(n, dtype=np.int64)
+    stop = np.zeros(n, dtype=np.int64)
+    for g in np.unique(trade_group):
+        sel = trade_group == g
+        lo = np.searchsorted(bar_group, g, side="left")
+        hi = np.searchsorted(bar_group, g, side="right")
+        ts = bar_ts[lo:hi]
+        start[sel] = lo + np.searchsorted(ts, start_ts[sel], side="right" if after else "left")
+        stop[sel] = hi if end_ts is None else lo + np.searchsorted(ts, np.asarray(end_ts)[sel], side="right")
+    return start, np.maximum(stop - start, 0)
+
+
+def simulate_exits(open_, high, low, close, start, length, is_long, tp, sl, entry=None,
+                   tie: str = "sl_first", fill: str = "level", atr=None, trail_atr_mult: float = 0.0,
+                   trail_activation_atr: float = 0.5, break_even_atr=None) -> dict:
+    """
+    Primer toque de TP/SL para un lote de trades (kernel vectorizado).
+
+    open_, high, low, close: arrays de barras (largo N, todos los tickers concatenados).
+    start, length: ventana de cada trade (índices en las barras); is_long, tp, sl: por trade.
+    entry: precio de entrada (default: open de la primera barra de la ventana).
+    tie: 'sl_first' | 'tp_first' — qué nivel gana si ambos se tocan en la misma barra.
+    fill: 'level' (sale al nivel) | 'gap' (si la barra abre más allá del nivel, sale al open) |
+    'open' (si la barra abre del lado interior del nivel, sale al open; convención de bmv hybrid_v2).
+    trail_atr_mult > 0 activa trailing stop (requiere atr): cuando el movimiento a favor
+    alcanza trail_activation_atr·ATR, el stop sigue al extremo a trail_atr_mult·ATR y, si
+    break_even_atr no es None y el movimiento alcanza break_even_atr·ATR, sube a la entrada.
+
+    Retorna dict de arrays por trade: reason (HIT_*; HIT_NONE = sin toque, sale al close
+    de la última barra), exit_bar (offset en la ventana, -1 si ventana vacía),
+    exit_price, mfe_pct, mae_pct (excursiones hasta la barra de salida inclusive).
+    """
+    o = np.asarray(open_, dtype=float)
+    h = np.asarray(high, dtype=float)
+    l = np.asarray(low, dtype=float)
+    c = np.asarray(close, dtype=float)
+    start = np.asarray(start, dtype=np.int64)
+    length = np.asarray(length, dtype=np.int64)
+    n = len(start)
+    is_long = np.broadcast_to(np.asarray(is_long, dtype=bool), (n,))
+    tp = np.broadcast_to(np.asarray(tp, dtype=float), (n,))
+    sl = np.array(np.broadcast_to(np.asarray(sl, dtype=float), (n,)))  # mutable (trailing)
+    has_bars = length > 0
+    first = np.minimum(start, max(len(o) - 1, 0))
+    entry = np.where(has_bars, o[first], np.nan) if entry is None \
+        else np.broadcast_to(np.asarray(entry, dtype=float), (n,))
+    trailing = trail_atr_mult > 0
+    if trailing:
+        atr = np.broadcast_to(np.asarray(atr, dtype=float), (n,))
+        ext = entry.copy()  # pico (LONG) / valle (SHORT) desde la activación
+
+    reason = np.full(n, HIT_NONE, dtype=np.int8)
+    exit_bar = np.full(n, -1, dtype=np.int64)
+    exit_px = np.full(n, np.nan)
+    mfe = np.zeros(n)
+    mae = np.zeros(n)
+    pending = has_bars.copy()
+
+    def record(mask, code, level, b, O):
+        if not mask.any():
+            return
+        px = level
+        if fill == "gap":
+            # TP: LONG max(tp, O) / SHORT min(tp, O); SL y trailing: LONG min(sl, O) / SHORT max(sl, O)
+            px = np.where(is_long if code == HIT_TP else ~is_long, np.maximum(level, O), np.minimum(level, O))
+        elif fill == "open":
+            # inverso: TP LONG min(tp, O) / SHORT max(tp, O); SL y trailing LONG max(sl, O) / SHORT min(sl, O)
+            px = np.where(is_long if code == HIT_TP else ~is_long, np.minimum(level, O), np.maximum(level, O))
+        reason[mask] = code
+        exit_bar[mask] = b
+        exit_px[mask] = px[mask] if np.ndim(px) else px
+        pending[mask] = False
+
+    B = int(length.max()) if n else 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for b in range(B):
+            act = pending & (b < length)
+            if not act.any():
+                break
+            j = np.minimum(start + b, len(o) - 1)
+            H, L, O = h[j], l[j], o[j]
+
+            fav = np.where(is_long, H - entry, entry - L) / entry
+            adv = np.where(is_long, L - entry, entry - H) / entry
+            mfe = np.where(act, np.fmax(mfe, fav), mfe)
+            mae = np.where(act, np.fmin(mae, adv), mae)
+
+            sl_hit = act & np.where(is_long, L <= sl, H >= sl)
+            tp_hit = act & np.where(is_long, H >= tp, L <= tp)
+            if tie == "tp_first":
+                record(tp_hit, HIT_TP, tp, b, O)
+                record(sl_hit & ~tp_hit, HIT_SL, sl, b, O)
+            else:
+                record(sl_hit, HIT_SL, sl, b, O)
+                record(tp_hit & ~sl_hit, HIT_TP, tp, b, O)
+
+            if trailing:
+                act &= pending
+                move = np.where(is_long, H - entry, entry - L)
+                on = act & (move >= trail_activation_atr * atr)
+                if break_even_atr is not None:
+                    be = on & (move >= break_even_atr * atr)
+                    sl = np.where(be, np.where(is_long, np.maximum(sl, entry), np.minimum(sl, entry)), sl)
+                ext = np.where(on, np.where(is_long, np.maximum(ext, H), np.minimum(ext, L)), ext)
+                trail = np.where(is_long, ext - trail_atr_mult * atr, ext + trail_atr_mult * atr)
+                sl = np.where(on, np.where(is_long, np.maximum(sl, trail), np.minimum(sl, trail)), sl)
+                record(on & np.where(is_long, L <= sl, H >= sl), HIT_TRAIL, sl, b, O)
+
+    # Sin toque: sale al close de la última barra de la ventana
+    rest = has_bars & (exit_bar < 0)
+    exit_bar[rest] = length[rest] - 1
+    exit_px[rest] = c[(start + length - 1)[rest]]
+    return {"reason": reason, "exit_bar": exit_bar, "exit_price": exit_px, "mfe_pct": mfe, "mae_pct": mae}
+
+
+def _reference_exits(open_, high, low, close, start, length, is_long, tp, sl, entry=None,
+                     tie="sl_first", fill="level", atr=None, trail_atr_mult=0.0,
+                     trail_activation_atr=0.5, break_even_atr=None) -> dict:
+    """Equivalente escalar (barra por barra, trade por trade) de simulate_exits."""
+    n = len(start)
+    out = {"reason": np.zeros(n, dtype=np.int8), "exit_bar": np.full(n, -1), "exit_price": np.full(n, np.nan),
+           "mfe_pct": np.zeros(n), "mae_pct": np.zeros(n)}
+    for i in range(n):
+        if length[i] <= 0:
+            continue
+        lg = bool(np.broadcast_to(is_long, (n,))[i])
+        e = open_[start[i]] if entry is None else np.broadcast_to(entry, (n,))[i]
+        t, s = float(np.broadcast_to(tp, (n,))[i]), float(np.broadcast_to(sl, (n,))[i])
+        a = float(np.broadcast_to(atr, (n,))[i]) if trail_atr_mult > 0 else 0.0
+        ext, mfe, mae = e, 0.0, 0.0
+        done = None
+        for b in range(length[i]):
+            j = start[i] + b
+            H, L, O = high[j], low[j], open_[j]
+            mfe = max(mfe, ((H - e) if lg else (e - L)) / e)
+            mae = min(mae, ((L - e) if lg else (e - H)) / e)
+            s_hit = L <= s if lg else H >= s
+            t_hit = H >= t if lg else L <= t
+            order = [(t_hit, HIT_TP, t), (s_hit, HIT_SL, s)]
+            if tie != "tp_first":
+                order.reverse()
+            for hit, code, lvl in order:
+                if hit:
+                    done = (code, lvl)
+                    break
+            if done is None and trail_atr_mult > 0:
+                move = (H - e) if lg else (e - L)
+                if move >= trail_activation_atr * a:
+                    if break_even_atr is not None and move >= break_even_atr * a:
+                        s = max(s, e) if lg else min(s, e)
+                    ext = max(ext, H) if lg else min(ext, L)
+                    s = max(s, ext - trail_atr_mult * a) if lg else min(s, ext + trail_atr_mult * a)
+                    if (L <= s) if lg else (H >= s):
+                        done = (HIT_TRAIL, s)
+            if done is not None:
+                code, lvl = done
+                if fill == "gap":
+                    lvl = (max(lvl, O) if lg else min(lvl, O)) if code == HIT_TP else (min(lvl, O) if lg else max(lvl, O))
+                elif fill == "open":
+                    lvl = (min(lvl, O) if lg else max(lvl, O)) if code == HIT_TP else (max(lvl, O) if lg else min(lvl, O))
+                out["reason"][i], out["exit_bar"][i], out["exit_price"][i] = code, b, lvl
+                break
+        if done is None:
+            out["exit_bar"][i] = length[i] - 1
+            out["exit_price"][i] = close[start[i] + length[i] - 1]
+        out["mfe_pct"][i], out["mae_pct"][i] = mfe, mae
+    return out
+
+
+def _synthetic_batch(n_trades, n_bars, seed=0):
+    rng = np.random.default_rng(seed)
+    N = n_trades * n_bars
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.003, N)))
+    open_ = np.r_[close[0], close[:-1]] * (1 + rng.normal(0, 0.001, N))
+    high = np.maximum(open_, close) * (1 + rng.random(N) * 0.003)
+    low = np.minimum(open_, close) * (1 - rng.random(N) * 0.003)
+    start = np.arange(n_trades) * n_bars
+    length = rng.integers(1, n_bars + 1, n_trades)
+    is_long = rng.random(n_trades) < 0.5
+    e = open_[start]
+    tp = np.where(is_long, e * 1.01, e * 0.99)
+    sl = np.where(is_long, e * 0.995, e * 1.005)
+    atr = e * 0.004
+    return (open_, high, low, close, start, length, is_long, tp, sl), atr
+
+
+def bench(n_trades: int = 20000, n_bars: int = 78, ref_trades: int = 2000) -> list:
+    """Throughput (trades/s) del kernel vs la referencia escalar, verificando igualdad."""
+    args, atr = _synthetic_batch(n_trades, n_bars)
+    configs = {
+        "fijo/sl_first": dict(),
+        "fijo/tp_first+gap": dict(tie="tp_first", fill="gap"),
+        "trailing+BE": dict(atr=atr, trail_atr_mult=1.0, trail_activation_atr=0.5, break_even_atr=1.0),
+        "trailing+BE+open": dict(fill="open", atr=atr, trail_atr_mult=1.0, trail_activation_atr=0.5,
+                                 break_even_atr=1.0),
+    }
+    rows = []
+    for name, kw in configs.items():
+        t0 = time.perf_counter()
+        fast = simulate_exits(*args, **kw)
+        t_fast = time.perf_counter() - t0
+        m = min(ref_trades, n_trades)
+        sub = args[:4] + tuple(a[:m] for a in args[4:])
+        kw_ref = {k: (v[:m] if isinstance(v, np.ndarray) else v) for k, v in kw.items()}
+        t0 = time.perf_counter()
+        ref = _reference_exits(*sub, **kw_ref)
+        t_ref = time.perf_counter() - t0
+        for k in ref:
+            np.testing.assert_allclose(fast[k][:m], ref[k], rtol=1e-12, equal_nan=True, err_msg=f"{name}: {k}")
+        rows.append({"config": name, "kernel_tps": n_trades / t_fast, "ref_tps": m / t_ref})
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Kernel de primer toque TP/SL")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("bench", help="Throughput del kernel vs loop escalar (y verificación)")
+    b.add_argument("--trades", type=int, default=20000)
+    b.add_argument("--bars", type=int, default=78)
+    b.add_argument("--ref-trades", type=int, default=2000, help="Trades evaluados con la referencia escalar")
+    a = ap.parse_args()
+    for r in bench(a.trades, a.bars, a.ref_trades):
+        print(f"[first_touch] {r['config']:<20} kernel={r['kernel_tps']:>12,.0f} trades/s  "
+              f"escalar={r['ref_tps']:>10,.0f} trades/s  x{r['kernel_tps'] / r['ref_tps']:.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
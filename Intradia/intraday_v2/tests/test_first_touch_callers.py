@@ -0,0 +1,172 @@
+"""Scripts 03, 06 y 06b contra las salidas de sus loops barra por barra anteriores.
+
+tests/fixtures/first_touch/ tiene las salidas de esos loops (antes de pasar por el kernel
+vendorizado first_touch.py) sobre los datos sintéticos construidos aquí. Se generaron una
+vez; regenerarlas solo si cambian a propósito las reglas de salida.
+"""
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+GOLDEN = Path(__file__).parent / "fixtures" / "first_touch"
+TZ = "America/New_York"
+
+
+def _load(rel, name):
+    sys.path.insert(0, str(ROOT))
+    try:
+        spec = importlib.util.spec_from_file_location(name, ROOT / rel)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(str(ROOT))
+    return module
+
+
+def _bars(seed=0, tickers=("AAA", "BBB")):
+    """Barras 15m 09:30-15:45 NY; faltan algunas barras y un día completo de BBB."""
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range("2025-03-03", periods=10)
+    rows = []
+    for k, t in enumerate(tickers):
+        p = 40.0 + 60 * k
+        for d in days:
+            if t == "BBB" and d == days[4]:
+                continue
+            ts = pd.date_range(d + pd.Timedelta("09:30:00"), periods=26, freq="15min", tz=TZ)
+            r = rng.normal(0, 0.004, 26)
+            c = p * np.exp(np.cumsum(r))
+            p = c[-1]
+            o = np.r_[c[0] / np.exp(r[0]), c[:-1]]
+            vol = rng.choice([0.0, 1000.0, 2500.0], 26, p=[0.05, 0.6, 0.35])
+            keep = rng.random(26) > 0.05
+            rows.append(pd.DataFrame({
+                "ticker": t, "datetime": ts, "open": o, "close": c, "volume": vol,
+                "high": np.maximum(o, c) * (1 + rng.random(26) * 0.003),
+                "low": np.minimum(o, c) * (1 - rng.random(26) * 0.003),
+            })[keep])
+    return pd.concat(rows, ignore_index=True), days
+
+
+WINDOWS = [("W1", "09:30", "10:15"), ("W2", "11:00", "11:45"), ("W3", "15:15", "15:45")]
+
+
+def _windows_and_regime(bars, days, seed=1):
+    rng = np.random.default_rng(seed)
+    win, reg = [], []
+    for t in bars["ticker"].unique():
+        for d in days:
+            date = pd.Timestamp(d).tz_localize(TZ)
+            day = bars[(bars["ticker"] == t) & (bars["datetime"].dt.date == d.date())]
+            ref = float(day["open"].iloc[0]) if len(day) else 50.0
+            reg.append({"ticker": t, "date": date, "close": ref * 1.001, "atr14_prev": ref * rng.choice([0.004, 0.01]),
+                        "ema20_prev": ref * 0.99, "daily_range_pct_prev": 0.02, "is_high_vol_prev": int(rng.random() < 0.3),
+                        "is_wide_range_prev": 0, "is_directional_prev": int(rng.random() < 0.5),
+                        "side_prev": rng.choice(["BUY", "SELL"], p=[0.85, 0.15]), "close_prev": ref})
+            for w, a, b in WINDOWS:
+                o = ref * (1 + rng.normal(0, 0.002))
+                win.append({"ticker": t, "date": date, "window": w, "start_time": a, "end_time": b,
+                            "w_open": o, "w_high": o * 1.003, "w_low": o * 0.997, "w_close": o * (1 + rng.normal(0, 0.002)),
+                            "w_volume": float(rng.integers(1000, 9000))})
+    return pd.DataFrame(win), pd.DataFrame(reg)
+
+
+def _as_csv(df, path):
+    df.to_csv(path, index=False)
+    return pd.read_csv(path)
+
+
+@pytest.mark.parametrize("drop_timeouts", [False, True])
+def test_build_intraday_dataset_matches_golden(tmp_path, drop_timeouts):
+    mod = _load("03_build_intraday_dataset.py", "build_intraday_dataset")
+    bars, days = _bars()
+    windows, regime = _windows_and_regime(bars, days)
+    paths = {k: tmp_path / f"{k}.parquet" for k in ("windows", "regime", "bars")}
+    windows.to_parquet(paths["windows"])
+    regime.to_parquet(paths["regime"])
+    bars.to_parquet(paths["bars"])
+    out = mod.build_intraday_dataset(str(paths["windows"]), str(paths["regime"]), str(paths["bars"]),
+                                     str(tmp_path / "out.parquet"), time_stop_bars=6, drop_timeouts=drop_timeouts)
+    got = _as_csv(out, tmp_path / "out.csv")
+    golden = pd.read_csv(GOLDEN / f"dataset_drop{int(drop_timeouts)}.csv")
+    pd.testing.assert_frame_equal(got, golden, check_exact=False, rtol=1e-12)
+    if not drop_timeouts:
+        assert set(got["outcome"]) == {"TP", "SL", "TIMEOUT", "NO_DATA"}
+
+
+def _plan(bars, seed=2, n=60):
+    rng = np.random.default_rng(seed)
+    pick = bars.sample(n, random_state=seed).sort_values("datetime")
+    side = rng.choice(["BUY", "SELL"], n)
+    entry = pick["close"].to_numpy()
+    dist = entry * rng.choice([0.002, 0.004, 0.01], n)
+    plan = pd.DataFrame({
+        "ticker": pick["ticker"].to_numpy(),
+        "side": side,
+        "entry_time": pick["datetime"].dt.tz_convert("UTC").astype(str).to_numpy(),
+        "entry_price": entry,
+        "tp_price": np.where(side == "BUY", entry + 1.5 * dist, entry - 1.5 * dist),
+        "sl_price": np.where(side == "BUY", entry - dist, entry + dist),
+        "time_stop_bars": rng.choice([4, 8, 16], n),
+    })
+    plan.loc[plan.index[:3], "ticker"] = "ZZZ"  # sin barras
+    return plan
+
+
+def test_execute_intraday_backtest_matches_golden(tmp_path):
+    mod = _load("06_execute_intraday_backtest.py", "execute_intraday_backtest")
+    bars, _ = _bars()
+    _plan(bars).to_csv(tmp_path / "plan.csv", index=False)
+    bars.to_parquet(tmp_path / "bars.parquet")
+    out = {k: str(tmp_path / f"{k}") for k in ("trades.csv", "equity.csv", "metrics.json")}
+    mod.execute_intraday_backtest(str(tmp_path / "plan.csv"), str(tmp_path / "bars.parquet"),
+                                  out["trades.csv"], out["equity.csv"], out["metrics.json"])
+    for name in ("trades.csv", "equity.csv"):
+        pd.testing.assert_frame_equal(pd.read_csv(out[name]), pd.read_csv(GOLDEN / f"execute_{name}"),
+                                      check_exact=False, rtol=1e-12)
+    metrics = json.loads(Path(out["metrics.json"]).read_text())
+    assert metrics == json.loads((GOLDEN / "execute_metrics.json").read_text())
+    reasons = set(pd.read_csv(out["trades.csv"])["exit_reason"])
+    assert {"TP", "SL", "TIMEOUT", "NO_DATA", "DAILY_STOP_SL"} <= reasons
+
+
+def _baseline_signals(bars, seed=3, n=50):
+    rng = np.random.default_rng(seed)
+    pick = bars.sample(n, random_state=seed)
+    atr = pick["close"].to_numpy() * rng.choice([0.0, 0.002, 0.005], n, p=[0.1, 0.45, 0.45])
+    return pd.DataFrame({"ticker": pick["ticker"].to_numpy(), "entry_time": pick["datetime"].to_numpy(),
+                         "entry_price": pick["open"].to_numpy(), "atr14": atr})
+
+
+def _baseline_per_signal(mod, bars, signals):
+    bars = bars.sort_values(["ticker", "datetime"]).reset_index(drop=True)
+    bars["date_ny"] = bars["datetime"].dt.date
+    grouped = {k: g for k, g in bars.groupby(["ticker", "date_ny"])}
+    return [mod._evaluate_trade_per_share(grouped[(s.ticker, s.entry_time.date())], s.entry_time, s.entry_price, s.atr14)
+            for s in signals.itertuples()]
+
+
+def _jsonable(results):
+    return [None if r is None else {k: (str(v) if isinstance(v, pd.Timestamp) else v) for k, v in r.items()}
+            for r in results]
+
+
+def test_baseline_trade_evaluation_matches_golden():
+    mod = _load("06b_execute_baseline_backtest.py", "execute_baseline_backtest")
+    bars, _ = _bars()
+    signals = _baseline_signals(bars)
+    golden = json.loads((GOLDEN / "baseline_eval.json").read_text())
+    per_signal = _jsonable(_baseline_per_signal(mod, bars, signals))
+    b = bars.sort_values(["ticker", "datetime"]).reset_index(drop=True)
+    batch = _jsonable(mod._evaluate_trades(b, signals))
+    for got in (per_signal, batch):
+        assert len(got) == len(golden)
+        for g, r in zip(got, golden):
+            assert g == (None if r is None else pytest.approx(r, rel=1e-12))
+    assert {r["exit_reason"] for r in golden if r} == {"TP", "SL", "EOD"} and None in golden
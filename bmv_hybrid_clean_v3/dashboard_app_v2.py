@@ -21,9 +21,13 @@ from dotenv import load_dotenv
 
 import psutil
 import pandas as pd
-from flask import Flask, jsonify, render_string, request
+from flask import Flask, Response, g, jsonify, render_template_string, request
 from flask_cors import CORS
 
+from src.latency import LatencyRecorder
+from src.response_cache import ResponseCache, fingerprint
+from src.snapshot_store import SnapshotStore, read_csv_tail
+
 # ============================================================================
 # CONFIG & LOGGER
 # ============================================================================
@@ -51,33 +55,61 @@ logging.basicConfig(
 )
 logger = logging.getLogger("bmv_dashboard")
 
+# Series append-only del monitor/trader (src/snapshot_store.py)
+SNAPSHOT_DIR = Path(os.getenv("SNAPSHOT_DIR", "engine_runtime"))
+if not SNAPSHOT_DIR.is_absolute():
+    SNAPSHOT_DIR = Path(__file__).resolve().parent / SNAPSHOT_DIR
+EQUITY_DEFAULT_ROWS = 252
+
 app = Flask(__name__)
 CORS(app)
 
 # ============================================================================
-# CACHE DECORATOR (15 segundos)
+# RESPONSE CACHE (fingerprint de entradas + LRU + coalescing + gzip/ETag)
 # ============================================================================
 
-_cache = {}
-_cache_ttl = {}
-CACHE_DURATION = 15  # segundos
+CACHE_DURATION = 15  # segundos (tope para entradas que no son archivos)
+
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("DASH_CACHE_ENTRIES", 64)),
+    max_builds=int(os.getenv("DASH_MAX_BUILDS", 2)),
+)
+route_latency = LatencyRecorder()
+
+def cached_route(name, inputs=None, ttl=CACHE_DURATION):
+    """Cachea la respuesta JSON ya serializada (y comprimida) de un endpoint.
 
-def cache_result(key, ttl=CACHE_DURATION):
+    - inputs: callable que devuelve los archivos que lee la vista; la entrada se
+      invalida cuando cambia su mtime/tamaño (ttl sigue aplicando como tope).
+    - La vista devuelve (payload, status); solo se cachean respuestas 200.
+    - Varios clientes refrescando a la vez disparan una sola reconstrucción.
+    """
     def decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
-            now = time.time()
-            if key in _cache and key in _cache_ttl:
-                if now - _cache_ttl[key] < ttl:
-                    return _cache[key]
-            
-            result = f(*args, **kwargs)
-            _cache[key] = result
-            _cache_ttl[key] = now
-            return result
+            fp = fingerprint(inputs()) if inputs else ()
+            key = (name, request.query_string)
+            entry = response_cache.get(key, fp, lambda: f(*args, **kwargs), ttl=ttl)
+            return cached_response(entry)
         return wrapper
     return decorator
 
+def cached_response(entry):
+    """Response con ETag/304 y gzip según los headers del cliente."""
+    etag = entry.etag.strip('"')
+    if entry.status == 200 and request.if_none_match.contains(etag):
+        resp = Response(status=304)
+        resp.set_etag(etag)
+        return resp
+    use_gzip = 'gzip' in request.accept_encodings
+    resp = Response(entry.gzip_body if use_gzip else entry.body, status=entry.status, mimetype='application/json')
+    if use_gzip:
+        resp.headers['Content-Encoding'] = 'gzip'
+    resp.headers['Vary'] = 'Accept-Encoding'
+    if entry.status == 200:
+        resp.set_etag(etag)
+    return resp
+
 # ============================================================================
 # UTILIDADES
 # ============================================================================
@@ -107,7 +139,8 @@ def safe_read_json(path):
 def get_system_health():
     """Telemetría del sistema."""
     try:
-        cpu_percent = psutil.cpu_percent(interval=1)
+        # interval=None: uso desde la llamada anterior, no bloquea 1s por request
+        cpu_percent = psutil.cpu_percent(interval=None)
         mem = psutil.virtual_memory()
         disk = psutil.disk_usage("/")
         
@@ -131,12 +164,26 @@ def get_system_health():
         logger.error(f"Error obteniendo health: {e}")
         return {}
 
+ACTIVE_POSITIONS_FILE = Path(os.path.expanduser("~")) / "bmv_hybrid_clean_v3" / "active_positions.json"
+EQUITY_CURVE_FILE = BVM_REPORTS / "paper_trading" / "equity_curve.csv"
+
+def latest_trades_files():
+    """trades.csv de las últimas 10 carpetas de días."""
+    paper_trading_dir = BVM_REPORTS / "paper_trading"
+    if not paper_trading_dir.exists():
+        return []
+    return [d / "trades.csv" for d in sorted(paper_trading_dir.glob("*/"), reverse=True)[:10]]
+
+def equity_inputs():
+    series = SnapshotStore(SNAPSHOT_DIR)
+    return [series.series_dir / "equity", *series.segments("equity")[-1:], EQUITY_CURVE_FILE]
+
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
 
 @app.route('/health', methods=['GET'])
-@cache_result('health', ttl=5)
+@cached_route('health', inputs=lambda: [BVM_STATE / "last_run.json", BVM_STATE / "lock_daily"], ttl=5)
 def health():
     """Health check con telemetría."""
     try:
@@ -146,47 +193,64 @@ def health():
         # Verificar locks
         has_lock = (BVM_STATE / "lock_daily").exists()
         
-        return jsonify({
+        return {
             'status': 'ok' if not has_lock else 'busy',
             'service': 'bmv-dashboard',
             'last_run': state,
             'system': health_data,
             'timestamp': datetime.now().isoformat()
-        }), 200
+        }, 200
     except Exception as e:
         logger.error(f"Error en health: {e}")
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+        return {'status': 'error', 'message': str(e)}, 500
 
 @app.route('/api/positions')
-@cache_result('positions')
+@cached_route('positions', inputs=lambda: [ACTIVE_POSITIONS_FILE])
 def api_positions():
     """Posiciones activas actuales."""
     try:
-        active_pos_file = Path(os.path.expanduser("~")) / "bmv_hybrid_clean_v3" / "active_positions.json"
-        positions = safe_read_json(active_pos_file)
+        positions = safe_read_json(ACTIVE_POSITIONS_FILE)
         
-        return jsonify({
+        return {
             'status': 'success',
             'data': positions,
             'count': len(positions),
             'timestamp': datetime.now().isoformat()
-        })
+        }, 200
     except Exception as e:
         logger.error(f"Error en /api/positions: {e}")
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+        return {'status': 'error', 'message': str(e)}, 500
 
 @app.route('/api/equity')
-@cache_result('equity')
+@cached_route('equity', inputs=equity_inputs)
 def api_equity():
-    """Curva de capital (últimos 252 días = 1 año aprox)."""
+    """Curva de capital.
+
+    Query params opcionales: start, end (ISO fecha/hora) y limit (default 252).
+    Si existe la serie del monitor/trader (SnapshotStore) solo se leen los
+    segmentos diarios del rango pedido; si no, las últimas filas de
+    equity_curve.csv leyendo desde el final del archivo.
+    """
     try:
-        equity_file = BVM_REPORTS / "paper_trading" / "equity_curve.csv"
-        data = safe_read_csv(equity_file, max_rows=252)
+        start = request.args.get('start') or None
+        end = request.args.get('end') or None
+        limit = request.args.get('limit', default=EQUITY_DEFAULT_ROWS, type=int)
+
+        store = SnapshotStore(SNAPSHOT_DIR)
+        if store.segments("equity"):
+            source = 'series'
+            data = store.query("equity", start=start, end=end, limit=limit)
+        else:
+            source = 'equity_curve'
+            data = read_csv_tail(EQUITY_CURVE_FILE, limit)
         
         # Calcular estadísticas
         stats = {}
         if data:
             df = pd.DataFrame(data)
+            for col in ('pnl_cumulative', 'pnl_day', 'equity', 'day_pnl'):
+                if col in df.columns:
+                    df[col] = pd.to_numeric(df[col], errors='coerce')
             if 'pnl_cumulative' in df.columns:
                 stats = {
                     'total_pnl': float(df['pnl_cumulative'].iloc[-1]) if len(df) > 0 else 0,
@@ -194,44 +258,47 @@ def api_equity():
                     'max_pnl': float(df['pnl_cumulative'].max()),
                     'min_pnl': float(df['pnl_cumulative'].min()),
                 }
+            elif 'equity' in df.columns:
+                stats = {
+                    'total_pnl': float(df['equity'].iloc[-1] - df['equity'].iloc[0]),
+                    'today_pnl': float(df['day_pnl'].iloc[-1]) if 'day_pnl' in df.columns else 0,
+                    'max_pnl': float(df['equity'].max() - df['equity'].iloc[0]),
+                    'min_pnl': float(df['equity'].min() - df['equity'].iloc[0]),
+                }
         
-        return jsonify({
+        return {
             'status': 'success',
             'data': data,
             'stats': stats,
+            'source': source,
             'timestamp': datetime.now().isoformat()
-        })
+        }, 200
     except Exception as e:
         logger.error(f"Error en /api/equity: {e}")
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+        return {'status': 'error', 'message': str(e)}, 500
 
 @app.route('/api/trades/latest')
-@cache_result('trades')
+@cached_route('trades', inputs=lambda: [BVM_REPORTS / "paper_trading", *latest_trades_files()])
 def api_trades_latest():
     """Últimos 20 trades."""
     try:
         trades = []
-        paper_trading_dir = BVM_REPORTS / "paper_trading"
-        
-        # Buscar últimas 10 carpetas de días
-        if paper_trading_dir.exists():
-            for day_dir in sorted(paper_trading_dir.glob("*/"), reverse=True)[:10]:
-                trades_file = day_dir / "trades.csv"
-                if trades_file.exists():
-                    trades.extend(safe_read_csv(trades_file, max_rows=5))
+        for trades_file in latest_trades_files():
+            if trades_file.exists():
+                trades.extend(safe_read_csv(trades_file, max_rows=5))
         
-        return jsonify({
+        return {
             'status': 'success',
             'data': trades[:20],
             'count': len(trades),
             'timestamp': datetime.now().isoformat()
-        })
+        }, 200
     except Exception as e:
         logger.error(f"Error en /api/trades/latest: {e}")
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+        return {'status': 'error', 'message': str(e)}, 500
 
 @app.route('/api/status')
-@cache_result('status', ttl=5)
+@cached_route('status', ttl=30)
 def api_status():
     """Status general del sistema."""
     try:
@@ -242,7 +309,7 @@ def api_status():
         reports_count = len(list(BVM_REPORTS.glob("**/*.csv")))
         logs_count = len(list(BVM_LOGS.glob("*.log")))
         
-        return jsonify({
+        return {
             'status': 'ok',
             'last_run': last_run,
             'system_health': health,
@@ -251,15 +318,15 @@ def api_status():
                 'logs': logs_count
             },
             'timestamp': datetime.now().isoformat()
-        })
+        }, 200
     except Exception as e:
         logger.error(f"Error en /api/status: {e}")
-        return jsonify({'status': 'error'}), 500
+        return {'status': 'error'}, 500
 
 @app.route('/')
 def index():
     """Dashboard HTML."""
-    return render_string(HTML_TEMPLATE, 
+    return render_template_string(HTML_TEMPLATE,
                         last_update=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                         bvm_runtime=str(BVM_RUNTIME))
 
@@ -269,13 +336,27 @@ def index():
 
 @app.before_request
 def log_request():
+    g.request_start = time.perf_counter()
     logger.debug(f"{request.method} {request.path} from {request.remote_addr}")
 
 @app.after_request
 def log_response(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        route_latency.observe(route, (time.perf_counter() - start) * 1000.0)
     logger.debug(f"Response: {response.status_code}")
     return response
 
+@app.route('/metrics')
+def metrics():
+    """Latencia por ruta y estadísticas del cache de respuestas."""
+    return jsonify({
+        'routes': route_latency.summary(),
+        'cache': response_cache.info(),
+        'timestamp': datetime.now().isoformat()
+    })
+
 # ============================================================================
 # HTML TEMPLATE
 # ============================================================================
@@ -462,7 +543,7 @@ HTML_TEMPLATE = """
             const ctx = document.getElementById('equityChart');
             if (!ctx) return;
             
-            const dates = data.data.map(row => row.date || row.datetime || '').slice(-60);
+            const dates = data.data.map(row => row.date || row.datetime || row.timestamp || '').slice(-60);
             const equities = data.data.map(row => row.capital || row.equity || 0).slice(-60);
             
             new Chart(ctx.getContext('2d'), {
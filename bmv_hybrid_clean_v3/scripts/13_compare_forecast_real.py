@@ -1,11 +1,21 @@
 # scripts/13_compare_forecast_real.py
 from __future__ import annotations
 
-import argparse
+# --- bootstrap para que 'src' se pueda importar (igual que en 09_*) ---
+import sys
 from pathlib import Path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+# ----------------------------------------------------------------------
+
+import argparse
 import json
+import numpy as np
 import pandas as pd
 
+from src.execution.first_touch import HIT_SL, HIT_TP, simulate_exits
+
 # ------------------------------------------------------------
 # Helpers de lectura
 # ------------------------------------------------------------
@@ -126,6 +136,53 @@ def load_forecast_trades(val_dir: Path) -> pd.DataFrame:
 # Lógica de comparación barra-a-barra
 # ------------------------------------------------------------
 
+def simulate_tp_sl_batch(
+    bars: pd.DataFrame,
+    sides: list[str],
+    entry_ts: list[pd.Timestamp],
+    exit_ts: list[pd.Timestamp | None],
+    tp: list[float],
+    sl: list[float],
+    tie_mode: str = "worst",
+) -> list[dict]:
+    """
+    simulate_tp_sl_on_1h para varios trades del mismo ticker en una corrida del kernel
+    de primer toque (src/execution/first_touch.py). bars ordenado por índice.
+    """
+    idx = bars.index
+    n = len(sides)
+    start = idx.searchsorted(pd.DatetimeIndex(entry_ts), side="left") if n else np.zeros(0, dtype=np.int64)
+    stop = np.array([len(idx) if e is None else idx.searchsorted(e, side="left") for e in exit_ts], dtype=np.int64)
+    length = np.maximum(stop - start, 0)
+    is_long = np.array([str(s).upper() == "BUY" for s in sides], dtype=bool)
+    out = simulate_exits(bars["Open"].to_numpy(dtype=float), bars["High"].to_numpy(dtype=float),
+                         bars["Low"].to_numpy(dtype=float), bars["Close"].to_numpy(dtype=float),
+                         start, length, is_long, np.asarray(tp, dtype=float), np.asarray(sl, dtype=float),
+                         tie="tp_first" if tie_mode == "best" else "sl_first")
+
+    results = []
+    for i in range(n):
+        if length[i] == 0:
+            results.append(dict(outcome_real="NO_DATA", exit_price=None, entry_price=None, pnl_sign_real=0, bars_used=0))
+            continue
+        entry_price = float(bars["Open"].iat[start[i]])
+        bars_used = int(out["exit_bar"][i]) + 1
+        code = out["reason"][i]
+        if code == HIT_TP:
+            results.append(dict(outcome_real="TP", exit_price=tp[i], entry_price=entry_price, pnl_sign_real=+1, bars_used=bars_used))
+        elif code == HIT_SL:
+            results.append(dict(outcome_real="SL", exit_price=sl[i], entry_price=entry_price, pnl_sign_real=-1, bars_used=bars_used))
+        else:
+            close_price = float(out["exit_price"][i])
+            delta = close_price - entry_price
+            if is_long[i]:
+                pnl_sign = 1 if delta > 0 else (-1 if delta < 0 else 0)
+            else:
+                pnl_sign = 1 if delta < 0 else (-1 if delta > 0 else 0)
+            results.append(dict(outcome_real="TIME", exit_price=close_price, entry_price=entry_price, pnl_sign_real=pnl_sign, bars_used=bars_used))
+    return results
+
+
 def simulate_tp_sl_on_1h(
     bars: pd.DataFrame,
     side: str,
@@ -136,50 +193,9 @@ def simulate_tp_sl_on_1h(
     tie_mode: str = "worst",
 ) -> dict:
     """
-    Igual que antes: recorre barras [entry_ts, exit_ts) y determina TP/SL primero.
+    Recorre barras [entry_ts, exit_ts) y determina TP/SL primero (ver simulate_tp_sl_batch).
     """
-    sub = bars.loc[bars.index >= entry_ts]
-    if exit_ts is not None:
-        sub = sub.loc[sub.index < exit_ts]
-    if sub.empty:
-        return dict(outcome_real="NO_DATA", exit_price=None, entry_price=None, pnl_sign_real=0, bars_used=0)
-
-    entry_price = float(sub.iloc[0]["Open"])
-    bars_used = 0
-    side = side.upper()
-
-    for _, row in sub.iterrows():
-        bars_used += 1
-        hi = float(row["High"])
-        lo = float(row["Low"])
-
-        if side == "BUY":
-            tp_hit = (hi >= tp)
-            sl_hit = (lo <= sl)
-        else:
-            tp_hit = (lo <= tp)
-            sl_hit = (hi >= sl)
-
-        if tp_hit and sl_hit:
-            if tie_mode == "best":
-                return dict(outcome_real="TP", exit_price=tp, entry_price=entry_price, pnl_sign_real=+1, bars_used=bars_used)
-            else:
-                return dict(outcome_real="SL", exit_price=sl, entry_price=entry_price, pnl_sign_real=-1, bars_used=bars_used)
-
-        if tp_hit:
-            return dict(outcome_real="TP", exit_price=tp, entry_price=entry_price, pnl_sign_real=+1, bars_used=bars_used)
-        if sl_hit:
-            return dict(outcome_real="SL", exit_price=sl, entry_price=entry_price, pnl_sign_real=-1, bars_used=bars_used)
-
-    close_price = float(sub.iloc[-1]["Close"])
-    delta = close_price - entry_price
-    pnl_sign = 0
-    if side == "BUY":
-        pnl_sign = 1 if delta > 0 else (-1 if delta < 0 else 0)
-    else:
-        pnl_sign = 1 if delta < 0 else (-1 if delta > 0 else 0)
-
-    return dict(outcome_real="TIME", exit_price=close_price, entry_price=entry_price, pnl_sign_real=pnl_sign, bars_used=bars_used)
+    return simulate_tp_sl_batch(bars, [side], [entry_ts], [exit_ts], [tp], [sl], tie_mode=tie_mode)[0]
 
 
 def simulate_fallback_sign_on_1h(
@@ -232,6 +248,32 @@ def reason_to_pred_outcome(reason: str | None) -> str | None:
     return None
 
 
+def _fill_sim(rec: dict, sim: dict) -> None:
+    """Completa la fila de resultados con la simulación (outcome, precios, pnl_real_pct)."""
+    rec["outcome_real"] = sim["outcome_real"]
+    rec["match_reason"] = bool(rec["reason_pred"] is not None and rec["reason_pred"] == sim["outcome_real"])
+
+    # === NUEVO: calcular pnl_real_pct con base en precios simulados y lado ===
+    entry_price = sim["entry_price"]
+    exit_price = sim["exit_price"]
+    if entry_price is None or exit_price is None:
+        pnl_real_pct = None
+    else:
+        try:
+            if rec["side"] in ("BUY", "LONG"):
+                pnl_real_pct = (exit_price - entry_price) / entry_price
+            else:  # SELL / SHORT
+                pnl_real_pct = (entry_price - exit_price) / entry_price
+        except Exception:
+            pnl_real_pct = None
+
+    rec["entry_price"] = entry_price
+    rec["exit_price_real"] = exit_price
+    rec["pnl_sign_real"] = sim["pnl_sign_real"]
+    rec["pnl_real_pct"] = pnl_real_pct
+    rec["bars_used"] = sim["bars_used"]
+
+
 # ------------------------------------------------------------
 # Main
 # ------------------------------------------------------------
@@ -255,6 +297,7 @@ def run(month: str,
     cache_bars: dict[str, pd.DataFrame] = {}
 
     results = []
+    pending: dict[str, list] = {}
     for _, row in trades.iterrows():
         ticker = str(row["ticker"])
         side = str(row["side"]).upper()
@@ -330,42 +373,33 @@ def run(month: str,
         else:
             bars = cache_bars[ticker]
 
-        if tp is not None and sl is not None:
-            sim = simulate_tp_sl_on_1h(bars, side, entry_ts, exit_ts, tp, sl, tie_mode=tie_mode)
-        else:
-            sim = simulate_fallback_sign_on_1h(bars, side, entry_ts, exit_ts)
-
-        match_reason = (reason_pred is not None and reason_pred == sim["outcome_real"])
-
-        # === NUEVO: calcular pnl_real_pct con base en precios simulados y lado ===
-        entry_price = sim["entry_price"]
-        exit_price = sim["exit_price"]
-        if entry_price is None or exit_price is None:
-            pnl_real_pct = None
-        else:
-            try:
-                if side in ("BUY", "LONG"):
-                    pnl_real_pct = (exit_price - entry_price) / entry_price
-                else:  # SELL / SHORT
-                    pnl_real_pct = (entry_price - exit_price) / entry_price
-            except Exception:
-                pnl_real_pct = None
-
         results.append({
             "ticker": ticker, "side": side,
             "entry_date": entry_ts, "exit_date": exit_ts,
             "tp": tp, "sl": sl,
             "reason_pred": reason_pred,
             "pnl_pred": pnl_pred,
-            "outcome_real": sim["outcome_real"],
-            "entry_price": entry_price,
-            "exit_price_real": exit_price,
-            "pnl_sign_real": sim["pnl_sign_real"],
-            "pnl_real_pct": pnl_real_pct,   # ← NUEVO
-            "y_score": y_score,             # ← NUEVO
-            "match_reason": bool(match_reason),
-            "bars_used": sim["bars_used"],
+            "outcome_real": None,
+            "entry_price": None,
+            "exit_price_real": None,
+            "pnl_sign_real": None,
+            "pnl_real_pct": None,   # ← NUEVO
+            "y_score": y_score,     # ← NUEVO
+            "match_reason": False,
+            "bars_used": 0,
         })
+        if tp is not None and sl is not None:
+            # TP/SL: se simulan todos los trades del ticker juntos al final (kernel de primer toque)
+            pending.setdefault(ticker, []).append((len(results) - 1, side, entry_ts, exit_ts, tp, sl))
+        else:
+            _fill_sim(results[-1], simulate_fallback_sign_on_1h(bars, side, entry_ts, exit_ts))
+
+    for ticker, items in pending.items():
+        pos, sides, entries, exits, tps, sls = zip(*items)
+        sims = simulate_tp_sl_batch(cache_bars[ticker], list(sides), list(entries), list(exits),
+                                    list(tps), list(sls), tie_mode=tie_mode)
+        for k, sim in zip(pos, sims):
+            _fill_sim(results[k], sim)
 
     out_csv = out_dir / "forecast_vs_real.csv"
     out_json = out_dir / "forecast_vs_real_metrics.json"
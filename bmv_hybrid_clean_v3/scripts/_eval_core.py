@@ -10,7 +10,7 @@ from src.io.loader import load_daily_map, load_hourly_map
 from src.features.indicators import ensure_atr_14
 from src.models.adapters import LSTMSim
 from src.signals.generate import generate_daily_signals
-from src.execution.hybrid_v2 import execute_hybrid_v2
+from src.execution.hybrid_v2 import execute_hybrid_v2_batch
 
 # ---------------------------- Helpers locales ----------------------------
 
@@ -47,33 +47,30 @@ def run_backtest(sig_df: pd.DataFrame,
                  d1_map: dict[str, pd.DataFrame],
                  exec_cfg: dict) -> pd.DataFrame:
     """
-    Ejecuta cada señal con execute_hybrid_v2 y devuelve un DataFrame de trades.
-    Requiere columnas: ['ticker','date','side','prob'] en sig_df.
+    Ejecuta las señales con execute_hybrid_v2_batch (una corrida del kernel por ticker)
+    y devuelve un DataFrame de trades. Requiere columnas: ['ticker','date','side','prob'] en sig_df.
     """
-    rows = []
     if sig_df is None or sig_df.empty:
-        return pd.DataFrame(rows)
-
-    for _, s in sig_df.iterrows():
-        t = s["ticker"]
-        D = pd.to_datetime(s["date"]).date()
-        side = str(s["side"])
-        prob = float(s.get("prob", 0.0))
-        if t not in h1_map or t not in d1_map or h1_map[t].empty or d1_map[t].empty:
-            continue
-
-        res = execute_hybrid_v2(
-            h1_map, d1_map, t, D, side, prob,
-            tp_mult=exec_cfg["tp_atr_mult"],
-            sl_mult=exec_cfg["sl_atr_mult"],
-            commission=exec_cfg["commission_pct"],
-            slippage=exec_cfg["slippage_pct"],
-            max_holding_days=exec_cfg["max_holding_days"],
-            trail_atr_mult=exec_cfg.get("trail_atr_mult", 0.0),
-            trail_activation_atr=exec_cfg.get("trail_activation_atr", 0.5),
-            break_even_atr=exec_cfg.get("break_even_atr", 1.0),
-        )
-        rows.append(res)
+        return pd.DataFrame([])
+
+    ok = [t in h1_map and t in d1_map and not h1_map[t].empty and not d1_map[t].empty for t in sig_df["ticker"]]
+    sig = pd.DataFrame({
+        "ticker": sig_df["ticker"],
+        "date": pd.to_datetime(sig_df["date"]).dt.date,
+        "side": sig_df["side"].astype(str),
+        "prob": sig_df["prob"].astype(float) if "prob" in sig_df.columns else 0.0,
+    })[ok]
+    rows = execute_hybrid_v2_batch(
+        h1_map, d1_map, sig,
+        tp_mult=exec_cfg["tp_atr_mult"],
+        sl_mult=exec_cfg["sl_atr_mult"],
+        commission=exec_cfg["commission_pct"],
+        slippage=exec_cfg["slippage_pct"],
+        max_holding_days=exec_cfg["max_holding_days"],
+        trail_atr_mult=exec_cfg.get("trail_atr_mult", 0.0),
+        trail_activation_atr=exec_cfg.get("trail_activation_atr", 0.5),
+        break_even_atr=exec_cfg.get("break_even_atr", 1.0),
+    )
     return pd.DataFrame(rows)
 
 def kpis(trades_df: pd.DataFrame) -> dict:
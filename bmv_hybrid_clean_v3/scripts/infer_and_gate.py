@@ -91,11 +91,23 @@ def _safe_predict_reg(mdl, X: pd.DataFrame) -> np.ndarray:
     return mdl.predict(X)
 
 
+# Modelos ya deserializados en este proceso: {ruta: (mtime_ns, size, modelo)}
+_MODEL_CACHE: dict = {}
+
+
 def _load_model(path: Path):
+    """joblib.load memoizado por (ruta, mtime, tamaño); se recarga si el archivo cambia."""
+    path = Path(path)
     try:
+        st = path.stat()
+        key = str(path.resolve())
+        hit = _MODEL_CACHE.get(key)
+        if hit is not None and hit[:2] == (st.st_mtime_ns, st.st_size):
+            return hit[2]
         mdl = joblib.load(path)
     except Exception as e:
         raise RuntimeError(f"No se pudo cargar el modelo: {path} -> {e}")
+    _MODEL_CACHE[key] = (st.st_mtime_ns, st.st_size, mdl)
     return mdl
 
 
@@ -125,7 +137,7 @@ def add_prob(df: pd.DataFrame, prob_model_path: Path, prob_col: str = "prob_win"
 
     mdl = None
     try:
-        mdl = joblib.load(prob_model_path)
+        mdl = _load_model(prob_model_path)
     except Exception as e:
         print(f"ℹ️  No se pudo cargar modelo de probas ({prob_model_path}): {e}")
         return df
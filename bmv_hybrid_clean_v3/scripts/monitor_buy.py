@@ -9,6 +9,12 @@ import requests
 from dotenv import load_dotenv, find_dotenv
 from openpyxl import Workbook, load_workbook
 from collections import Counter, defaultdict
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
 
 # ========= Telegram =========
 load_dotenv()
@@ -178,6 +184,18 @@ def investing_last_close_dict(tickers_mx: List[str]) -> Dict[str, Tuple[float, s
             out[t] = (val, "investing")
     return out
 
+def quote_service_dict(tickers_mx: List[str]) -> Dict[str, Tuple[float, str]]:
+    """Precios desde src.quote_service (QUOTE_SERVICE_URL). Vacío si no hay servicio."""
+    url = (os.getenv("QUOTE_SERVICE_URL") or "").strip()
+    if not url or not tickers_mx:
+        return {}
+    try:
+        from src.quote_service import QuoteClient
+    except Exception:
+        return {}
+    prices = QuoteClient(url).get_prices(tickers_mx)
+    return {t: (float(px), "quote-svc") for t, px in prices.items()}
+
 def fetch_prices_multi(tickers_mx: List[str], prefer: str = "yf") -> Dict[str, Tuple[float, str]]:
     """
     Devuelve {ticker_mx: (precio, fuente)}. prefer: 'yf' o 'investing'
@@ -187,14 +205,20 @@ def fetch_prices_multi(tickers_mx: List[str], prefer: str = "yf") -> Dict[str, T
     if not tickers_mx:
         return res
 
+    # Servicio de cotizaciones compartido (si está configurado) antes que YF/Investing
+    res.update(quote_service_dict(tickers_mx))
+    pending = [t for t in tickers_mx if t not in res]
+
+    if not pending:
+        return res
     if prefer == "yf":
-        a = yf_last_close_dict(tickers_mx)
-        need = [t for t in tickers_mx if t not in a]
+        a = yf_last_close_dict(pending)
+        need = [t for t in pending if t not in a]
         b = investing_last_close_dict(need)
         res.update(a); res.update(b)
     else:
-        a = investing_last_close_dict(tickers_mx)
-        need = [t for t in tickers_mx if t not in a]
+        a = investing_last_close_dict(pending)
+        need = [t for t in pending if t not in a]
         b = yf_last_close_dict(need)
         res.update(a); res.update(b)
 
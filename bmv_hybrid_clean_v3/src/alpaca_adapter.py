@@ -1,7 +1,9 @@
 import time
+import random
 import logging
 from pathlib import Path
-from typing import Dict, List, Optional
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
@@ -66,16 +68,38 @@ class AlpacaAdapter:
         return out
 
     def fetch_latest_price(self, symbol: str) -> Optional[float]:
+        return self.fetch_latest_prices([symbol]).get(symbol)
+
+    def fetch_latest_prices(self, symbols: List[str]) -> Dict[str, float]:
+        """Latest trade price for every symbol in a single multi-symbol request."""
+        return {sym: px for sym, (px, _) in self.fetch_latest_trades(symbols).items()}
+
+    def fetch_latest_trades(self, symbols: List[str]) -> Dict[str, Tuple[float, float]]:
+        """{symbol: (price, trade time as epoch seconds)} in a single multi-symbol request."""
+        symbols = list(dict.fromkeys(s for s in symbols if s))
+        if not symbols:
+            return {}
         try:
             from alpaca.data.requests import StockLatestTradeRequest
 
-            req = StockLatestTradeRequest(symbol_or_symbols=symbol)
+            req = StockLatestTradeRequest(symbol_or_symbols=symbols, feed=self.env.get("ALPACA_DATA_FEED") or None)
             resp = self._retry(lambda: self._data().get_stock_latest_trade(req))
-            trade = resp[symbol] if isinstance(resp, dict) else resp
-            return float(trade.price)
         except Exception as exc:
-            logger.warning("latest price failed for %s: %s", symbol, exc)
-            return None
+            logger.warning("latest prices failed for %s: %s", ",".join(symbols), exc)
+            return {}
+        if not isinstance(resp, dict):
+            resp = {symbols[0]: resp}
+        out: Dict[str, Tuple[float, float]] = {}
+        now = time.time()
+        for sym in symbols:
+            trade = resp.get(sym)
+            if trade is not None and getattr(trade, "price", None) is not None:
+                ts = getattr(trade, "timestamp", None)
+                out[sym] = (float(trade.price), ts.timestamp() if hasattr(ts, "timestamp") else now)
+        missing = [s for s in symbols if s not in out]
+        if missing:
+            logger.warning("no latest trade for %s", ",".join(missing))
+        return out
 
     def submit_order(self, symbol: str, qty: float, side: str, client_order_id: str):
         from alpaca.trading.requests import MarketOrderRequest
@@ -97,7 +121,7 @@ class AlpacaAdapter:
         orders = self._retry(lambda: self._trading().get_orders(req))
         return orders[0] if orders else None
 
-    def _retry(self, func, retries: int = 3, backoff: float = 1.5):
+    def _retry(self, func, retries: int = 3, backoff: float = 0.5, max_backoff: float = 8.0):
         last_exc = None
         for attempt in range(retries):
             try:
@@ -105,5 +129,64 @@ class AlpacaAdapter:
             except Exception as exc:  # pragma: no cover - network dependent
                 last_exc = exc
                 logger.warning("alpaca call failed (attempt %s/%s): %s", attempt + 1, retries, exc)
-                time.sleep(backoff * (attempt + 1))
+                if attempt + 1 < retries:
+                    time.sleep(backoff_delay(attempt, backoff, max_backoff))
         raise RuntimeError(f"alpaca call failed after {retries} attempts: {last_exc}")
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 8.0) -> float:
+    """Exponential backoff with full jitter: uniform(0, min(cap, base * 2**attempt))."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class FakeAlpacaAdapter:
+    """In-memory stand-in for AlpacaAdapter (tests and dry runs).
+
+    Records every call in ``calls`` so tests can assert on request counts;
+    ``submit_order`` returns an object shaped like an alpaca order.
+    """
+
+    def __init__(self, prices: Optional[Dict[str, float]] = None, account: Optional[Dict] = None, positions: Optional[List[Dict]] = None):
+        self.prices = dict(prices or {})
+        self.account = dict(account or {"equity": 100000.0, "cash": 100000.0, "buying_power": 100000.0, "day_pnl": 0.0, "day_pnl_pct": 0.0})
+        self.positions = list(positions or [])
+        self.orders: Dict[str, SimpleNamespace] = {}
+        self.calls: List[tuple] = []
+
+    def fetch_account(self) -> Dict:
+        self.calls.append(("fetch_account",))
+        return dict(self.account)
+
+    def fetch_positions(self) -> List[Dict]:
+        self.calls.append(("fetch_positions",))
+        return [dict(p) for p in self.positions]
+
+    def fetch_latest_price(self, symbol: str) -> Optional[float]:
+        return self.fetch_latest_prices([symbol]).get(symbol)
+
+    def fetch_latest_prices(self, symbols: List[str]) -> Dict[str, float]:
+        self.calls.append(("fetch_latest_prices", tuple(symbols)))
+        return {s: self.prices[s] for s in symbols if s in self.prices}
+
+    def fetch_latest_trades(self, symbols: List[str]) -> Dict[str, Tuple[float, float]]:
+        now = time.time()
+        return {s: (px, now) for s, px in self.fetch_latest_prices(symbols).items()}
+
+    def submit_order(self, symbol: str, qty: float, side: str, client_order_id: str):
+        self.calls.append(("submit_order", symbol, qty, side))
+        order = SimpleNamespace(
+            id=f"fake-{len(self.orders) + 1}",
+            client_order_id=client_order_id,
+            symbol=symbol,
+            qty=qty,
+            side=side.lower(),
+            status="filled",
+            filled_qty=qty,
+            filled_avg_price=self.prices.get(symbol, 0.0),
+        )
+        self.orders[client_order_id] = order
+        return order
+
+    def fetch_order_by_client_id(self, client_order_id: str):
+        self.calls.append(("fetch_order_by_client_id", client_order_id))
+        return self.orders.get(client_order_id)
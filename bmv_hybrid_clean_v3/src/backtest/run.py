@@ -5,7 +5,7 @@ from ..features.indicators import ensure_atr_14
 from ..models.adapters import LSTMSim
 from ..signals.generate import generate_daily_signals
 from ..calibrate.threshold import scan_tau_pnl
-from ..execution.hybrid_v2 import execute_hybrid_v2
+from ..execution.hybrid_v2 import execute_hybrid_v2_batch
 
 def search_weights(d1_map, cfg, step=0.1):
     vals = [round(i*step,10) for i in range(int(1/step)+1)]
@@ -81,18 +81,15 @@ def main():
                                     tickers=cfg.tickers, dates=dates_ev, weights=tuple(best["weights"]))
     sig_ev.to_csv(os.path.join(cfg.reports_dir,"signals_eval.csv"), index=False)
 
-    trades = []
-    for _, s in sig_ev.iterrows():
-        res = execute_hybrid_v2(
-            h1_map, d1_map, s["ticker"], s["date"], s["side"], s["prob"],
-            tp_mult=cfg.exec.tp_atr_mult, sl_mult=cfg.exec.sl_atr_mult,
-            commission=cfg.exec.commission_pct, slippage=cfg.exec.slippage_pct,
-            max_holding_days=cfg.exec.max_holding_days,
-            trail_atr_mult=cfg.exec.trail_atr_mult,
-            trail_activation_atr=cfg.exec.trail_activation_atr,
-            break_even_atr=cfg.exec.break_even_atr
-        )
-        trades.append(res)
+    trades = execute_hybrid_v2_batch(
+        h1_map, d1_map, sig_ev,
+        tp_mult=cfg.exec.tp_atr_mult, sl_mult=cfg.exec.sl_atr_mult,
+        commission=cfg.exec.commission_pct, slippage=cfg.exec.slippage_pct,
+        max_holding_days=cfg.exec.max_holding_days,
+        trail_atr_mult=cfg.exec.trail_atr_mult,
+        trail_activation_atr=cfg.exec.trail_activation_atr,
+        break_even_atr=cfg.exec.break_even_atr
+    )
     trades_df = pd.DataFrame(trades)
     trades_df.to_csv(os.path.join(cfg.reports_dir,"trades_eval.csv"), index=False)
 
@@ -1,23 +1,27 @@
 import pandas as pd
-from ..execution.hybrid_v2 import execute_hybrid_v2
+from ..execution.hybrid_v2 import execute_hybrid_v2_batch
 
 def scan_tau_pnl(signals_df, side, h1_map, d1_map, grid, exec_cfg):
     best_tau, best_pnl = None, -1e18
     rows = []
+    # cada señal se ejecuta una sola vez; cada τ suma el PnL del subconjunto prob >= τ
+    sig = signals_df[signals_df["side"]==side]
+    res = execute_hybrid_v2_batch(
+        h1_map, d1_map, sig,
+        tp_mult=exec_cfg["tp_atr_mult"], sl_mult=exec_cfg["sl_atr_mult"],
+        commission=exec_cfg["commission_pct"], slippage=exec_cfg["slippage_pct"],
+        max_holding_days=exec_cfg["max_holding_days"],
+        trail_atr_mult=exec_cfg["trail_atr_mult"],
+        trail_activation_atr=exec_cfg["trail_activation_atr"],
+        break_even_atr=exec_cfg["break_even_atr"]
+    )
+    pnl = [r["pnl"] for r in res]
+    prob = sig["prob"].tolist()
     for tau in grid:
         pnl_sum = 0.0; ntr = 0
-        sub = signals_df[(signals_df["side"]==side) & (signals_df["prob"]>=tau)]
-        for _, s in sub.iterrows():
-            res = execute_hybrid_v2(
-                h1_map, d1_map, s["ticker"], s["date"], s["side"], s["prob"],
-                tp_mult=exec_cfg["tp_atr_mult"], sl_mult=exec_cfg["sl_atr_mult"],
-                commission=exec_cfg["commission_pct"], slippage=exec_cfg["slippage_pct"],
-                max_holding_days=exec_cfg["max_holding_days"],
-                trail_atr_mult=exec_cfg["trail_atr_mult"],
-                trail_activation_atr=exec_cfg["trail_activation_atr"],
-                break_even_atr=exec_cfg["break_even_atr"]
-            )
-            pnl_sum += res["pnl"]; ntr += 1
+        for p, x in zip(prob, pnl):
+            if p >= tau:
+                pnl_sum += x; ntr += 1
         rows.append({"side": side, "tau": tau, "pnl": pnl_sum, "trades": ntr})
         if pnl_sum > best_pnl:
             best_pnl, best_tau = pnl_sum, tau
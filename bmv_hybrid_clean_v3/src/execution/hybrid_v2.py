@@ -1,5 +1,7 @@
+import numpy as np
 import pandas as pd
-from datetime import timedelta
+
+from .first_touch import HIT_NONE, HIT_SL, HIT_TP, HIT_TRAIL, simulate_exits
 
 # ---------------- utilidades ----------------
 
@@ -60,97 +62,7 @@ def finalize_trade(ticker, D, side, entry, exit_px, reason, prob):
         "prob": float(prob),
     }
 
-def execute_hybrid_v2(
-    h1_map, d1_map, ticker, date, side, prob,
-    tp_mult=1.5, sl_mult=1.0,
-    commission=0.001, slippage=0.0002,
-    max_holding_days=3, trail_atr_mult=1.0, trail_activation_atr=0.5, break_even_atr=1.0
-):
-    df_h = h1_map[ticker]
-    df_d = d1_map[ticker]
-    D = pd.to_datetime(date).date()
-
-    # niveles desde diario (as-of)
-    tp, sl, atr_entry, close_entry = atr_targets_daily(df_d, D, side, tp_mult, sl_mult)
-
-    open_found = False
-    entry_px = None
-    peak = None
-    trough = None
-
-    for day_offset in range(0, max_holding_days + 1):
-        Dn = pd.to_datetime(D) + timedelta(days=day_offset)
-
-        # seleccionar todas las barras 1h del día Dn
-        try:
-            day_df = df_h.loc[str(Dn.date())]
-            # si el loc de un día devuelve Series (un solo bar), conviértelo a DF
-            if isinstance(day_df, pd.Series):
-                day_df = day_df.to_frame().T
-        except KeyError:
-            # no hay barras ese día
-            continue
-
-        if day_df.empty:
-            continue
-
-        O = day_df.iloc[0]["Open"]
-        if not open_found:
-            entry_px = O * (1 + slippage) if side == "BUY" else O * (1 - slippage)
-            peak = entry_px if side == "BUY" else None
-            trough = entry_px if side == "SELL" else None
-            open_found = True
-
-        for _, bar in day_df.iterrows():
-            H = bar["High"]; L = bar["Low"]; O_bar = bar["Open"]
-
-            # --- SL primero (incluye gaps) ---
-            if side == "BUY":
-                if L <= sl:
-                    px = max(sl, O_bar) * (1 - commission)
-                    return finalize_trade(ticker, D, side, entry_px, px, "SL", prob)
-            else:
-                if H >= sl:
-                    px = min(sl, O_bar) * (1 + commission)
-                    return finalize_trade(ticker, D, side, entry_px, px, "SL", prob)
-
-            # --- TP ---
-            if side == "BUY" and H >= tp:
-                px = min(tp, O_bar) * (1 - commission)
-                return finalize_trade(ticker, D, side, entry_px, px, "TP", prob)
-            if side == "SELL" and L <= tp:
-                px = max(tp, O_bar) * (1 + commission)
-                return finalize_trade(ticker, D, side, entry_px, px, "TP", prob)
-
-            # --- Trailing + break-even ---
-            if trail_atr_mult > 0.0:
-                move = (H - entry_px) if side == "BUY" else (entry_px - L)
-                if move >= trail_activation_atr * atr_entry:
-                    if move >= break_even_atr * atr_entry:
-                        sl = max(sl, entry_px) if side == "BUY" else min(sl, entry_px)
-
-                    if side == "BUY":
-                        peak = max(peak, H) if peak is not None else H
-                        trail = peak - trail_atr_mult * atr_entry
-                        sl = max(sl, trail)
-                        if L <= sl:
-                            px = max(sl, O_bar) * (1 - commission)
-                            return finalize_trade(ticker, D, side, entry_px, px, "TRAIL_SL", prob)
-                    else:
-                        trough = min(trough, L) if trough is not None else L
-                        trail = trough + trail_atr_mult * atr_entry
-                        sl = min(sl, trail)
-                        if H >= sl:
-                            px = min(sl, O_bar) * (1 + commission)
-                            return finalize_trade(ticker, D, side, entry_px, px, "TRAIL_SL", prob)
-
-        # último día: cerrar al close del último bar 1h disponible
-        if day_offset == max_holding_days:
-            close_px = day_df.iloc[-1]["Close"]
-            px = close_px * (1 - commission) if side == "BUY" else close_px * (1 + commission)
-            return finalize_trade(ticker, D, side, entry_px, px, "Close_LastDay", prob)
-
-    # No hubo barras en toda la ventana
+def _no_bars(ticker, D, side, prob):
     return {
         "ticker": ticker,
         "date": str(D),
@@ -161,4 +73,93 @@ def execute_hybrid_v2(
         "reason": "NoBars",
         "prob": float(prob),
     }
-        
\ No newline at end of file
+
+_REASONS = {HIT_SL: "SL", HIT_TP: "TP", HIT_TRAIL: "TRAIL_SL"}
+
+def _execute_ticker(df_h, df_d, ticker, dates, sides, probs, tp_mult, sl_mult, commission, slippage,
+                    max_holding_days, trail_atr_mult, trail_activation_atr, break_even_atr):
+    """Todas las señales de un ticker en una corrida del kernel de primer toque."""
+    days = [pd.to_datetime(d).date() for d in dates]
+    levels = [atr_targets_daily(df_d, D, side, tp_mult, sl_mult) for D, side in zip(days, sides)]
+    tp, sl, atr = (np.array([lv[k] for lv in levels], dtype=float) for k in range(3))
+    is_long = np.array([side == "BUY" for side in sides], dtype=bool)
+
+    # ventana: barras 1h de los días calendario D .. D+max_holding_days (fecha local del índice)
+    bar_day = df_h.index.tz_localize(None).normalize().values if df_h.index.tz is not None \
+        else df_h.index.normalize().values
+    d0 = np.array(days, dtype="datetime64[ns]")
+    start = np.searchsorted(bar_day, d0, side="left")
+    stop = np.searchsorted(bar_day, d0 + np.timedelta64(max_holding_days, "D"), side="right")
+    length = stop - start
+
+    o = df_h["Open"].to_numpy(dtype=float)
+    has_bars = length > 0
+    first_open = o[np.minimum(start, max(len(o) - 1, 0))] if len(o) else np.full(len(days), np.nan)
+    entry = np.where(has_bars, np.where(is_long, first_open * (1 + slippage), first_open * (1 - slippage)), np.nan)
+
+    out = simulate_exits(o, df_h["High"].to_numpy(dtype=float), df_h["Low"].to_numpy(dtype=float),
+                         df_h["Close"].to_numpy(dtype=float), start, length, is_long, tp, sl, entry=entry,
+                         tie="sl_first", fill="open", atr=atr, trail_atr_mult=trail_atr_mult,
+                         trail_activation_atr=trail_activation_atr, break_even_atr=break_even_atr)
+
+    last_day = d0 + np.timedelta64(max_holding_days, "D")
+    rows = []
+    for i, (D, side, prob) in enumerate(zip(days, sides, probs)):
+        code = int(out["reason"][i])
+        if not has_bars[i]:
+            rows.append(_no_bars(ticker, D, side, prob))
+            continue
+        if code == HIT_NONE:
+            # sin toque: cierra al close del último bar solo si el último día de la ventana tuvo barras
+            if bar_day[stop[i] - 1] != last_day[i]:
+                rows.append(_no_bars(ticker, D, side, prob))
+                continue
+            reason = "Close_LastDay"
+        else:
+            reason = _REASONS[code]
+        px = out["exit_price"][i]
+        px = px * (1 - commission) if side == "BUY" else px * (1 + commission)
+        rows.append(finalize_trade(ticker, D, side, entry[i], px, reason, prob))
+    return rows
+
+def execute_hybrid_v2_batch(
+    h1_map, d1_map, signals,
+    tp_mult=1.5, sl_mult=1.0,
+    commission=0.001, slippage=0.0002,
+    max_holding_days=3, trail_atr_mult=1.0, trail_activation_atr=0.5, break_even_atr=1.0
+):
+    """
+    execute_hybrid_v2 para un lote de señales (DataFrame con ticker, date, side, prob).
+
+    Una corrida de first_touch.simulate_exits por ticker en lugar de recorrer barra por
+    barra cada señal. Devuelve la lista de dicts de finalize_trade en el orden de signals.
+    """
+    if signals is None or len(signals) == 0:
+        return []
+    params = dict(tp_mult=tp_mult, sl_mult=sl_mult, commission=commission, slippage=slippage,
+                  max_holding_days=max_holding_days, trail_atr_mult=trail_atr_mult,
+                  trail_activation_atr=trail_activation_atr, break_even_atr=break_even_atr)
+    results = [None] * len(signals)
+    tickers = signals["ticker"].to_numpy()
+    for ticker in pd.unique(tickers):
+        pos = np.flatnonzero(tickers == ticker)
+        sub = signals.iloc[pos]
+        rows = _execute_ticker(h1_map[ticker], d1_map[ticker], ticker, sub["date"].tolist(),
+                               sub["side"].tolist(), sub["prob"].tolist(), **params)
+        for p, r in zip(pos, rows):
+            results[p] = r
+    return results
+
+def execute_hybrid_v2(
+    h1_map, d1_map, ticker, date, side, prob,
+    tp_mult=1.5, sl_mult=1.0,
+    commission=0.001, slippage=0.0002,
+    max_holding_days=3, trail_atr_mult=1.0, trail_activation_atr=0.5, break_even_atr=1.0
+):
+    """Una señal: entrada al Open del primer bar 1h desde D; SL, TP y trailing/break-even por barra."""
+    return _execute_ticker(
+        h1_map[ticker], d1_map[ticker], ticker, [date], [side], [prob],
+        tp_mult=tp_mult, sl_mult=sl_mult, commission=commission, slippage=slippage,
+        max_holding_days=max_holding_days, trail_atr_mult=trail_atr_mult,
+        trail_activation_atr=trail_activation_atr, break_even_atr=break_even_atr,
+    )[0]
@@ -22,11 +22,12 @@ def make_limits(env: Dict[str, str]) -> Limits:
     )
 
 
-def client_order_id(symbol: str, side: str, strategy_id: str = "hybrid") -> str:
+def client_order_id(symbol: str, side: str, strategy_id: str = "hybrid", seq: int = 0) -> str:
+    """Deterministic order id; ``seq`` disambiguates same symbol/side orders within one second."""
     ts = time.strftime("%Y%m%d%H%M%S")
-    payload = f"{ts}-{symbol}-{side}-{strategy_id}"
+    payload = f"{ts}-{symbol}-{side}-{strategy_id}-{seq}"
     digest = hashlib.sha1(payload.encode()).hexdigest()[:6]
-    return f"{ts}-{symbol}-{side}-{strategy_id}-{digest}"
+    return f"{ts}-{symbol}-{side}-{strategy_id}-{seq}-{digest}"
 
 
 def can_place_order(
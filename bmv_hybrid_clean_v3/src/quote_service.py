@@ -0,0 +1,435 @@
+import argparse
+import csv
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import parse_qs, urlencode, urlparse
+from urllib.request import urlopen
+
+from .state_store import load_runtime_env
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+
+
+@dataclass
+class Quote:
+    """``ts`` is the vendor's trade/bar time; ``fetched`` is when the service got it."""
+
+    symbol: str
+    price: float
+    ts: float
+    source: str
+    fetched: float
+
+    def to_payload(self, now: float, max_age: float) -> Dict:
+        age = max(0.0, now - self.ts)
+        return {
+            "price": self.price,
+            "ts": _iso(self.ts),
+            "fetched_at": _iso(self.fetched),
+            "age_sec": round(age, 3),
+            "stale": age > max_age,
+            "source": self.source,
+        }
+
+
+def _iso(ts: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))
+
+
+def _fresh_prices(quotes: Dict[str, Optional[Dict]], allow_stale: bool = False) -> Dict[str, float]:
+    """Prices of the quotes that exist and are not stale, so callers fall back for the rest.
+
+    ``allow_stale`` keeps stale quotes too, e.g. the last close while the market is shut.
+    """
+    return {s: q["price"] for s, q in quotes.items() if q is not None and (allow_stale or not q.get("stale"))}
+
+
+def _interval_sec(interval: str) -> float:
+    units = {"m": 60, "h": 3600, "d": 86400, "wk": 7 * 86400}
+    for unit, sec in units.items():
+        if interval.endswith(unit) and interval[: -len(unit)].isdigit():
+            return int(interval[: -len(unit)]) * sec
+    return 0.0
+
+
+class RateLimiter:
+    """Token bucket; one instance per vendor so every caller shares the budget."""
+
+    def __init__(self, rate_per_sec: float, burst: int = 1) -> None:
+        self.rate = max(float(rate_per_sec), 1e-6)
+        self.capacity = max(int(burst), 1)
+        self._tokens = float(self.capacity)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class YFinanceBackend:
+    name = "yf"
+
+    def __init__(self, period: str = "1d", interval: str = "1m") -> None:
+        self.period = period
+        self.interval = interval
+
+    def fetch(self, symbols: List[str]) -> Dict[str, tuple]:
+        """{symbol: (last close, bar end time)}."""
+        import yfinance as yf
+
+        out: Dict[str, tuple] = {}
+        bar_sec = _interval_sec(self.interval)
+        now = time.time()
+        data = yf.download(
+            tickers=symbols,
+            period=self.period,
+            interval=self.interval,
+            progress=False,
+            group_by="ticker",
+            threads=True,
+            auto_adjust=False,
+        )
+        # group_by="ticker" gives (ticker, field) columns, also for a single symbol
+        multi = getattr(data.columns, "nlevels", 1) > 1
+        for sym in symbols:
+            try:
+                s = data[sym]["Close"] if multi else data["Close"]
+                s = s.dropna()
+                if not s.empty:
+                    out[sym] = (float(s.iloc[-1]), min(now, s.index[-1].timestamp() + bar_sec))
+            except KeyError:
+                logger.debug("yfinance returned no %s bars", sym)
+        return out
+
+
+class AlpacaBackend:
+    name = "alpaca"
+
+    def __init__(self, env: Dict[str, str]) -> None:
+        from .alpaca_adapter import AlpacaAdapter
+
+        self.adapter = AlpacaAdapter(env)
+
+    def fetch(self, symbols: List[str]) -> Dict[str, tuple]:
+        return self.adapter.fetch_latest_trades(symbols)
+
+
+class ReplayBackend:
+    """Serves recorded quotes (CSV with timestamp,symbol,price) for offline runs.
+
+    The replay clock starts at the first recorded timestamp (or ``start``) and
+    advances ``speed`` recorded seconds per wall-clock second.
+    """
+
+    name = "replay"
+
+    def __init__(self, path: Path, start: Optional[float] = None, speed: float = 1.0) -> None:
+        self.series: Dict[str, List[tuple]] = {}
+        with Path(path).open("r", newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                try:
+                    ts = _parse_ts(row["timestamp"])
+                    self.series.setdefault(row["symbol"].strip().upper(), []).append((ts, float(row["price"])))
+                except (KeyError, ValueError):
+                    continue
+        for rows in self.series.values():
+            rows.sort()
+        first = min((rows[0][0] for rows in self.series.values() if rows), default=0.0)
+        self.start = first if start is None else start
+        self.speed = speed
+        self._t0 = time.monotonic()
+
+    def now(self) -> float:
+        return self.start + (time.monotonic() - self._t0) * self.speed
+
+    def fetch(self, symbols: List[str]) -> Dict[str, tuple]:
+        """{symbol: (price, recorded time mapped onto the wall clock)}."""
+        import bisect
+
+        clock = self.now()
+        wall = time.time()
+        out: Dict[str, tuple] = {}
+        for sym in symbols:
+            rows = self.series.get(sym)
+            if not rows:
+                continue
+            i = bisect.bisect_right(rows, (clock, float("inf"))) - 1
+            if i >= 0:
+                ts, px = rows[i]
+                out[sym] = (px, wall - (clock - ts) / self.speed if self.speed > 0 else wall)
+        return out
+
+
+def _parse_ts(raw: str) -> float:
+    raw = raw.strip()
+    try:
+        return float(raw)
+    except ValueError:
+        pass
+    from datetime import datetime, timezone
+
+    dt = datetime.fromisoformat(raw.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+class QuoteCache:
+    """TTL + LRU quote cache in front of a backend.
+
+    Misses are fetched in one batched backend call; concurrent requests for a
+    symbol that is already being fetched wait for that fetch instead of
+    issuing their own. Backends return ``{symbol: (price, vendor_ts)}`` (a bare
+    price is stamped with the fetch time). A quote whose vendor time is older
+    than ``stale_after`` is served with ``stale=True``, e.g. the last known
+    quote when the backend fails. Refresh (``ttl_sec`` / ``max_age``) and
+    staleness are separate: after the close the last bar is old but refetching
+    it does not help.
+    """
+
+    def __init__(
+        self,
+        backend,
+        ttl_sec: float = 30.0,
+        max_symbols: int = 1000,
+        limiter: Optional[RateLimiter] = None,
+        fetch_timeout: float = 30.0,
+        stale_after: float = 120.0,
+    ) -> None:
+        self.backend = backend
+        self.ttl = float(ttl_sec)
+        self.max_symbols = int(max_symbols)
+        self.limiter = limiter
+        self.fetch_timeout = fetch_timeout
+        self.stale_after = float(stale_after)
+        self._quotes: "OrderedDict[str, Quote]" = OrderedDict()
+        self._inflight: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "backend_calls": 0, "backend_errors": 0}
+
+    def _store(self, quote: Quote) -> None:
+        self._quotes[quote.symbol] = quote
+        self._quotes.move_to_end(quote.symbol)
+        while len(self._quotes) > self.max_symbols:
+            self._quotes.popitem(last=False)
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += n
+
+    def _fetch(self, symbols: List[str]) -> None:
+        try:
+            if self.limiter is not None:
+                self.limiter.acquire()
+            self._count("backend_calls")
+            prices = self.backend.fetch(symbols)
+        except Exception as exc:
+            self._count("backend_errors")
+            logger.warning("quote backend %s failed for %s symbols: %s", self.backend.name, len(symbols), exc)
+            prices = {}
+        now = time.time()
+        with self._lock:
+            for sym, px in prices.items():
+                px, ts = px if isinstance(px, tuple) else (px, now)
+                self._store(Quote(sym, float(px), float(ts), self.backend.name, now))
+            for sym in symbols:
+                ev = self._inflight.pop(sym, None)
+                if ev is not None:
+                    ev.set()
+
+    def get_quotes(
+        self, symbols: Iterable[str], max_age: Optional[float] = None, stale_after: Optional[float] = None
+    ) -> Dict[str, Optional[Dict]]:
+        """Quotes refetched when fetched more than ``max_age`` (default TTL) ago;
+        flagged stale when the vendor time is older than ``stale_after`` (default: the cache's)."""
+        refresh = self.ttl if max_age is None else float(max_age)
+        stale_age = self.stale_after if stale_after is None else float(stale_after)
+        wanted = list(dict.fromkeys(s.strip().upper() for s in symbols if s and s.strip()))
+        now = time.time()
+        to_fetch: List[str] = []
+        waits: List[threading.Event] = []
+        with self._lock:
+            for sym in wanted:
+                q = self._quotes.get(sym)
+                if q is not None and now - q.fetched <= refresh:
+                    self._quotes.move_to_end(sym)
+                    self.stats["hits"] += 1
+                elif sym in self._inflight:
+                    self.stats["coalesced"] += 1
+                    waits.append(self._inflight[sym])
+                else:
+                    self.stats["misses"] += 1
+                    self._inflight[sym] = threading.Event()
+                    to_fetch.append(sym)
+        if to_fetch:
+            self._fetch(to_fetch)
+        for ev in waits:
+            ev.wait(self.fetch_timeout)
+
+        now = time.time()
+        out: Dict[str, Optional[Dict]] = {}
+        with self._lock:
+            for sym in wanted:
+                q = self._quotes.get(sym)
+                out[sym] = q.to_payload(now, stale_age) if q is not None else None
+        return out
+
+    def get_prices(
+        self,
+        symbols: Iterable[str],
+        max_age: Optional[float] = None,
+        stale_after: Optional[float] = None,
+        allow_stale: bool = False,
+    ) -> Dict[str, float]:
+        """Fresh prices only: missing and (unless ``allow_stale``) stale symbols are omitted."""
+        return _fresh_prices(self.get_quotes(symbols, max_age, stale_after), allow_stale)
+
+
+class QuoteClient:
+    """Client for a running quote service. Returns empty results when the
+    service is unreachable so callers can fall back to their direct fetch."""
+
+    def __init__(self, url: str, timeout: float = 5.0) -> None:
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def get_quotes(
+        self, symbols: Iterable[str], max_age: Optional[float] = None, stale_after: Optional[float] = None
+    ) -> Dict[str, Optional[Dict]]:
+        symbols = [s for s in symbols if s]
+        if not symbols or not self.url:
+            return {}
+        params = {"symbols": ",".join(symbols)}
+        if max_age is not None:
+            params["max_age"] = str(max_age)
+        if stale_after is not None:
+            params["stale_after"] = str(stale_after)
+        try:
+            with urlopen(f"{self.url}/quotes?{urlencode(params)}", timeout=self.timeout) as resp:
+                return json.loads(resp.read().decode("utf-8")).get("quotes", {})
+        except Exception as exc:
+            logger.warning("quote service %s unavailable: %s", self.url, exc)
+            return {}
+
+    def get_prices(
+        self,
+        symbols: Iterable[str],
+        max_age: Optional[float] = None,
+        stale_after: Optional[float] = None,
+        allow_stale: bool = False,
+    ) -> Dict[str, float]:
+        """Fresh prices only: missing and (unless ``allow_stale``) stale symbols are omitted."""
+        return _fresh_prices(self.get_quotes(symbols, max_age, stale_after), allow_stale)
+
+
+def make_handler(cache: QuoteCache):
+    class QuoteHandler(BaseHTTPRequestHandler):
+        def _send(self, code: int, payload: Dict) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:  # noqa: N802 - http.server API
+            url = urlparse(self.path)
+            qs = parse_qs(url.query)
+            if url.path == "/quotes":
+                raw = ",".join(qs.get("symbols", []))
+                symbols = [s for s in raw.split(",") if s.strip()]
+                if not symbols:
+                    self._send(400, {"error": "symbols required"})
+                    return
+                max_age = qs.get("max_age", [None])[0]
+                stale_after = qs.get("stale_after", [None])[0]
+                try:
+                    quotes = cache.get_quotes(
+                        symbols,
+                        float(max_age) if max_age else None,
+                        float(stale_after) if stale_after else None,
+                    )
+                except ValueError:
+                    self._send(400, {"error": "invalid max_age or stale_after"})
+                    return
+                self._send(200, {"quotes": quotes, "backend": cache.backend.name})
+            elif url.path == "/health":
+                with cache._lock:
+                    stats = {"cached": len(cache._quotes), **cache.stats}
+                self._send(200, {"status": "ok", "backend": cache.backend.name, **stats})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def log_message(self, fmt: str, *args) -> None:
+            logger.debug("quote service: " + fmt, *args)
+
+    return QuoteHandler
+
+
+def build_cache(env: Dict[str, str], backend_name: str, replay_file: Optional[Path] = None) -> QuoteCache:
+    if backend_name == "replay":
+        if replay_file is None:
+            raise ValueError("replay backend requires --replay-file")
+        backend = ReplayBackend(replay_file, speed=float(env.get("QUOTE_REPLAY_SPEED", 1.0)))
+        limiter = None
+    elif backend_name == "alpaca":
+        backend = AlpacaBackend(env)
+        limiter = RateLimiter(float(env.get("ALPACA_RATE_PER_SEC", 3.0)), burst=3)
+    else:
+        backend = YFinanceBackend()
+        limiter = RateLimiter(float(env.get("YF_RATE_PER_SEC", 0.5)), burst=1)
+    return QuoteCache(
+        backend,
+        ttl_sec=float(env.get("QUOTE_TTL_SEC", 30)),
+        max_symbols=int(env.get("QUOTE_CACHE_MAX", 1000)),
+        limiter=limiter,
+        stale_after=float(env.get("QUOTE_STALE_SEC", 120)),
+    )
+
+
+def serve(cache: QuoteCache, host: str, port: int) -> None:
+    server = ThreadingHTTPServer((host, port), make_handler(cache))
+    logger.info("quote service listening on http://%s:%s backend=%s ttl=%ss", host, port, cache.backend.name, cache.ttl)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local quote cache shared by dashboards and monitors")
+    parser.add_argument("--env", type=Path, default=Path(__file__).resolve().parents[1] / "config" / "runtime.env")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--backend", choices=["yf", "alpaca", "replay"], default=None)
+    parser.add_argument("--replay-file", type=Path, default=None)
+    args = parser.parse_args()
+
+    env = load_runtime_env(args.env)
+    backend = args.backend or env.get("QUOTE_BACKEND", "yf")
+    port = args.port or int(env.get("QUOTE_SERVICE_PORT", DEFAULT_PORT))
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    serve(build_cache(env, backend, args.replay_file), args.host, port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Fingerprint = Tuple[Tuple[str, int, int], ...]
+
+
+def fingerprint(paths: Iterable[Path]) -> Fingerprint:
+    """(path, mtime_ns, size) per input; missing files fingerprint as (path, 0, -1)."""
+    out = []
+    for p in paths:
+        try:
+            st = Path(p).stat()
+            out.append((str(p), st.st_mtime_ns, st.st_size))
+        except OSError:
+            out.append((str(p), 0, -1))
+    return tuple(out)
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    gzip_body: bytes
+    etag: str
+    status: int
+    fingerprint: Fingerprint
+    built_at: float
+
+    @classmethod
+    def build(cls, payload, status: int, fp: Fingerprint) -> "CachedResponse":
+        body = json.dumps(payload, default=str, ensure_ascii=False).encode("utf-8")
+        return cls(
+            body=body,
+            gzip_body=gzip.compress(body, compresslevel=5),
+            etag='"' + hashlib.sha1(body).hexdigest()[:20] + '"',
+            status=status,
+            fingerprint=fp,
+            built_at=time.time(),
+        )
+
+
+class ResponseCache:
+    """Bounded LRU of serialized responses, invalidated by input fingerprints.
+
+    An entry is fresh while its inputs' fingerprint is unchanged and it is
+    younger than ``ttl`` (for inputs that are not files, e.g. CPU stats).
+    Concurrent misses on the same key wait for a single rebuild. When more
+    than ``max_builds`` rebuilds are already running, a request that has a
+    stale entry is served that entry instead of queueing another rebuild.
+    Non-200 responses are returned but never cached.
+    """
+
+    def __init__(self, max_entries: int = 64, max_builds: int = 2) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, CachedResponse]" = OrderedDict()
+        self._building: Dict[Tuple, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._builds = threading.BoundedSemaphore(max_builds)
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "stale_served": 0, "evictions": 0}
+
+    def _fresh(self, entry: Optional[CachedResponse], fp: Fingerprint, ttl: Optional[float]) -> bool:
+        if entry is None or entry.fingerprint != fp:
+            return False
+        return ttl is None or time.time() - entry.built_at < ttl
+
+    def _put(self, key: Tuple, entry: CachedResponse) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get(
+        self,
+        key: Tuple,
+        fp: Fingerprint,
+        build: Callable[[], Tuple[object, int]],
+        ttl: Optional[float] = None,
+    ) -> CachedResponse:
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if self._fresh(entry, fp, ttl):
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry
+                waiting = self._building.get(key)
+                if waiting is None:
+                    # with a stale entry in hand, shed load instead of queueing a rebuild
+                    acquired = entry is not None and self._builds.acquire(blocking=False)
+                    if entry is not None and not acquired:
+                        self.stats["stale_served"] += 1
+                        return entry
+                    self._building[key] = threading.Event()
+                    self.stats["misses"] += 1
+                    break
+                if entry is not None:
+                    self.stats["stale_served"] += 1
+                    return entry
+                self.stats["coalesced"] += 1
+            waiting.wait(30)
+
+        try:
+            if not acquired:
+                self._builds.acquire()
+            try:
+                payload, status = build()
+            finally:
+                self._builds.release()
+            fresh = CachedResponse.build(payload, status, fp)
+            with self._lock:
+                if status == 200:
+                    self._put(key, fresh)
+            return fresh
+        finally:
+            with self._lock:
+                ev = self._building.pop(key, None)
+            if ev is not None:
+                ev.set()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def info(self) -> Dict:
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries, **self.stats}
@@ -2,11 +2,16 @@ import argparse
 import logging
 import time
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 from .alpaca_adapter import AlpacaAdapter
 from .guardrails import guardrail_reason, make_limits
+from .quote_service import QuoteClient
+from .snapshot_store import SnapshotStore
 from .snapshot_writer import (
+    FlatSnapshotWriter,
+    append_equity_series,
+    append_positions_series,
     build_equity_row,
     build_positions_rows,
     write_equity_snapshot,
@@ -32,12 +37,11 @@ def _resolve_snapshot_dir(env: Dict[str, str]) -> Path:
     return base
 
 
-def _collect_price_cache(adapter: AlpacaAdapter, symbols: List[str]) -> Dict[str, float]:
-    cache: Dict[str, float] = {}
-    for sym in symbols:
-        px = adapter.fetch_latest_price(sym)
-        if px is not None:
-            cache[sym] = px
+def _collect_price_cache(adapter: AlpacaAdapter, symbols: List[str], quotes: Optional[QuoteClient] = None) -> Dict[str, float]:
+    cache: Dict[str, float] = quotes.get_prices(symbols) if quotes is not None else {}
+    missing = [s for s in symbols if s not in cache]
+    if missing:
+        cache.update(adapter.fetch_latest_prices(missing))
     return cache
 
 
@@ -46,8 +50,11 @@ def run_monitor(env_path: Path, interval_sec: int) -> None:
     limits = make_limits(env)
     symbols = _parse_symbols(env)
     snapshot_dir = _resolve_snapshot_dir(env)
+    store = SnapshotStore(snapshot_dir)
+    flat = FlatSnapshotWriter(float(env.get("SNAPSHOT_FLAT_MIN_SEC", 60) or 0))
 
     adapter = AlpacaAdapter(env)
+    quotes = QuoteClient(env["QUOTE_SERVICE_URL"]) if env.get("QUOTE_SERVICE_URL") else None
 
     logger.info("monitor started | symbols=%s interval=%ss", ",".join(symbols), interval_sec)
 
@@ -56,14 +63,18 @@ def run_monitor(env_path: Path, interval_sec: int) -> None:
             account = adapter.fetch_account()
             positions = adapter.fetch_positions()
 
-            price_cache = _collect_price_cache(adapter, symbols)
+            price_cache = _collect_price_cache(adapter, symbols, quotes)
             for pos in positions:
                 sym = pos.get("symbol")
                 if sym and sym not in price_cache and pos.get("last_price") is not None:
                     price_cache[sym] = float(pos.get("last_price"))
 
-            write_positions_snapshot(snapshot_dir / "positions.csv", build_positions_rows(positions, price_cache))
-            write_equity_snapshot(snapshot_dir / "equity.csv", build_equity_row(account))
+            positions_rows = build_positions_rows(positions, price_cache)
+            equity_rows = build_equity_row(account)
+            flat.write(snapshot_dir / "positions.csv", positions_rows, write_positions_snapshot)
+            flat.write(snapshot_dir / "equity.csv", equity_rows, write_equity_snapshot)
+            append_positions_series(store, positions_rows)
+            append_equity_series(store, equity_rows)
 
             hb_payload = {
                 "engine": env.get("ENGINE_NAME", "USA_Hybrid_Clean_V1"),
@@ -1,4 +1,5 @@
 import argparse
+import asyncio
 import json
 import logging
 import time
@@ -9,7 +10,12 @@ from typing import Deque, Dict, List, Optional
 
 from .alpaca_adapter import AlpacaAdapter
 from .guardrails import can_place_order, client_order_id, guardrail_reason, make_limits
+from .latency import LatencyRecorder
+from .snapshot_store import SnapshotStore
 from .snapshot_writer import (
+    FlatSnapshotWriter,
+    append_equity_series,
+    append_positions_series,
     build_equity_row,
     build_positions_rows,
     build_trades_rows,
@@ -22,20 +28,43 @@ from .state_store import ensure_runtime_dirs, load_runtime_env, now_iso
 
 logger = logging.getLogger(__name__)
 
+FINAL_ORDER_STATUSES = {"filled", "canceled", "cancelled", "expired", "rejected", "done_for_day", "replaced"}
+
+
+def _status_str(status) -> str:
+    return str(getattr(status, "value", status) or "submitted").lower()
+
 
 class TraderLoop:
+    """Trader tick pipeline.
+
+    Each tick fetches account, positions and quotes concurrently, reserves the
+    guardrail budget for every valid order in file order, then submits the
+    accepted orders concurrently. Order-status polling runs as a separate task
+    (see ``run_trader``) and snapshot/heartbeat writes happen in a worker
+    thread off the critical path. Per-stage latencies are kept in ``latency``
+    and published in the heartbeat.
+    """
+
     def __init__(self, env: Dict[str, str], orders_path: Path, snapshot_dir: Path) -> None:
         self.env = env
         self.symbols = self._parse_symbols(env)
         self.limits = make_limits(env)
         self.orders_path = orders_path
         self.snapshot_dir = snapshot_dir
+        self.store = SnapshotStore(snapshot_dir)
+        self.flat = FlatSnapshotWriter(float(env.get("SNAPSHOT_FLAT_MIN_SEC", 60) or 0))
         self.adapter = AlpacaAdapter(env)
+        self.max_concurrent_orders = max(1, int(env.get("MAX_CONCURRENT_ORDERS", 4) or 4))
 
         self.order_timestamps: Deque[datetime] = deque()
+        self.order_seq = 0
         self.today_notional = 0.0
         self.today = datetime.now(timezone.utc).date()
         self.trades: List[Dict] = []
+        self.pending_orders: Dict[str, Dict] = {}
+        self.latency = LatencyRecorder()
+        self._snapshot_task: Optional[asyncio.Task] = None
 
     def _parse_symbols(self, env: Dict[str, str]) -> List[str]:
         raw = env.get("SYMBOLS", "")
@@ -47,6 +76,7 @@ class TraderLoop:
             self.today_notional = 0.0
             self.order_timestamps.clear()
             self.trades.clear()
+            self.pending_orders.clear()
 
     def _orders_last_hour(self, now: datetime) -> int:
         cutoff = now - timedelta(hours=1)
@@ -75,9 +105,6 @@ class TraderLoop:
             except Exception:
                 pass
 
-    def _latest_price(self, symbol: str) -> Optional[float]:
-        return self.adapter.fetch_latest_price(symbol)
-
     def _guardrails_status(self, open_positions: int, orders_last_hour: int, today_notional: float, day_drawdown_pct: float) -> str:
         return guardrail_reason(
             self.limits,
@@ -92,57 +119,60 @@ class TraderLoop:
         if len(self.trades) > 200:
             self.trades = self.trades[-200:]
 
-    def tick(self) -> None:
-        now = datetime.now(timezone.utc)
-        self._roll_daily(now)
-
-        account = self.adapter.fetch_account()
-        positions = self.adapter.fetch_positions()
-
-        price_cache: Dict[str, float] = {}
-        for sym in self.symbols:
-            px = self._latest_price(sym)
-            if px is not None:
-                price_cache[sym] = px
-        for pos in positions:
-            sym = pos.get("symbol")
-            if sym and sym not in price_cache and pos.get("last_price") is not None:
-                price_cache[sym] = float(pos.get("last_price"))
+    def _blocked(self, symbol: str, side: str, qty: float, reason: str) -> None:
+        self._record_trade(
+            {
+                "timestamp": now_iso(),
+                "order_id": "",
+                "client_order_id": "",
+                "symbol": symbol,
+                "side": side,
+                "qty": qty,
+                "filled_qty": 0,
+                "filled_avg_price": 0,
+                "status": "blocked",
+                "reason": reason,
+            }
+        )
 
-        orders_last_hour = self._orders_last_hour(now)
-        open_positions = len(positions)
-        day_drawdown_pct = float(account.get("day_pnl_pct", 0))
+    async def _call(self, stage: str, func, *args):
+        with self.latency.time(stage):
+            return await asyncio.to_thread(func, *args)
 
-        orders = self._load_orders()
-        if orders:
-            logger.info("processing %s orders", len(orders))
+    async def _fetch_state(self):
+        return await asyncio.gather(
+            self._call("account", self.adapter.fetch_account),
+            self._call("positions", self.adapter.fetch_positions),
+            self._call("quotes", self.adapter.fetch_latest_prices, self.symbols),
+        )
 
+    def _reserve_orders(
+        self,
+        orders: List[Dict],
+        price_cache: Dict[str, float],
+        open_positions: int,
+        orders_last_hour: int,
+        day_drawdown_pct: float,
+        now: datetime,
+    ) -> List[Dict]:
+        """Apply guardrails in file order and reserve notional/order-rate budget.
+
+        Runs before any submission so concurrent submits can never exceed the
+        budget; a failed submit releases its reservation.
+        """
+        accepted: List[Dict] = []
         for order in orders:
             symbol = str(order.get("symbol", "")).upper()
             side = str(order.get("side", "")).upper()
             qty = float(order.get("qty", 0) or 0)
-            reason = order.get("reason", "")
             if not symbol or qty <= 0 or side not in {"BUY", "SELL"}:
                 logger.warning("invalid order payload skipped: %s", order)
                 continue
 
-            last_price = price_cache.get(symbol) or self._latest_price(symbol)
+            last_price = price_cache.get(symbol)
             if last_price is None:
                 logger.warning("no price for %s, skipping order", symbol)
-                self._record_trade(
-                    {
-                        "timestamp": now_iso(),
-                        "order_id": "",
-                        "client_order_id": "",
-                        "symbol": symbol,
-                        "side": side,
-                        "qty": qty,
-                        "filled_qty": 0,
-                        "filled_avg_price": 0,
-                        "status": "blocked",
-                        "reason": "no_price",
-                    }
-                )
+                self._blocked(symbol, side, qty, "no_price")
                 continue
 
             proposed_notional = self.today_notional + abs(qty * last_price)
@@ -155,50 +185,40 @@ class TraderLoop:
             ):
                 block_reason = self._guardrails_status(open_positions, orders_last_hour, proposed_notional, day_drawdown_pct)
                 logger.warning("guardrails block %s %s: %s", side, symbol, block_reason)
-                self._record_trade(
-                    {
-                        "timestamp": now_iso(),
-                        "order_id": "",
-                        "client_order_id": "",
-                        "symbol": symbol,
-                        "side": side,
-                        "qty": qty,
-                        "filled_qty": 0,
-                        "filled_avg_price": 0,
-                        "status": "blocked",
-                        "reason": block_reason,
-                    }
-                )
+                self._blocked(symbol, side, qty, block_reason)
                 continue
 
-            coid = client_order_id(symbol, side, strategy_id=self.env.get("ENGINE_NAME", "hybrid"))
-            try:
-                alpaca_order = self.adapter.submit_order(symbol, qty, side, coid)
-                order_id = getattr(alpaca_order, "id", "")
-                filled_qty = float(getattr(alpaca_order, "filled_qty", 0) or 0)
-                filled_avg_price = float(getattr(alpaca_order, "filled_avg_price", 0) or 0)
-                status = str(getattr(alpaca_order, "status", "submitted"))
-
-                self.today_notional = proposed_notional
-                self.order_timestamps.append(now)
+            self.today_notional = proposed_notional
+            self.order_timestamps.append(now)
+            orders_last_hour += 1
+            self.order_seq += 1
+            accepted.append(
+                {
+                    "symbol": symbol,
+                    "side": side,
+                    "qty": qty,
+                    "notional": abs(qty * last_price),
+                    "reason": order.get("reason", ""),
+                    "client_order_id": client_order_id(
+                        symbol, side, strategy_id=self.env.get("ENGINE_NAME", "hybrid"), seq=self.order_seq
+                    ),
+                    "reserved_at": now,
+                }
+            )
+        return accepted
 
-                self._record_trade(
-                    {
-                        "timestamp": now_iso(),
-                        "order_id": order_id,
-                        "client_order_id": coid,
-                        "symbol": symbol,
-                        "side": side,
-                        "qty": qty,
-                        "filled_qty": filled_qty,
-                        "filled_avg_price": filled_avg_price,
-                        "status": status,
-                        "reason": reason or "order_submitted",
-                    }
-                )
-                logger.info("order submitted %s %s qty=%s status=%s", side, symbol, qty, status)
+    async def _submit(self, order: Dict, sem: asyncio.Semaphore) -> None:
+        symbol, side, qty, coid = order["symbol"], order["side"], order["qty"], order["client_order_id"]
+        async with sem:
+            try:
+                alpaca_order = await self._call("submit", self.adapter.submit_order, symbol, qty, side, coid)
             except Exception as exc:  # pragma: no cover - network
                 logger.exception("order submit failed for %s %s: %s", side, symbol, exc)
+                self.today_notional -= order["notional"]
+                try:
+                    self.order_timestamps.remove(order["reserved_at"])
+                except ValueError:  # already pruned from the rate window
+                    pass
                 self._record_trade(
                     {
                         "timestamp": now_iso(),
@@ -213,13 +233,90 @@ class TraderLoop:
                         "reason": str(exc),
                     }
                 )
+                return
+
+        record = {
+            "timestamp": now_iso(),
+            "order_id": str(getattr(alpaca_order, "id", "")),
+            "client_order_id": coid,
+            "symbol": symbol,
+            "side": side,
+            "qty": qty,
+            "filled_qty": float(getattr(alpaca_order, "filled_qty", 0) or 0),
+            "filled_avg_price": float(getattr(alpaca_order, "filled_avg_price", 0) or 0),
+            "status": _status_str(getattr(alpaca_order, "status", "submitted")),
+            "reason": order["reason"] or "order_submitted",
+        }
+        self._record_trade(record)
+        if record["status"] not in FINAL_ORDER_STATUSES:
+            self.pending_orders[coid] = record
+        logger.info("order submitted %s %s qty=%s status=%s", side, symbol, qty, record["status"])
+
+    async def poll_pending_orders(self) -> None:
+        """Refresh status/fills of submitted orders that are not final yet."""
+        pending = list(self.pending_orders.items())
+        if not pending:
+            return
+        results = await asyncio.gather(
+            *(self._call("order_status", self.adapter.fetch_order_by_client_id, coid) for coid, _ in pending),
+            return_exceptions=True,
+        )
+        for (coid, record), order in zip(pending, results):
+            if isinstance(order, Exception):
+                logger.warning("order status failed for %s: %s", coid, order)
+                continue
+            if order is None:
+                continue
+            record["status"] = _status_str(getattr(order, "status", record["status"]))
+            record["filled_qty"] = float(getattr(order, "filled_qty", 0) or 0)
+            record["filled_avg_price"] = float(getattr(order, "filled_avg_price", 0) or 0)
+            if record["status"] in FINAL_ORDER_STATUSES:
+                self.pending_orders.pop(coid, None)
+
+    def _write_snapshots(self, positions_rows: List[List], equity_rows: List[List], trades_rows: List[List], hb_payload: Dict) -> None:
+        with self.latency.time("snapshot"):
+            self.flat.write(self.snapshot_dir / "positions.csv", positions_rows, write_positions_snapshot)
+            self.flat.write(self.snapshot_dir / "equity.csv", equity_rows, write_equity_snapshot)
+            # trades only change on submit/status updates: write on change without throttling
+            self.flat.write(self.snapshot_dir / "trades.csv", trades_rows, write_trades_snapshot, min_interval_sec=0)
+            append_positions_series(self.store, positions_rows)
+            append_equity_series(self.store, equity_rows)
+        write_heartbeat(self.snapshot_dir / "heartbeat.json", hb_payload)
+
+    async def flush(self) -> None:
+        if self._snapshot_task is not None:
+            await self._snapshot_task
+            self._snapshot_task = None
+
+    async def tick_async(self, wait_snapshots: bool = False) -> None:
+        tick_start = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        self._roll_daily(now)
+
+        account, positions, price_cache = await self._fetch_state()
+        for pos in positions:
+            sym = pos.get("symbol")
+            if sym and sym not in price_cache and pos.get("last_price") is not None:
+                price_cache[sym] = float(pos.get("last_price"))
+
+        orders_last_hour = self._orders_last_hour(now)
+        open_positions = len(positions)
+        day_drawdown_pct = float(account.get("day_pnl_pct", 0))
 
+        orders = self._load_orders()
         if orders:
+            logger.info("processing %s orders", len(orders))
+            with self.latency.time("orders"):
+                extra = {str(o.get("symbol", "")).upper() for o in orders} - set(price_cache) - {""}
+                if extra:
+                    price_cache.update(await self._call("quotes", self.adapter.fetch_latest_prices, sorted(extra)))
+                accepted = self._reserve_orders(orders, price_cache, open_positions, orders_last_hour, day_drawdown_pct, now)
+                sem = asyncio.Semaphore(self.max_concurrent_orders)
+                await asyncio.gather(*(self._submit(o, sem) for o in accepted))
             self._archive_orders()
+            orders_last_hour = self._orders_last_hour(now)
 
-        write_positions_snapshot(self.snapshot_dir / "positions.csv", build_positions_rows(positions, price_cache))
-        write_equity_snapshot(self.snapshot_dir / "equity.csv", build_equity_row(account))
-        write_trades_snapshot(self.snapshot_dir / "trades.csv", build_trades_rows(self.trades))
+        self.latency.observe("tick", (time.perf_counter() - tick_start) * 1000.0)
 
         hb_payload = {
             "engine": self.env.get("ENGINE_NAME", "USA_Hybrid_Clean_V1"),
@@ -232,8 +329,60 @@ class TraderLoop:
                 self.today_notional,
                 day_drawdown_pct,
             ),
+            "pending_orders": len(self.pending_orders),
+            "latency_ms": {k: {m: v[m] for m in ("count", "p50_ms", "p95_ms", "max_ms")} for k, v in self.latency.summary().items()},
         }
-        write_heartbeat(self.snapshot_dir / "heartbeat.json", hb_payload)
+        # Rows are built on the loop thread (the poller mutates self.trades); only file IO goes to the worker.
+        await self.flush()
+        self._snapshot_task = asyncio.create_task(
+            asyncio.to_thread(
+                self._write_snapshots,
+                build_positions_rows(positions, price_cache),
+                build_equity_row(account),
+                build_trades_rows(self.trades),
+                hb_payload,
+            )
+        )
+        if wait_snapshots:
+            await self.flush()
+
+    def tick(self) -> None:
+        """Synchronous single tick (scripts/tests); waits for snapshot writes."""
+        asyncio.run(self.tick_async(wait_snapshots=True))
+
+
+async def _poll_orders_forever(loop: TraderLoop, interval: float) -> None:
+    while True:
+        try:
+            await loop.poll_pending_orders()
+        except Exception as exc:  # pragma: no cover - runtime loop
+            logger.warning("order status poll failed: %s", exc)
+        await asyncio.sleep(interval)
+
+
+async def run_trader(loop: TraderLoop, interval: int, snapshot_dir: Path) -> None:
+    poller = asyncio.create_task(_poll_orders_forever(loop, float(loop.env.get("ORDER_POLL_SEC", 5) or 5)))
+    try:
+        while True:
+            started = time.monotonic()
+            try:
+                await loop.tick_async()
+            except Exception as exc:  # pragma: no cover - runtime loop
+                logger.exception("trader loop failed: %s", exc)
+                write_heartbeat(
+                    snapshot_dir / "heartbeat.json",
+                    {
+                        "engine": loop.env.get("ENGINE_NAME", "USA_Hybrid_Clean_V1"),
+                        "mode": loop.env.get("MODE", "trader"),
+                        "status": "error",
+                        "error": str(exc),
+                        "last_loop": now_iso(),
+                    },
+                )
+            await asyncio.sleep(max(1.0, interval - (time.monotonic() - started)))
+    finally:
+        poller.cancel()
+        await loop.flush()
 
 
 def _resolve_snapshot_dir(env: Dict[str, str]) -> Path:
@@ -261,22 +410,7 @@ def main() -> None:
     logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
     logger.info("trader started | symbols=%s interval=%ss", ",".join(loop.symbols), interval)
 
-    while True:
-        try:
-            loop.tick()
-        except Exception as exc:  # pragma: no cover - runtime loop
-            logger.exception("trader loop failed: %s", exc)
-            write_heartbeat(
-                snapshot_dir / "heartbeat.json",
-                {
-                    "engine": env.get("ENGINE_NAME", "USA_Hybrid_Clean_V1"),
-                    "mode": env.get("MODE", "trader"),
-                    "status": "error",
-                    "error": str(exc),
-                    "last_loop": now_iso(),
-                },
-            )
-        time.sleep(max(1, interval))
+    asyncio.run(run_trader(loop, interval, snapshot_dir))
 
 
 if __name__ == "__main__":
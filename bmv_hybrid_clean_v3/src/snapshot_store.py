@@ -0,0 +1,243 @@
+import csv
+import gzip
+import io
+import logging
+import os
+import shutil
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+try:  # POSIX
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+DateLike = Union[str, date, datetime, None]
+
+
+def _as_iso(value: DateLike) -> Optional[str]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def _day_of(ts: str) -> str:
+    return str(ts)[:10]
+
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    """Exclusive inter-process lock on ``path`` (created if missing)."""
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:  # pragma: no cover - Windows
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:  # pragma: no cover - Windows
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class SnapshotStore:
+    """Append-only time series for monitor/trader snapshots.
+
+    Layout under ``base_dir/series/<name>/``::
+
+        2025-01-02.csv.gz   closed daily segments (gzip)
+        2025-01-03.csv      today's segment, appended in place
+
+    Rows are appended to the segment of their timestamp's UTC day; when a
+    new day starts, older plain segments are compressed. Late rows for an
+    already compressed day are merged into its archive in timestamp order.
+    Writers (monitor and trader may share a directory) hold a per-series
+    file lock. Timestamps are ISO UTC strings (``now_iso``), so range
+    filters compare strings and only the segments whose day overlaps the
+    window are opened.
+    """
+
+    def __init__(self, base_dir: Path) -> None:
+        self.base_dir = Path(base_dir)
+        self.series_dir = self.base_dir / "series"
+
+    def _dir(self, name: str) -> Path:
+        return self.series_dir / name
+
+    def segments(self, name: str) -> List[Path]:
+        d = self._dir(name)
+        if not d.exists():
+            return []
+        return sorted(p for p in d.iterdir() if p.name.endswith(".csv") or p.name.endswith(".csv.gz"))
+
+    def append(self, name: str, headers: List[str], rows: Iterable[Iterable]) -> int:
+        """Append rows (first column = ISO timestamp). Returns rows written."""
+        by_day: Dict[str, List[List]] = {}
+        for row in rows:
+            row = list(row)
+            by_day.setdefault(_day_of(row[0]), []).append(row)
+        if not by_day:
+            return 0
+        d = self._dir(name)
+        d.mkdir(parents=True, exist_ok=True)
+        written = 0
+        with _file_lock(d / ".lock"):
+            for day in sorted(by_day):
+                gz = d / f"{day}.csv.gz"
+                if gz.exists():
+                    self._merge_into_archive(gz, headers, by_day[day])
+                else:
+                    seg = d / f"{day}.csv"
+                    is_new = not seg.exists()
+                    with seg.open("a", newline="", encoding="utf-8") as f:
+                        writer = csv.writer(f)
+                        if is_new:
+                            writer.writerow(headers)
+                        writer.writerows(by_day[day])
+                written += len(by_day[day])
+            self._roll(name, keep_day=max(by_day))
+        return written
+
+    def _merge_into_archive(self, gz: Path, headers: List[str], rows: List[List]) -> None:
+        """Rewrite a closed day's archive with ``rows`` merged in timestamp order."""
+        with gzip.open(gz, "rt", newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            headers = next(reader, None) or headers
+            merged = list(reader)
+        merged.extend([str(v) for v in row] for row in rows)
+        merged.sort(key=lambda r: r[0])
+        tmp = gz.with_name(gz.name + ".tmp")
+        with gzip.open(tmp, "wt", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            writer.writerows(merged)
+        os.replace(tmp, gz)
+
+    def roll(self, name: str, keep_day: Optional[str] = None) -> List[Path]:
+        """Compress plain segments older than ``keep_day`` (default: today UTC)."""
+        d = self._dir(name)
+        if not d.exists():
+            return []
+        with _file_lock(d / ".lock"):
+            return self._roll(name, keep_day)
+
+    def _roll(self, name: str, keep_day: Optional[str] = None) -> List[Path]:
+        keep_day = keep_day or datetime.utcnow().strftime("%Y-%m-%d")
+        rolled: List[Path] = []
+        for seg in self.segments(name):
+            if not seg.name.endswith(".csv") or seg.name[:10] >= keep_day:
+                continue
+            gz = seg.with_name(seg.name + ".gz")
+            if gz.exists():
+                # plain segment left next to its archive (older layout): merge it in
+                with seg.open(newline="", encoding="utf-8") as f:
+                    reader = csv.reader(f)
+                    headers = next(reader, [])
+                    self._merge_into_archive(gz, headers, list(reader))
+            else:
+                tmp = gz.with_name(gz.name + ".tmp")
+                with seg.open("rb") as src, gzip.open(tmp, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                os.replace(tmp, gz)
+            seg.unlink()
+            rolled.append(gz)
+        if rolled:
+            logger.info("rolled %s %s segment(s)", len(rolled), name)
+        return rolled
+
+    def _iter_segment(self, path: Path) -> Iterator[Dict[str, str]]:
+        opener = gzip.open if path.name.endswith(".gz") else open
+        with opener(path, "rt", newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+
+    def _day_rows(self, paths: List[Path]) -> Iterable[Dict[str, str]]:
+        """Rows of one day; a plain segment next to its archive is merged by timestamp."""
+        if len(paths) == 1:
+            return self._iter_segment(paths[0])
+        rows = [r for p in paths for r in self._iter_segment(p)]
+        rows.sort(key=lambda r: r.get("timestamp", ""))
+        return rows
+
+    def _days(self, segs: List[Path]) -> List[List[Path]]:
+        days: Dict[str, List[Path]] = {}
+        for p in segs:
+            days.setdefault(p.name[:10], []).append(p)
+        return [days[k] for k in sorted(days)]
+
+    def query(self, name: str, start: DateLike = None, end: DateLike = None, limit: Optional[int] = None) -> List[Dict[str, str]]:
+        """Rows with ``start <= timestamp <= end`` (inclusive; dates cover the whole day).
+
+        ``limit`` keeps the most recent rows; without ``start`` only as many
+        trailing segments as needed to satisfy it are read.
+        """
+        start_s, end_s = _as_iso(start), _as_iso(end)
+        if end_s is not None and len(end_s) == 10:
+            end_s = end_s + "\uffff"
+        segs = [
+            p for p in self.segments(name)
+            if (start_s is None or p.name[:10] >= start_s[:10]) and (end_s is None or p.name[:10] <= end_s[:10])
+        ]
+        days = self._days(segs)
+        out: List[Dict[str, str]] = []
+        if start_s is None and limit:
+            for paths in reversed(days):
+                rows = [r for r in self._day_rows(paths) if end_s is None or r.get("timestamp", "") <= end_s]
+                out = rows + out
+                if len(out) >= limit:
+                    break
+            return out[-limit:]
+        for paths in days:
+            for r in self._day_rows(paths):
+                ts = r.get("timestamp", "")
+                if start_s is not None and ts < start_s:
+                    continue
+                if end_s is not None and ts > end_s:
+                    continue
+                out.append(r)
+        return out[-limit:] if limit else out
+
+    def prune(self, name: str, keep_days: int) -> int:
+        """Delete segments older than ``keep_days`` days. Returns files removed."""
+        cutoff = (datetime.utcnow().date() - timedelta(days=keep_days)).isoformat()
+        removed = 0
+        for seg in self.segments(name):
+            if seg.name[:10] < cutoff:
+                seg.unlink()
+                removed += 1
+        return removed
+
+
+def read_csv_tail(path: Path, n: int, chunk_size: int = 64 * 1024) -> List[Dict[str, str]]:
+    """Last ``n`` data rows of a CSV as dicts, reading from the end of the file."""
+    path = Path(path)
+    if n <= 0 or not path.exists():
+        return []
+    with path.open("rb") as f:
+        header = f.readline()
+        header_end = f.tell()
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        buf = b""
+        while pos > header_end and buf.count(b"\n") <= n:
+            step = min(chunk_size, pos - header_end)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+    lines = [ln for ln in buf.splitlines() if ln.strip()]
+    if pos > header_end:
+        lines = lines[1:]  # first line may be partial
+    text = header.decode("utf-8") + "\n".join(ln.decode("utf-8") for ln in lines[-n:])
+    return list(csv.DictReader(io.StringIO(text)))
@@ -1,7 +1,9 @@
 from pathlib import Path
-from typing import Dict, Iterable, List
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 import logging
+import time
 
+from .snapshot_store import SnapshotStore
 from .state_store import atomic_write_csv, atomic_write_json, now_iso
 
 logger = logging.getLogger(__name__)
@@ -57,6 +59,47 @@ def write_trades_snapshot(path: Path, rows: Iterable[Iterable]) -> None:
     logger.info("trades snapshot written -> %s", path)
 
 
+class FlatSnapshotWriter:
+    """Throttles rewrites of the flat latest-view CSVs (positions/equity/trades).
+
+    The full history lives in the SnapshotStore series; a flat file is only
+    rewritten when its rows changed (ignoring the timestamp column) and at
+    most once every ``min_interval_sec``.
+    """
+
+    def __init__(self, min_interval_sec: float = 60.0) -> None:
+        self.min_interval_sec = float(min_interval_sec)
+        self._last: Dict[Path, Tuple[int, float]] = {}
+
+    def write(
+        self,
+        path: Path,
+        rows: Iterable[Iterable],
+        writer: Callable[[Path, Iterable[Iterable]], None],
+        min_interval_sec: Optional[float] = None,
+    ) -> bool:
+        rows = [list(r) for r in rows]
+        key = hash(tuple(tuple(str(v) for v in r[1:]) for r in rows))
+        interval = self.min_interval_sec if min_interval_sec is None else min_interval_sec
+        now = time.monotonic()
+        last = self._last.get(path)
+        if last is not None and (last[0] == key or now - last[1] < interval):
+            return False
+        writer(path, rows)
+        self._last[path] = (key, now)
+        return True
+
+
+def append_positions_series(store: SnapshotStore, rows: Iterable[Iterable]) -> None:
+    n = store.append("positions", POS_HEADERS, rows)
+    logger.debug("positions series +%s rows -> %s", n, store.series_dir)
+
+
+def append_equity_series(store: SnapshotStore, rows: Iterable[Iterable]) -> None:
+    n = store.append("equity", EQUITY_HEADERS, rows)
+    logger.debug("equity series +%s rows -> %s", n, store.series_dir)
+
+
 def write_heartbeat(path: Path, payload: Dict) -> None:
     payload = dict(payload)
     payload.setdefault("last_update", now_iso())
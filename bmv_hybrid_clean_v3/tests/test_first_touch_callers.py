@@ -0,0 +1,227 @@
+"""Callers of the vendored first-touch kernel (src/execution/first_touch.py) against golden outputs.
+
+tests/fixtures/first_touch/ holds the outputs of the former bar-by-bar loops (hybrid_v2,
+scripts/13_compare_forecast_real.py and wf_box/scripts/simulate_trading.py) on the synthetic
+data built below. They were generated once from those loops; regenerate them only when the
+trading rules change on purpose.
+"""
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.execution.hybrid_v2 import execute_hybrid_v2, execute_hybrid_v2_batch
+
+ROOT = Path(__file__).resolve().parents[1]
+GOLDEN = Path(__file__).parent / "fixtures" / "first_touch"
+
+HYBRID_CONFIGS = {
+    "default": {},
+    "no_trailing": {"trail_atr_mult": 0.0},
+    "one_day": {"max_holding_days": 1, "tp_mult": 0.8, "sl_mult": 0.6},
+    "tight_trailing": {"tp_mult": 3.0, "trail_atr_mult": 0.5, "trail_activation_atr": 0.2, "break_even_atr": 0.4},
+}
+
+
+def _load(rel, name):
+    path = ROOT / rel
+    sys.path.insert(0, str(path.parent))
+    try:
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(str(path.parent))
+    return module
+
+
+def _hourly(seed=0, tickers=("AAA", "BBB", "CCC")):
+    """7 hourly bars per business day with opening gaps and a few missing days."""
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range("2025-01-06", periods=30)
+    out = {}
+    for k, t in enumerate(tickers):
+        keep = days[rng.random(len(days)) > 0.15]
+        idx = pd.DatetimeIndex([d + pd.Timedelta(hours=9 + h) for d in keep for h in range(7)])
+        r = rng.normal(0, 0.006, len(idx))
+        close = (50 + 40 * k) * np.exp(np.cumsum(r))
+        open_ = np.r_[close[0], close[:-1]] * (1 + rng.normal(0, 0.003, len(idx)))
+        out[t] = pd.DataFrame({
+            "Open": open_,
+            "High": np.maximum(open_, close) * (1 + rng.random(len(idx)) * 0.004),
+            "Low": np.minimum(open_, close) * (1 - rng.random(len(idx)) * 0.004),
+            "Close": close,
+        }, index=idx)
+    return out
+
+
+def _daily(h1_map):
+    d1_map = {}
+    for t, h in h1_map.items():
+        d = h.groupby(h.index.normalize()).agg({"Open": "first", "High": "max", "Low": "min", "Close": "last"})
+        d["ATR_14"] = (d["High"] - d["Low"]).rolling(14, min_periods=1).mean()
+        d1_map[t] = d
+    return d1_map
+
+
+def _signals(h1_map, seed=1, n=40):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2025-01-07", "2025-02-16", freq="D")  # weekends and the end of the data included
+    return pd.DataFrame({
+        "ticker": rng.choice(sorted(h1_map), n),
+        "date": rng.choice(dates, n),
+        "side": rng.choice(["BUY", "SELL"], n),
+        "prob": rng.uniform(0.4, 0.9, n).round(4),
+    })
+
+
+def _hybrid_results(h1_map, d1_map, sig, kw):
+    return [execute_hybrid_v2(h1_map, d1_map, s.ticker, s.date, s.side, s.prob, **kw) for s in sig.itertuples()]
+
+
+def _assert_records_equal(new, old):
+    assert len(new) == len(old)
+    for a, b in zip(new, old):
+        assert a.keys() == b.keys()
+        for k in a:
+            if isinstance(b[k], float):
+                assert a[k] == pytest.approx(b[k], rel=1e-12, abs=1e-12), k
+            else:
+                assert a[k] == b[k], k
+
+
+@pytest.mark.parametrize("name", sorted(HYBRID_CONFIGS))
+def test_hybrid_v2_matches_golden(name):
+    h1_map = _hourly()
+    d1_map = _daily(h1_map)
+    sig = _signals(h1_map)
+    kw = HYBRID_CONFIGS[name]
+    golden = json.loads((GOLDEN / "hybrid_v2.json").read_text())[name]
+    _assert_records_equal(execute_hybrid_v2_batch(h1_map, d1_map, sig, **kw), golden)
+    _assert_records_equal(_hybrid_results(h1_map, d1_map, sig, kw), golden)
+
+
+def test_scan_tau_pnl_executes_each_signal_once(monkeypatch):
+    from src.calibrate import threshold
+
+    h1_map = _hourly()
+    d1_map = _daily(h1_map)
+    sig = _signals(h1_map)
+    golden = json.loads((GOLDEN / "hybrid_v2.json").read_text())["default"]
+    calls = []
+    batch = threshold.execute_hybrid_v2_batch
+    monkeypatch.setattr(threshold, "execute_hybrid_v2_batch", lambda *a, **kw: calls.append(1) or batch(*a, **kw))
+    exec_cfg = {"tp_atr_mult": 1.5, "sl_atr_mult": 1.0, "commission_pct": 0.001, "slippage_pct": 0.0002,
+                "max_holding_days": 3, "trail_atr_mult": 1.0, "trail_activation_atr": 0.5, "break_even_atr": 1.0}
+    grid = [0.4, 0.5, 0.6, 0.7, 0.95]
+    _, _, table = threshold.scan_tau_pnl(sig, "SELL", h1_map, d1_map, grid, exec_cfg)
+    assert len(calls) == 1
+    for tau, row in zip(grid, table.itertuples()):
+        picked = [g["pnl"] for g, p, s in zip(golden, sig["prob"], sig["side"]) if s == "SELL" and p >= tau]
+        assert row.trades == len(picked)
+        assert row.pnl == pytest.approx(sum(picked), rel=1e-12, abs=1e-12)
+
+
+def test_hybrid_v2_golden_covers_every_exit():
+    golden = json.loads((GOLDEN / "hybrid_v2.json").read_text())
+    reasons = {r["reason"] for rows in golden.values() for r in rows}
+    assert reasons == {"TP", "SL", "TRAIL_SL", "Close_LastDay", "NoBars"}
+
+
+def _forecast_trades(h1_map, seed=2, n=40):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for _ in range(n):
+        t = rng.choice(sorted(h1_map) + ["ZZZ"])  # ZZZ has no 1h file
+        i = int(rng.integers(0, 150))
+        bars = h1_map.get(t, h1_map["AAA"])
+        entry = bars.index[i] + pd.Timedelta(minutes=int(rng.choice([-30, 0, 30])))
+        exit_ = bars.index[min(i + int(rng.integers(-2, 10)), len(bars) - 1)] if rng.random() > 0.15 else None
+        side = rng.choice(["BUY", "SELL", "sell"])
+        ref = float(bars["Open"].iloc[i])
+        up, dn = ref * (1 + rng.choice([0.0015, 0.005, 0.03])), ref * (1 - rng.choice([0.0015, 0.005, 0.03]))
+        tp, sl = (up, dn) if side == "BUY" else (dn, up)
+        if rng.random() < 0.15:
+            tp = sl = None  # fallback by sign
+        rows.append({"ticker": t, "side": side, "entry": entry, "exit": exit_, "tp": tp, "sl": sl,
+                     "reason": rng.choice(["TP", "SL", "Close_LastDay", "TRAIL_SL"]),
+                     "pnl": float(rng.normal(0, 1)), "prob": float(rng.uniform(0, 1))})
+    return pd.DataFrame(rows)
+
+
+def _run_compare(tmp_path, monkeypatch, tie_mode):
+    compare = _load("scripts/13_compare_forecast_real.py", "compare_forecast_real")
+    h1_map = _hourly()
+    hist = tmp_path / "hist"
+    hist.mkdir()
+    for t, bars in h1_map.items():
+        bars.rename_axis("datetime").reset_index().to_csv(hist / f"{t}_1h.csv", index=False)
+    val = tmp_path / "reports" / "forecast" / "2025-01" / "validation"
+    val.mkdir(parents=True)
+    _forecast_trades(h1_map).to_csv(val / "validation_trades_auto.csv", index=False)
+    monkeypatch.chdir(tmp_path)
+    compare.run("2025-01", hist_dir=str(hist), tie_mode=tie_mode)
+    metrics = json.loads((val / "forecast_vs_real_metrics.json").read_text())
+    metrics.pop("output_csv")
+    return pd.read_csv(val / "forecast_vs_real.csv"), metrics
+
+
+@pytest.mark.parametrize("tie_mode", ["worst", "best"])
+def test_compare_forecast_real_matches_golden(tmp_path, monkeypatch, tie_mode):
+    out, metrics = _run_compare(tmp_path, monkeypatch, tie_mode)
+    golden = pd.read_csv(GOLDEN / f"compare_forecast_real_{tie_mode}.csv")
+    pd.testing.assert_frame_equal(out, golden, check_exact=False, rtol=1e-12)
+    assert metrics == json.loads((GOLDEN / f"compare_forecast_real_{tie_mode}.json").read_text())
+    assert {"TP", "SL", "TIME", "NO_DATA", "NO_HIST", "TIME_FALLBACK"} <= set(out["outcome_real"])
+
+
+def _daily_prices(seed=3, tickers=("AAA", "BBB", "EXP")):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2025-01-02", periods=45)
+    out = {}
+    for k, t in enumerate(tickers):
+        close = (30 + 20 * k) * np.exp(np.cumsum(rng.normal(0, 0.015, len(dates))))
+        if t == "EXP":
+            close *= 100  # more than fixed_cash per share: no trade
+        open_ = np.r_[close[0], close[:-1]] * (1 + rng.normal(0, 0.006, len(dates)))
+        out[t] = pd.DataFrame({
+            "Date": dates, "Open": open_,
+            "High": np.maximum(open_, close) * (1 + rng.random(len(dates)) * 0.015),
+            "Low": np.minimum(open_, close) * (1 - rng.random(len(dates)) * 0.015),
+            "Close": close,
+        })
+    preds = pd.DataFrame([(t, d, rng.choice([rng.normal(0, 0.01), 0.0, np.nan], p=[0.85, 0.1, 0.05]))
+                          for t in tickers for d in dates[::2]], columns=["Ticker", "Date", "y_pred"])
+    return out, preds
+
+
+WF_RUNS = {"2025-01": {}, "2025-02": {"long_only": True, "min_abs_y": 0.004, "horizon_days": 2}}
+
+
+def _run_wf_box(tmp_path, monkeypatch, month):
+    sim = _load("wf_box/scripts/simulate_trading.py", "wf_simulate_trading")
+    prices, preds = _daily_prices()
+    frozen = tmp_path / "data" / "frozen"
+    frozen.mkdir(parents=True)
+    for t, px in prices.items():
+        px.to_parquet(frozen / f"{t}.parquet")
+    val = tmp_path / "reports" / "forecast" / month / "validation"
+    val.mkdir(parents=True)
+    preds.to_csv(val / "predictions.csv", index=False)
+    monkeypatch.setattr(sim, "FROZEN", str(frozen))
+    monkeypatch.setattr(sim, "REPORTS", str(tmp_path / "reports"))
+    sim.simulate_month(month, tp_pct=0.03, sl_pct=0.02, **WF_RUNS[month])
+    return pd.read_csv(val / "trades.csv"), json.loads((val / "pnl_summary.json").read_text())
+
+
+@pytest.mark.parametrize("month", sorted(WF_RUNS))
+def test_wf_box_simulate_trading_matches_golden(tmp_path, monkeypatch, month):
+    trades, summary = _run_wf_box(tmp_path, monkeypatch, month)
+    golden = pd.read_csv(GOLDEN / f"wf_box_trades_{month}.csv")
+    pd.testing.assert_frame_equal(trades, golden, check_exact=False, rtol=1e-12)
+    assert summary == json.loads((GOLDEN / f"wf_box_summary_{month}.json").read_text())
+    assert {"TP", "SL", "TIMEOUT"} <= set(trades["outcome"])
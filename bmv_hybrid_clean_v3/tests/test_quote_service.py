@@ -0,0 +1,135 @@
+import threading
+import time
+
+from src.quote_service import QuoteCache, ReplayBackend
+
+
+class CountingBackend:
+    name = "fake"
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.calls = []
+
+    def fetch(self, symbols):
+        self.calls.append(list(symbols))
+        time.sleep(0.05)
+        return {s: self.prices[s] for s in symbols if s in self.prices}
+
+
+def test_cache_batches_and_serves_hits():
+    backend = CountingBackend({"AMD": 100.0, "NVDA": 200.0})
+    cache = QuoteCache(backend, ttl_sec=60)
+    assert cache.get_prices(["amd", "NVDA", "XOM"]) == {"AMD": 100.0, "NVDA": 200.0}
+    assert backend.calls == [["AMD", "NVDA", "XOM"]]
+    quotes = cache.get_quotes(["AMD", "XOM"])
+    assert quotes["AMD"]["stale"] is False and quotes["XOM"] is None
+    assert backend.calls[-1] == ["XOM"]
+
+
+def test_concurrent_misses_are_coalesced():
+    backend = CountingBackend({"AMD": 100.0})
+    cache = QuoteCache(backend, ttl_sec=60)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_prices(["AMD"]))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(backend.calls) == 1
+    assert all(r == {"AMD": 100.0} for r in results)
+
+
+def test_lru_eviction():
+    backend = CountingBackend({"A": 1.0, "B": 2.0, "C": 3.0})
+    cache = QuoteCache(backend, ttl_sec=60, max_symbols=2)
+    cache.get_prices(["A", "B"])
+    cache.get_prices(["A"])
+    cache.get_prices(["C"])
+    assert set(cache._quotes) == {"A", "C"}
+
+
+def test_replay_backend(tmp_path):
+    path = tmp_path / "quotes.csv"
+    path.write_text(
+        "timestamp,symbol,price\n"
+        "2025-01-02T14:30:00Z,AMD,100.0\n"
+        "2025-01-02T14:31:00Z,AMD,101.0\n"
+        "2025-01-02T14:30:00Z,NVDA,200.0\n"
+    )
+    backend = ReplayBackend(path, speed=0.0)
+    assert {s: q[0] for s, q in backend.fetch(["AMD", "NVDA", "XOM"]).items()} == {"AMD": 100.0, "NVDA": 200.0}
+    backend.start += 60
+    assert backend.fetch(["AMD"])["AMD"][0] == 101.0
+
+
+class VendorTimeBackend:
+    name = "fake"
+
+    def __init__(self, quotes):
+        self.quotes = quotes
+
+    def fetch(self, symbols):
+        return {s: self.quotes[s] for s in symbols if s in self.quotes}
+
+
+def test_stale_quotes_use_vendor_time_and_are_dropped_from_prices():
+    now = time.time()
+    backend = VendorTimeBackend({"AMD": (100.0, now - 600), "NVDA": (200.0, now - 5)})
+    cache = QuoteCache(backend, ttl_sec=60, stale_after=120)
+    quotes = cache.get_quotes(["AMD", "NVDA"])
+    assert quotes["AMD"]["stale"] is True and quotes["AMD"]["age_sec"] >= 600
+    assert quotes["NVDA"]["stale"] is False
+    assert quotes["AMD"]["ts"] != quotes["AMD"]["fetched_at"]
+    # Callers only get fresh prices and fall back to their direct fetch for the rest
+    assert cache.get_prices(["AMD", "NVDA"]) == {"NVDA": 200.0}
+    assert cache.get_prices(["NVDA"], stale_after=1) == {}
+
+
+def test_refresh_ttl_and_staleness_are_separate():
+    # After the close the last bar is hours old, and refetching does not make it newer
+    now = time.time()
+    backend = VendorTimeBackend({"AMD": (100.0, now - 3 * 3600)})
+    backend.calls = 0
+    fetch = backend.fetch
+
+    def counting(symbols):
+        backend.calls += 1
+        return fetch(symbols)
+
+    backend.fetch = counting
+    cache = QuoteCache(backend, ttl_sec=30, stale_after=120)
+    for _ in range(3):
+        assert cache.get_quotes(["AMD"], max_age=60)["AMD"]["stale"] is True
+    assert backend.calls == 1  # max_age only drives the refresh
+    assert cache.get_prices(["AMD"], max_age=60) == {}
+    assert cache.get_prices(["AMD"], max_age=60, allow_stale=True) == {"AMD": 100.0}
+    assert cache.get_quotes(["AMD"], max_age=60, stale_after=4 * 3600)["AMD"]["stale"] is False
+    assert backend.calls == 1
+
+
+def _yf_frame(symbols, multi):
+    import pandas as pd
+
+    idx = pd.date_range("2025-01-02 14:30", periods=3, freq="1min", tz="UTC")
+    if not multi:
+        return pd.DataFrame({"Close": [1.0, 2.0, 3.0]}, index=idx)
+    cols = pd.MultiIndex.from_product([symbols, ["Open", "Close"]])
+    return pd.DataFrame([[1.0 + i] * len(cols) for i in range(3)], index=idx, columns=cols)
+
+
+def test_yfinance_backend_single_symbol_multiindex(monkeypatch):
+    import sys
+    import types
+
+    from src.quote_service import YFinanceBackend
+
+    for multi in (True, False):
+        fake = types.SimpleNamespace(download=lambda tickers, **kw: _yf_frame(tickers, multi))
+        monkeypatch.setitem(sys.modules, "yfinance", fake)
+        out = YFinanceBackend().fetch(["AMD"])
+        assert out["AMD"][0] == 3.0
+        assert out["AMD"][1] == 1735828380.0  # 14:32 + 1m bar
+    fake = types.SimpleNamespace(download=lambda tickers, **kw: _yf_frame(tickers, True))
+    monkeypatch.setitem(sys.modules, "yfinance", fake)
+    assert set(YFinanceBackend().fetch(["AMD", "NVDA"])) == {"AMD", "NVDA"}
@@ -0,0 +1,50 @@
+import gzip
+import threading
+import time
+
+from src.response_cache import ResponseCache, fingerprint
+
+
+def test_fingerprint_invalidates_on_file_change(tmp_path):
+    path = tmp_path / "positions.json"
+    path.write_text("{}")
+    cache = ResponseCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return {"data": path.read_text()}, 200
+
+    first = cache.get(("positions", b""), fingerprint([path]), build)
+    assert cache.get(("positions", b""), fingerprint([path]), build) is first
+    path.write_text('{"AMD": 1}')
+    second = cache.get(("positions", b""), fingerprint([path]), build)
+    assert len(builds) == 2 and second.etag != first.etag
+    assert gzip.decompress(second.gzip_body) == second.body
+
+
+def test_concurrent_misses_trigger_one_build():
+    cache = ResponseCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        time.sleep(0.05)
+        return {"ok": True}, 200
+
+    threads = [threading.Thread(target=cache.get, args=(("equity", b""), (), build)) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(builds) == 1
+    assert cache.info()["coalesced"] >= 1
+
+
+def test_errors_not_cached_and_lru_bounded():
+    cache = ResponseCache(max_entries=2)
+    assert cache.get(("a", b""), (), lambda: ({"status": "error"}, 500)).status == 500
+    assert cache.info()["entries"] == 0
+    for key in ("a", "b", "c"):
+        cache.get((key, b""), (), lambda: ({}, 200))
+    assert cache.info()["entries"] == 2 and cache.info()["evictions"] == 1
@@ -0,0 +1,70 @@
+import gzip
+
+from src.snapshot_store import SnapshotStore, read_csv_tail
+from src.snapshot_writer import FlatSnapshotWriter
+
+HEADERS = ["timestamp", "equity"]
+
+
+def test_append_rolls_previous_days(tmp_path):
+    store = SnapshotStore(tmp_path)
+    store.append("equity", HEADERS, [["2025-01-02T15:00:00Z", 100], ["2025-01-02T16:00:00Z", 101]])
+    store.append("equity", HEADERS, [["2025-01-03T15:00:00Z", 102]])
+    names = [p.name for p in store.segments("equity")]
+    assert names == ["2025-01-02.csv.gz", "2025-01-03.csv"]
+    with gzip.open(tmp_path / "series" / "equity" / "2025-01-02.csv.gz", "rt") as f:
+        assert f.read().splitlines()[0] == "timestamp,equity"
+
+
+def test_query_reads_only_requested_window(tmp_path):
+    store = SnapshotStore(tmp_path)
+    for day in range(1, 6):
+        store.append("equity", HEADERS, [[f"2025-01-0{day}T15:00:00Z", 100 + day]])
+    rows = store.query("equity", start="2025-01-02", end="2025-01-03")
+    assert [r["equity"] for r in rows] == ["102", "103"]
+    assert [r["equity"] for r in store.query("equity", limit=2)] == ["104", "105"]
+    assert store.query("equity", start="2025-01-04T16:00:00Z") == [{"timestamp": "2025-01-05T15:00:00Z", "equity": "105"}]
+
+
+def test_late_rows_merge_into_closed_segment(tmp_path):
+    store = SnapshotStore(tmp_path)
+    store.append("equity", HEADERS, [["2025-01-02T15:00:00Z", 100]])
+    store.append("equity", HEADERS, [["2025-01-03T15:00:00Z", 101]])
+    store.append("equity", HEADERS, [["2025-01-02T20:00:00Z", 99], ["2025-01-04T15:00:00Z", 102]])
+    assert [p.name for p in store.segments("equity")] == ["2025-01-02.csv.gz", "2025-01-03.csv.gz", "2025-01-04.csv"]
+    assert [r["equity"] for r in store.query("equity", end="2025-01-02")] == ["100", "99"]
+
+
+def test_read_csv_tail(tmp_path):
+    path = tmp_path / "curve.csv"
+    path.write_text("date,capital\n" + "".join(f"d{i},{i}\n" for i in range(1000)))
+    rows = read_csv_tail(path, 3, chunk_size=16)
+    assert [r["capital"] for r in rows] == ["997", "998", "999"]
+    assert len(read_csv_tail(path, 5000)) == 1000
+
+
+def test_late_rows_for_latest_archived_day_are_merged_in_order(tmp_path):
+    store = SnapshotStore(tmp_path)
+    store.append("equity", HEADERS, [["2025-01-02T15:00:00Z", 100], ["2025-01-02T17:00:00Z", 102]])
+    store.append("equity", HEADERS, [["2025-01-03T15:00:00Z", 103]])
+    store.append("equity", HEADERS, [["2025-01-02T16:00:00Z", 101]])
+    assert [p.name for p in store.segments("equity")] == ["2025-01-02.csv.gz", "2025-01-03.csv"]
+    assert [r["equity"] for r in store.query("equity")] == ["100", "101", "102", "103"]
+
+
+def test_query_merges_plain_segment_left_next_to_archive(tmp_path):
+    store = SnapshotStore(tmp_path)
+    store.append("equity", HEADERS, [["2025-01-02T15:00:00Z", 100], ["2025-01-03T15:00:00Z", 103]])
+    (tmp_path / "series" / "equity" / "2025-01-02.csv").write_text("timestamp,equity\n2025-01-02T14:00:00Z,99\n")
+    assert [r["equity"] for r in store.query("equity", limit=3)] == ["99", "100", "103"]
+
+
+def test_flat_snapshot_writer_skips_unchanged_and_throttles(tmp_path):
+    writes = []
+    flat = FlatSnapshotWriter(min_interval_sec=3600)
+    path = tmp_path / "positions.csv"
+    assert flat.write(path, [["t1", "AMD", 1]], lambda p, rows: writes.append(rows))
+    assert not flat.write(path, [["t2", "AMD", 1]], lambda p, rows: writes.append(rows))
+    assert not flat.write(path, [["t3", "AMD", 2]], lambda p, rows: writes.append(rows))
+    assert flat.write(path, [["t4", "AMD", 2]], lambda p, rows: writes.append(rows), min_interval_sec=0)
+    assert len(writes) == 2
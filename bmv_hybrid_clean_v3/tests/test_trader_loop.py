@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+from src.alpaca_adapter import FakeAlpacaAdapter, backoff_delay
+from src.run_intraday_trader import TraderLoop
+
+
+def _make_loop(tmp_path, prices, symbols="AMD,NVDA,XOM"):
+    env = {"SYMBOLS": symbols, "TRADING_ENABLED": "1", "MAX_DAILY_NOTIONAL_USD": "100000"}
+    loop = TraderLoop(env, tmp_path / "orders.json", tmp_path)
+    loop.adapter = FakeAlpacaAdapter(prices=prices)
+    return loop
+
+
+def test_tick_fetches_prices_in_one_request(tmp_path):
+    loop = _make_loop(tmp_path, {"AMD": 100.0, "NVDA": 200.0, "XOM": 50.0})
+    loop.tick()
+    price_calls = [c for c in loop.adapter.calls if c[0] == "fetch_latest_prices"]
+    assert price_calls == [("fetch_latest_prices", ("AMD", "NVDA", "XOM"))]
+    assert (tmp_path / "positions.csv").exists()
+    assert (tmp_path / "heartbeat.json").exists()
+
+
+def test_tick_submits_orders(tmp_path):
+    loop = _make_loop(tmp_path, {"AMD": 100.0, "TSLA": 250.0}, symbols="AMD")
+    (tmp_path / "orders.json").write_text(json.dumps([
+        {"symbol": "amd", "side": "buy", "qty": 2},
+        {"symbol": "TSLA", "side": "BUY", "qty": 1},
+        {"symbol": "", "side": "BUY", "qty": 1},
+    ]))
+    loop.tick()
+    submitted = [c for c in loop.adapter.calls if c[0] == "submit_order"]
+    assert [c[1] for c in submitted] == ["AMD", "TSLA"]
+    assert loop.today_notional == 450.0
+    assert not (tmp_path / "orders.json").exists()
+
+
+def test_backoff_delay_is_capped():
+    for attempt in range(10):
+        assert 0 <= backoff_delay(attempt, base=0.5, cap=2.0) <= 2.0
+
+
+def test_budget_reserved_before_concurrent_submit(tmp_path):
+    env = {"SYMBOLS": "AMD", "TRADING_ENABLED": "1", "MAX_DAILY_NOTIONAL_USD": "250"}
+    loop = TraderLoop(env, tmp_path / "orders.json", tmp_path)
+    loop.adapter = FakeAlpacaAdapter(prices={"AMD": 100.0})
+    (tmp_path / "orders.json").write_text(json.dumps([{"symbol": "AMD", "side": "BUY", "qty": 1}] * 3))
+    loop.tick()
+    assert len([c for c in loop.adapter.calls if c[0] == "submit_order"]) == 2
+    assert [t["reason"] for t in loop.trades if t["status"] == "blocked"] == ["max_daily_notional"]
+
+
+def test_pending_orders_are_polled(tmp_path):
+    loop = _make_loop(tmp_path, {"AMD": 100.0}, symbols="AMD")
+    (tmp_path / "orders.json").write_text(json.dumps([{"symbol": "AMD", "side": "BUY", "qty": 1}]))
+    submit = loop.adapter.submit_order
+
+    def accepted_only(*args):
+        order = submit(*args)
+        order.status = "accepted"
+        return order
+
+    loop.adapter.submit_order = accepted_only
+    loop.tick()
+    assert len(loop.pending_orders) == 1
+    next(iter(loop.adapter.orders.values())).status = "filled"
+    asyncio.run(loop.poll_pending_orders())
+    assert not loop.pending_orders
+    assert loop.trades[-1]["status"] == "filled"
+    assert "submit" in json.loads((tmp_path / "heartbeat.json").read_text())["latency_ms"]
+
+
+def test_same_tick_duplicate_orders_get_distinct_ids(tmp_path):
+    loop = _make_loop(tmp_path, {"AMD": 100.0}, symbols="AMD")
+    (tmp_path / "orders.json").write_text(json.dumps([{"symbol": "AMD", "side": "BUY", "qty": 1}] * 2))
+    submit = loop.adapter.submit_order
+
+    def accepted_only(*args):
+        order = submit(*args)
+        order.status = "accepted"
+        return order
+
+    loop.adapter.submit_order = accepted_only
+    loop.tick()
+    coids = [o.client_order_id for o in loop.adapter.orders.values()]
+    assert len(coids) == 2 and len(set(coids)) == 2
+    assert len(loop.pending_orders) == 2
+
+
+def test_failed_submit_releases_budget_and_rate_slot(tmp_path):
+    loop = _make_loop(tmp_path, {"AMD": 100.0}, symbols="AMD")
+    (tmp_path / "orders.json").write_text(json.dumps([{"symbol": "AMD", "side": "BUY", "qty": 1}]))
+
+    def rejected(*args):
+        raise RuntimeError("rejected")
+
+    loop.adapter.submit_order = rejected
+    loop.tick()
+    assert loop.today_notional == 0.0
+    assert not loop.order_timestamps
+    assert loop.trades[-1]["status"] == "error"
@@ -15,6 +15,7 @@ Salidas por mes:
 """
 import os, argparse, json, math, pandas as pd, numpy as np
 from pathlib import Path
+from first_touch import HIT_SL, HIT_TP, simulate_exits
 
 HERE = os.path.dirname(os.path.abspath(__file__))
 ROOT = os.path.normpath(os.path.join(HERE, ".."))
@@ -40,14 +41,10 @@ def simulate_month(month, fixed_cash=2000.0, tp_pct=0.05, sl_pct=0.02,
         raise ValueError("predictions.csv debe incluir columna 'Ticker'")
     preds = preds.sort_values(["Ticker","Date"]).reset_index(drop=True)
 
-    trades = []
-    capital = capital_initial
+    # 1) Candidatos: señal válida con entrada al Open de D+1
     cache_prices = {}
-
-    for _, row in preds.iterrows():
-        ticker = row["Ticker"]
-        signal_date = row["Date"]
-        ypred = row["y_pred"]
+    cand = []
+    for ticker, signal_date, ypred in zip(preds["Ticker"], preds["Date"], preds["y_pred"]):
         if pd.isna(ypred) or ypred == 0:
             continue
         if abs(ypred) < min_abs_y:
@@ -59,7 +56,7 @@ def simulate_month(month, fixed_cash=2000.0, tp_pct=0.05, sl_pct=0.02,
             cache_prices[ticker] = load_price_series(ticker)
         px = cache_prices[ticker]
 
-        idx_arr = px.index[px["Date"] == signal_date]
+        idx_arr = np.flatnonzero((px["Date"] == signal_date).to_numpy())
         if len(idx_arr) == 0:
             continue
         i = int(idx_arr[0])
@@ -67,9 +64,7 @@ def simulate_month(month, fixed_cash=2000.0, tp_pct=0.05, sl_pct=0.02,
         entry_idx = i + 1
         if entry_idx >= len(px):
             continue
-        entry_row = px.iloc[entry_idx]
-        entry_date = entry_row["Date"]
-        entry_price = float(entry_row["Open"])
+        entry_price = float(px["Open"].iat[entry_idx])
         if entry_price <= 0 or not np.isfinite(entry_price):
             continue
 
@@ -84,45 +79,35 @@ def simulate_month(month, fixed_cash=2000.0, tp_pct=0.05, sl_pct=0.02,
         else:
             tp_price = entry_price * (1 - tp_pct)
             sl_price = entry_price * (1 + sl_pct)
-
-        exit_price = None
-        exit_date = None
-        outcome = "TIMEOUT"
-
         last_idx = min(entry_idx + horizon_days, len(px)-1)
-        for j in range(entry_idx, last_idx+1):
-            hi = float(px.iloc[j]["High"])
-            lo = float(px.iloc[j]["Low"])
-            day_date = px.iloc[j]["Date"]
-
-            if side == "BUY":
-                hit_tp = hi >= tp_price
-                hit_sl = lo <= sl_price
-            else:
-                hit_tp = lo <= tp_price
-                hit_sl = hi >= sl_price
-
-            if hit_tp and hit_sl:
-                outcome = "SL"
-                exit_price = sl_price
-                exit_date = day_date
-                break
-            elif hit_tp:
-                outcome = "TP"
-                exit_price = tp_price
-                exit_date = day_date
-                break
-            elif hit_sl:
-                outcome = "SL"
-                exit_price = sl_price
-                exit_date = day_date
-                break
-
-        if exit_price is None:
-            exit_row = px.iloc[last_idx]
-            exit_date = exit_row["Date"]
-            exit_price = float(exit_row["Close"])
-            outcome = "TIMEOUT"
+        cand.append((ticker, signal_date, ypred, side, entry_idx, last_idx, entry_price, shares, tp_price, sl_price))
+
+    # 2) Primer toque TP/SL de todos los candidatos en una corrida del kernel (first_touch.py);
+    #    si toca ambos el mismo día cuenta SL, sin toque sale al Close del último día
+    offsets, frames = {}, []
+    n_bars = 0
+    for ticker, px in cache_prices.items():
+        offsets[ticker] = n_bars
+        frames.append(px)
+        n_bars += len(px)
+    bars = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=["Date","Open","High","Low","Close"])
+    start = np.array([offsets[c[0]] + c[4] for c in cand], dtype=np.int64)
+    length = np.array([c[5] - c[4] + 1 for c in cand], dtype=np.int64)
+    out = simulate_exits(bars["Open"].to_numpy(dtype=float), bars["High"].to_numpy(dtype=float),
+                         bars["Low"].to_numpy(dtype=float), bars["Close"].to_numpy(dtype=float),
+                         start, length, np.array([c[3] == "BUY" for c in cand], dtype=bool),
+                         np.array([c[8] for c in cand], dtype=float), np.array([c[9] for c in cand], dtype=float),
+                         tie="sl_first")
+
+    # 3) Capital secuencial en el orden de las señales
+    trades = []
+    capital = capital_initial
+    for k, (ticker, signal_date, ypred, side, entry_idx, last_idx, entry_price, shares, tp_price, sl_price) in enumerate(cand):
+        px = cache_prices[ticker]
+        code = out["reason"][k]
+        outcome = {HIT_TP: "TP", HIT_SL: "SL"}.get(code, "TIMEOUT")
+        exit_price = {HIT_TP: tp_price, HIT_SL: sl_price}.get(code, float(out["exit_price"][k]))
+        exit_date = px["Date"].iat[entry_idx + int(out["exit_bar"][k])]
 
         if side == "BUY":
             gross = (exit_price - entry_price) * shares
@@ -137,7 +122,7 @@ def simulate_month(month, fixed_cash=2000.0, tp_pct=0.05, sl_pct=0.02,
             "Ticker": ticker,
             "signal_date": pd.to_datetime(signal_date),
             "side": side,
-            "entry_date": pd.to_datetime(entry_date),
+            "entry_date": pd.to_datetime(px["Date"].iat[entry_idx]),
             "entry_price": entry_price,
             "shares": shares,
             "tp_price": tp_price,
@@ -11,6 +11,11 @@ Usage:
   python backtest_comparative_modes.py --mode hybrid --pw_threshold 0.55
   python backtest_comparative_modes.py --mode hybrid --pw_bands 0.52,0.58
   python backtest_comparative_modes.py --mode probwin_only --pw_threshold 0.55
+  python backtest_comparative_modes.py --mode hybrid --soft_hybrid --mc_cache evidence/mc_cache.joblib
+
+The engine steps through timestamps (not rows): each 15m cross-section is read from
+(time x ticker) OHLC arrays, exits are evaluated for all open positions at once, and
+MC selections are cached by lookback window (--mc_cache shares them across modes).
 """
 
 import pandas as pd
@@ -84,40 +89,33 @@ def resolve_pnl_col(df):
 # MONTE CARLO SIMULATION
 # ==============================================================================
 def monte_carlo_simulation(returns, tp_pct=TP_PCT, sl_pct=SL_PCT, max_hold=MAX_HOLD_DAYS, n_paths=MC_PATHS, block_size=MC_BLOCK_SIZE):
-    """Run block bootstrap Monte Carlo"""
+    """Run block bootstrap Monte Carlo (all paths at once)"""
     if len(returns) < 10:
         return {'ev': 0, 'cvar': 0, 'prob_loss': 1.0, 'score': -999, 'tp_rate': 0, 'sl_rate': 0}
     
-    returns = np.array(returns)
+    returns = np.asarray(returns, dtype=float)
     n = len(returns)
-    pnls = []
-    tp_count = 0
-    sl_count = 0
-    
-    for _ in range(n_paths):
-        # Block bootstrap
-        cumret = 0
-        for day in range(max_hold):
-            if day >= n:
-                break
-            block_start = np.random.randint(0, max(1, n - block_size + 1))
-            block = returns[block_start:block_start + block_size]
-            ret = np.random.choice(block)
-            cumret += ret
-            
-            # TP/SL check
-            if cumret >= tp_pct:
-                pnls.append(tp_pct)
-                tp_count += 1
-                break
-            elif cumret <= -sl_pct:
-                pnls.append(-sl_pct)
-                sl_count += 1
-                break
-        else:
-            pnls.append(cumret)
+    cumret = np.zeros(n_paths)
+    pnls = np.zeros(n_paths)
+    hit_tp = np.zeros(n_paths, dtype=bool)
+    hit_sl = np.zeros(n_paths, dtype=bool)
+    
+    for day in range(min(max_hold, n)):
+        # Block bootstrap: random block, then one random return inside it
+        block_start = np.random.randint(0, max(1, n - block_size + 1), size=n_paths)
+        width = np.minimum(block_size, n - block_start)
+        ret = returns[block_start + np.random.randint(0, width)]
+        
+        live = ~(hit_tp | hit_sl)
+        cumret[live] += ret[live]
+        
+        # TP/SL check
+        tp_now = live & (cumret >= tp_pct)
+        sl_now = live & ~tp_now & (cumret <= -sl_pct)
+        hit_tp |= tp_now
+        hit_sl |= sl_now
     
-    pnls = np.array(pnls)
+    pnls = np.where(hit_tp, tp_pct, np.where(hit_sl, -sl_pct, cumret))
     ev = np.mean(pnls)
     cvar = -np.percentile(pnls, 5)
     prob_loss = (pnls < 0).mean()
@@ -128,12 +126,30 @@ def monte_carlo_simulation(returns, tp_pct=TP_PCT, sl_pct=SL_PCT, max_hold=MAX_H
         'cvar': cvar,
         'prob_loss': prob_loss,
         'score': score,
-        'tp_rate': tp_count / n_paths,
-        'sl_rate': sl_count / n_paths
+        'tp_rate': hit_tp.sum() / n_paths,
+        'sl_rate': hit_sl.sum() / n_paths
     }
 
-def select_tickers_by_mc(daily_df, current_date, lookback_days=MC_LOOKBACK, top_k=MAX_POSITIONS):
-    """Select top-K tickers by MC score"""
+def load_mc_cache(path):
+    """Load MC cache (dict) from disk; empty if missing."""
+    if path and Path(path).exists():
+        import joblib
+        return joblib.load(path)
+    return {}
+
+def save_mc_cache(cache, path):
+    if path:
+        import joblib
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        joblib.dump(cache, path)
+
+def select_tickers_by_mc(daily_df, current_date, lookback_days=MC_LOOKBACK, top_k=MAX_POSITIONS, universe=None, cache=None):
+    """Select top-K tickers by MC score
+    
+    universe: optional set of tickers eligible for selection (default: all in daily_df)
+    cache: optional dict keyed by (lookback window returns, MC params); the same window
+           is never re-simulated, so every mode/rebalance sees the same MC result
+    """
     end_date = current_date
     start_date = current_date - timedelta(days=lookback_days)
     
@@ -141,19 +157,26 @@ def select_tickers_by_mc(daily_df, current_date, lookback_days=MC_LOOKBACK, top_
         (daily_df['date'] >= start_date) & 
         (daily_df['date'] < end_date)
     ]
+    counts = window_data['ticker'].value_counts()
     
     scores = {}
-    for ticker in daily_df['ticker'].unique():
-        ticker_data = window_data[window_data['ticker'] == ticker]
-        if len(ticker_data) < 10:
+    for ticker, ticker_data in window_data.groupby('ticker', sort=False):
+        if counts[ticker] < 10 or (universe is not None and ticker not in universe):
             continue
         
         returns = ticker_data['return'].dropna().values
-        mc_result = monte_carlo_simulation(returns)
+        if cache is None:
+            mc_result = monte_carlo_simulation(returns)
+        else:
+            key = (returns.tobytes(), TP_PCT, SL_PCT, MAX_HOLD_DAYS, MC_PATHS, MC_BLOCK_SIZE)
+            mc_result = cache.get(key)
+            if mc_result is None:
+                mc_result = cache[key] = monte_carlo_simulation(returns)
         scores[ticker] = mc_result
     
-    # Rank by score
-    ranked = sorted(scores.items(), key=lambda x: x[1]['score'], reverse=True)
+    # Rank by score (ties: order of first appearance in daily_df)
+    order = {t: i for i, t in enumerate(daily_df['ticker'].unique())}
+    ranked = sorted(scores.items(), key=lambda x: (-x[1]['score'], order[x[0]]))
     return [t[0] for t in ranked[:top_k]], {t[0]: t[1] for t in ranked}
 
 # ==============================================================================
@@ -225,27 +248,47 @@ def load_data(mode, forecast_path=None, ticker_universe=None):
 # ==============================================================================
 # BACKTEST ENGINE
 # ==============================================================================
-def run_backtest(mode, intraday_df, daily_df, forecast_df=None, pw_threshold=None, pw_bands=None, soft_hybrid=False):
+def pivot_bars(intraday_df):
+    """Pivot intraday bars to (time x ticker) OHLC arrays (NaN where a ticker has no bar)."""
+    bars = intraday_df.drop_duplicates(['date', 'ticker'], keep='last')
+    times = np.sort(bars['date'].unique())
+    tickers = np.sort(bars['ticker'].unique())
+    ti = np.searchsorted(times, bars['date'].values)
+    ki = np.searchsorted(tickers, bars['ticker'].values)
+    ohlc = {}
+    for col in ['open', 'high', 'low', 'close']:
+        arr = np.full((len(times), len(tickers)), np.nan)
+        arr[ti, ki] = bars[col].to_numpy(dtype=float)
+        ohlc[col] = arr
+    present = np.zeros((len(times), len(tickers)), dtype=bool)
+    present[ti, ki] = True
+    return pd.DatetimeIndex(times), tickers, ohlc, present
+
+def run_backtest(mode, intraday_df, daily_df, forecast_df=None, pw_threshold=None, pw_bands=None, soft_hybrid=False, mc_cache=None):
     """
-    Unified backtest engine
+    Unified backtest engine (portfolio event loop over timestamps)
+    
+    Each 15m timestamp is one event: the cross-section of bars for all tickers is read
+    from pre-pivoted (time x ticker) arrays, TP/SL/timeout exits are evaluated at once for
+    all open positions, then entries are taken in ticker order subject to the guardrails.
     
     Args:
-        mode: 'baseline', 'hybrid', or 'probwin_only'
+        mode: 'baseline', 'hybrid', 'probwin_only' or 'hybrid_full_universe'
         pw_threshold: single threshold (e.g. 0.55)
         pw_bands: tuple (low, high) for sizing bands (e.g. (0.52, 0.58))
         soft_hybrid: if True, hybrid uses sizing without blocking trades (≥0.58: 1.0x, 0.52-0.58: 0.8x, <0.52: 0.6x)
+        mc_cache: optional dict shared across runs/modes (see select_tickers_by_mc)
     """
     print("\n" + "=" * 80)
     print(f"Running backtest: {mode.upper()}")
     print("=" * 80)
     
     # Setup
-    intraday_df = intraday_df.sort_values(['ticker', 'date'])
     trades = []
     equity_curve = []
     cash = CAPITAL
-    positions = {}
     deployed_cash = 0  # Track deployed capital for guardrail
+    mc_cache = {} if mc_cache is None else mc_cache
     
     # Restrict MC selection universe to forecast-covered tickers for hybrid/probwin_only
     if mode in ['hybrid', 'probwin_only'] and forecast_df is not None:
@@ -254,21 +297,34 @@ def run_backtest(mode, intraday_df, daily_df, forecast_df=None, pw_threshold=Non
     elif mode == 'hybrid_full_universe':
         # For full_universe mode, MC selects from ALL available tickers
         # but ProbWin will veto any without forecast
+        allowed = None
         daily_df_sel = daily_df.copy()
     else:
+        allowed = None
         daily_df_sel = daily_df
 
+    times, tickers, ohlc, present = pivot_bars(intraday_df)
+    n_tickers = len(tickers)
+    ticker_pos = {t: i for i, t in enumerate(tickers)}
+
     # DIAGNOSTIC: Print forecast and daily info
     print("\n" + "=" * 80)
     print("DIAGNOSTIC: Forecast vs Daily Data")
     print("=" * 80)
     print(f"FORECAST tickers: {sorted(forecast_df['ticker'].unique()) if forecast_df is not None else 'N/A'}")
-    forecast_lookup = None
+    pw_by_day = {}
     if forecast_df is not None:
-        # Precompute fast lookup for prob_win by (ticker, date)
-        forecast_df = forecast_df.copy()
-        forecast_df['date_only'] = forecast_df['date'].dt.date
-        forecast_lookup = dict(zip(zip(forecast_df['ticker'], forecast_df['date_only']), forecast_df['prob_win']))
+        # prob_win per day as an array aligned with `tickers` (NaN = no forecast)
+        fc = forecast_df[forecast_df['ticker'].isin(ticker_pos)].copy()
+        fc['date_only'] = fc['date'].dt.date
+        fc = fc.drop_duplicates(['ticker', 'date_only'], keep='last')
+        for day, grp in fc.groupby('date_only'):
+            has = np.zeros(n_tickers, dtype=bool)
+            pw = np.full(n_tickers, np.nan)
+            idx = grp['ticker'].map(ticker_pos).to_numpy()
+            has[idx] = True
+            pw[idx] = grp['prob_win'].to_numpy(dtype=float)
+            pw_by_day[day] = (has, pw)
         print(f"FORECAST date sample: {forecast_df['date'].head(3).tolist()}")
         print(f"FORECAST date dtype: {forecast_df['date'].dtype}")
     print(f"\nDAILY tickers: {sorted(daily_df_sel['ticker'].unique())}")
@@ -276,233 +332,215 @@ def run_backtest(mode, intraday_df, daily_df, forecast_df=None, pw_threshold=Non
     print(f"DAILY date dtype: {daily_df_sel['date'].dtype}")
     print("=" * 80 + "\n")
 
-    selected_tickers = []
-    mc_scores = {}  # Initialize mc_scores
+    no_pw = (np.zeros(n_tickers, dtype=bool), np.full(n_tickers, np.nan))
+    selected = np.zeros(n_tickers, dtype=bool)
+    has_mc = np.zeros(n_tickers, dtype=bool)
+    mc_score_arr = np.full(n_tickers, np.nan)
+    mc_ev_arr = np.full(n_tickers, np.nan)
     last_rebalance_date = None
+    n_rebalances = 0
     trades_today = 0
     current_date = None
     
+    # Open positions, one slot per ticker
+    is_open = np.zeros(n_tickers, dtype=bool)
+    pos_entry_price = np.zeros(n_tickers)
+    pos_entry_ns = np.zeros(n_tickers, dtype=np.int64)
+    pos_size = np.zeros(n_tickers)
+    pos_prob_win = np.full(n_tickers, np.nan)
+    pos_mc_score = np.full(n_tickers, np.nan)
+    pos_mc_ev = np.full(n_tickers, np.nan)
+    pos_seq = np.zeros(n_tickers, dtype=np.int64)
+    n_entries = 0
+    last_close = np.full(n_tickers, np.nan)
+    
     # Counter for prob_win availability
     present_pw = 0
     missing_pw = 0
     
-    total_bars = len(intraday_df)
-    
-    for idx, row in intraday_df.iterrows():
-        bar_date = row['date']
+    times_ns = times.asi8
+    day_ns = 86400 * 10**9
+    for t, bar_date in enumerate(times):
         bar_date_only = bar_date.date()
-        ticker = row['ticker']
+        bar_ns = times_ns[t]
+        live = present[t]
         
         # Date change
         if current_date != bar_date_only:
+            if current_date is not None:
+                equity_curve.append({'date': times[t - 1],
+                                     'equity': cash + np.nansum(pos_size[is_open] * last_close[is_open])})
             current_date = bar_date_only
             trades_today = 0
+            has_pw, pw_today = pw_by_day.get(bar_date_only, no_pw)
             
             # Rebalance check (for baseline/hybrid with dynamic MC)
             if mode in ['baseline', 'hybrid', 'hybrid_full_universe']:
                 if last_rebalance_date is None or (bar_date - last_rebalance_date).days >= REBALANCE_FREQ_DAYS:
-                    selected_tickers, mc_scores = select_tickers_by_mc(daily_df_sel, bar_date, MC_LOOKBACK, MAX_POSITIONS)
+                    selected_tickers, mc_scores = select_tickers_by_mc(daily_df, bar_date, MC_LOOKBACK, MAX_POSITIONS,
+                                                                       universe=allowed, cache=mc_cache)
                     last_rebalance_date = bar_date
-                    if idx % 10000 == 0:
+                    selected[:] = np.isin(tickers, selected_tickers)
+                    has_mc[:] = False
+                    for tk, res in mc_scores.items():
+                        if tk in ticker_pos:
+                            has_mc[ticker_pos[tk]] = True
+                            mc_score_arr[ticker_pos[tk]] = res['score']
+                            mc_ev_arr[ticker_pos[tk]] = res['ev']
+                    if n_rebalances % 10 == 0:
                         print(f"  Rebalancing on {bar_date.date()}: {selected_tickers}")
+                    n_rebalances += 1
         
-        # Check open positions (exits)
-        if ticker in positions:
-            pos = positions[ticker]
-            entry_price = pos['entry_price']
-            hold_days = (bar_date - pos['entry_date']).days
-            
-            tp_price = entry_price * (1 + TP_PCT)
-            sl_price = entry_price * (1 - SL_PCT)
-            
-            exit_reason = None
-            exit_price = None
-            
-            if row['high'] >= tp_price:
-                exit_reason = 'TP'
-                exit_price = tp_price
-            elif row['low'] <= sl_price:
-                exit_reason = 'SL'
-                exit_price = sl_price
-            elif hold_days >= MAX_HOLD_DAYS:
-                exit_reason = 'TO'
-                exit_price = row['close']
+        high, low, close = ohlc['high'][t], ohlc['low'][t], ohlc['close'][t]
+        last_close = np.where(live, close, last_close)
+        
+        # Exits: TP / SL / timeout for all open positions with a bar now
+        check = is_open & live
+        if check.any():
+            tp_price = pos_entry_price * (1 + TP_PCT)
+            sl_price = pos_entry_price * (1 - SL_PCT)
+            hold_days = (bar_ns - pos_entry_ns) // day_ns
+            exit_tp = check & (high >= tp_price)
+            exit_sl = check & ~exit_tp & (low <= sl_price)
+            exit_to = check & ~exit_tp & ~exit_sl & (hold_days >= MAX_HOLD_DAYS)
+            exit_price = np.where(exit_tp, tp_price, np.where(exit_sl, sl_price, close))
             
-            if exit_reason:
+            for i in np.flatnonzero(exit_tp | exit_sl | exit_to):
                 # Close position
-                pnl = (exit_price - entry_price) * pos['size'] - (entry_price * pos['size'] * SLIPPAGE_PCT)
-                cash += (exit_price * pos['size'])
-                deployed_cash -= (entry_price * pos['size'])  # Reduce deployed on exit
+                entry_price = pos_entry_price[i]
+                size = pos_size[i]
+                px = exit_price[i]
+                pnl = (px - entry_price) * size - (entry_price * size * SLIPPAGE_PCT)
+                cash += (px * size)
+                deployed_cash -= (entry_price * size)  # Reduce deployed on exit
                 
                 trades.append({
-                    'ticker': ticker,
-                    'entry_date': pos['entry_date'],
+                    'ticker': tickers[i],
+                    'entry_date': pd.Timestamp(pos_entry_ns[i]),
                     'entry_price': entry_price,
                     'exit_date': bar_date,
-                    'exit_price': exit_price,
-                    'exit_reason': exit_reason,
+                    'exit_price': px,
+                    'exit_reason': 'TP' if exit_tp[i] else ('SL' if exit_sl[i] else 'TO'),
                     'pnl': pnl,
-                    'pnl_pct': (exit_price - entry_price) / entry_price,
-                    'size': pos['size'],
-                    'prob_win': pos.get('prob_win', np.nan),
-                    'mc_score': pos.get('mc_score', np.nan),
-                    'mc_ev': pos.get('mc_ev', np.nan)
+                    'pnl_pct': (px - entry_price) / entry_price,
+                    'size': size,
+                    'prob_win': pos_prob_win[i],
+                    'mc_score': pos_mc_score[i],
+                    'mc_ev': pos_mc_ev[i]
                 })
-                
-                del positions[ticker]
+                is_open[i] = False
         
         # Entry logic
-        if ticker not in positions and len(positions) < MAX_POSITIONS and trades_today < MAX_TRADES_PER_DAY:
-            # Mode-specific signal generation
-            take_trade = False
-            prob_win = None
-            mc_score = None
-            mc_ev = None
-            sizing_mult = 1.0
-            
-            if mode == 'baseline':
-                # Pure MC: only check if ticker selected
-                if ticker in selected_tickers:
-                    # Check MC EV filter
-                    if ticker in mc_scores and mc_scores[ticker]['ev'] >= MIN_MC_EV:
-                        take_trade = True
-                        mc_score = mc_scores[ticker]['score']
-                        mc_ev = mc_scores[ticker]['ev']
-            
-            elif mode == 'hybrid':
-                # MC + prob_win gating
-                if ticker in selected_tickers:
-                    if ticker in mc_scores and mc_scores[ticker]['ev'] >= MIN_MC_EV:
-                        mc_score = mc_scores[ticker]['score']
-                        mc_ev = mc_scores[ticker]['ev']
-                        
-                        # Get prob_win from forecast
-                        if forecast_lookup is not None:
-                            prob_win = forecast_lookup.get((ticker, bar_date_only))
-                            if prob_win is not None:
-                                present_pw += 1
-                                
-                                # Apply gating
-                                if soft_hybrid:
-                                    # Soft hybrid: always trade, vary sizing
-                                    take_trade = True
-                                    if prob_win >= 0.58:
-                                        sizing_mult = 1.0
-                                    elif prob_win >= 0.52:
-                                        sizing_mult = 0.8
-                                    else:
-                                        sizing_mult = 0.6
-                                elif pw_threshold is not None:
-                                    # Single threshold
-                                    if prob_win >= pw_threshold:
-                                        take_trade = True
-                                elif pw_bands is not None:
-                                    # Bands for sizing
-                                    low, high = pw_bands
-                                    if prob_win >= high:
-                                        take_trade = True
-                                        sizing_mult = 1.0
-                                    elif prob_win >= low:
-                                        take_trade = True
-                                        sizing_mult = 0.5
-                                else:
-                                    # No filter
-                                    take_trade = True
-                            else:
-                                missing_pw += 1
-            
-            elif mode == 'probwin_only':
-                # Only prob_win signal
-                if forecast_lookup is not None:
-                    prob_win = forecast_lookup.get((ticker, bar_date_only))
-                    if prob_win is not None:
-                        
-                        if pw_threshold is not None:
-                            if prob_win >= pw_threshold:
-                                take_trade = True
-                        else:
-                            if prob_win >= 0.5:
-                                take_trade = True
-            
-            elif mode == 'hybrid_full_universe':
-                # MC proposes from FULL universe, ProbWin decides
-                # Always try MC scoring first
-                if ticker in mc_scores and mc_scores[ticker]['ev'] >= MIN_MC_EV:
-                    mc_score = mc_scores[ticker]['score']
-                    mc_ev = mc_scores[ticker]['ev']
-                    
-                    # Get prob_win from forecast
-                    if forecast_lookup is not None:
-                        prob_win = forecast_lookup.get((ticker, bar_date_only))
-                        if prob_win is not None:
-                            present_pw += 1
-                            
-                            # Hard ProbWin gate
-                            if pw_threshold is not None:
-                                if prob_win >= pw_threshold:
-                                    take_trade = True
-                            else:
-                                if prob_win >= 0.55:
-                                    take_trade = True
-                        else:
-                            # No forecast = no trade
-                            missing_pw += 1
-                    else:
-                        # No forecast available
-                        missing_pw += 1
+        n_open = int(is_open.sum())
+        if n_open >= MAX_POSITIONS or trades_today >= MAX_TRADES_PER_DAY:
+            continue
+        cand = live & ~is_open
+        
+        # Mode-specific signal generation (vectorized over the cross-section)
+        sizing_mult = np.ones(n_tickers)
+        entry_pw = np.full(n_tickers, np.nan)
+        entry_mc = has_mc & (mc_ev_arr >= MIN_MC_EV)
+        
+        if mode == 'baseline':
+            # Pure MC: ticker selected and MC EV filter
+            take = cand & selected & entry_mc
+        
+        elif mode in ['hybrid', 'hybrid_full_universe']:
+            # hybrid: MC selection + prob_win gating; full universe: MC proposes from ALL tickers, ProbWin decides
+            gated = cand & entry_mc & (selected if mode == 'hybrid' else True)
+            if mode == 'hybrid_full_universe' or forecast_df is not None:
+                present_pw += int((gated & has_pw).sum())
+                missing_pw += int((gated & ~has_pw).sum())
+            ok = gated & has_pw
+            entry_pw = np.where(ok, pw_today, np.nan)
+            with np.errstate(invalid='ignore'):
+                if mode == 'hybrid_full_universe':
+                    # Hard ProbWin gate
+                    take = ok & (pw_today >= (pw_threshold if pw_threshold is not None else 0.55))
+                elif soft_hybrid:
+                    # Soft hybrid: always trade, vary sizing
+                    take = ok
+                    sizing_mult = np.where(pw_today >= 0.58, 1.0, np.where(pw_today >= 0.52, 0.8, 0.6))
+                elif pw_threshold is not None:
+                    # Single threshold
+                    take = ok & (pw_today >= pw_threshold)
+                elif pw_bands is not None:
+                    # Bands for sizing
+                    low_b, high_b = pw_bands
+                    take = ok & (pw_today >= low_b)
+                    sizing_mult = np.where(pw_today >= high_b, 1.0, 0.5)
+                else:
+                    # No filter
+                    take = ok
+        
+        elif mode == 'probwin_only':
+            # Only prob_win signal
+            ok = cand & has_pw
+            entry_pw = np.where(ok, pw_today, np.nan)
+            with np.errstate(invalid='ignore'):
+                take = ok & (pw_today >= (pw_threshold if pw_threshold is not None else 0.5))
+        
+        else:
+            take = np.zeros(n_tickers, dtype=bool)
+        
+        if mode in ['baseline', 'hybrid', 'hybrid_full_universe']:
+            entry_score = np.where(entry_mc, mc_score_arr, np.nan)
+            entry_ev = np.where(entry_mc, mc_ev_arr, np.nan)
+        else:
+            entry_score = entry_ev = np.full(n_tickers, np.nan)
+        
+        # Execute trades in ticker order (guardrails are path dependent)
+        opens = ohlc['open'][t]
+        for i in np.flatnonzero(take):
+            if n_open >= MAX_POSITIONS or trades_today >= MAX_TRADES_PER_DAY:
+                break
+            entry_price_with_slip = opens[i] * (1 + SLIPPAGE_PCT)
+            position_value = PER_TRADE_CASH * sizing_mult[i]
+            size = position_value / entry_price_with_slip
+            trade_cash = entry_price_with_slip * size
             
-            # Execute trade if signal
-            if take_trade:
-                entry_price = row['open']
-                entry_price_with_slip = entry_price * (1 + SLIPPAGE_PCT)
-                position_value = PER_TRADE_CASH * sizing_mult
-                size = position_value / entry_price_with_slip
-                trade_cash = entry_price_with_slip * size
+            # Guardrails: max_deploy check + cash check
+            if deployed_cash + trade_cash <= MAX_DEPLOY and cash >= trade_cash:
+                cash -= trade_cash
+                deployed_cash += trade_cash
                 
-                # Guardrails: max_deploy check + max_open check
-                if (deployed_cash + trade_cash <= MAX_DEPLOY and 
-                    cash >= trade_cash and
-                    len(positions) < MAX_POSITIONS):
-                    
-                    cash -= trade_cash
-                    deployed_cash += trade_cash
-                    
-                    positions[ticker] = {
-                        'entry_date': bar_date,
-                        'entry_price': entry_price_with_slip,
-                        'size': size,
-                        'prob_win': prob_win,
-                        'mc_score': mc_score,
-                        'mc_ev': mc_ev
-                    }
-                    
-                    trades_today += 1
-        
-        # Track equity
-        if idx % 1000 == 0:
-            equity = cash + sum(row['close'] * pos['size'] for t, pos in positions.items() if t == ticker)
-            equity_curve.append({'date': bar_date, 'equity': equity})
-    
-    # Close remaining positions
-    for ticker, pos in positions.items():
-        last_price = intraday_df[intraday_df['ticker'] == ticker].iloc[-1]['close']
-        pnl = (last_price - pos['entry_price']) * pos['size']
-        deployed_cash -= (pos['entry_price'] * pos['size'])  # Reduce deployed on close
-        cash += (last_price * pos['size'])
+                is_open[i] = True
+                pos_entry_price[i] = entry_price_with_slip
+                pos_entry_ns[i] = bar_ns
+                pos_size[i] = size
+                pos_prob_win[i] = entry_pw[i]
+                pos_mc_score[i] = entry_score[i]
+                pos_mc_ev[i] = entry_ev[i]
+                pos_seq[i] = n_entries
+                n_entries += 1
+                n_open += 1
+                trades_today += 1
+    
+    if len(times):
+        equity_curve.append({'date': times[-1], 'equity': cash + np.nansum(pos_size[is_open] * last_close[is_open])})
+    
+    # Close remaining positions (in entry order) at the ticker's last bar
+    last_bar = len(times) - 1 - np.argmax(present[::-1], axis=0) if len(times) else np.zeros(n_tickers, dtype=int)
+    open_idx = np.flatnonzero(is_open)
+    for i in open_idx[np.argsort(pos_seq[open_idx])]:
+        last_price = ohlc['close'][last_bar[i], i]
+        pnl = (last_price - pos_entry_price[i]) * pos_size[i]
+        deployed_cash -= (pos_entry_price[i] * pos_size[i])  # Reduce deployed on close
+        cash += (last_price * pos_size[i])
         
         trades.append({
-            'ticker': ticker,
-            'entry_date': pos['entry_date'],
-            'entry_price': pos['entry_price'],
-            'exit_date': intraday_df['date'].max(),
+            'ticker': tickers[i],
+            'entry_date': pd.Timestamp(pos_entry_ns[i]),
+            'entry_price': pos_entry_price[i],
+            'exit_date': times[-1],
             'exit_price': last_price,
             'exit_reason': 'FINAL',
             'pnl': pnl,
-            'pnl_pct': (last_price - pos['entry_price']) / pos['entry_price'],
-            'size': pos['size'],
-            'prob_win': pos.get('prob_win', np.nan),
-            'mc_score': pos.get('mc_score', np.nan),
-            'mc_ev': pos.get('mc_ev', np.nan)
+            'pnl_pct': (last_price - pos_entry_price[i]) / pos_entry_price[i],
+            'size': pos_size[i],
+            'prob_win': pos_prob_win[i],
+            'mc_score': pos_mc_score[i],
+            'mc_ev': pos_mc_ev[i]
         })
     
     final_equity = cash
@@ -609,6 +647,7 @@ def main():
     parser.add_argument('--start_date', type=str, help='Start date (YYYY-MM-DD)')
     parser.add_argument('--end_date', type=str, help='End date (YYYY-MM-DD)')
     parser.add_argument('--output', default=None, help='Output directory')
+    parser.add_argument('--mc_cache', default=None, help='MC cache file shared across modes (joblib)')
     
     args = parser.parse_args()
     
@@ -634,12 +673,15 @@ def main():
     intraday_df, daily_df, forecast_df = load_data(args.mode, args.forecast, ticker_universe)
     
     # Run backtest
+    mc_cache = load_mc_cache(args.mc_cache)
     trades_df, final_equity, equity_curve = run_backtest(
         args.mode, intraday_df, daily_df, forecast_df,
         pw_threshold=args.pw_threshold,
         pw_bands=pw_bands,
-        soft_hybrid=args.soft_hybrid
+        soft_hybrid=args.soft_hybrid,
+        mc_cache=mc_cache
     )
+    save_mc_cache(mc_cache, args.mc_cache)
     
     # Debug quick view
     print("\nDEBUG trades_df shape:", trades_df.shape)
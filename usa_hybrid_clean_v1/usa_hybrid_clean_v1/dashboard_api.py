@@ -475,6 +475,49 @@ def api_meta_routes():
     return jsonify({"ok": True, "routes": routes})
 
 
+@app.get("/api/meta/bundles")
+def api_meta_bundles():
+    """Bundles de inferencia cargados en el servidor caliente (proceso aparte, vía /health)."""
+    try:
+        from utils.inference_bundle import warm_health, warm_url
+    except Exception as e:  # noqa: BLE001
+        return jsonify({"ok": False, "error": str(e)}), 500
+    health = warm_health()
+    return jsonify({"ok": True, "warm_url": warm_url() or None, "warm_alive": health is not None,
+                    "warm_pid": (health or {}).get("pid"), "bundles": (health or {}).get("bundles", [])})
+
+
+@app.get("/api/forecast")
+def api_forecast():
+    """Forecast de una fecha as-of desde el forecast store (lee solo esas particiones).
+
+    Query: asof=YYYY-MM-DD (default: última), tickers=AMD,NVDA, model=direction_daily, lookback_days=0
+    """
+    try:
+        import pandas as pd  # type: ignore
+        from utils import forecast_store
+    except Exception as e:  # noqa: BLE001
+        return jsonify({"ok": False, "error": str(e)}), 500
+    root = forecast_store.store_root()
+    root = root if root.is_absolute() else REPO_ROOT / root
+    if not forecast_store.is_store(root):
+        return jsonify({"ok": False, "error": f"No existe forecast store en {root}"}), 404
+    model = request.args.get("model", forecast_store.DEFAULT_MODEL)
+    asof = request.args.get("asof") or forecast_store.latest_asof(model, root=root)
+    if asof is None:
+        return jsonify({"ok": False, "error": f"Sin forecasts para {model}"}), 404
+    tickers = [t.strip().upper() for t in request.args.get("tickers", "").split(",") if t.strip()] or None
+    try:
+        lookback = int(request.args.get("lookback_days", 0))
+        df = forecast_store.get_forecast(asof, tickers, model=model, lookback_days=lookback, root=root)
+    except Exception as e:  # noqa: BLE001
+        return jsonify({"ok": False, "error": str(e)}), 400
+    if "date" in df.columns:
+        df["date"] = pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d")
+    df = df.astype(object).where(df.notna(), None)
+    return jsonify({"ok": True, "asof": str(asof), "model": model, "rows": df.to_dict(orient="records")})
+
+
 @app.get("/api/meta/port")
 def api_meta_port():
     """Devuelve el puerto activo leído desde outputs/api_port.json (si existe)."""
@@ -1192,6 +1235,24 @@ if __name__ == "__main__":
     except Exception as e:  # noqa: BLE001
         print(f"[WARN] No se pudo escribir api_port.json: {e}")
 
+    # Servidor caliente de inferencia (opcional): proceso hijo dedicado. Los scripts lanzados vía
+    # utils/inference_bundle.py run corren ahí (cambian cwd/argv/stdout de su proceso, no de Flask)
+    # y reutilizan bundles ya cargados.
+    warm_port = os.environ.get("INFERENCE_WARM_PORT", "").strip()
+    if warm_port:
+        try:
+            import atexit
+            import secrets
+            from utils.inference_bundle import spawn_server
+            # Token compartido con los procesos hijos (heredan el entorno)
+            os.environ.setdefault("INFERENCE_WARM_TOKEN", secrets.token_hex(16))
+            warm_proc = spawn_server("127.0.0.1", int(warm_port), os.environ["INFERENCE_WARM_TOKEN"])
+            atexit.register(warm_proc.terminate)
+            os.environ["INFERENCE_WARM_URL"] = f"http://127.0.0.1:{warm_port}"
+            print(f"[INFO] Servidor caliente de inferencia en {os.environ['INFERENCE_WARM_URL']} (pid {warm_proc.pid})")
+        except Exception as e:  # noqa: BLE001
+            print(f"[WARN] No se pudo iniciar servidor caliente de inferencia: {e}")
+
     try:
         app.run(host="127.0.0.1", port=chosen_port, debug=False)
     except Exception as e:
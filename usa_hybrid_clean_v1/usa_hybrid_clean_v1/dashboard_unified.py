@@ -167,6 +167,18 @@ def get_cached_prices(tickers):
         else:
             tickers_to_fetch.append(ticker)
     
+    # Servicio de cotizaciones compartido (si QUOTE_SERVICE_URL está configurado)
+    if tickers_to_fetch:
+        from utils.quote_client import get_prices as quote_service_prices
+        # CACHE_TTL es el refresco; la antigüedad la juzga el servicio. Con el mercado cerrado
+        # la última barra siempre es vieja y es el precio válido (no volver a bajarla con yf)
+        market_open = 'ABIERTO' in get_market_status()[0]
+        shared = quote_service_prices(tickers_to_fetch, max_age=CACHE_TTL, allow_stale=not market_open)
+        for ticker, price in shared.items():
+            PRICE_CACHE[ticker] = {'price': price, 'timestamp': now}
+            result[ticker] = price
+        tickers_to_fetch = [t for t in tickers_to_fetch if t not in shared]
+
     # Batch fetch para tickers no cacheados
     if tickers_to_fetch:
         try:
@@ -2,11 +2,21 @@
 """
 Descargar datos intraday 15m para todos los tickers del universo completo
 Basado en la mejor configuración encontrada (paper_dec_2025_ab_new)
+
+Descarga concurrente y reanudable (utils/intraday_downloader.py): solo se piden
+los rangos que faltan en data/intraday15/history y, al final, se exporta el mes
+a data/intraday_15m/<MES>_ALL_TICKERS.parquet (sin archivos semanales ni merge).
 """
 
-import subprocess
+import argparse
 import sys
-from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.append(str(Path(__file__).resolve().parent))
+from utils.intraday_downloader import backfill, make_source
+from utils.intraday_store import HistoryStore
 
 # Universo completo de 18 tickers (ver tickers_master.csv)
 ALL_TICKERS = [
@@ -18,91 +28,63 @@ ALL_TICKERS = [
 # Configuración
 MONTH = "2025-12"  # Mes a descargar
 INTERVAL = "15m"
+HISTORY_DIR = "data/intraday15/history"
+
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Descarga 15m del universo completo para un mes")
+    ap.add_argument("--month", default=MONTH, help="Mes YYYY-MM")
+    ap.add_argument("--tickers", default=",".join(ALL_TICKERS))
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--source", default=None, help="URL de servidor de fixtures (default: yfinance)")
+    ap.add_argument("--yes", action="store_true", help="No pedir confirmación")
+    return ap.parse_args()
 
-def download_week(tickers, start, end, week_num, month):
-    """Descarga datos de una semana para los tickers especificados."""
-    output_file = f"data/intraday_15m/{month}_w{week_num}_ALL.parquet"
-    
-    tickers_str = " ".join(tickers)
-    cmd = [
-        "python", "paper/intraday_data.py",
-        "--tickers", *tickers,
-        "--start", start,
-        "--end", end,
-        "--interval", INTERVAL,
-        "--out", output_file
-    ]
-    
-    print(f"\n{'='*70}")
-    print(f"📥 Descargando Semana {week_num}: {start} a {end}")
-    print(f"   Tickers: {', '.join(tickers)}")
-    print(f"   Output: {output_file}")
-    print(f"{'='*70}")
-    
-    result = subprocess.run(cmd, capture_output=True, text=True)
-    
-    if result.returncode == 0:
-        print(f"✅ Semana {week_num} completada")
-        return output_file
-    else:
-        print(f"❌ Error en semana {week_num}")
-        print(result.stderr)
-        return None
 
 def main():
+    args = parse_args()
+    tickers = [t.strip().upper() for t in args.tickers.split(",") if t.strip()]
+    start = pd.Timestamp(f"{args.month}-01")
+    end = start + pd.offsets.MonthBegin(1)
+
     print("="*70)
     print("🚀 DESCARGA DE DATOS INTRADAY 15M - UNIVERSO COMPLETO")
     print("="*70)
-    print(f"\n📊 Tickers a descargar: {len(ALL_TICKERS)}")
-    print(f"   {', '.join(ALL_TICKERS)}")
-    print(f"\n📅 Mes: {MONTH}")
+    print(f"\n📊 Tickers a descargar: {len(tickers)}")
+    print(f"   {', '.join(tickers)}")
+    print(f"\n📅 Mes: {args.month}")
     print(f"⏱️  Intervalo: {INTERVAL}")
-    
-    # Diciembre 2025 - 4 semanas
-    weeks = [
-        ("2025-12-01", "2025-12-07", 1),
-        ("2025-12-08", "2025-12-14", 2),
-        ("2025-12-15", "2025-12-21", 3),
-        ("2025-12-22", "2025-12-31", 4),
-    ]
-    
-    print(f"\n📦 Total semanas: {len(weeks)}")
-    
+
     # Confirmar
-    response = input("\n¿Continuar con la descarga? (y/n): ")
-    if response.lower() != 'y':
-        print("❌ Cancelado")
-        sys.exit(0)
-    
-    # Descargar por semanas
-    output_files = []
-    for start, end, week_num in weeks:
-        result = download_week(ALL_TICKERS, start, end, week_num, MONTH)
-        if result:
-            output_files.append(result)
-        else:
-            print(f"\n⚠️  Falló semana {week_num}, continuando...")
-    
+    if not args.yes:
+        response = input("\n¿Continuar con la descarga? (y/n): ")
+        if response.lower() != 'y':
+            print("❌ Cancelado")
+            sys.exit(0)
+
+    store = HistoryStore(HISTORY_DIR)
+    summary = backfill(tickers, start.date(), end.date(), INTERVAL, make_source(args.source), store, args.workers)
+    errors = summary[summary["status"] != "ok"]
+
     print("\n" + "="*70)
     print("📋 RESUMEN DE DESCARGA")
     print("="*70)
-    print(f"✅ Archivos creados: {len(output_files)}/{len(weeks)}")
-    
-    if output_files:
-        print("\n📁 Archivos generados:")
-        for f in output_files:
-            print(f"   - {f}")
-        
-        print("\n" + "="*70)
-        print("📌 SIGUIENTE PASO: MERGE")
-        print("="*70)
-        print("\nEjecuta este comando para combinar todas las semanas:")
-        print(f'\npython paper/merge_intraday_parquets.py \\')
-        print(f'  --input-pattern "data/intraday_15m/{MONTH}_w*_ALL.parquet" \\')
-        print(f'  --out "data/intraday_15m/{MONTH}_ALL_TICKERS.parquet" \\')
-        print(f'  --verbose')
-    else:
+    print(f"✅ Chunks descargados: {len(summary) - len(errors)}/{len(summary)} ({int(summary['rows'].sum())} filas)")
+    for _, e in errors.iterrows():
+        print(f"   ❌ {e['ticker']} {e['start']}->{e['end']}: {e['status']}")
+
+    df = store.read_bars(tickers, start.tz_localize("UTC"), end.tz_localize("UTC") - pd.Timedelta(microseconds=1))
+    if df.empty:
         print("\n❌ No se generaron archivos")
+        return
+    df = df.rename(columns={"timestamp": "datetime"})
+    df = df[["datetime", "ticker", "open", "high", "low", "close", "volume"]].sort_values(["ticker", "datetime"])
+    out = Path(f"data/intraday_15m/{args.month}_ALL_TICKERS.parquet")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    df.to_parquet(out, index=False)
+    print(f"\n📁 Archivo generado: {out} ({len(df)} filas)")
+    if len(errors):
+        print("   (reejecuta el script para reintentar solo los rangos pendientes)")
 
 if __name__ == "__main__":
     main()
@@ -18,6 +18,8 @@ from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Dict, List
 
+from utils import forecast_store
+
 # Configuración
 DEFAULT_CONFIG = {
     "n_days": 20,
@@ -56,19 +58,20 @@ def load_intraday_data(parquet_path: str, asof_date: str) -> pd.DataFrame:
     
     return df
 
-def load_forecast_data(parquet_path: str, asof_date: str) -> pd.DataFrame:
-    """Carga forecast con prob_win hasta asof_date."""
-    df = pd.read_parquet(parquet_path)
-    
-    # Detectar columna de fecha
-    date_col = None
-    for col in ['date', 'Date', 'forecast_date', 'asof_date', 'datetime']:
-        if col in df.columns:
-            date_col = col
-            break
-    
-    if date_col is None:
-        raise ValueError("No se encontró columna de fecha en forecast")
+def load_forecast_data(parquet_path: str, asof_date: str, lookback_days: int = None, tickers=None,
+                       model: str = forecast_store.DEFAULT_MODEL) -> pd.DataFrame:
+    """Carga forecast con prob_win hasta asof_date.
+
+    `parquet_path` puede ser un archivo o un forecast store; en el store solo se
+    leen las particiones de [asof_date - lookback_days, asof_date].
+    """
+    if forecast_store.is_store(parquet_path):
+        df = forecast_store.get_forecast(asof_date, tickers, model=model,
+                                         lookback_days=lookback_days or 0, root=parquet_path)
+        date_col = 'date'
+    else:
+        df = pd.read_parquet(parquet_path)
+        date_col = forecast_store.detect_date_col(df)
     
     df['date'] = pd.to_datetime(df[date_col])
     
@@ -300,7 +303,7 @@ def run_hybrid_gate(
     # Cargar datos
     print(f"\n📊 Cargando datos...")
     df_intraday = load_intraday_data(intraday_parquet, asof_date)
-    df_forecast = load_forecast_data(forecast_parquet, asof_date)
+    df_forecast = load_forecast_data(forecast_parquet, asof_date, config['signal_lookback'])
     
     print(f"   Intraday: {len(df_intraday)} barras")
     print(f"   Forecast: {len(df_forecast)} señales")
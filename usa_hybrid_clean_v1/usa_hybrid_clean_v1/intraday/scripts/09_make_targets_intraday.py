@@ -22,12 +22,18 @@ Uso:
 
 import argparse
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime, timedelta
 import pandas as pd
 import numpy as np
 import yaml
 
+# Raíz del proyecto (usa_hybrid_clean_v1) en sys.path para importar `utils`
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from utils.first_touch import HIT_LABELS, HIT_TP, HIT_SL, HIT_EOD, HIT_HORIZON, session_first_touch
+
 
 def parse_args():
     ap = argparse.ArgumentParser()
@@ -42,6 +48,8 @@ def parse_args():
     ap.add_argument("--tp-pct", type=float, default=0.012, help="Take profit % (training, conservador)")
     ap.add_argument("--sl-pct", type=float, default=0.003, help="Stop loss % (training, conservador)")
     ap.add_argument("--horizon-bars", type=int, default=10, help="Horizon en barras (2-3 horas)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Tickers procesados en paralelo")
+    ap.add_argument("--sweep", default="", help="Pares TP:SL extra a evaluar en una pasada, p.ej. 0.012:0.003,0.015:0.004")
     return ap.parse_args()
 
 
@@ -240,94 +248,49 @@ def calculate_targets(df, tp_pct, sl_pct, horizon_bars=None):
         col_name = f'ret_{minutes}m'
         targets[col_name] = (targets['close'].shift(-bars) / targets['close'] - 1)
     
-    # TP/SL hit detection
-    entry_price = targets['close']
-    
-    # Para LONG: TP arriba, SL abajo
-    tp_price_long = entry_price * (1 + tp_pct)
-    sl_price_long = entry_price * (1 - sl_pct)
-    
-    # Para SHORT: TP abajo, SL arriba (invertido)
-    tp_price_short = entry_price * (1 - tp_pct)
-    sl_price_short = entry_price * (1 + sl_pct)
-    
-    # Inicializar columnas
-    targets['win'] = 0
-    targets['tte_bars'] = np.nan
-    targets['hit_type'] = 'NONE'
-    
-    # Para cada fila, buscar hacia adelante hasta EOD o hit
-    for idx in range(len(targets)):
-        if idx >= len(targets) - 1:
-            continue
-        
-        entry = entry_price.iloc[idx]
-        direction = targets['direction'].iloc[idx]
-        current_date = targets['timestamp'].iloc[idx].date()
-        
-        # Seleccionar TP/SL según dirección
-        if direction == 'LONG':
-            tp = tp_price_long.iloc[idx]
-            sl = sl_price_long.iloc[idx]
-        else:  # SHORT
-            tp = tp_price_short.iloc[idx]
-            sl = sl_price_short.iloc[idx]
-        
-        # Buscar hacia adelante en el mismo día (con límite de horizon_bars si aplica)
-        future_idx = idx + 1
-        bars_to_hit = 0
-        hit = 'NONE'
-        
-        while future_idx < len(targets):
-            future_row = targets.iloc[future_idx]
-            
-            # Si cambió de día, break
-            if future_row['timestamp'].date() != current_date:
-                hit = 'EOD'
-                break
-            
-            bars_to_hit += 1
-            
-            # Si alcanzamos el horizon, break (training conservador)
-            if horizon_bars is not None and bars_to_hit > horizon_bars:
-                hit = 'HORIZON'
-                break
-            high = future_row['high']
-            low = future_row['low']
-            
-            # Check TP/SL según dirección
-            if direction == 'LONG':
-                # LONG: TP arriba, SL abajo
-                if high >= tp:
-                    hit = 'TP'
-                    break
-                if low <= sl:
-                    hit = 'SL'
-                    break
-            else:  # SHORT
-                # SHORT: TP abajo, SL arriba (invertido)
-                if low <= tp:
-                    hit = 'TP'
-                    break
-                if high >= sl:
-                    hit = 'SL'
-                    break
-            
-            future_idx += 1
-            
-            # Límite de búsqueda (26 barras = 1 día de trading)
-            if bars_to_hit > 26:
-                hit = 'EOD'
-                break
-        
-        # Asignar resultados
-        targets.at[idx, 'hit_type'] = hit
-        targets.at[idx, 'tte_bars'] = bars_to_hit if hit != 'NONE' else np.nan
-        targets.at[idx, 'win'] = 1 if hit == 'TP' else 0
+    # TP/SL hit detection (motor vectorizado de primer toque, utils/first_touch.py)
+    hit, tte = _first_touch(targets, tp_pct, sl_pct, horizon_bars)
+    targets['win'] = (hit[:, 0] == HIT_TP).astype(int)
+    targets['tte_bars'] = tte[:, 0]
+    targets['hit_type'] = HIT_LABELS[hit[:, 0]]
     
     return targets
 
 
+def _first_touch(df, tp_pct, sl_pct, horizon_bars=None):
+    """Primer toque para cada barra de df (ordenado por ticker, timestamp) y cada par tp/sl."""
+    ts = df['timestamp']
+    day = ts.dt.normalize().to_numpy() if ts.dt.tz is None else ts.dt.tz_localize(None).dt.normalize().to_numpy()
+    group = pd.factorize(df['ticker'])[0] if 'ticker' in df.columns else None
+    return session_first_touch(
+        df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy(),
+        (df['direction'] == 'LONG').to_numpy(), tp_pct, sl_pct, day, group=group,
+        horizon_bars=horizon_bars,
+    )
+
+
+def sweep_targets(df, pairs, horizon_bars=None, mask=None):
+    """
+    Evalúa varios pares (tp_pct, sl_pct) en una sola pasada sobre todos los tickers.
+    df contiguo por ticker y ordenado por timestamp; mask: filas a resumir (p.ej. sin warmup).
+    """
+    tp, sl = np.array(pairs, dtype=float).T
+    hit, tte = _first_touch(df, tp, sl, horizon_bars)
+    if mask is not None:
+        hit, tte = hit[mask], tte[mask]
+    rows = []
+    for p in range(len(tp)):
+        h = hit[:, p]
+        rows.append({
+            'tp_pct': tp[p], 'sl_pct': sl[p], 'n': len(h),
+            'win_rate': float((h == HIT_TP).mean()) if len(h) else np.nan,
+            'tp_hits': int((h == HIT_TP).sum()), 'sl_hits': int((h == HIT_SL).sum()),
+            'eod': int((h == HIT_EOD).sum()), 'horizon': int((h == HIT_HORIZON).sum()),
+            'tte_mean': float(np.nanmean(tte[:, p])) if np.isfinite(tte[:, p]).any() else np.nan,
+        })
+    return pd.DataFrame(rows)
+
+
 def process_ticker(ticker_df, tp_pct, sl_pct, horizon_bars=None):
     """Procesar un ticker completo."""
     # Ordenar por timestamp
@@ -359,6 +322,8 @@ def main():
     
     print(f"[targets_intraday] TRAINING params: TP={tp_pct:.3%}, SL={sl_pct:.3%}, Horizon={horizon_bars} bars")
     
+    pairs = [tuple(float(x) for x in p.split(':')) for p in args.sweep.split(',') if p.strip()]
+    
     # Obtener fechas
     dates = get_date_range(args)
     print(f"[targets_intraday] Procesando {len(dates)} fechas")
@@ -373,26 +338,29 @@ def main():
         if df is None or df.empty:
             continue
         
-        # Procesar por ticker
+        # Procesar por ticker (en paralelo)
         results = []
         tickers = df['ticker'].unique()
-        for ticker in tickers:
-            ticker_df = df[df['ticker'] == ticker].copy()
-            try:
-                processed = process_ticker(ticker_df, tp_pct, sl_pct, horizon_bars)
-                results.append(processed)
-                print(f"[targets_intraday]   {ticker}: {len(processed)} barras, {processed['win'].sum()} wins")
-            except Exception as e:
-                print(f"[targets_intraday]   ERROR {ticker}: {e}")
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as ex:
+            futs = {t: ex.submit(process_ticker, df[df['ticker'] == t].copy(), tp_pct, sl_pct, horizon_bars)
+                    for t in tickers}
+            for ticker, fut in futs.items():
+                try:
+                    processed = fut.result()
+                    results.append(processed)
+                    print(f"[targets_intraday]   {ticker}: {len(processed)} barras, {processed['win'].sum()} wins")
+                except Exception as e:
+                    print(f"[targets_intraday]   ERROR {ticker}: {e}")
         
         if not results:
             continue
         
         # Combinar y guardar
-        combined = pd.concat(results, ignore_index=True)
+        full = pd.concat(results, ignore_index=True)
         
         # Remover filas con NaN en features clave (warmup)
-        combined = combined.dropna(subset=['RSI_14', 'EMA_20', 'MACD', 'ATR_14'])
+        keep = full[['RSI_14', 'EMA_20', 'MACD', 'ATR_14']].notna().all(axis=1)
+        combined = full[keep]
         
         # Guardar
         out_dir = Path(args.out_dir)
@@ -405,6 +373,12 @@ def main():
         print(f"[targets_intraday]   TP hits: {(combined['hit_type']=='TP').sum()}")
         print(f"[targets_intraday]   SL hits: {(combined['hit_type']=='SL').sum()}")
         print(f"[targets_intraday]   EOD: {(combined['hit_type']=='EOD').sum()}")
+        
+        if pairs:
+            sweep = sweep_targets(full, pairs, horizon_bars, mask=keep.to_numpy())
+            sweep_file = out_dir / f"{date_str}_sweep.csv"
+            sweep.to_csv(sweep_file, index=False)
+            print(f"[targets_intraday]   Sweep {len(pairs)} pares TP/SL → {sweep_file}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,194 @@
+# =============================================
+# 11b_infer_worker_intraday.py
+# =============================================
+"""
+Worker de inferencia intraday residente durante la sesión.
+
+A diferencia de 11_infer_and_gate_intraday.py (una corrida por invocación que
+relee el parquet de features del día y recarga modelo/scaler), este proceso:
+- carga modelo, scaler, feature_cols y config una sola vez;
+- tras el cierre de cada barra (15m) lee solo los archivos de data/intraday/<fecha>
+  que cambiaron y toma las barras cerradas nuevas;
+- calcula features incrementalmente (utils/intraday_features.py), puntúa y aplica
+  el gate vectorizado;
+- publica dentro de --latency-budget segundos desde el cierre de la barra: los
+  tickers cuya barra no llegó a tiempo se puntúan en el ciclo siguiente.
+
+Salidas en reports/intraday/<fecha>/:
+- forecast_intraday.parquet   candidatos acumulados del día (mismo formato que 11)
+- forecast_latest.parquet     candidatos de la última barra
+- worker_latency.csv          latencia cierre→publicación por barra
+
+Uso:
+  python intraday/scripts/11b_infer_worker_intraday.py --date 2025-11-03
+  python intraday/scripts/11b_infer_worker_intraday.py --date 2025-11-03 --replay
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+import pandas as pd
+
+# Raíz del proyecto (usa_hybrid_clean_v1) en sys.path para importar `utils`
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from utils.intraday_inference import IntradayInferenceWorker
+
+
+def parse_args():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--date", default=pd.Timestamp.now(tz="America/New_York").strftime("%Y-%m-%d"), help="Fecha YYYY-MM-DD")
+    ap.add_argument("--interval", default="15m", help="Intervalo de velas")
+    ap.add_argument("--intraday-dir", default="data/intraday", help="Directorio de barras (<fecha>/<ticker>.parquet)")
+    ap.add_argument("--model", default="models/clf_intraday_brf_calibrated.joblib", help="Modelo de clasificación")
+    ap.add_argument("--scaler", default="", help="Scaler (opcional, si el modelo no incluye preprocesamiento)")
+    ap.add_argument("--out-dir", default="reports/intraday", help="Directorio de salida")
+    ap.add_argument("--config", default="config/intraday.yaml", help="Archivo de configuración")
+    ap.add_argument("--prob-min", type=float, default=0.55, help="Probabilidad mínima")
+    ap.add_argument("--tz", default="America/New_York", help="Zona horaria del mercado")
+    ap.add_argument("--session-end", default="16:00", help="Hora de cierre (HH:MM, tz del mercado)")
+    ap.add_argument("--latency-budget", type=float, default=60.0, help="Segundos desde el cierre de barra hasta publicar")
+    ap.add_argument("--settle", type=float, default=5.0, help="Espera tras el cierre antes del primer sondeo (s)")
+    ap.add_argument("--poll", type=float, default=2.0, help="Intervalo de sondeo de archivos (s)")
+    ap.add_argument("--replay", action="store_true", help="Procesar las barras ya descargadas barra por barra, sin esperar")
+    return ap.parse_args()
+
+
+def load_config(config_path):
+    """Cargar configuración."""
+    import yaml
+    if os.path.exists(config_path):
+        with open(config_path) as f:
+            return yaml.safe_load(f) or {}
+    return {}
+
+
+class BarFeed:
+    """
+    Barras del día desde data/intraday/<fecha>/*.parquet. Solo se releen los archivos
+    modificados; poll() devuelve todas las barras conocidas (el estado de features
+    descarta las ya procesadas), así una vela excluida por abierta entra en el ciclo siguiente.
+    """
+
+    def __init__(self, date_dir):
+        self.date_dir = Path(date_dir)
+        self.mtimes = {}
+        self.frames = {}
+
+    def poll(self) -> pd.DataFrame:
+        for f in sorted(self.date_dir.glob("*.parquet")) if self.date_dir.exists() else []:
+            mtime = f.stat().st_mtime
+            if self.mtimes.get(f) == mtime:
+                continue
+            try:
+                df = pd.read_parquet(f)
+            except Exception as e:
+                print(f"[infer_worker] ERROR leyendo {f}: {e}")
+                continue
+            self.mtimes[f] = mtime
+            self.frames[f] = df
+        frames = [df for df in self.frames.values() if not df.empty]
+        if not frames:
+            return pd.DataFrame()
+        bars = pd.concat(frames, ignore_index=True)
+        bars['timestamp'] = pd.to_datetime(bars['timestamp'])
+        return bars
+
+
+def closed_bars(bars, cutoff, step):
+    """Barras cuyo cierre (timestamp + intervalo) es <= cutoff (excluye la vela en curso)."""
+    if bars.empty:
+        return bars
+    ts = bars['timestamp']
+    if ts.dt.tz is None:
+        cutoff = cutoff.tz_localize(None)
+    return bars[ts + step <= cutoff]
+
+
+def publish(worker, scored, candidates, out_dir, bar_close, latency, proc_sec):
+    def write(df, name):
+        tmp = out_dir / f".{name}.tmp"
+        df.to_parquet(tmp, index=False)
+        tmp.replace(out_dir / name)  # los lectores nunca ven un archivo a medio escribir
+
+    write(worker.forecast(), "forecast_intraday.parquet")
+    write(candidates, "forecast_latest.parquet")
+    log = out_dir / "worker_latency.csv"
+    row = pd.DataFrame([{'bar_close': bar_close, 'scored': len(scored), 'candidates': len(candidates),
+                         'proc_sec': round(proc_sec, 4), 'latency_sec': round(latency, 3)}])
+    row.to_csv(log, mode='a', header=not log.exists(), index=False)
+
+
+def run_replay(worker, feed, out_dir, step):
+    """Modo replay/backfill: entrega las barras existentes en orden de cierre, una barra a la vez."""
+    bars = feed.poll()
+    if bars.empty:
+        print("[infer_worker] ERROR: No hay barras para reproducir")
+        return
+    for ts, batch in bars.groupby('timestamp', sort=True):
+        t0 = time.perf_counter()
+        scored, candidates = worker.process(batch)
+        proc = time.perf_counter() - t0
+        publish(worker, scored, candidates, out_dir, ts + step, proc, proc)
+    print(f"[infer_worker] Replay: {bars['timestamp'].nunique()} barras, {len(worker.forecast())} candidatos")
+
+
+def run_live(worker, feed, out_dir, step, args):
+    tz = args.tz
+    session_end = pd.Timestamp(f"{args.date} {args.session_end}", tz=tz)
+    proc_est = 0.0
+    while True:
+        now = pd.Timestamp.now(tz=tz)
+        bar_close = now.ceil(step)
+        if bar_close > session_end + step:
+            print("[infer_worker] Fin de sesión")
+            return
+        time.sleep(max(0.0, (bar_close - now).total_seconds() + args.settle))
+
+        # Sondear hasta tener la barra de todos los tickers conocidos o agotar el presupuesto
+        # (reservando el tiempo estimado de procesamiento)
+        deadline = bar_close + pd.Timedelta(seconds=args.latency_budget - proc_est)
+        expected = bar_close - step
+        while True:
+            got = closed_bars(feed.poll(), bar_close, step)
+            have = set(got.loc[got['timestamp'] >= expected, 'ticker']) if len(got) else set()
+            known = set(worker.features.slot) | (set(got['ticker']) if len(got) else set())
+            if (known and known <= have) or pd.Timestamp.now(tz=tz) >= deadline:
+                break
+            time.sleep(args.poll)
+
+        t0 = time.perf_counter()
+        scored, candidates = worker.process(got)
+        proc = time.perf_counter() - t0
+        proc_est = max(proc, 0.8 * proc_est + 0.2 * proc)
+        latency = (pd.Timestamp.now(tz=tz) - bar_close).total_seconds()
+        publish(worker, scored, candidates, out_dir, bar_close, latency, proc)
+        late = len(known - have)
+        flag = "  ⚠ fuera de presupuesto" if latency > args.latency_budget else ""
+        print(f"[infer_worker] {bar_close:%H:%M} scored={len(scored)} candidatos={len(candidates)} "
+              f"tarde={late} proc={proc:.3f}s latencia={latency:.1f}s{flag}")
+
+
+def main():
+    args = parse_args()
+    config = load_config(args.config)
+    prob_min = args.prob_min if args.prob_min else config.get('filters', {}).get('prob_win_min', 0.55)
+
+    out_dir = Path(args.out_dir) / args.date
+    out_dir.mkdir(parents=True, exist_ok=True)
+    step = pd.Timedelta(args.interval.replace('m', 'min'))
+
+    # Modelo, scaler, features y config residentes durante toda la sesión
+    worker = IntradayInferenceWorker.from_paths(args.model, args.scaler, config, prob_min)
+    print(f"[infer_worker] Features: {len(worker.feature_cols)} | presupuesto de latencia: {args.latency_budget:.0f}s")
+    feed = BarFeed(Path(args.intraday_dir) / args.date)
+
+    if args.replay:
+        run_replay(worker, feed, out_dir, step)
+    else:
+        run_live(worker, feed, out_dir, step, args)
+
+
+if __name__ == "__main__":
+    main()
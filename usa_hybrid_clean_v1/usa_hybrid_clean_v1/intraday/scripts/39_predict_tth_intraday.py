@@ -16,6 +16,7 @@ Uso:
 
 import argparse
 import os
+import sys
 from pathlib import Path
 import pandas as pd
 import numpy as np
@@ -23,6 +24,11 @@ import joblib
 import yaml
 from scipy import stats
 
+# Raíz del proyecto (usa_hybrid_clean_v1) en sys.path para importar `utils`
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from utils.inference_bundle import load_bundle
+from utils.tth_montecarlo import simulate_first_passage
+
 
 def parse_args():
     ap = argparse.ArgumentParser()
@@ -33,6 +39,7 @@ def parse_args():
     ap.add_argument("--calibration", default="data/trading/tth_calibration_intraday.json", help="Archivo de calibración")
     ap.add_argument("--steps-per-day", type=int, default=26, help="Steps por día (26 para 15m)")
     ap.add_argument("--sims", type=int, default=500, help="Simulaciones Monte Carlo")
+    ap.add_argument("--bridge", action="store_true", help="Corrección de puente browniano (permite menos steps por día)")
     ap.add_argument("--use-hazard", action="store_true", help="Usar hazard discreto")
     ap.add_argument("--use-mc", action="store_true", default=True, help="Usar Monte Carlo (default)")
     return ap.parse_args()
@@ -83,30 +90,33 @@ def load_forecast(date_str, forecast_dir):
     return df
 
 
+HAZARD_FILES = {
+    'hazard': "tth_hazard_intraday.joblib",
+    'hazard_scaler': "tth_hazard_scaler_intraday.joblib",
+}
+MC_FILES = {
+    'mc_mu': "tth_mc_mu_intraday.joblib",
+    'mc_sigma': "tth_mc_sigma_intraday.joblib",
+    'mc_scaler': "tth_mc_scaler_intraday.joblib",
+}
+
+
 def load_models(models_dir, use_hazard, use_mc):
-    """Cargar modelos TTH."""
+    """Cargar modelos TTH (bundle versionado, memoizado en proceso)."""
     models = {}
     
     if use_hazard:
-        hazard_path = Path(models_dir) / "tth_hazard_intraday.joblib"
-        scaler_path = Path(models_dir) / "tth_hazard_scaler_intraday.joblib"
-        
-        if hazard_path.exists() and scaler_path.exists():
-            models['hazard'] = joblib.load(hazard_path)
-            models['hazard_scaler'] = joblib.load(scaler_path)
+        paths = {k: Path(models_dir) / f for k, f in HAZARD_FILES.items()}
+        if all(p.exists() for p in paths.values()):
+            models.update(load_bundle("tth_hazard_intraday", paths, out_dir=Path(models_dir) / "bundles").components)
             print("[tth_intraday] Hazard cargado")
         else:
             print("[tth_intraday] WARN: Modelos hazard no encontrados")
     
     if use_mc:
-        mu_path = Path(models_dir) / "tth_mc_mu_intraday.joblib"
-        sigma_path = Path(models_dir) / "tth_mc_sigma_intraday.joblib"
-        scaler_path = Path(models_dir) / "tth_mc_scaler_intraday.joblib"
-        
-        if mu_path.exists() and sigma_path.exists() and scaler_path.exists():
-            models['mc_mu'] = joblib.load(mu_path)
-            models['mc_sigma'] = joblib.load(sigma_path)
-            models['mc_scaler'] = joblib.load(scaler_path)
+        paths = {k: Path(models_dir) / f for k, f in MC_FILES.items()}
+        if all(p.exists() for p in paths.values()):
+            models.update(load_bundle("tth_mc_intraday", paths, out_dir=Path(models_dir) / "bundles").components)
             print("[tth_intraday] MC regressors cargados")
         else:
             print("[tth_intraday] WARN: Modelos MC no encontrados")
@@ -129,11 +139,12 @@ def get_feature_columns():
     ]
 
 
-def simulate_monte_carlo_tth(df, models, feature_cols, tp_pct, sl_pct, steps_per_day, n_sims, calibration):
+def simulate_monte_carlo_tth(df, models, feature_cols, tp_pct, sl_pct, steps_per_day, n_sims, calibration,
+                             bridge=False):
     """
-    Simular TTH con Monte Carlo GBM.
+    Simular TTH con Monte Carlo GBM (utils/tth_montecarlo, todas las señales en lote).
     
-    Para intraday: steps_per_day=26 (15m intervals)
+    Para intraday: steps_per_day=26 (15m intervals), horizonte de 1 día
     """
     if 'mc_mu' not in models or 'mc_sigma' not in models:
         print("[tth_intraday] ERROR: Modelos MC no disponibles")
@@ -173,65 +184,29 @@ def simulate_monte_carlo_tth(df, models, feature_cols, tp_pct, sl_pct, steps_per
     tp_pct_cal = tp_pct * scale_tp
     sl_pct_cal = sl_pct * scale_sl
     
-    # Simular
-    results = []
-    for idx, row in df_pred.iterrows():
-        S0 = row['close']
-        mu = mu_pred[idx - df_pred.index[0]]
-        sigma = sigma_pred[idx - df_pred.index[0]]
-        
-        tp_price = S0 * (1 + tp_pct_cal)
-        sl_price = S0 * (1 - sl_pct_cal)
-        
-        # MC simulation
-        dt = 1.0 / steps_per_day  # Fracción de día por step
-        max_steps = steps_per_day  # 1 día máximo
-        
-        tp_hits = 0
-        sl_hits = 0
-        tte_tp_sum = 0
-        tte_sl_sum = 0
-        
-        for _ in range(n_sims):
-            S = S0
-            for step in range(max_steps):
-                # GBM
-                dW = np.random.normal(0, np.sqrt(dt))
-                S = S * np.exp((mu - 0.5 * sigma**2) * dt + sigma * dW)
-                
-                # Check hits
-                if S >= tp_price:
-                    tp_hits += 1
-                    tte_tp_sum += (step + 1) * dt
-                    break
-                if S <= sl_price:
-                    sl_hits += 1
-                    tte_sl_sum += (step + 1) * dt
-                    break
-        
-        # Métricas
-        p_tp = tp_hits / n_sims
-        p_sl = sl_hits / n_sims
-        p_tp_before_sl = p_tp / (p_tp + p_sl + 1e-10)
-        
-        etth_tp = (tte_tp_sum / tp_hits) if tp_hits > 0 else 1.0
-        etth_sl = (tte_sl_sum / sl_hits) if sl_hits > 0 else 1.0
-        etth = p_tp * etth_tp + p_sl * etth_sl
-        
-        rec = {
-            'ticker': row['ticker'],
-            'ETTH': etth,
-            'p_tp_before_sl': p_tp_before_sl,
-            'p_tp': p_tp,
-            'p_sl': p_sl,
-            'mu_pred': mu,
-            'sigma_pred': sigma
-        }
-        if 'timestamp' in row:
-            rec['timestamp'] = row['timestamp']
-        results.append(rec)
-    
-    df_tth = pd.DataFrame(results)
+    # Simular (1 día máximo)
+    sim = simulate_first_passage(
+        tp_pct=tp_pct_cal, sl_pct=sl_pct_cal, mu=mu_pred, sigma=sigma_pred,
+        n_steps=steps_per_day, dt=1.0 / steps_per_day, n_sims=n_sims, bridge=bridge,
+    )
+    
+    # Métricas
+    p_tp = sim['p_tp'].to_numpy()
+    p_sl = sim['p_sl'].to_numpy()
+    etth_tp = sim['etth_tp'].fillna(1.0).to_numpy()
+    etth_sl = sim['etth_sl'].fillna(1.0).to_numpy()
+    
+    df_tth = pd.DataFrame({
+        'ticker': df_pred['ticker'].to_numpy(),
+        'ETTH': p_tp * etth_tp + p_sl * etth_sl,
+        'p_tp_before_sl': p_tp / (p_tp + p_sl + 1e-10),
+        'p_tp': p_tp,
+        'p_sl': p_sl,
+        'mu_pred': mu_pred,
+        'sigma_pred': sigma_pred,
+    })
+    if 'timestamp' in df_pred.columns:
+        df_tth['timestamp'] = df_pred['timestamp'].to_numpy()
     
     # Limpiar columnas TTH existentes si las hay (para permitir re-ejecución)
     tth_cols = ['ETTH', 'p_tp_before_sl', 'p_tp', 'p_sl', 'mu_pred', 'sigma_pred']
@@ -288,7 +263,7 @@ def main():
             df, models, feature_cols, 
             tp_pct, sl_pct, 
             args.steps_per_day, args.sims,
-            calibration
+            calibration, bridge=args.bridge
         )
     
     # Guardar
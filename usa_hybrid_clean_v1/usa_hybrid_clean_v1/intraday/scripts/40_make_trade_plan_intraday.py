@@ -18,6 +18,9 @@ Guardrails:
 - max_per_ticker = 1
 - max_sector_share = 60%
 
+Selección (utils/plan_selection.py): greedy sobre el ranking, o --selection knapsack
+para maximizar E[PnL] en USD bajo los mismos guardrails.
+
 Ranking: E[PnL] / ETTH
 
 Uso:
@@ -31,8 +34,13 @@ from datetime import datetime
 import pandas as pd
 import numpy as np
 import json
+import sys
 import yaml
 
+# Raíz del proyecto (usa_hybrid_clean_v1) en sys.path para importar `utils`
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from utils.plan_selection import greedy_select, knapsack_select
+
 
 def parse_args():
     ap = argparse.ArgumentParser()
@@ -47,6 +55,8 @@ def parse_args():
     ap.add_argument("--p-tp-sl-min", type=float, help="P(TP≺SL) mínima")
     ap.add_argument("--etth-max", type=float, help="ETTH máximo en días")
     ap.add_argument("--capital-max", type=float, help="Capital total máximo")
+    ap.add_argument("--selection", choices=["greedy", "knapsack"],
+                    help="Selección: greedy por ranking (default) o knapsack por E[PnL] en USD (config plan.selection)")
     # Flags para ensure-one (fallback controlado)
     ap.add_argument("--ensure-one", action="store_true",
                     help="Si no hay trades tras filtros, forzar 1 trade en modo fallback.")
@@ -194,56 +204,22 @@ def apply_guardrails(df, config, args, df_fallback=None):
     if 'sector' not in df.columns:
         df['sector'] = 'Unknown'
     
-    # Selección con guardrails
-    selected = []
-    ticker_count = {}
-    sector_capital = {}
-    total_capital = 0.0
-
-    for idx, row in df.iterrows():
-        # Check max_open
-        if len(selected) >= max_open:
-            print(f"  Límite max_open alcanzado: {len(selected)}")
-            break
-
-        price = float(row.get('close', np.nan))
-        if not np.isfinite(price) or price <= 0:
-            continue
-
-        # Capital restante y sizing por trade
-        cash_left = max(capital_max - total_capital, 0.0)
-        if cash_left < 1e-6:
-            print(f"  Límite de capital alcanzado: ${total_capital:.2f}")
-            break
-
-        cash_for_trade = min(per_trade_cash, cash_left)
+    # Selección con guardrails (vectorizada: a lo sumo max_open pasos sobre el ranking)
+    mode = getattr(args, 'selection', None) or config.get('plan', {}).get('selection', 'greedy')
+    price = df['close'] if 'close' in df.columns else pd.Series(np.nan, index=df.index)
+    if mode == 'knapsack':
+        value = df['exp_pnl_pct'] if 'exp_pnl_pct' in df.columns else pd.Series(np.nan, index=df.index)
+        pos, exposures = knapsack_select(price, df['ticker'], df['sector'], value, per_trade_cash,
+                                         capital_max, max_open, max_per_ticker, max_sector_share)
+        print(f"  Modo knapsack: E[PnL] esperado ${float((value.iloc[pos] * exposures).sum()):.2f}")
+    else:
+        pos, exposures = greedy_select(price, df['ticker'], df['sector'], per_trade_cash,
+                                       capital_max, max_open, max_per_ticker, max_sector_share)
+    df_selected = df.iloc[pos]
+    total_capital = float(exposures.sum())
 
-        # Check max_per_ticker y max_sector_share usando cash_for_trade estimado
-        ticker = row['ticker']
-        sector = row.get('sector', 'Unknown')
-        if ticker_count.get(ticker, 0) >= max_per_ticker:
-            continue
-        if sector_capital.get(sector, 0.0) + cash_for_trade > capital_max * max_sector_share:
-            continue
-
-        # Calcular qty (solo cantidades enteras)
-        qty = int(cash_for_trade // price)
-        if qty < 1:
-            # Política: saltar si no alcanza 1 acción con per_trade_cash
-            continue
-
-        exposure = qty * price
-        if exposure < 1e-6:
-            continue
-
-        # Aprobar y actualizar contadores con exposure real
-        selected.append(row)
-        ticker_count[ticker] = ticker_count.get(ticker, 0) + 1
-        sector_capital[sector] = sector_capital.get(sector, 0.0) + exposure
-        total_capital += exposure
-    
     # === FALLBACK: Ensure-One (si plan vacío y flag activado) ===
-    if getattr(args, 'ensure_one', False) and len(selected) == 0:
+    if getattr(args, 'ensure_one', False) and len(df_selected) == 0:
         print("\n[plan_intraday] FALLBACK: Activando ensure-one (plan vacío)")
         # Usar df_fallback si está disponible (señales filtradas pre-ranking), sino df ranked
         fb = df_fallback.copy() if df_fallback is not None and not df_fallback.empty else df.copy()
@@ -278,49 +254,40 @@ def apply_guardrails(df, config, args, df_fallback=None):
             # Ordenar por eficiencia
             fb_sorted = fb.sort_values('rank_score', ascending=False)
             
-            # Iterar sobre candidatos hasta encontrar uno con exposure válido
-            found = False
-            for idx, row in fb_sorted.iterrows():
-                price = float(row.get('close', row.get('entry_price', np.nan)))
-                
-                if not np.isfinite(price) or price <= 0:
-                    continue
-                
-                cash_left = max(capital_max - total_capital, 0.0)
-                if cash_left < 1.0:
-                    print(f"  [fallback] Sin capital disponible (${cash_left:.2f})")
-                    break
-                
-                # Objetivo de exposure: máximo $650 (sin mínimo)
-                target_max = getattr(args, 'ensure_exposure_max', 650.0)
-
-                # Solo cantidades enteras (sin fracciones)
-                # Calcular qty máximo que cabe en target_max y cash_left
-                qty_max_by_target = int(target_max // price)
-                qty_max_by_cash = int(cash_left // price)
-                qty = min(max(1, qty_max_by_target), qty_max_by_cash)
-                exposure = qty * price
-
-                # Verificar límites de exposure
-                if qty >= 1 and exposure <= target_max and exposure <= cash_left:
-                    row['qty'] = qty
-                    row['exposure'] = exposure
-                    selected.append(row)
-                    total_capital += exposure
-                    print(f"  ✅ Fallback: {row['ticker']} {row.get('direction', 'LONG')} @ ${price:.2f}, qty={qty}, exposure=${exposure:.2f}")
-                    found = True
-                    break  # Encontrado trade válido, salir del loop
-                else:
-                    print(f"  [fallback] {row['ticker']}: exposure ${exposure:.2f} excede máximo ${target_max:.2f} o cash disponible, probando siguiente...")
-                    continue  # Probar siguiente candidato
-
-            if not found:
+            # Primer candidato (en orden de eficiencia) con exposure válido
+            col = 'close' if 'close' in fb_sorted.columns else 'entry_price'
+            prices = fb_sorted[col].to_numpy(float) if col in fb_sorted.columns else np.full(len(fb_sorted), np.nan)
+            valid = np.isfinite(prices) & (prices > 0)
+            prices = np.where(valid, prices, 1.0)
+            cash_left = max(capital_max - total_capital, 0.0)
+            # Objetivo de exposure: máximo $650 (sin mínimo)
+            target_max = getattr(args, 'ensure_exposure_max', 650.0)
+
+            # Solo cantidades enteras (sin fracciones): qty máximo que cabe en target_max y cash_left
+            qty = np.minimum(np.maximum(1, np.floor_divide(target_max, prices)), np.floor_divide(cash_left, prices))
+            exposure = qty * prices
+            ok = valid & (qty >= 1) & (exposure <= target_max) & (exposure <= cash_left)
+
+            if valid.any() and cash_left < 1.0:
+                print(f"  [fallback] Sin capital disponible (${cash_left:.2f})")
+                ok[:] = False
+            if ok.any():
+                j = int(np.argmax(ok))
+                n_skip = int(valid[:j].sum())
+                if n_skip:
+                    print(f"  [fallback] {n_skip} candidatos con exposure > máximo ${target_max:.2f} o cash disponible, descartados")
+                df_selected = fb_sorted.iloc[[j]].copy()
+                df_selected['qty'] = int(qty[j])
+                df_selected['exposure'] = exposure[j]
+                total_capital += exposure[j]
+                row = df_selected.iloc[0]
+                print(f"  ✅ Fallback: {row['ticker']} {row.get('direction', 'LONG')} @ ${prices[j]:.2f}, qty={int(qty[j])}, exposure=${exposure[j]:.2f}")
+            else:
                 print("  [fallback] Sin candidatos válidos con E[PnL]>0")
     
-    if not selected:
+    if df_selected.empty:
         return pd.DataFrame(columns=df.columns)
     
-    df_selected = pd.DataFrame(selected)
     print(f"  Seleccionados: {len(df_selected)} trades")
     print(f"  Capital usado: ${total_capital:.2f} / ${capital_max}")
     
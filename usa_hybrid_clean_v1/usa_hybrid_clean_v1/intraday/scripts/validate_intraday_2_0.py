@@ -1,9 +1,13 @@
 """
 Validate Intraday 2.0 trade (Oct 28 NVDA)
 """
+import sys
 import pandas as pd
 from pathlib import Path
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from utils.first_touch import HIT_NONE, HIT_SL, HIT_TP, simulate_exits
+
 # Load plan
 plan = pd.read_csv("reports/intraday/2025-10-28/trade_plan_intraday.csv")
 
@@ -53,33 +57,30 @@ for idx, trade in plan.iterrows():
     
     print(f"📊 Bars after entry: {len(data_after_entry)}")
     
-    # Check for TP/SL hits
-    hit_found = False
-    for bar_idx, (bar_time, bar) in enumerate(data_after_entry.iterrows(), 1):
-        high = bar['High']
-        low = bar['Low']
-        
-        if direction == 'LONG':
-            if high >= tp_price:
-                pnl_pct = (tp_price - entry_price) / entry_price
-                pnl_usd = pnl_pct * exposure
-                print(f"\n✅ TP HIT @ bar {bar_idx} ({bar_time})")
-                print(f"   High: ${high:.2f} >= TP ${tp_price:.2f}")
-                print(f"   PnL: {pnl_pct*100:+.2f}% (${pnl_usd:+.2f})")
-                print(f"   Tiempo: {bar_idx * 15} minutos ({bar_idx * 15 / 60:.1f}h)")
-                hit_found = True
-                break
-            elif low <= sl_price:
-                pnl_pct = (sl_price - entry_price) / entry_price
-                pnl_usd = pnl_pct * exposure
-                print(f"\n❌ SL HIT @ bar {bar_idx} ({bar_time})")
-                print(f"   Low: ${low:.2f} <= SL ${sl_price:.2f}")
-                print(f"   PnL: {pnl_pct*100:+.2f}% (${pnl_usd:+.2f})")
-                print(f"   Tiempo: {bar_idx * 15} minutos ({bar_idx * 15 / 60:.1f}h)")
-                hit_found = True
-                break
+    # Check for TP/SL hits (kernel compartido; TP gana si ambos se tocan en la misma barra).
+    # Como antes, solo se evalúan TP/SL de trades LONG; un SHORT cierra a EOD.
+    reason, bar_idx = HIT_NONE, 0
+    if direction == 'LONG':
+        res = simulate_exits(data_after_entry['Open'], data_after_entry['High'], data_after_entry['Low'],
+                             data_after_entry['Close'], [0], [len(data_after_entry)], True,
+                             tp_price, sl_price, entry=entry_price, tie="tp_first")
+        reason, bar_idx = res['reason'][0], int(res['exit_bar'][0]) + 1
+    hit_found = reason in (HIT_TP, HIT_SL)
     
-    if not hit_found:
+    if hit_found:
+        bar_time = data_after_entry.index[bar_idx - 1]
+        level = tp_price if reason == HIT_TP else sl_price
+        pnl_pct = (level - entry_price) / entry_price
+        pnl_usd = pnl_pct * exposure
+        if reason == HIT_TP:
+            print(f"\n✅ TP HIT @ bar {bar_idx} ({bar_time})")
+            print(f"   High: ${data_after_entry['High'].iloc[bar_idx - 1]:.2f} >= TP ${tp_price:.2f}")
+        else:
+            print(f"\n❌ SL HIT @ bar {bar_idx} ({bar_time})")
+            print(f"   Low: ${data_after_entry['Low'].iloc[bar_idx - 1]:.2f} <= SL ${sl_price:.2f}")
+        print(f"   PnL: {pnl_pct*100:+.2f}% (${pnl_usd:+.2f})")
+        print(f"   Tiempo: {bar_idx * 15} minutos ({bar_idx * 15 / 60:.1f}h)")
+    else:
         # EOD close
         last_close = data_after_entry.iloc[-1]['Close']
         pnl_pct = (last_close - entry_price) / entry_price
@@ -94,5 +95,5 @@ for idx, trade in plan.iterrows():
     # Compare with old config
     print("📊 COMPARACIÓN:")
     print(f"   Intraday 1.0 (TP=2.0%, SL=0.4%): SL hit -$1.60 (15 min)")
-    print(f"   Intraday 2.0 (TP=1.2%, SL=0.35%): {'TP hit' if hit_found and 'TP' in locals() else 'EOD/SL'}")
+    print(f"   Intraday 2.0 (TP=1.2%, SL=0.35%): {'TP hit' if reason == HIT_TP else 'EOD/SL'}")
     print()
@@ -17,6 +17,8 @@ from datetime import time
 import numpy as np
 import pandas as pd
 
+from utils.first_touch import HIT_LABELS, HIT_NONE, simulate_exits
+
 
 def build_time_windows(num_windows: int):
     # Ventanas en UTC
@@ -118,31 +120,56 @@ def simulate_trades(
             (forecast['is_directional'] == True)
         ].copy()
 
-    # Agrupar intraday por ticker/date
-    prices_by_ticker_date = {
-        k: g.sort_values('datetime')
-        for k, g in df_intraday.groupby(['ticker', 'date'])
-    }
+    # Barras contiguas por ticker/date (ordenadas por datetime) y rango [lo, hi) de cada día
+    bars = df_intraday.sort_values(['ticker', 'date', 'datetime'], kind='stable').reset_index(drop=True)
+    day_id = bars.groupby(['ticker', 'date'], sort=False).ngroup().to_numpy()
+    day_lo = np.flatnonzero(np.r_[True, day_id[1:] != day_id[:-1]]) if len(bars) else np.array([], dtype=int)
+    day_hi = np.r_[day_lo[1:], len(bars)]
+    day_index = pd.MultiIndex.from_frame(bars.loc[day_lo, ['ticker', 'date']])
+    row_day = day_index.get_indexer(pd.MultiIndex.from_frame(forecast[['ticker', 'date']])) \
+        if len(day_lo) else np.full(len(forecast), -1)
+    has_data = row_day >= 0
+    hi = day_hi[row_day] if len(day_lo) else row_day
+
+    # Primera vela de cada ventana en cada día: la entrada candidata (fila, ventana)
+    n_rows, n_win = len(forecast), len(windows)
+    bar_time = bars['datetime'].dt.time
+    pos = np.arange(len(bars))
+    first = np.full((n_rows, n_win), -1, dtype=np.int64)
+    for w_idx, (start_t, end_t) in enumerate(windows):
+        in_w = ((bar_time >= start_t) & (bar_time <= end_t)).to_numpy()
+        if len(day_lo):
+            day_first = np.minimum.reduceat(np.where(in_w, pos, len(bars)), day_lo)
+            first[has_data, w_idx] = day_first[row_day[has_data]]
+    window_ok = has_data[:, None] & (first >= 0) & (first < hi[:, None])
+
+    # Salidas de todos los candidatos en un solo paso del kernel (TP se revisa antes que SL)
+    r_idx, w_of = np.nonzero(window_ok)
+    c_start = first[r_idx, w_of]
+    c_entry = bars['open'].to_numpy(float)[c_start] if len(c_start) else np.array([])
+    c_atr = forecast['atr'].to_numpy(float)[r_idx]
+    c_long = forecast['side'].to_numpy()[r_idx] == 'BUY'
+    c_tp = np.where(c_long, c_entry + tp_multiplier * c_atr, c_entry - tp_multiplier * c_atr)
+    c_sl = np.where(c_long, c_entry - sl_multiplier * c_atr, c_entry + sl_multiplier * c_atr)
+    res = simulate_exits(bars['open'], bars['high'], bars['low'], bars['close'], c_start,
+                         hi[r_idx] - c_start, c_long, c_tp, c_sl, entry=c_entry, tie="tp_first")
+    cand = np.full((n_rows, n_win), -1, dtype=np.int64)
+    cand[r_idx, w_of] = np.arange(len(r_idx))
+    c_reason = np.where(res['reason'] == HIT_NONE, 'TIMEOUT', HIT_LABELS[res['reason']])
+    c_exit_time = bars['datetime'].iloc[c_start + res['exit_bar']].tolist() if len(c_start) else []
 
     trades = []
     trades_per_window = {}
 
-    debug_no_data = 0
+    debug_no_data = int((~has_data).sum())
     debug_qty_zero = 0
     debug_no_window = 0
 
-    for _, row in forecast.iterrows():
-        ticker = row['ticker']
-        date = row['date']
-        side = row['side']
-        atr = row['atr']
-
-        key = (ticker, date)
-        if key not in prices_by_ticker_date:
-            debug_no_data += 1
+    # Loop secuencial solo para capital/cupos por ventana; las salidas ya están calculadas
+    for r, row in enumerate(forecast.itertuples(index=False)):
+        if not has_data[r]:
             continue
-
-        df_day = prices_by_ticker_date[key]
+        ticker, date, side, atr = row.ticker, row.date, row.side, row.atr
 
         # Seleccionar primer ventana disponible
         for w_idx, (start_t, end_t) in enumerate(windows):
@@ -150,14 +177,13 @@ def simulate_trades(
             if trades_per_window.get(w_key, 0) >= max_trades_per_window:
                 continue
 
-            df_window = df_day[(df_day['datetime'].dt.time >= start_t) & (df_day['datetime'].dt.time <= end_t)]
-            if df_window.empty:
+            if not window_ok[r, w_idx]:
                 debug_no_window += 1
                 continue
 
-            entry_candle = df_window.iloc[0]
-            entry_price = entry_candle['open']
-            entry_time = entry_candle['datetime']
+            c = cand[r, w_idx]
+            entry_price = c_entry[c]
+            entry_time = bars['datetime'].iat[c_start[c]]
 
             qty = int((capital * position_pct) / entry_price)
             if qty == 0:
@@ -166,44 +192,7 @@ def simulate_trades(
 
             tp_distance = tp_multiplier * atr
             sl_distance = sl_multiplier * atr
-
-            if side == 'BUY':
-                tp_price = entry_price + tp_distance
-                sl_price = entry_price - sl_distance
-            else:
-                tp_price = entry_price - tp_distance
-                sl_price = entry_price + sl_distance
-
-            # Simular desde entry_time hasta fin del día
-            df_after = df_day[df_day['datetime'] >= entry_time]
-            exit_reason = 'TIMEOUT'
-            exit_price = df_after.iloc[-1]['close']
-            exit_time = df_after.iloc[-1]['datetime']
-
-            for _, candle in df_after.iterrows():
-                high = candle['high']
-                low = candle['low']
-
-                if side == 'BUY' and high >= tp_price:
-                    exit_reason = 'TP'
-                    exit_price = tp_price
-                    exit_time = candle['datetime']
-                    break
-                if side == 'SELL' and low <= tp_price:
-                    exit_reason = 'TP'
-                    exit_price = tp_price
-                    exit_time = candle['datetime']
-                    break
-                if side == 'BUY' and low <= sl_price:
-                    exit_reason = 'SL'
-                    exit_price = sl_price
-                    exit_time = candle['datetime']
-                    break
-                if side == 'SELL' and high >= sl_price:
-                    exit_reason = 'SL'
-                    exit_price = sl_price
-                    exit_time = candle['datetime']
-                    break
+            exit_reason, exit_price, exit_time = c_reason[c], res['exit_price'][c], c_exit_time[c]
 
             pnl = (exit_price - entry_price) * qty if side == 'BUY' else (entry_price - exit_price) * qty
             capital += pnl
@@ -220,7 +209,7 @@ def simulate_trades(
                 'qty': qty,
                 'pnl': pnl,
                 'capital': capital,
-                'prob_win': row['prob_win'],
+                'prob_win': row.prob_win,
                 'atr': atr,
                 'tp_distance': tp_distance,
                 'sl_distance': sl_distance,
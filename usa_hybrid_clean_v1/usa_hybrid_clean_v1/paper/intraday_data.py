@@ -5,53 +5,32 @@ Download and cache intraday OHLC data using yfinance.
 """
 
 import argparse
+import os
+import sys
 import pandas as pd
-import yfinance as yf
 from pathlib import Path
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.intraday_downloader import fetch_many, make_source
 
-def download_intraday(tickers, start, end, interval="1h"):
-    """Download intraday data for multiple tickers using yfinance."""
-    dfs = []
-    for ticker in tickers:
-        try:
-            print(f"[{ticker}] Downloading {interval} data from {start} to {end}...")
-            df = yf.download(ticker, start=start, end=end, interval=interval, progress=False)
-            if df.empty:
-                print(f"[WARN] {ticker}: No data returned")
-                continue
-            df.reset_index(inplace=True)
-            df["ticker"] = ticker
-            dfs.append(df)
-            print(f"[OK] {ticker}: {len(df)} rows")
-        except Exception as e:
-            print(f"[ERROR] {ticker}: {e}")
-    
-    if not dfs:
+
+def download_intraday(tickers, start, end, interval="1h", source=None, workers=8):
+    """Download intraday data for multiple tickers concurrently (yfinance by default)."""
+    print(f"Downloading {interval} data for {len(tickers)} tickers from {start} to {end}...")
+    frames = fetch_many(tickers, start, end, interval, source=source or make_source(None), workers=workers)
+    for ticker, df in frames.items():
+        print(f"[OK] {ticker}: {len(df)} rows")
+
+    if not frames:
         raise ValueError("No data retrieved for any ticker")
-    
-    combined = pd.concat(dfs, ignore_index=True)
-    
-    # Normalize columns
-    if "Date" in combined.columns:
-        combined.rename(columns={"Date": "datetime"}, inplace=True)
-    elif "Datetime" in combined.columns:
-        combined.rename(columns={"Datetime": "datetime"}, inplace=True)
-    
+
+    combined = pd.concat(frames.values(), ignore_index=True)
+    combined = combined.rename(columns={"timestamp": "datetime"})
+
     # Ensure datetime is consistent
     combined["datetime"] = pd.to_datetime(combined["datetime"])
-    
-    # Rename OHLCV columns
-    rename_map = {
-        "Open": "open",
-        "High": "high",
-        "Low": "low",
-        "Close": "close",
-        "Volume": "volume",
-    }
-    combined.rename(columns=rename_map, inplace=True)
-    
+
     # Select relevant columns
     cols = ["datetime", "ticker", "open", "high", "low", "close", "volume"]
     combined = combined[cols].copy()
@@ -69,11 +48,14 @@ def main():
     ap.add_argument("--end", required=True, help="End date (YYYY-MM-DD)")
     ap.add_argument("--interval", default="1h", help="Interval (1m, 1h, 1d)")
     ap.add_argument("--out", required=True, help="Output parquet path")
+    ap.add_argument("--workers", type=int, default=8, help="Concurrent downloads")
+    ap.add_argument("--source", default=None, help="Fixture server URL (default: yfinance)")
     
     args = ap.parse_args()
     
     # Download
-    df = download_intraday(args.tickers, args.start, args.end, args.interval)
+    df = download_intraday(args.tickers, args.start, args.end, args.interval,
+                           source=make_source(args.source), workers=args.workers)
     
     # Summary
     print(f"\n=== SUMMARY ===")
@@ -4,10 +4,16 @@ paper/intraday_simulator.py
 Simulate paper trades intraday (hour-by-hour) using cached OHLC candles.
 """
 
+import os
+import sys
+
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.first_touch import HIT_SL, HIT_TP, simulate_exits
+
 
 def _reshape_wide_to_long(df_wide):
     """
@@ -81,8 +87,42 @@ def simulate_trades(trade_plan, intraday_df, max_hold_days=3, tp_pct=None, sl_pc
     
     # Reshape if needed (wide → long)
     df = _reshape_wide_to_long(intraday_df)
+    # Rename 'timestamp' to 'datetime' if needed for compatibility
+    if "timestamp" in df.columns and "datetime" not in df.columns:
+        df = df.rename(columns={"timestamp": "datetime"})
+    
+    # Candles grouped once: contiguous per ticker, sorted by datetime, with session boundaries
+    bars = df.sort_values(["ticker", "datetime"], kind="stable").reset_index(drop=True) if len(df) else df
+    by_ticker = {}
+    for ticker, idx in bars.groupby("ticker", sort=False).indices.items():
+        lo = int(idx[0])
+        dts = bars["datetime"].iloc[idx[0]:idx[-1] + 1].reset_index(drop=True)
+        dates = pd.to_datetime(dts).dt.date.to_numpy()
+        day_start = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]])
+        day_end = np.r_[day_start[1:], len(dates)]
+        by_ticker[ticker] = (lo, dts, day_start, day_end)
+    
+    def empty_trade(ticker, side, entry_price, outcome, tp_price, sl_price, qty, trade_date_str):
+        return {
+            "ticker": ticker,
+            "side": side,
+            "entry_time": None,
+            "entry_price": entry_price,
+            "exit_time": None,
+            "exit_price": None,
+            "outcome": outcome,
+            "pnl": 0.0,
+            "pnl_pct": 0.0,
+            "hold_hours": 0,
+            "tp_price": tp_price,
+            "sl_price": sl_price,
+            "qty": qty,
+            "trade_date": trade_date_str,
+        }
     
+    # Pass 1: entry, TP/SL levels and hold window per trade (candles not scanned yet)
     trades = []
+    pending = []  # (position in trades, window start, window length, timeout bar, fields)
     
     for idx, plan_row in trade_plan.iterrows():
         ticker = plan_row["ticker"]
@@ -97,66 +137,27 @@ def simulate_trades(trade_plan, intraday_df, max_hold_days=3, tp_pct=None, sl_pc
         if qty <= 0:
             continue
         
-        # Filter intraday for this ticker
-        ticker_data = df[df["ticker"] == ticker].copy()
-        if ticker_data.empty:
-            trades.append({
-                "ticker": ticker,
-                "side": side,
-                "entry_time": None,
-                "entry_price": entry_price,
-                "exit_time": None,
-                "exit_price": None,
-                "outcome": "NO_DATA",
-                "pnl": 0.0,
-                "pnl_pct": 0.0,
-                "hold_hours": 0,
-                "tp_price": tp_price,
-                "sl_price": sl_price,
-                "qty": qty,
-                "trade_date": trade_date_str,
-            })
+        if ticker not in by_ticker:
+            trades.append(empty_trade(ticker, side, entry_price, "NO_DATA", tp_price, sl_price, qty, trade_date_str))
             continue
-        
-        # Rename 'timestamp' to 'datetime' if needed for compatibility
-        if "timestamp" in ticker_data.columns and "datetime" not in ticker_data.columns:
-            ticker_data = ticker_data.rename(columns={"timestamp": "datetime"})
-        
-        ticker_data = ticker_data.sort_values("datetime").reset_index(drop=True)
+        lo, dts, day_start, day_end = by_ticker[ticker]
         
         # Find entry: first candle on/after trade_date (market open)
         trade_dt = pd.to_datetime(trade_date_str)
         # Make timezone-aware to match intraday cache (UTC)
-        if trade_dt.tz is None and hasattr(ticker_data["datetime"].iloc[0], 'tz') and ticker_data["datetime"].iloc[0].tz is not None:
+        if trade_dt.tz is None and hasattr(dts.iloc[0], 'tz') and dts.iloc[0].tz is not None:
             trade_dt = trade_dt.tz_localize('UTC')
         
-        entry_data = ticker_data[ticker_data["datetime"] >= trade_dt]
-        
-        if entry_data.empty:
-            trades.append({
-                "ticker": ticker,
-                "side": side,
-                "entry_time": None,
-                "entry_price": entry_price,
-                "exit_time": None,
-                "exit_price": None,
-                "outcome": "NO_ENTRY",
-                "pnl": 0.0,
-                "pnl_pct": 0.0,
-                "hold_hours": 0,
-                "tp_price": tp_price,
-                "sl_price": sl_price,
-                "qty": qty,
-                "trade_date": trade_date_str,
-            })
+        after = (dts >= trade_dt).to_numpy()
+        if not after.any():
+            trades.append(empty_trade(ticker, side, entry_price, "NO_ENTRY", tp_price, sl_price, qty, trade_date_str))
             continue
-        
-        entry_idx = entry_data.index[0]
-        entry_time = ticker_data.loc[entry_idx, "datetime"]
+        entry_idx = int(np.argmax(after))
+        entry_time = dts.iloc[entry_idx]
         
         # CRITICAL FIX: Use actual OPEN price of first candle as entry
         # Plan's entry_price comes from asof_date (T-1 close), not sim_date open
-        actual_entry_price = float(ticker_data.loc[entry_idx, "open"])
+        actual_entry_price = float(bars["open"].iat[lo + entry_idx])
         # Apply slippage on entry (worsen price)
         if slippage_pct and slippage_pct > 0:
             if side == "BUY":
@@ -190,149 +191,37 @@ def simulate_trades(trade_plan, intraday_df, max_hold_days=3, tp_pct=None, sl_pc
         # Calculate max hold window: max_hold_days TRADING sessions
         # Day 0: from entry until EOD (market close)
         # Day 1...N-1: subsequent full trading days
-        # TIMEOUT: at close of Day (max_hold_days - 1)
-        #
-        # Strategy: Find unique trading dates in data, locate entry date, 
-        # then find Nth date forward (0-indexed: max_hold_days-1 offset)
-        ticker_data["date_only"] = pd.to_datetime(ticker_data["datetime"]).dt.date
-        unique_trade_dates = sorted(ticker_data["date_only"].unique())
-        
-        entry_date = pd.to_datetime(entry_time).date()
-        if entry_date not in unique_trade_dates:
-            # Entry date not in available data → use next available
-            entry_date = min([d for d in unique_trade_dates if d >= entry_date], default=None)
-            if entry_date is None:
-                # No future data → skip trade
-                trades.append({
-                    "ticker": ticker,
-                    "side": side,
-                    "entry_time": entry_time,
-                    "entry_price": entry_price,
-                    "exit_time": None,
-                    "exit_price": None,
-                    "outcome": "NO_DATA_POST_ENTRY",
-                    "pnl": 0.0,
-                    "pnl_pct": 0.0,
-                    "hold_hours": 0,
-                    "tp_price": tp_price,
-                    "sl_price": sl_price,
-                    "qty": qty,
-                    "trade_date": trade_date_str,
-                })
-                continue
-        
-        entry_date_idx = unique_trade_dates.index(entry_date)
-        # max_hold_days=2 → hold until end of Day 1 (entry_date_idx + 1)
-        timeout_date_idx = entry_date_idx + (max_hold_days - 1)
-        
-        if timeout_date_idx >= len(unique_trade_dates):
-            # Not enough data to complete hold window → force timeout at last available date
-            timeout_date = unique_trade_dates[-1]
-        else:
-            timeout_date = unique_trade_dates[timeout_date_idx]
+        # TIMEOUT: at close of Day (max_hold_days - 1), or at last available date
+        # if there is not enough data to complete the hold window
+        entry_day = int(np.searchsorted(day_start, entry_idx, side="right")) - 1
+        timeout_day = np.arange(len(day_start))[min(entry_day + (max_hold_days - 1), len(day_start) - 1)]
+        timeout_bar = int(day_end[timeout_day]) - 1  # last candle of timeout_date (EOD close)
         
-        # Get last candle of timeout_date (EOD close)
-        eod_candles = ticker_data[ticker_data["date_only"] == timeout_date]
-        if eod_candles.empty:
-            # Should not happen if logic correct, but fallback
-            timeout_datetime = pd.Timestamp(timeout_date) + timedelta(hours=20)  # 20:00 UTC = 16:00 ET (market close)
-        else:
-            timeout_datetime = eod_candles["datetime"].max()
-        
-        # Simulate candle-by-candle within hold window
-        exit_time = None
-        exit_price = None
-        outcome = "TIMEOUT"
-        
-        # Track MFE/MAE (Max Favorable/Adverse Excursion)
-        max_favorable = 0.0  # Best unrealized profit during trade
-        max_adverse = 0.0    # Worst unrealized loss during trade
-        
-        for candle_idx in range(entry_idx, len(ticker_data)):
-            candle = ticker_data.iloc[candle_idx]
-            candle_dt = candle["datetime"]
-            candle_date = pd.to_datetime(candle_dt).date()
-            
-            # Stop if beyond timeout date
-            if candle_date > timeout_date:
-                break
-            
-            high = float(candle["high"])
-            low = float(candle["low"])
-            close = float(candle["close"])
-            
-            # Track MFE/MAE
-            if side == "BUY":
-                favorable_move = (high - entry_price) / entry_price
-                adverse_move = (low - entry_price) / entry_price
-                max_favorable = max(max_favorable, favorable_move)
-                max_adverse = min(max_adverse, adverse_move)
-            else:  # SELL
-                favorable_move = (entry_price - low) / entry_price
-                adverse_move = (entry_price - high) / entry_price
-                max_favorable = max(max_favorable, favorable_move)
-                max_adverse = min(max_adverse, adverse_move)
-            
-            # Check TP/SL
-            if side == "BUY":
-                # Check SL first (conservative)
-                if low <= sl_price:
-                    exit_price = sl_price
-                    exit_time = candle_dt
-                    outcome = "SL"
-                    break
-                # Then check TP
-                elif high >= tp_price:
-                    exit_price = tp_price
-                    exit_time = candle_dt
-                    outcome = "TP"
-                    break
-            else:  # SELL
-                if high >= sl_price:
-                    exit_price = sl_price
-                    exit_time = candle_dt
-                    outcome = "SL"
-                    break
-                elif low <= tp_price:
-                    exit_price = tp_price
-                    exit_time = candle_dt
-                    outcome = "TP"
-                    break
-            
-            # If we reached timeout_date EOD and no exit yet → force TIMEOUT at close
-            if candle_date == timeout_date and candle_dt == timeout_datetime:
-                exit_price = close
-                exit_time = candle_dt
-                outcome = "TIMEOUT"
-                break
-        
-        # If loop ended without exit (should not happen with correct logic), force timeout at EOD
-        if exit_time is None:
-            eod_final = ticker_data[ticker_data["date_only"] == timeout_date]
-            if not eod_final.empty:
-                last_candle_eod = eod_final.iloc[-1]
-                exit_time = last_candle_eod["datetime"]
-                exit_price = float(last_candle_eod["close"])
-                outcome = "TIMEOUT"
-            else:
-                # Fallback: no data for timeout date → skip trade
-                trades.append({
-                    "ticker": ticker,
-                    "side": side,
-                    "entry_time": entry_time,
-                    "entry_price": entry_price,
-                    "exit_time": None,
-                    "exit_price": None,
-                    "outcome": "NO_DATA_TIMEOUT",
-                    "pnl": 0.0,
-                    "pnl_pct": 0.0,
-                    "hold_hours": 0,
-                    "tp_price": tp_price,
-                    "sl_price": sl_price,
-                    "qty": qty,
-                    "trade_date": trade_date_str,
-                })
-                continue
+        fields = dict(ticker=ticker, side=side, entry_time=entry_time, entry_price=entry_price,
+                      tp_price=tp_price, sl_price=sl_price, qty=qty, trade_date=trade_date_str)
+        pending.append((len(trades), lo + entry_idx, max(timeout_bar + 1 - entry_idx, 0), lo + timeout_bar, fields))
+        trades.append(None)
+    
+    # Pass 2: candle-by-candle TP/SL of all trades in one kernel run (SL checked first, conservative),
+    # tracking MFE/MAE (Max Favorable/Adverse Excursion). No hit → TIMEOUT at close of timeout_date.
+    if pending:
+        _, start, length, timeout_bar, fields = zip(*pending)
+        start, length = np.array(start), np.array(length)
+        res = simulate_exits(bars["open"], bars["high"], bars["low"], bars["close"], start, length,
+                             np.array([f["side"] == "BUY" for f in fields]),
+                             np.array([f["tp_price"] for f in fields]), np.array([f["sl_price"] for f in fields]),
+                             entry=np.array([f["entry_price"] for f in fields]), tie="sl_first")
+        # Empty window (timeout before entry date): force TIMEOUT at close of timeout_date
+        exit_bar = np.where(length > 0, start + res["exit_bar"], np.array(timeout_bar))
+        exit_px = np.where(length > 0, res["exit_price"], bars["close"].to_numpy(float)[np.array(timeout_bar)])
+        exit_times = bars["datetime"].iloc[exit_bar].tolist()
+        outcomes = np.select([res["reason"] == HIT_SL, res["reason"] == HIT_TP], ["SL", "TP"], "TIMEOUT")
+    
+    for i, (pos, _, _, _, f) in enumerate(pending):
+        side, entry_price, tp_price, sl_price = f["side"], f["entry_price"], f["tp_price"], f["sl_price"]
+        entry_time, exit_time, qty = f["entry_time"], exit_times[i], f["qty"]
+        exit_price = float(exit_px[i])
+        outcome = str(outcomes[i])
         
         # Calculate PnL
         # Apply slippage on exit
@@ -363,8 +252,8 @@ def simulate_trades(trade_plan, intraday_df, max_hold_days=3, tp_pct=None, sl_pc
             tp_distance_pct = (entry_price - tp_price) / entry_price
             sl_distance_pct = (sl_price - entry_price) / entry_price
         
-        trades.append({
-            "ticker": ticker,
+        trades[pos] = {
+            "ticker": f["ticker"],
             "side": side,
             "entry_time": entry_time,
             "entry_price": entry_price,
@@ -378,13 +267,13 @@ def simulate_trades(trade_plan, intraday_df, max_hold_days=3, tp_pct=None, sl_pc
             "tp_price": tp_price,
             "sl_price": sl_price,
             "qty": qty,
-            "trade_date": trade_date_str,
+            "trade_date": f["trade_date"],
             "tp_distance_pct": tp_distance_pct,
             "sl_distance_pct": sl_distance_pct,
-            "mfe_pct": max_favorable,  # Max Favorable Excursion
-            "mae_pct": max_adverse,    # Max Adverse Excursion
+            "mfe_pct": float(res["mfe_pct"][i]),  # Max Favorable Excursion
+            "mae_pct": float(res["mae_pct"][i]),  # Max Adverse Excursion
             "commission": commission_per_trade,
             "slippage_pct": slippage_pct,
-        })
+        }
     
     return pd.DataFrame(trades)
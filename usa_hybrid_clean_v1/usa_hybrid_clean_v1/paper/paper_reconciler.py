@@ -5,6 +5,7 @@ Update broker mark-to-market with fresh prices.
 """
 
 import argparse
+import sys
 import pandas as pd
 import yfinance as yf
 from pathlib import Path
@@ -13,18 +14,38 @@ from paper_broker import mark_to_market, load_state
 
 
 def get_latest_prices_yfinance(tickers, interval="1m"):
-    """Fetch latest prices from yfinance."""
-    price_map = {}
-    for ticker in tickers:
+    """Fetch latest prices: shared quote service first, then one batched yfinance call."""
+    price_map = get_quote_service_prices(tickers)
+    missing = [t for t in tickers if t not in price_map]
+    if not missing:
+        return price_map
+    try:
+        df = yf.download(missing, period="1d", interval=interval, progress=False, group_by="ticker")
+    except Exception:
+        return price_map
+    for ticker in missing:
         try:
-            df = yf.download(ticker, period="1d", interval=interval, progress=False)
-            if not df.empty:
-                price_map[ticker] = float(df["Close"].iloc[-1])
-        except:
+            close = df["Close"] if len(missing) == 1 else df[ticker]["Close"]
+            close = close.dropna()
+            if not close.empty:
+                price_map[ticker] = float(close.iloc[-1])
+        except Exception:
             pass
     return price_map
 
 
+def get_quote_service_prices(tickers):
+    """Prices from the shared quote service (QUOTE_SERVICE_URL); empty if unavailable."""
+    root = str(Path(__file__).resolve().parents[1])
+    if root not in sys.path:
+        sys.path.insert(0, root)
+    try:
+        from utils.quote_client import get_prices
+    except ImportError:
+        return {}
+    return get_prices(list(tickers))
+
+
 def get_latest_prices_parquet(intraday_parquet, tickers):
     """Fetch latest prices from parquet cache."""
     df = pd.read_parquet(intraday_parquet)
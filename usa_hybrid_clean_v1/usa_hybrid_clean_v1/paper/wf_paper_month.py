@@ -5,14 +5,32 @@ Walk-forward paper simulation for a full month, day by day.
 """
 
 import argparse
+import os
+import sys
 import pandas as pd
-import subprocess
 import json
 from pathlib import Path
 from datetime import datetime, timedelta
 from intraday_simulator import simulate_trades
 from metrics import summary_stats, equity_curve
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.forecast_store import is_store
+from utils.trade_plan import load_forecast_auto, make_trade_plan
+
+# forecast/prices se leen una vez por corrida (el plan se arma por día en proceso)
+_FRAME_CACHE = {}
+
+
+def _load_frame(path, asof_date=None, tickers=None):
+    # forecast store: solo las particiones alrededor de asof_date (no se cachea el histórico)
+    if asof_date is not None and is_store(path):
+        return load_forecast_auto(path, asof_date=asof_date, tickers=tickers)[0]
+    key = str(Path(path).resolve())
+    if key not in _FRAME_CACHE:
+        _FRAME_CACHE[key] = load_forecast_auto(path)[0]
+    return _FRAME_CACHE[key]
+
 
 def get_weekday_range(month_str):
     """Get list of weekdays in a month (YYYY-MM)."""
@@ -117,9 +135,10 @@ def run_trade_plan(
     max_open=None,
     tp_pct=None,
     sl_pct=None,
+    tickers=None,
 ):
     """
-    Call core run_trade_plan.py via subprocess.
+    Build the core trade plan in-process (utils.trade_plan.make_trade_plan).
     
     Args:
         forecast_file: path to signals_with_gates.parquet
@@ -133,6 +152,7 @@ def run_trade_plan(
         max_open: optional cap on concurrently open trades
         tp_pct: optional TP override (fraction, e.g., 0.016)
         sl_pct: optional SL override (fraction, e.g., 0.01)
+        tickers: optional universe (applied when reading from a forecast store)
     
     Returns:
         path to generated trade_plan.csv or None if failed
@@ -147,35 +167,33 @@ def run_trade_plan(
     if month_str is None:
         month_str = asof_date[:7]  # YYYY-MM
     
-    cmd = [
-        "python", "scripts/run_trade_plan.py",
-        "--forecast", str(forecast_file),
-        "--prices", str(prices_file),
-        "--out", str(trade_plan_csv),
-        "--month", month_str,
-        "--capital", str(capital),
-        "--exposure-cap", str(exposure_cap),
-        "--execution-mode", execution_mode,
-        "--asof-date", asof_date,
-        "--audit-file", str(audit_json),
-    ]
-
+    # Same defaults as scripts/run_trade_plan.py
+    kwargs = {"capital": capital, "exposure_cap": exposure_cap, "execution_mode": execution_mode, "asof_date": asof_date}
     if tp_pct is not None:
-        cmd += ["--tp-pct", str(tp_pct)]
+        kwargs["tp_pct"] = tp_pct
     if sl_pct is not None:
-        cmd += ["--sl-pct", str(sl_pct)]
-
+        kwargs["sl_pct"] = sl_pct
     if max_open is not None:
-        cmd += ["--max-open", str(max_open)]
-    
-    result = subprocess.run(cmd, capture_output=True, text=True)
+        kwargs["max_open"] = max_open
     
-    if result.returncode != 0:
-        print(f"[ERROR] run_trade_plan.py failed for asof_date={asof_date}:")
-        print(result.stdout)
-        print(result.stderr)
+    try:
+        plan, info = make_trade_plan(_load_frame(forecast_file, asof_date, tickers), _load_frame(prices_file), month_str, **kwargs)
+    except Exception as e:
+        print(f"[ERROR] trade plan failed for asof_date={asof_date}: {type(e).__name__}: {e}")
         return None
     
+    plan.to_csv(trade_plan_csv, index=False)
+    audit = {
+        "timestamp": datetime.now().isoformat(),
+        "asof_date": asof_date,
+        "output_rows": int(len(plan)),
+        "execution_mode": info["exec_info"],
+        "exposure_cap": info["cap_info"],
+        "warnings": info["warnings"],
+        **info["etth_stats"],
+    }
+    audit_json.write_text(json.dumps(audit, indent=2, default=str))
+    
     print(f"  [OK] Trade plan generated for asof_date={asof_date}: {trade_plan_csv}")
     return trade_plan_csv
 
@@ -263,7 +281,7 @@ def main():
 
     forecast_path = Path(args.forecast)
     forecast_to_use = forecast_path
-    if tickers:
+    if tickers and not is_store(forecast_path):
         filtered_path = state_dir / f"forecast_filtered_{args.month.replace('-', '')}{forecast_path.suffix}"
         forecast_to_use = filter_forecast_universe(forecast_path, tickers, filtered_path)
 
@@ -306,7 +324,7 @@ def main():
             forecast_to_use, args.prices, asof_date,
             args.capital, args.exposure_cap, args.execution_mode,
             day_dir, month_str=args.month, max_open=args.max_open,
-            tp_pct=tp_pct, sl_pct=sl_pct
+            tp_pct=tp_pct, sl_pct=sl_pct, tickers=tickers
         )
         
         if trade_plan_csv is None or not trade_plan_csv.exists():
@@ -1,5 +1,5 @@
 """
-Execute all 3 backtests and compare results
+Execute all comparative backtests and compare results
 """
 
 import subprocess
@@ -23,6 +23,12 @@ RUNS = [
         'args': ['--pw_bands', '0.52,0.58'],
         'description': 'MC + prob_win sizing bands (0.52-0.58) on 5-ticker forecast universe'
     },
+    {
+        'name': 'B2_Hybrid_Soft',
+        'mode': 'hybrid',
+        'args': ['--soft_hybrid'],
+        'description': 'MC + soft prob_win sizing (1.0x/0.8x/0.6x, no blocking) on 5-ticker forecast universe'
+    },
     {
         'name': 'C_ProbWin_Only',
         'mode': 'probwin_only',
@@ -33,6 +39,7 @@ RUNS = [
 
 OUTPUT_BASE = Path("evidence/comparative_backtests")
 OUTPUT_BASE.mkdir(parents=True, exist_ok=True)
+MC_CACHE = OUTPUT_BASE / "mc_cache.joblib"  # MC selections shared by all runs (same picks across modes)
 
 # ==============================================================================
 # EXECUTE RUNS
@@ -55,7 +62,8 @@ for run in RUNS:
         'python',
         'backtest_comparative_modes.py',
         '--mode', run['mode'],
-        '--output', str(output_dir)
+        '--output', str(output_dir),
+        '--mc_cache', str(MC_CACHE)
     ] + run['args']
     
     print(f"Command: {' '.join(cmd)}\n")
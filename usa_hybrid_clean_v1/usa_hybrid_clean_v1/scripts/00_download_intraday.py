@@ -14,10 +14,14 @@ import argparse
 import os
 from datetime import datetime, timedelta
 from pathlib import Path
+import sys
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
-import yfinance as yf
 from zoneinfo import ZoneInfo
 
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from utils.intraday_downloader import YFinanceSource, fetch_with_retry, make_source
+
 def parse_args():
     ap = argparse.ArgumentParser()
     ap.add_argument("--date", required=True, help="Fecha YYYY-MM-DD")
@@ -27,6 +31,8 @@ def parse_args():
     ap.add_argument("--out-dir", default="data/intraday", help="Directorio de salida")
     ap.add_argument("--tz", default="America/New_York", help="Zona horaria del mercado")
     ap.add_argument("--lookback-days", type=int, default=5, help="Días hacia atrás para descargar")
+    ap.add_argument("--workers", type=int, default=8, help="Descargas concurrentes")
+    ap.add_argument("--source", default=None, help="URL de servidor de fixtures (default: yfinance)")
     return ap.parse_args()
 
 
@@ -44,78 +50,28 @@ def get_ticker_list(args):
         raise ValueError("Debe especificar --tickers o --tickers-file")
 
 
-def download_intraday(ticker, start_dt, end_dt, interval, tz_str):
-    """Descargar datos intraday para un ticker."""
+def download_intraday(ticker, start_dt, end_dt, interval, tz_str, source=None):
+    """Descargar datos intraday para un ticker (rate limit por vendor, reintentos)."""
     try:
         print(f"[download_intraday] Descargando {ticker} {interval} {start_dt.date()} -> {end_dt.date()}")
-        df = yf.download(
-            ticker,
-            start=start_dt,
-            end=end_dt,
-            interval=interval,
-            progress=False,
-            auto_adjust=True
-        )
-        
+        df = fetch_with_retry(source or YFinanceSource(auto_adjust=True), ticker, start_dt.date(), end_dt.date(), interval)
+
         if df is None or df.empty:
             print(f"[download_intraday] WARN {ticker}: sin datos")
             return None
-        
-        # Si es MultiIndex (intraday de un solo ticker), aplanar
-        if isinstance(df.columns, pd.MultiIndex):
-            df.columns = df.columns.get_level_values(0)
-        
-        # Normalizar columnas
-        df = df.rename(columns={
-            'Open': 'open',
-            'High': 'high',
-            'Low': 'low',
-            'Close': 'close',
-            'Volume': 'volume'
-        })
-        
-        # Asegurar que tenemos las columnas necesarias
-        required_cols = ['open', 'high', 'low', 'close', 'volume']
-        for col in required_cols:
-            if col not in df.columns:
-                print(f"[download_intraday] WARN {ticker}: columna '{col}' no encontrada")
-                return None
-        
-        df = df[required_cols].copy()
-        
-        # Reset index para obtener la columna de tiempo
-        df_reset = df.reset_index()
-        
-        # Identificar columna de timestamp
-        time_col = None
-        for possible_col in ['Datetime', 'Date', 'Time', 'timestamp']:
-            if possible_col in df_reset.columns:
-                time_col = possible_col
-                break
-        
-        if time_col is None:
-            print(f"[download_intraday] ERROR {ticker}: {df_reset.columns}")
-            return None
-        
-        df = df_reset
-        df.rename(columns={time_col: 'timestamp'}, inplace=True)
-        
+
         # Convertir a zona horaria del mercado
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
         tz = ZoneInfo(tz_str)
         if df['timestamp'].dt.tz is None:
             df['timestamp'] = df['timestamp'].dt.tz_localize('UTC').dt.tz_convert(tz)
         else:
             df['timestamp'] = df['timestamp'].dt.tz_convert(tz)
-        
-        # Agregar ticker
-        df['ticker'] = ticker
-        
+
         # Remover duplicados y ordenar
         df = df.drop_duplicates(subset=['timestamp']).sort_values('timestamp')
-        
+
         return df
-        
+
     except Exception as e:
         print(f"[download_intraday] ERROR {ticker}: {e}")
         return None
@@ -152,9 +108,11 @@ def main():
     print(f"[download_intraday] Procesando {len(tickers)} tickers para {args.date} (lookback={args.lookback_days}d)")
     
     # Descargar y guardar
+    source = make_source(args.source)
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as ex:
+        frames = list(ex.map(lambda t: download_intraday(t, start_dt, end_dt, args.interval, args.tz, source), tickers))
     success_count = 0
-    for ticker in tickers:
-        df = download_intraday(ticker, start_dt, end_dt, args.interval, args.tz)
+    for ticker, df in zip(tickers, frames):
         if df is not None and not df.empty:
             save_by_date(df, ticker, args.out_dir, args.date)
             success_count += 1
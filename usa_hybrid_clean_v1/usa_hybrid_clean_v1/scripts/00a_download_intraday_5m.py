@@ -1,9 +1,12 @@
 import pandas as pd
-import yfinance as yf
 from datetime import datetime
 import os
+import sys
 import yaml
 
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from utils.intraday_downloader import YFinanceSource, fetch_many
+
 BUFFER_PATH = "data/intraday5/buffer/"
 CONFIG_PATH = "config/data_sources.yaml"
 
@@ -14,24 +17,17 @@ def load_tickers():
     return config['tickers']
 
 
-def download_intraday_5m(ticker, start_date, end_date):
-    df = yf.download(ticker, start=start_date, end=end_date, interval="5m", auto_adjust=True, progress=False)
-    if df.empty:
-        return None
-    df = df.reset_index()
-    df['ticker'] = ticker
-    df = df.rename(columns={
-        'Datetime': 'timestamp',
-        'Open': 'open',
-        'High': 'high',
-        'Low': 'low',
-        'Close': 'close',
-        'Volume': 'volume'
-    })
-    df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
-    df = df.drop_duplicates(subset=['timestamp'])
-    df = df.sort_values('timestamp')
-    return df[['timestamp', 'open', 'high', 'low', 'close', 'volume', 'ticker']]
+def download_intraday_5m(tickers, start_date, end_date, workers=8):
+    """{ticker: df 5m} descargados en paralelo (rate limit compartido por vendor)."""
+    frames = fetch_many(tickers, start_date, end_date, "5m", source=YFinanceSource(auto_adjust=True), workers=workers)
+    out = {}
+    for ticker, df in frames.items():
+        df = df.copy()
+        df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True)
+        df = df.drop_duplicates(subset=['timestamp'])
+        df = df.sort_values('timestamp')
+        out[ticker] = df[['timestamp', 'open', 'high', 'low', 'close', 'volume', 'ticker']]
+    return out
 
 
 def save_to_buffer(df, ticker, date):
@@ -44,9 +40,10 @@ def save_to_buffer(df, ticker, date):
 def main():
     tickers = load_tickers()
     today = datetime.utcnow().strftime("%Y-%m-%d")
+    print(f"Descargando {len(tickers)} tickers 5m...")
+    frames = download_intraday_5m(tickers, today, today)
     for ticker in tickers:
-        print(f"Descargando {ticker} 5m...")
-        df = download_intraday_5m(ticker, today, today)
+        df = frames.get(ticker)
         if df is not None and len(df) > 0:
             save_to_buffer(df, ticker, today)
         else:
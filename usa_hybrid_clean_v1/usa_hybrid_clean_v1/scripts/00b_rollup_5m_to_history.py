@@ -1,31 +1,59 @@
-import pandas as pd
-import os
+"""
+Rollup buffer 5m -> history.
+
+- Mezcla las barras nuevas con las particiones existentes (dedup ticker+timestamp).
+- Compacta los meses cerrados en history/ticker=T/month=YYYY-MM/part-0.parquet.
+- Mantiene history/_manifest.parquet (ticker, path, min_ts, max_ts, rows).
+
+Uso:
+  python scripts/00b_rollup_5m_to_history.py [--no-compact] [--rebuild-manifest]
+"""
+import argparse
 import glob
+import os
+import sys
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from utils.intraday_store import HistoryStore
 
 BUFFER_PATH = "data/intraday5/buffer/"
 HISTORY_PATH = "data/intraday5/history/"
+BATCH_FILES = 200  # archivos del buffer por lote de merge
 
 
-def rollup_buffer_to_history():
-    files = glob.glob(BUFFER_PATH + "*.parquet")
+def rollup_buffer_to_history(compact=True):
+    store = HistoryStore(HISTORY_PATH)
+    files = sorted(glob.glob(BUFFER_PATH + "*.parquet"))
     if not files:
         print("[WARN] No hay archivos en buffer.")
-        return
-    for f in files:
-        df = pd.read_parquet(f)
-        if df.empty:
-            continue
-        ticker = df['ticker'].iloc[0]
-        date = pd.to_datetime(df['timestamp'].iloc[0]).strftime("%Y-%m-%d")
-        out_dir = f"{HISTORY_PATH}ticker={ticker}/date={date}/"
-        os.makedirs(out_dir, exist_ok=True)
-        out_file = f"{out_dir}part-0.parquet"
-        # Deduplicar y ordenar
-        df = df.drop_duplicates(subset=['timestamp'])
-        df = df.sort_values('timestamp')
-        df.to_parquet(out_file, index=False, compression='snappy')
-        print(f"[OK] Rollup {f} → {out_file} ({len(df)} filas)")
-        os.remove(f)
+    for i in range(0, len(files), BATCH_FILES):
+        batch = files[i:i + BATCH_FILES]
+        frames = [pd.read_parquet(f) for f in batch]
+        frames = [f for f in frames if not f.empty]
+        if frames:
+            written = store.merge_bars(pd.concat(frames, ignore_index=True))
+            print(f"[OK] Rollup {len(batch)} archivos → {len(written)} particiones")
+        for f in batch:
+            os.remove(f)
+    if compact:
+        done = store.compact()
+        if done:
+            print(f"[OK] Compactados {len(done)} meses")
+    man = store.manifest()
+    print(f"[OK] Manifest {store.manifest_path} ({len(man)} archivos, {int(man['rows'].sum()) if len(man) else 0} filas)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Rollup buffer 5m → history con compactación y manifiesto")
+    ap.add_argument("--no-compact", action="store_true")
+    ap.add_argument("--rebuild-manifest", action="store_true", help="Reconstruye el manifiesto desde el árbol")
+    args = ap.parse_args()
+    if args.rebuild_manifest:
+        HistoryStore(HISTORY_PATH).rebuild_manifest()
+    rollup_buffer_to_history(compact=not args.no_compact)
+
 
 if __name__ == "__main__":
-    rollup_buffer_to_history()
+    main()
@@ -1,9 +1,21 @@
 # Script: 09b_make_features_intraday.py
 # Genera features de contexto intradía agregados al día
+#
+# Incremental: el estado rolling por ticker (utils/intraday_features.IncrementalContextFeatures)
+# se guarda en --state; cada corrida lee solo las barras posteriores a la última procesada
+# de cada ticker y actualiza (upsert) las filas (ticker, date) afectadas del parquet de salida.
+# Tickers sin estado se calculan completos. --full recalcula todo (p.ej. tras un backfill
+# de barras anteriores a las ya procesadas).
+import argparse
+import time
 import pandas as pd
 import numpy as np
 import os
-import glob
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from utils.intraday_store import HistoryStore
+from utils.intraday_features import IncrementalContextFeatures
 
 def compute_intraday_features(df):
     # Volatilidad intradía
@@ -26,29 +38,87 @@ def compute_intraday_features(df):
     df['ll_20'] = (df['low'] <= df['low'].rolling(20).min()).astype(int)
     return df
 
+def full_ticker(store, state, ticker):
+    """Resumen diario de todo el historial del ticker; deja su estado al cierre del último día."""
+    out = []
+    bars = store.read_bars([ticker])
+    days = list(bars.groupby(bars['timestamp'].dt.date, sort=True))
+    for _, df in days:
+        df = compute_intraday_features(df.reset_index(drop=True))
+        # Agregar resumen diario (ejemplo: media, std, último valor)
+        summary = df.iloc[-1:].copy()
+        summary['ticker'] = ticker
+        summary['date'] = df['timestamp'].dt.date.iloc[-1]
+        out.append(summary)
+    if days:
+        state.update(days[-1][1])  # solo el último día alimenta el estado (se reinicia por fecha)
+    return out
+
+def incremental(store, state, tickers):
+    """Resumen de los días con barras nuevas de tickers con estado (O(1) por barra).
+
+    Cada ticker se lee desde su propio last_ts (agrupados por valor: normalmente una sola
+    lectura); un ticker atrasado no obliga a releer el historial de los demás.
+    """
+    by_since = {}
+    for t in tickers:
+        by_since.setdefault(state.last_ts[t], []).append(t)
+    bars = [store.read_bars(group, start=since) for since, group in sorted(by_since.items())]
+    bars = [b for b in bars if not b.empty]
+    if not bars:
+        return []
+    feats = state.update(pd.concat(bars, ignore_index=True))
+    if feats.empty:
+        return []
+    feats['date'] = feats['timestamp'].dt.date
+    return [feats.groupby(['ticker', 'date'], sort=False).tail(1)]
+
+def run(store, output_path, state_path, full=False):
+    state = None
+    if not full and os.path.exists(output_path):
+        state = IncrementalContextFeatures.load(state_path)
+    old = pd.read_parquet(output_path) if state is not None else None
+    state = state or IncrementalContextFeatures()
+
+    known = [t for t in store.tickers() if t in state.last_ts]
+    all_feat = incremental(store, state, known) if known else []
+    for ticker in store.tickers():
+        if ticker not in state.last_ts:
+            all_feat.extend(full_ticker(store, state, ticker))
+    if not all_feat:
+        print("[OK] Sin barras nuevas" if old is not None else "[WARN] No se generaron features intradía.")
+        return 0
+
+    df_feat = pd.concat(all_feat)
+    n_new = len(df_feat)
+    if old is not None and not old.empty:
+        keys = pd.MultiIndex.from_frame(df_feat[['ticker', 'date']])
+        old = old[~pd.MultiIndex.from_frame(old[['ticker', 'date']]).isin(keys)]
+        df_feat = pd.concat([old, df_feat[old.columns]])
+    df_feat = df_feat.sort_values(['ticker', 'date'], kind='stable')
+    # Salida antes que el estado: si se corta entre ambos, la siguiente corrida rehace los mismos días
+    tmp = output_path + '.tmp'
+    df_feat.to_parquet(tmp, index=False, compression='snappy')
+    os.replace(tmp, output_path)
+    state.save(state_path)
+    print(f"[OK] Features intradía guardados en {output_path} ({n_new} filas actualizadas)")
+    return n_new
+
 def main():
-    input_dir = 'data/intraday5/history/'
-    output_path = 'data/intraday5/features_intraday.parquet'
-    all_feat = []
-    for ticker_dir in glob.glob(f"{input_dir}ticker=*/"):
-        ticker = ticker_dir.split('=')[1].replace('/', '')
-        for date_dir in glob.glob(f"{ticker_dir}date=*/"):
-            for f in glob.glob(f"{date_dir}*.parquet"):
-                df = pd.read_parquet(f)
-                if df.empty:
-                    continue
-                df = compute_intraday_features(df)
-                # Agregar resumen diario (ejemplo: media, std, último valor)
-                summary = df.iloc[-1:].copy()
-                summary['ticker'] = ticker
-                summary['date'] = df['timestamp'].dt.date.iloc[-1]
-                all_feat.append(summary)
-    if all_feat:
-        df_feat = pd.concat(all_feat)
-        df_feat.to_parquet(output_path, index=False, compression='snappy')
-        print(f"[OK] Features intradía guardados en {output_path}")
-    else:
-        print("[WARN] No se generaron features intradía.")
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--input-dir', default='data/intraday5/history/')
+    ap.add_argument('--output', default='data/intraday5/features_intraday.parquet')
+    ap.add_argument('--state', default='', help='Checkpoint del estado incremental (default: <output>.state.joblib)')
+    ap.add_argument('--full', action='store_true', help='Recalcular todo el historial ignorando el estado')
+    ap.add_argument('--watch', type=float, default=0, help='Repetir cada N segundos (0 = una sola corrida)')
+    args = ap.parse_args()
+    state_path = args.state or args.output + '.state.joblib'
+
+    run(HistoryStore(args.input_dir), args.output, state_path, full=args.full)
+    while args.watch > 0:
+        time.sleep(args.watch)
+        # Store nuevo en cada vuelta: HistoryStore cachea el manifest y no vería barras escritas por otro proceso
+        run(HistoryStore(args.input_dir), args.output, state_path)
 
 if __name__ == "__main__":
     main()
@@ -1,64 +1,72 @@
 # Script: 10_train_direction_ensemble.py
 # Entrena modelos base (RF, XGBoost, CatBoost) y meta-learner para stacking/blending
+# Los modelos base se ajustan en paralelo bajo CPU_BUDGET y sus predicciones de
+# validación se cachean (models/cache/ensemble); ver utils/ensemble_trainer.py.
+import argparse
+import os
+import sys
+
+import joblib
 import pandas as pd
-import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from xgboost import XGBClassifier
-from catboost import CatBoostClassifier
 from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import roc_auc_score
-import joblib
-import os
+from sklearn.model_selection import train_test_split
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from utils.ensemble_trainer import (ArtifactCache, BASE_LEARNERS, CACHE_DIR, cpu_budget,
+                                    fit_base_learners, fit_report, stack_preds)
 
 FEATURES_PATH = 'data/daily/features_with_targets.parquet'
 MODEL_DIR = 'models/direction/'
 
 
 def load_data():
-    df = pd.read_parquet(FEATURES_PATH)
+    feature_cols = ['ret_1d', 'ret_5d', 'ret_20d', 'vol_5d', 'vol_20d', 'atr_14d', 'pos_in_range_20d']
+    df = pd.read_parquet(FEATURES_PATH, columns=feature_cols + ['target'])
     df = df.dropna(subset=['target'])  # Solo samples con label
-    
+
     # Features para modelo
-    feature_cols = ['ret_1d', 'ret_5d', 'ret_20d', 'vol_5d', 'vol_20d', 'atr_14d', 'pos_in_range_20d']
     X = df[feature_cols]
     y = df['target']
-    
+
     print(f"[INFO] Dataset: {len(X)} samples, {X.shape[1]} features")
     print(f"[INFO] Target balance: {y.mean():.2%} positive")
-    
+
     return X, y
 
-def train_ensemble(X, y):
+
+def train_ensemble(X, y, budget=None, cache=None):
     X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
-    rf = RandomForestClassifier(n_estimators=100, random_state=42)
-    xgb = XGBClassifier(n_estimators=100, random_state=42, use_label_encoder=False, eval_metric='logloss')
-    cat = CatBoostClassifier(iterations=100, verbose=0, random_state=42)
-    rf.fit(X_train, y_train)
-    xgb.fit(X_train, y_train)
-    cat.fit(X_train, y_train)
-    # Meta-learner (stacking)
-    val_preds = np.column_stack([
-        rf.predict_proba(X_val)[:,1],
-        xgb.predict_proba(X_val)[:,1],
-        cat.predict_proba(X_val)[:,1]
-    ])
+    budget = budget or cpu_budget()
+    print(f"[INFO] CPU budget: {budget} hilos para {len(BASE_LEARNERS)} learners")
+    results = fit_base_learners(X_train, y_train, {'val': X_val}, fold='holdout', budget=budget, cache=cache)
+    print(fit_report(results).to_string(index=False))
+
+    # Meta-learner (stacking) sobre predicciones de validación (cacheadas)
+    val_preds = stack_preds(results, 'val')
     meta = LogisticRegression()
     meta.fit(val_preds, y_val)
     # Save models
     os.makedirs(MODEL_DIR, exist_ok=True)
-    joblib.dump(rf, MODEL_DIR+'rf.joblib')
-    joblib.dump(xgb, MODEL_DIR+'xgb.joblib')
-    joblib.dump(cat, MODEL_DIR+'cat.joblib')
-    joblib.dump(meta, MODEL_DIR+'meta.joblib')
+    for name in BASE_LEARNERS:
+        joblib.dump(results[name]['model'], MODEL_DIR + f'{name}.joblib')
+    joblib.dump(meta, MODEL_DIR + 'meta.joblib')
     print('[OK] Modelos base y meta-learner guardados')
     # Métrica
-    auc = roc_auc_score(y_val, meta.predict_proba(val_preds)[:,1])
+    auc = roc_auc_score(y_val, meta.predict_proba(val_preds)[:, 1])
     print(f'[AUC] Ensemble stacking: {auc:.4f}')
 
+
 def main():
+    ap = argparse.ArgumentParser(description="Entrena el ensemble de dirección (stacking)")
+    ap.add_argument('--cpu-budget', type=int, default=None, help='Hilos totales (default: CPU_BUDGET o nº de CPUs)')
+    ap.add_argument('--no-cache', action='store_true', help='Reentrena aunque haya artefactos en caché')
+    ap.add_argument('--cache-dir', default=str(CACHE_DIR))
+    args = ap.parse_args()
+
     X, y = load_data()
-    train_ensemble(X, y)
+    train_ensemble(X, y, budget=args.cpu_budget, cache=ArtifactCache(args.cache_dir, enabled=not args.no_cache))
+
 
 if __name__ == "__main__":
     main()
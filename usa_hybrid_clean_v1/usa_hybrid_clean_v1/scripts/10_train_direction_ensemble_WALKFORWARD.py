@@ -1,201 +1,232 @@
 # Script: 10_train_direction_ensemble_WALKFORWARD.py
 # Entrena ensemble con WALK-FORWARD VALIDATION (sin leakage)
-import pandas as pd
+# Artefactos por fold (modelos base, predicciones OOS, meta, curva de calibración)
+# cacheados por hash de la ventana de train/test + hiperparámetros: una
+# re-validación mensual solo entrena el fold nuevo. Folds independientes en paralelo.
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from xgboost import XGBClassifier
-from catboost import CatBoostClassifier
+import pandas as pd
 from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import TimeSeriesSplit
 from sklearn.metrics import roc_auc_score, brier_score_loss
-import joblib
-import os
+from sklearn.model_selection import TimeSeriesSplit
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from utils.ensemble_trainer import (ArtifactCache, BASE_LEARNERS, CACHE_DIR, DEFAULT_PARAMS, calibration_table,
+                                    cpu_budget, data_hash, fit_base_learners, fit_report, monthly_folds,
+                                    params_hash, split_threads, stack_preds)
 
 FEATURES_PATH = 'data/daily/features_enhanced_binary_targets.parquet'
 TARGET_COL = 'target_binary'
 MODEL_DIR = 'models/direction/'
 VAL_DIR = 'val/'
+META_PARAMS = {'max_iter': 1000, 'random_state': 42}
 
-def train_ensemble_walkforward():
-    """
-    Walk-forward validation con TimeSeriesSplit
-    - Train en ventanas pasadas
-    - Test en ventana futura
-    - Sin contamination entre splits
-    """
+
+def load_dataset():
     print("[INFO] Cargando datos...")
     df = pd.read_parquet(FEATURES_PATH)
     df = df.dropna(subset=[TARGET_COL])
-    df = df.sort_values('timestamp').reset_index(drop=True)
-    
+    # Orden estable (timestamp, ticker): las ventanas de train no cambian de hash al agregar datos nuevos
+    df = df.sort_values(['timestamp', 'ticker'], kind='mergesort').reset_index(drop=True)
+
     # Features mejoradas (excluir columns auxiliares)
     exclude_cols = ['timestamp', 'ticker', TARGET_COL, 'target', 'target_ordinal', 'open', 'high', 'low', 'close', 'volume',
                     'close_fwd', 'ret_fwd', 'thr_up', 'thr_dn', 'atr_pct_w', 'k', 'regime',
                     'prev_close', 'hh_20', 'll_20', 'hh_60', 'll_60',
                     'vol_avg_20', 'is_up', 'dow', 'day_of_month']
     feature_cols = [c for c in df.columns if c not in exclude_cols]
-    
+
     # Remover features con muchos NaN
     feature_cols = [c for c in feature_cols if df[c].notna().sum() > len(df) * 0.8]
-    
+
     print(f"[INFO] Features seleccionadas: {len(feature_cols)}")
     print(f"[INFO] Features: {', '.join(feature_cols[:10])}...")
-    
-    df_clean = df.dropna(subset=feature_cols)
+
+    df_clean = df.dropna(subset=feature_cols).reset_index(drop=True)
+    print(f"[INFO] Dataset cleaned: {len(df_clean)} samples")
+    print(f"[INFO] Date range: {df_clean['timestamp'].min()} to {df_clean['timestamp'].max()}")
+    return df_clean, feature_cols
+
+
+def make_folds(timestamps, split: str, n_folds: int):
+    if split == 'tscv':
+        tscv = TimeSeriesSplit(n_splits=n_folds)
+        return [(str(i + 1), tr, te) for i, (tr, te) in enumerate(tscv.split(timestamps))]
+    return monthly_folds(timestamps, n_test_months=n_folds)
+
+
+def run_fold(label, train_idx, test_idx, X, y, feature_cols, budget, cache):
+    """Entrena (o recupera del caché) un fold completo."""
+    X_train, X_test = X[train_idx], X[test_idx]
+    y_train, y_test = y[train_idx], y[test_idx]
+    fold_key = data_hash(X_train, y_train, X_test, y_test, np.asarray(feature_cols))
+    meta_key = f"wf-fold-{params_hash([DEFAULT_PARAMS, META_PARAMS])}-{fold_key[:16]}"
+
+    art = cache.get(meta_key)
+    if art is not None:
+        return {**art, 'cached': True}
+
+    base = fit_base_learners(X_train, y_train, {'train': X_train, 'test': X_test}, fold=f"wf{label}",
+                             budget=budget, cache=cache, data_key=fold_key)
+    # Meta-learner en train (predicciones in-sample de los modelos base)
+    meta = LogisticRegression(**META_PARAMS)
+    meta.fit(stack_preds(base, 'train'), y_train)
+    prob_pred = meta.predict_proba(stack_preds(base, 'test'))[:, 1]
+
+    art = {
+        'meta': meta,
+        'prob_pred': prob_pred,
+        'auc': roc_auc_score(y_test, prob_pred) if len(np.unique(y_test)) > 1 else np.nan,
+        'brier': brier_score_loss(y_test, prob_pred),
+        'calibration': calibration_table(y_test, prob_pred),
+        'report': fit_report(base, fold=label),
+    }
+    cache.put(meta_key, art)
+    return {**art, 'cached': False}
+
+
+def train_ensemble_walkforward(split='monthly', n_folds=6, budget=None, fold_workers=None, cache=None):
+    """
+    Walk-forward validation
+    - monthly (default): test = cada uno de los últimos `n_folds` meses, train = todo lo anterior
+    - tscv: TimeSeriesSplit(n_folds) como antes (fronteras se mueven al crecer el dataset)
+    - Sin contamination entre splits
+    """
+    cache = cache or ArtifactCache()
+    budget = budget or cpu_budget()
+    df_clean, feature_cols = load_dataset()
     X = df_clean[feature_cols].values
     y = df_clean[TARGET_COL].values
     timestamps = df_clean['timestamp'].values
-    
-    print(f"[INFO] Dataset cleaned: {len(X)} samples")
-    print(f"[INFO] Date range: {df_clean['timestamp'].min()} to {df_clean['timestamp'].max()}")
-    
-    # Walk-forward con 5 folds
-    tscv = TimeSeriesSplit(n_splits=5)
-    
+    tickers = df_clean['ticker'].values
+
+    folds = make_folds(timestamps, split, n_folds)
+    workers = fold_workers or max(1, min(len(folds), budget // len(BASE_LEARNERS)))
+    fold_budgets = split_threads(budget, workers)
+    print(f"[INFO] {len(folds)} folds ({split}) | CPU budget {budget} | {workers} folds en paralelo")
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futs = [ex.submit(run_fold, label, tr, te, X, y, feature_cols, fold_budgets[i % workers], cache)
+                for i, (label, tr, te) in enumerate(folds)]
+        outs = [f.result() for f in futs]
+
     fold_results = []
-    all_predictions = []
-    
-    for fold_idx, (train_idx, test_idx) in enumerate(tscv.split(X)):
-        print(f"\n{'='*60}")
-        print(f"FOLD {fold_idx + 1}/5")
-        print(f"{'='*60}")
-        
-        X_train, X_test = X[train_idx], X[test_idx]
-        y_train, y_test = y[train_idx], y[test_idx]
-        
+    pred_frames = []
+    calib_frames = []
+    reports = []
+    for (label, train_idx, test_idx), out in zip(folds, outs):
         train_dates = pd.to_datetime(timestamps[train_idx])
         test_dates = pd.to_datetime(timestamps[test_idx])
-        
-        print(f"Train: {len(X_train)} samples | {train_dates.min()} to {train_dates.max()}")
-        print(f"Test:  {len(X_test)} samples  | {test_dates.min()} to {test_dates.max()}")
-        
-        # Entrenar modelos base
-        print("[INFO] Entrenando modelos base...")
-        rf = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1)
-        xgb = XGBClassifier(n_estimators=100, random_state=42, use_label_encoder=False, eval_metric='logloss')
-        cat = CatBoostClassifier(iterations=100, verbose=0, random_state=42)
-        
-        rf.fit(X_train, y_train)
-        xgb.fit(X_train, y_train)
-        cat.fit(X_train, y_train)
-        
-        # Predicciones en test
-        rf_pred_test = rf.predict_proba(X_test)[:, 1].reshape(-1, 1)
-        xgb_pred_test = xgb.predict_proba(X_test)[:, 1].reshape(-1, 1)
-        cat_pred_test = cat.predict_proba(X_test)[:, 1].reshape(-1, 1)
-        X_meta_test = np.hstack([rf_pred_test, xgb_pred_test, cat_pred_test])
-        
-        # Entrenar meta-learner en train
-        rf_pred_train = rf.predict_proba(X_train)[:, 1].reshape(-1, 1)
-        xgb_pred_train = xgb.predict_proba(X_train)[:, 1].reshape(-1, 1)
-        cat_pred_train = cat.predict_proba(X_train)[:, 1].reshape(-1, 1)
-        X_meta_train = np.hstack([rf_pred_train, xgb_pred_train, cat_pred_train])
-        
-        meta = LogisticRegression(max_iter=1000, random_state=42)
-        meta.fit(X_meta_train, y_train)
-        
-        # Predecir en test con meta
-        prob_pred = meta.predict_proba(X_meta_test)[:, 1]
-        
-        # Métricas OOS
-        auc = roc_auc_score(y_test, prob_pred)
-        brier = brier_score_loss(y_test, prob_pred)
-        
-        print(f"\n[RESULTS] Fold {fold_idx + 1}:")
-        print(f"  AUC:   {auc:.4f}")
-        print(f"  Brier: {brier:.4f}")
-        
+        print(f"\n{'='*60}")
+        print(f"FOLD {label} {'(cache)' if out['cached'] else ''}")
+        print(f"{'='*60}")
+        print(f"Train: {len(train_idx)} samples | {train_dates.min()} to {train_dates.max()}")
+        print(f"Test:  {len(test_idx)} samples  | {test_dates.min()} to {test_dates.max()}")
+        print(f"  AUC:   {out['auc']:.4f}")
+        print(f"  Brier: {out['brier']:.4f}")
+
         fold_results.append({
-            'fold': fold_idx + 1,
-            'train_samples': len(X_train),
-            'test_samples': len(X_test),
+            'fold': label,
+            'train_samples': len(train_idx),
+            'test_samples': len(test_idx),
             'train_start': train_dates.min(),
             'train_end': train_dates.max(),
             'test_start': test_dates.min(),
             'test_end': test_dates.max(),
-            'auc': auc,
-            'brier': brier,
-            'target_mean': y_test.mean()
+            'auc': out['auc'],
+            'brier': out['brier'],
+            'target_mean': y[test_idx].mean(),
+            'cached': out['cached'],
         })
-        
-        # Guardar predicciones OOS
-        for i, idx in enumerate(test_idx):
-            all_predictions.append({
-                'fold': fold_idx + 1,
-                'idx': idx,
-                'timestamp': timestamps[idx],
-                'ticker': df.loc[idx, 'ticker'],
-                'y_true': y_test[i],
-                'prob_pred': prob_pred[i]
-            })
-    
+        pred_frames.append(pd.DataFrame({
+            'fold': label,
+            'idx': test_idx,
+            'timestamp': timestamps[test_idx],
+            'ticker': tickers[test_idx],
+            'y_true': y[test_idx],
+            'prob_pred': out['prob_pred'],
+        }))
+        calib_frames.append(out['calibration'].assign(fold=label))
+        reports.append(out['report'])
+
     # Resumen global
     print(f"\n{'='*60}")
     print("RESUMEN WALK-FORWARD VALIDATION")
     print(f"{'='*60}")
-    
+
     fold_df = pd.DataFrame(fold_results)
     print("\n", fold_df.to_string(index=False))
-    
+    print("\n", pd.concat(reports, ignore_index=True).to_string(index=False))
+
     avg_auc = fold_df['auc'].mean()
     avg_brier = fold_df['brier'].mean()
-    
+
     print(f"\n📊 Métricas Promedio (OOS):")
     print(f"  AUC:   {avg_auc:.4f} ± {fold_df['auc'].std():.4f}")
     print(f"  Brier: {avg_brier:.4f} ± {fold_df['brier'].std():.4f}")
-    
+
     # Guardar resultados
     os.makedirs(VAL_DIR, exist_ok=True)
     fold_df.to_csv(VAL_DIR + 'walkforward_results.csv', index=False)
-    
-    pred_df = pd.DataFrame(all_predictions)
-    pred_df.to_parquet(VAL_DIR + 'oos_predictions.parquet', index=False)
-    
+    pd.concat(pred_frames, ignore_index=True).to_parquet(VAL_DIR + 'oos_predictions.parquet', index=False)
+    pd.concat(calib_frames, ignore_index=True).to_csv(VAL_DIR + 'walkforward_calibration.csv', index=False)
+
     print(f"\n[OK] Resultados guardados en {VAL_DIR}")
-    
+
     # Re-entrenar en TODO el dataset para producción
     print(f"\n{'='*60}")
     print("RE-ENTRENAMIENTO EN DATASET COMPLETO (PRODUCCIÓN)")
     print(f"{'='*60}")
-    
+
     print("[INFO] Entrenando modelos finales...")
-    rf_final = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=-1)
-    xgb_final = XGBClassifier(n_estimators=100, random_state=42, use_label_encoder=False, eval_metric='logloss')
-    cat_final = CatBoostClassifier(iterations=100, verbose=0, random_state=42)
-    
-    rf_final.fit(X, y)
-    xgb_final.fit(X, y)
-    cat_final.fit(X, y)
-    
+    final = fit_base_learners(X, y, {'all': X}, fold='full', budget=budget, cache=cache,
+                              data_key=data_hash(X, y, np.asarray(feature_cols)))
+    print(fit_report(final, fold='full').to_string(index=False))
+
     # Meta-learner final
-    rf_pred_all = rf_final.predict_proba(X)[:, 1].reshape(-1, 1)
-    xgb_pred_all = xgb_final.predict_proba(X)[:, 1].reshape(-1, 1)
-    cat_pred_all = cat_final.predict_proba(X)[:, 1].reshape(-1, 1)
-    X_meta_all = np.hstack([rf_pred_all, xgb_pred_all, cat_pred_all])
-    
-    meta_final = LogisticRegression(max_iter=1000, random_state=42)
-    meta_final.fit(X_meta_all, y)
-    
+    meta_final = LogisticRegression(**META_PARAMS)
+    meta_final.fit(stack_preds(final, 'all'), y)
+
     # Guardar modelos
     os.makedirs(MODEL_DIR, exist_ok=True)
-    joblib.dump(rf_final, MODEL_DIR + 'rf.joblib')
-    joblib.dump(xgb_final, MODEL_DIR + 'xgb.joblib')
-    joblib.dump(cat_final, MODEL_DIR + 'cat.joblib')
+    for name in BASE_LEARNERS:
+        joblib.dump(final[name]['model'], MODEL_DIR + f'{name}.joblib')
     joblib.dump(meta_final, MODEL_DIR + 'meta.joblib')
-    
+
     print(f"[OK] Modelos finales guardados en {MODEL_DIR}")
-    
+
     return avg_auc, avg_brier
 
+
+def parse_args():
+    ap = argparse.ArgumentParser(description="Walk-forward del ensemble de dirección con caché por fold")
+    ap.add_argument('--split', choices=['monthly', 'tscv'], default='monthly')
+    ap.add_argument('--folds', type=int, default=6, help='Meses de test (monthly) o n_splits (tscv)')
+    ap.add_argument('--cpu-budget', type=int, default=None, help='Hilos totales (default: CPU_BUDGET o nº de CPUs)')
+    ap.add_argument('--fold-workers', type=int, default=None, help='Folds simultáneos (default: budget // 3)')
+    ap.add_argument('--no-cache', action='store_true', help='Reentrena todos los folds')
+    ap.add_argument('--cache-dir', default=str(CACHE_DIR))
+    return ap.parse_args()
+
+
 if __name__ == "__main__":
-    auc, brier = train_ensemble_walkforward()
-    
+    args = parse_args()
+    auc, brier = train_ensemble_walkforward(
+        split=args.split, n_folds=args.folds, budget=args.cpu_budget, fold_workers=args.fold_workers,
+        cache=ArtifactCache(args.cache_dir, enabled=not args.no_cache),
+    )
+
     print(f"\n{'='*60}")
     print("VALIDACIÓN COMPLETADA")
     print(f"{'='*60}")
     print(f"\n✅ AUC OOS:   {auc:.4f}")
     print(f"✅ Brier OOS: {brier:.4f}")
-    
+
     if auc > 0.60 and brier < 0.20:
         print("\n✅ MODELO APTO PARA PRODUCCIÓN")
     else:
@@ -7,8 +7,14 @@ import numpy as np
 import joblib
 import json
 import os
+import sys
 from pathlib import Path
 
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from utils.forecast_store import put_forecast
+from utils.inference_bundle import load_bundle
+from utils.parquet_io import column_stats, days_back, latest_date, read_date_window, resolve_dataset
+
 # Use freshest daily enhanced features (no target drop) for forward-looking inference
 FEATURES_PATH = 'data/daily/features_daily_enhanced.parquet'
 REGIME_PATH = Path('data/daily/regime_daily.csv')
@@ -17,6 +23,12 @@ CALIB_DIR = 'models/calibration/'
 POLICY_PATH = 'config/policies.yaml'
 OUTPUT_PATH = 'data/daily/signals_with_gates.parquet'
 MANIFEST_PATH = 'models/direction/feature_manifest.json'
+TRAIN_FEATURES_PATH = 'data/daily/features_enhanced_binary_targets.parquet'
+# Días calendario previos a T-1 que se leen para derivar prev_close (fallback ATR%)
+WARMUP_DAYS = 7
+REGIMES = ["low_vol", "med_vol", "high_vol"]
+BUNDLE_NAME = 'direction_daily'
+TEMPERATURE = 1.5
 
 
 def load_feature_manifest():
@@ -45,12 +57,13 @@ def normalize_date_utc(ts_col):
     ts = pd.to_datetime(ts_col, utc=True, errors="coerce")
     return ts.dt.tz_convert("UTC").dt.normalize().dt.date
 
-def load_regime_map():
-    """Carga y normaliza mapa de regímenes con fallback robusto."""
+def load_regime_map(day=None):
+    """Carga y normaliza mapa de regímenes con fallback robusto (opcionalmente solo una fecha)."""
     if not REGIME_PATH.exists():
         print(f"[WARN] No regime file at: {REGIME_PATH}")
         return pd.DataFrame(columns=["date","ticker","regime"])
-    reg = pd.read_csv(REGIME_PATH)
+    wanted = {"date", "timestamp", "ticker", "regime"}
+    reg = pd.read_csv(REGIME_PATH, usecols=lambda c: c.lower() in wanted)
     
     # Normaliza nombres esperados (case-insensitive)
     col_map = {}
@@ -78,6 +91,8 @@ def load_regime_map():
     valid_regimes = ["low_vol","med_vol","high_vol"]
     mask = reg["regime"].isin(valid_regimes)
     reg = reg.loc[mask, ["date","ticker","regime"]].drop_duplicates()
+    if day is not None:
+        reg = reg[reg["date"] == day]
     
     return reg
 
@@ -106,6 +121,93 @@ def load_calibrators_for_regime(regime: str):
     platt = joblib.load(platt_path)
     return iso, platt
 
+def load_inference_bundle():
+    """Modelos + calibradores + manifiesto + política como bundle versionado (memoizado en proceso)."""
+    import yaml
+    with open(POLICY_PATH) as f:
+        policy = yaml.safe_load(f)
+    components = {name: MODEL_DIR + f'{name}.joblib' for name in ("rf", "xgb", "cat", "meta")}
+    for regime in REGIMES:
+        components[f"iso_{regime}"] = os.path.join(CALIB_DIR, f'calibrator_iso_{regime}.joblib')
+        components[f"platt_{regime}"] = os.path.join(CALIB_DIR, f'calibrator_platt_{regime}.joblib')
+    meta = {
+        "manifest": load_feature_manifest(),
+        "temperature": TEMPERATURE,
+        "thresholds": policy.get("thresholds", {}),
+    }
+    bundle = load_bundle(BUNDLE_NAME, components, meta, required=("rf", "xgb", "cat", "meta"))
+    print(f"[INFO] Bundle de inferencia {bundle.name} v{bundle.version}")
+    calibrators = {}
+    for regime in REGIMES:
+        if bundle.get(f"iso_{regime}") is None or bundle.get(f"platt_{regime}") is None:
+            print(f"[WARN] Sin calibradores para régimen {regime}")
+            continue
+        calibrators[regime] = (bundle[f"iso_{regime}"], bundle[f"platt_{regime}"])
+    return {
+        "models": (bundle["rf"], bundle["xgb"], bundle["cat"], bundle["meta"]),
+        "calibrators": calibrators,
+        "manifest": bundle.meta["manifest"],
+        "policy": policy,
+        "temperature": bundle.meta["temperature"],
+        "version": bundle.version,
+        # Clave del forecast store: ordena cronológicamente como texto
+        "store_version": f"{bundle.created_at.replace('-', '').replace(':', '')}-{bundle.version}",
+    }
+
+def load_t1_features(path=FEATURES_PATH):
+    """Lee solo la ventana [T-1 - WARMUP_DAYS, T-1] del dataset de features.
+
+    T-1 = fecha más reciente <= hoy (NY) según particiones o estadísticas de
+    row groups; no se carga la historia completa.
+    """
+    from zoneinfo import ZoneInfo
+    src = resolve_dataset(path)
+    today_ny = pd.Timestamp.now(tz=ZoneInfo("America/New_York")).date()
+    t_minus_1 = latest_date(src, until=today_ny)
+    if t_minus_1 is None:
+        return None, None
+    df = read_date_window(src, days_back(t_minus_1, WARMUP_DAYS), t_minus_1)
+    print(f"[INFO] Leídas {len(df)} filas de {src} (ventana {days_back(t_minus_1, WARMUP_DAYS)}..{t_minus_1})")
+    return df, t_minus_1
+
+def atr_percentiles(manifest, atr_col, path=FEATURES_PATH):
+    """Percentiles p33/p66 de ATR% persistidos en entrenamiento (feature_manifest.json).
+
+    Si el manifiesto no los trae, se calculan sobre la historia completa leyendo
+    solo las columnas necesarias (comportamiento previo, más lento).
+    """
+    saved = (manifest or {}).get("atr_pct_percentiles") or {}
+    if saved.get("column") == atr_col and "p33" in saved and "p66" in saved:
+        return float(saved["p33"]), float(saved["p66"])
+    print("[WARN] Manifiesto sin atr_pct_percentiles; calculando sobre historia completa (regenerar manifiesto)")
+    import pyarrow.dataset as ds
+    src = resolve_dataset(path)
+    names = ds.dataset(src, format="parquet", partitioning="hive").schema.names
+    if atr_col not in names:
+        hist = pd.read_parquet(src, columns=["timestamp", "ticker", "close", "atr_14d"])
+        hist = hist.sort_values(["ticker", "timestamp"])
+        vals = hist["atr_14d"] / hist.groupby("ticker")["close"].shift(1)
+    else:
+        vals = pd.read_parquet(src, columns=[atr_col])[atr_col]
+    p33, p66 = np.nanpercentile(vals.dropna(), [33, 66])
+    return p33, p66
+
+def train_feature_columns(exclude_cols, path=TRAIN_FEATURES_PATH):
+    """Columnas numéricas con >80% no nulos del parquet de entrenamiento, desde metadata."""
+    import pyarrow as pa
+    allowed = []
+    for name, (dtype, notna_frac) in column_stats(path).items():
+        if name in exclude_cols:
+            continue
+        if not (pa.types.is_integer(dtype) or pa.types.is_floating(dtype) or pa.types.is_boolean(dtype)):
+            continue
+        if notna_frac is None:
+            col = pd.read_parquet(path, columns=[name])[name]
+            notna_frac = col.notna().mean()
+        if notna_frac > 0.8:
+            allowed.append(name)
+    return allowed
+
 def infer_ensemble(X, rf, xgb, cat, meta):
     base_preds = np.column_stack([
         rf.predict_proba(X)[:,1],
@@ -128,14 +230,28 @@ def apply_gates(df, prob_col, policy):
 
 def main():
     print("[INFO] Cargando features y régimen...")
-    df = pd.read_parquet(FEATURES_PATH)
+    df, t_minus_1 = load_t1_features()
+    if t_minus_1 is None:
+        print("[WARN] No hay fechas disponibles <= hoy en features_daily_enhanced")
+        return
 
     # Normaliza fechas y tickers para merge robusto
     df["date"] = normalize_date_utc(df["timestamp"])
     df["ticker"] = df["ticker"].astype(str).str.upper()
+    df = df.sort_values(["ticker", "timestamp"])
+
+    # Si no hay ATR% materializado, prev_close requiere la ventana previa a T-1
+    if "atr_pct" not in df.columns and "atr_pct_w" not in df.columns and {"atr_14d", "close"} <= set(df.columns):
+        df["prev_close"] = df.groupby("ticker")["close"].shift(1)
+        df["atr_pct"] = df["atr_14d"] / df["prev_close"]
+
+    # Limitar a T-1 (NY) para forward-looking
+    before = len(df)
+    df = df[df['date'] == t_minus_1].copy()
+    print(f"[INFO] Filtrado a T-1={t_minus_1}: {len(df)}/{before} filas")
 
-    # Carga y merge de regímenes con fallback
-    reg = load_regime_map()
+    # Carga y merge de regímenes (solo T-1) con fallback
+    reg = load_regime_map(day=t_minus_1)
     
     if len(reg) > 0:
         df = df.merge(reg, how="left", on=["date","ticker"])
@@ -145,6 +261,9 @@ def main():
         df["regime"] = np.nan
         missing = len(df)
 
+    bundle = load_inference_bundle()
+    manifest = bundle["manifest"]
+
     # Rellena regímenes faltantes usando ATR% del día
     if missing:
         print(f"[INFO] Regímenes faltantes: {missing}. Derivando por ATR%...")
@@ -152,21 +271,15 @@ def main():
         if "regime" not in df.columns:
             df["regime"] = np.nan
             
-        # Calcular percentiles globales una única vez para fallback estable
         atr_col = 'atr_pct' if 'atr_pct' in df.columns else 'atr_pct_w'
         if atr_col not in df.columns:
-            # Si no hay ATR, calcular de atr_14d/prev_close
-            if 'atr_14d' in df.columns and 'close' in df.columns:
-                df['prev_close'] = df.groupby('ticker')['close'].shift(1)
-                df['atr_pct'] = df['atr_14d'] / df['prev_close']
-                atr_col = 'atr_pct'
-            else:
-                print("[WARN] No se puede calcular ATR%; usando régimen 'med_vol' por defecto")
-                df['regime'] = df['regime'].fillna('med_vol')
-                atr_col = None
+            print("[WARN] No se puede calcular ATR%; usando régimen 'med_vol' por defecto")
+            df['regime'] = df['regime'].fillna('med_vol')
+            atr_col = None
         
         if atr_col:
-            p33, p66 = np.nanpercentile(df[atr_col].dropna(), [33, 66])
+            # Percentiles globales de entrenamiento para fallback estable
+            p33, p66 = atr_percentiles(manifest, atr_col)
             df["atr_pct_p33"] = p33
             df["atr_pct_p66"] = p66
             # Vectorized regime assignment by percentiles
@@ -175,19 +288,6 @@ def main():
             df.loc[df["regime"].isna(), "regime"] = "med_vol"
         print(f"[INFO] Regímenes derivados completados.")
 
-    # Limitar a T-1 (NY) para forward-looking
-    from zoneinfo import ZoneInfo
-    ny = ZoneInfo("America/New_York")
-    today_ny = pd.Timestamp.now(tz=ny).date()
-    available_dates = sorted(d for d in df['date'].dropna().unique() if d <= today_ny)
-    if not available_dates:
-        print("[WARN] No hay fechas disponibles <= hoy en features_daily_enhanced")
-        return
-    t_minus_1 = available_dates[-1]  # usa la fecha más reciente disponible
-    before = len(df)
-    df = df[df['date'] == t_minus_1].copy()
-    print(f"[INFO] Filtrado a T-1={t_minus_1}: {len(df)}/{before} filas")
-
     # Sanity check final para valores inválidos
     valid_regimes = ["low_vol","med_vol","high_vol"]
     bad = ~df["regime"].isin(valid_regimes)
@@ -201,8 +301,6 @@ def main():
         return
 
     # Selección de features consistente con entrenamiento
-    manifest = load_feature_manifest()
-    
     if manifest:
         # Usar manifiesto para alineación determinística
         required_features = manifest['feature_names']
@@ -233,18 +331,14 @@ def main():
         feature_cols = [c for c in feature_cols if df[c].notna().sum() > len(df) * 0.8]
         feature_cols = [c for c in feature_cols if pd.api.types.is_numeric_dtype(df[c])]
         
-        # Alinear columnas a las usadas en entrenamiento
+        # Alinear columnas a las usadas en entrenamiento (metadata del parquet, sin leer datos)
         try:
-            df_train_like = pd.read_parquet('data/daily/features_enhanced_binary_targets.parquet')
-            exclude_train = set(exclude_cols)
-            allowed_train = [c for c in df_train_like.columns if c not in exclude_train and pd.api.types.is_numeric_dtype(df_train_like[c])]
-            allowed_train = [c for c in allowed_train if df_train_like[c].notna().sum() > len(df_train_like) * 0.8]
-            feature_cols = [c for c in feature_cols if c in set(allowed_train)]
+            allowed_train = set(train_feature_columns(set(exclude_cols)))
+            feature_cols = [c for c in feature_cols if c in allowed_train]
         except Exception:
             pass
 
-    print("[INFO] Cargando modelos...")
-    rf, xgb, cat, meta = load_models()
+    rf, xgb, cat, meta = bundle["models"]
     expected_n = getattr(rf, 'n_features_in_', None)
     if expected_n is not None and len(feature_cols) != expected_n:
         if len(feature_cols) > expected_n:
@@ -260,14 +354,14 @@ def main():
     # Ensemble + calibración por régimen
     print("[INFO] Generando predicciones (ensemble → temperature → iso/platt blend)...")
     df['prob_raw'] = infer_ensemble(X, rf, xgb, cat, meta)
-    df['prob_temp'] = temperature_scale(df['prob_raw'].values, T=1.5)
+    df['prob_temp'] = temperature_scale(df['prob_raw'].values, T=bundle["temperature"])
 
     # Calibración vectorizada por régimen
     prob_final = np.zeros(len(df), dtype=float)
     for regime in df['regime'].unique():
         idx = (df['regime'] == regime)
         p_temp = df.loc[idx, 'prob_temp'].values
-        iso, platt = load_calibrators_for_regime(regime)
+        iso, platt = bundle["calibrators"].get(regime) or load_calibrators_for_regime(regime)
         # Isotonic: predict directamente sobre p_temp
         p_iso = iso.predict(p_temp)
         # Platt: logistic sobre logit(p_temp)
@@ -280,12 +374,8 @@ def main():
     # Alias para planner
     df['prob_win_cal'] = df['prob_win']
 
-    # Cargar política y aplicar gates
-    import yaml
-    with open(POLICY_PATH) as f:
-        policy = yaml.safe_load(f)
-
-    df_filtered = apply_gates(df, 'prob_win', policy)
+    # Aplicar gates de la política
+    df_filtered = apply_gates(df, 'prob_win', bundle["policy"])
 
     print(f"[OK] {len(df_filtered)} señales válidas tras gates")
     
@@ -303,6 +393,10 @@ def main():
     
     df_filtered.to_parquet(OUTPUT_PATH, index=False, compression='snappy')
     print(f"[OK] Guardado en {OUTPUT_PATH}")
+    # Store por fecha as-of (consultas O(1 día) para planners/gates/dashboards); la partición
+    # de T-1 se reemplaza completa, también vacía, para que coincida con OUTPUT_PATH
+    if put_forecast(df_filtered, model=BUNDLE_NAME, version=bundle["store_version"], asof=t_minus_1):
+        print(f"[OK] Forecast store: {BUNDLE_NAME} v{bundle['store_version']} asof={t_minus_1}")
 
 if __name__ == "__main__":
     main()
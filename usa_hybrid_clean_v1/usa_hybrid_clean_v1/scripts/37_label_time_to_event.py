@@ -7,13 +7,45 @@ para entrenar modelos de time-to-hit.
 
 Input: simulate_results*.csv (históricos)
 Output: time_to_event_labeled.parquet
+
+Con --incremental solo se etiquetan los meses cuyo archivo de trades cambió
+(path, mtime o tamaño distintos de los registrados en <output>.watermark.json);
+sus meses se reemplazan y el resto se conserva.
 """
 
 import pandas as pd
+import numpy as np
 import argparse
+import json
 import os
 from pathlib import Path
 
+TRADE_FILES = [
+    "trades_detailed_enriched.csv",
+    "trades_detailed.csv",
+    "simulate_results_merged.csv",
+    "simulate_results_all.csv",
+]
+
+# Columnas copiadas de los trades -> default si la columna no existe
+FEATURE_DEFAULTS = {
+    'prob_win': 0.5,
+    'y_hat': 0.0,
+    'tp_pct': 0.06,
+    'sl_pct': 0.01,
+    'horizon_days': 3,
+    'atr_pct': 0.02,
+    'rsi14': 50.0,
+    'vol_z': 0.0,
+    'pattern_weight': 1.0,
+    'pscore_adj': 1.0,
+    'double_top': 0,
+    'double_bottom': 0,
+    'sector': 'all',
+    'pnl': 0.0,
+    'actual_return': 0.0,
+}
+
 def label_time_to_event(trades_df):
     """
     Procesa trades históricos y genera etiquetas para TTH.
@@ -24,70 +56,88 @@ def label_time_to_event(trades_df):
     Returns:
         DataFrame con time_to_event_days, event_type, features
     """
-    labeled = []
-    
-    for _, row in trades_df.iterrows():
-        # Calcular tiempo hasta evento
-        if pd.notna(row.get('entry_date')) and pd.notna(row.get('exit_date')):
-            entry = pd.to_datetime(row['entry_date'])
-            exit_date = pd.to_datetime(row['exit_date'])
-            time_to_event = (exit_date - entry).days
-        else:
-            # Si no hay exit_date, usar horizon_days como censura
-            time_to_event = row.get('horizon_days', 3)
-        
-        # Determinar tipo de evento
-        outcome = str(row.get('outcome', row.get('close_reason', 'CENSORED'))).upper()
-        
-        if 'TP' in outcome or outcome == 'WIN':
-            event_type = 'TP'
-            event_observed = 1
-        elif 'SL' in outcome or outcome == 'LOSS':
-            event_type = 'SL'
-            event_observed = 1
-        else:
-            # EXPIRE, HORIZON, CENSORED
-            event_type = 'CENSORED'
-            event_observed = 0
-        
-        # Features al momento de la señal
-        features = {
-            'ticker': row.get('ticker', ''),
-            'entry_date': row.get('entry_date', ''),
-            'time_to_event_days': time_to_event,
-            'event_type': event_type,
-            'event_observed': event_observed,
-            
-            # Features predictivas
-            'prob_win': row.get('prob_win', 0.5),
-            'y_hat': row.get('y_hat', 0.0),
-            'abs_y_hat': abs(row.get('y_hat', 0.0)),
-            'tp_pct': row.get('tp_pct', 0.06),
-            'sl_pct': row.get('sl_pct', 0.01),
-            'horizon_days': row.get('horizon_days', 3),
-            
-            # Indicadores técnicos
-            'atr_pct': row.get('atr_pct', 0.02),
-            'rsi14': row.get('rsi14', 50.0),
-            'vol_z': row.get('vol_z', 0.0),
-            
-            # Patrones
-            'pattern_weight': row.get('pattern_weight', 1.0),
-            'pscore_adj': row.get('pscore_adj', 1.0),
-            'double_top': row.get('double_top', 0),
-            'double_bottom': row.get('double_bottom', 0),
-            
-            # Contexto
-            'sector': row.get('sector', 'all'),
-            
-            # Resultado real
-            'pnl': row.get('pnl', 0.0),
-            'actual_return': row.get('actual_return', 0.0),
-        }
-        
-        labeled.append(features)
-    
-    return pd.DataFrame(labeled)
+    n = len(trades_df)
+
+    def col(name, default):
+        return trades_df[name] if name in trades_df.columns else pd.Series([default] * n, index=trades_df.index)
+
+    # Tiempo hasta evento: diferencia de fechas vectorizada; sin exit_date, horizon_days como censura
+    entry = pd.to_datetime(col('entry_date', None), errors='coerce', format='mixed')
+    exit_date = pd.to_datetime(col('exit_date', None), errors='coerce', format='mixed')
+    has_dates = col('entry_date', None).notna() & col('exit_date', None).notna()
+    time_to_event = (exit_date - entry).dt.days.where(has_dates, col('horizon_days', 3))
+
+    # Tipo de evento: mapeo sobre las categorías (valores únicos), no por fila
+    if 'outcome' in trades_df.columns:
+        outcome = trades_df['outcome']
+    else:
+        outcome = col('close_reason', 'CENSORED')
+    outcome = pd.Categorical(outcome.astype(str).str.upper())
+
+    def event_of(o):
+        if 'TP' in o or o == 'WIN':
+            return 'TP'
+        if 'SL' in o or o == 'LOSS':
+            return 'SL'
+        return 'CENSORED'  # EXPIRE, HORIZON, CENSORED
+
+    labels = np.array([event_of(c) for c in outcome.categories] + ['CENSORED'], dtype=object)
+    event_type = labels[outcome.codes]
+
+    out = pd.DataFrame({
+        'ticker': col('ticker', ''),
+        'entry_date': col('entry_date', ''),
+        'time_to_event_days': time_to_event,
+        'event_type': event_type,
+        'event_observed': (event_type != 'CENSORED').astype(int),
+    })
+    # Features al momento de la señal, indicadores, patrones, contexto y resultado real
+    for name, default in FEATURE_DEFAULTS.items():
+        out[name] = col(name, default)
+    out.insert(out.columns.get_loc('tp_pct'), 'abs_y_hat', out['y_hat'].abs())
+    return out.reset_index(drop=True)
+
+def _watermark_path(output):
+    return Path(str(output) + ".watermark.json")
+
+def read_watermark(output):
+    """{'watermark': mtime máximo etiquetado, 'files': {mes: {'path', 'mtime', 'size'}}} o None."""
+    p = _watermark_path(output)
+    if not p.exists() or not Path(output).exists():
+        return None
+    return json.loads(p.read_text(encoding="utf-8"))
+
+def write_watermark(output, files):
+    state = {'watermark': max((f['mtime'] for f in files.values()), default=0.0), 'files': files}
+    _watermark_path(output).write_text(json.dumps(state, indent=2, sort_keys=True), encoding="utf-8")
+
+def read_month_trades(month_dir):
+    """Primer archivo de trades legible del mes → (path, DataFrame) o (None, None)."""
+    for fname in TRADE_FILES:
+        fpath = month_dir / fname
+        if fpath.exists():
+            try:
+                return fpath, pd.read_csv(fpath)
+            except Exception as e:
+                print(f"[label_tth] Error leyendo {fpath}: {e}")
+    return None, None
+
+def _current_file(month_dir):
+    for fname in TRADE_FILES:
+        if (month_dir / fname).exists():
+            return month_dir / fname
+    return None
+
+def _file_entry(fpath):
+    st = os.stat(fpath)
+    return {'path': str(fpath), 'mtime': st.st_mtime, 'size': st.st_size}
+
+def _unchanged(fpath, prev):
+    """Mismo archivo que el etiquetado: se compara contra su propio mtime/tamaño, no un watermark global."""
+    if fpath is None or not prev or prev['path'] != str(fpath):
+        return False
+    cur = _file_entry(fpath)
+    return cur['mtime'] == prev['mtime'] and cur['size'] == prev.get('size', cur['size'])
 
 def main():
     ap = argparse.ArgumentParser()
@@ -98,6 +148,8 @@ def main():
     ap.add_argument("--output", default="data/trading/time_to_event_labeled.parquet")
     ap.add_argument("--min-trades", type=int, default=5, 
                     help="Mínimo de trades por mes para incluir")
+    ap.add_argument("--incremental", action="store_true",
+                    help="Solo etiquetar meses cuyo archivo de trades cambió desde la última corrida")
     args = ap.parse_args()
     
     # Buscar archivos de trades históricos
@@ -111,45 +163,57 @@ def main():
         months = [d.name for d in trades_dir.iterdir() 
                   if d.is_dir() and d.name.count('-') == 1]
     
+    state = read_watermark(args.output) if args.incremental else None
+    files = dict(state['files']) if state else {}
+    if state:
+        print(f"[label_tth] Incremental: watermark={pd.Timestamp(state['watermark'], unit='s')} "
+              f"({len(files)} meses etiquetados)")
+    
     print(f"[label_tth] Procesando {len(months)} meses...")
     
+    processed = []
     for month in sorted(months):
         month_dir = trades_dir / month
         
-        # Buscar archivos de trades
-        trade_files = [
-            "trades_detailed_enriched.csv",
-            "trades_detailed.csv",
-            "simulate_results_merged.csv",
-            "simulate_results_all.csv",
-        ]
-        
-        trades_df = None
-        for fname in trade_files:
-            fpath = month_dir / fname
-            if fpath.exists():
-                try:
-                    trades_df = pd.read_csv(fpath)
-                    print(f"[label_tth] {month}: {fname} ({len(trades_df)} trades)")
-                    break
-                except Exception as e:
-                    print(f"[label_tth] Error leyendo {fpath}: {e}")
+        if state:
+            fpath = _current_file(month_dir)
+            prev = files.get(month)
+            if fpath is None and prev is None:
+                continue
+            if _unchanged(fpath, prev):
+                continue
         
+        fpath, trades_df = read_month_trades(month_dir)
+        processed.append(month)
+        files.pop(month, None)
+        if fpath is not None:
+            # también se registran los meses saltados, para no releerlos si no cambian
+            files[month] = _file_entry(fpath)
         if trades_df is None or len(trades_df) < args.min_trades:
             print(f"[label_tth] {month}: skip (sin datos suficientes)")
             continue
+        print(f"[label_tth] {month}: {fpath.name} ({len(trades_df)} trades)")
         
         # Etiquetar
         labeled = label_time_to_event(trades_df)
         labeled['month'] = month
         all_trades.append(labeled)
     
-    if not all_trades:
+    if state and not processed:
+        print("[label_tth] Sin archivos nuevos ni modificados; nada que hacer")
+        return
+    
+    if state:
+        # Conservar meses no re-etiquetados del parquet existente
+        existing = pd.read_parquet(args.output)
+        all_trades.insert(0, existing[~existing['month'].astype(str).isin(processed)])
+    
+    if not any(len(t) for t in all_trades):
         print("[label_tth] ERROR: No se encontraron trades para etiquetar")
         return
     
     # Consolidar
-    df_all = pd.concat(all_trades, ignore_index=True)
+    df_all = pd.concat([t for t in all_trades if len(t)], ignore_index=True)
     
     # Filtrar registros válidos
     df_all = df_all[df_all['time_to_event_days'] > 0].copy()
@@ -170,6 +234,7 @@ def main():
     # Guardar
     os.makedirs(os.path.dirname(args.output), exist_ok=True)
     df_all.to_parquet(args.output, index=False)
+    write_watermark(args.output, files)
     print(f"\n[label_tth] Guardado → {args.output}")
     
     # Guardar también CSV para inspección
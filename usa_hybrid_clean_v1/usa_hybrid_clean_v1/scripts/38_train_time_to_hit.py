@@ -14,108 +14,127 @@ import pandas as pd
 import numpy as np
 import argparse
 import os
+import sys
+import time
 import joblib
+from concurrent.futures import ThreadPoolExecutor
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 import json
 
-def train_hazard_discrete(df_train, df_test, max_days=5):
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from utils.ensemble_trainer import calibration_table, cpu_budget
+from utils.hazard_model import PooledHazardDay, build_person_period
+
+HAZARD_FEATURES = [
+    'prob_win', 'abs_y_hat', 'tp_pct', 'sl_pct', 
+    'atr_pct', 'rsi14', 'vol_z',
+    'pattern_weight', 'pscore_adj',
+    'double_top', 'double_bottom'
+]
+EVENTS = ('TP', 'SL')
+
+def _make_rf(n_jobs=1):
+    return RandomForestClassifier(
+        n_estimators=100,
+        max_depth=5,
+        min_samples_leaf=10,
+        random_state=42,
+        class_weight='balanced',
+        n_jobs=n_jobs,
+    )
+
+def _fit_timed(X, y, n_jobs):
+    t0 = time.perf_counter()
+    clf = _make_rf(n_jobs).fit(X, y)
+    return clf, time.perf_counter() - t0
+
+def train_hazard_discrete(df_train, df_test, max_days=5, pooled=False, budget=None):
     """
     Entrena modelos de hazard discreto: P(evento en día k | sobrevivió hasta k-1).
-    Un modelo por cada día y evento (TP/SL).
+
+    El dataset person-period (una fila por trade y día en riesgo) se construye una
+    sola vez. Por defecto, un modelo por día y evento (TP/SL), entrenados en paralelo
+    bajo el presupuesto de CPU; con pooled=True, un modelo por evento con k como feature
+    (expuesto por día vía PooledHazardDay, misma interfaz para 39_predict_time_to_hit).
+
+    Retorna models_tp, models_sl, feature_cols, report (fit/eval por evento y k), calib.
     """
-    models_tp = {}
-    models_sl = {}
-    
-    print(f"\n[train_hazard] Entrenando hazard discreto (max_days={max_days})")
-    
-    # Features
-    feature_cols = [
-        'prob_win', 'abs_y_hat', 'tp_pct', 'sl_pct', 
-        'atr_pct', 'rsi14', 'vol_z',
-        'pattern_weight', 'pscore_adj',
-        'double_top', 'double_bottom'
-    ]
-    
-    # Entrenar por día para TP
-    for k in range(1, max_days + 1):
-        print(f"  Día {k} (TP)...", end="")
-        
-        # Etiqueta: 1 si TP ocurrió exactamente en día k, 0 si no (sobrevivió más o fue SL/censura)
-        y_train = ((df_train['event_type'] == 'TP') & 
-                   (df_train['time_to_event_days'] == k)).astype(int)
-        
-        # Solo entrenar con los que sobrevivieron hasta k-1
-        mask_train = df_train['time_to_event_days'] >= k
-        
-        if mask_train.sum() < 10:
-            print(f" SKIP (datos insuficientes)")
-            continue
-        
-        X_train_k = df_train.loc[mask_train, feature_cols].fillna(0)
-        y_train_k = y_train[mask_train]
-        
-        if y_train_k.sum() < 2:
-            print(f" SKIP (sin eventos positivos)")
-            continue
-        
-        # Entrenar
-        clf = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=5,
-            min_samples_leaf=10,
-            random_state=42,
-            class_weight='balanced'
-        )
-        clf.fit(X_train_k, y_train_k)
-        models_tp[k] = clf
-        
-        # Evaluación
-        if len(df_test) > 0:
-            mask_test = df_test['time_to_event_days'] >= k
-            if mask_test.sum() > 0:
-                X_test_k = df_test.loc[mask_test, feature_cols].fillna(0)
-                y_test_k = ((df_test['event_type'] == 'TP') & 
-                            (df_test['time_to_event_days'] == k)).astype(int)[mask_test]
-                score = clf.score(X_test_k, y_test_k)
-                print(f" acc={score:.3f}")
-            else:
-                print(" OK")
-        else:
-            print(" OK")
-    
-    # Entrenar por día para SL
-    for k in range(1, max_days + 1):
-        print(f"  Día {k} (SL)...", end="")
-        
-        y_train = ((df_train['event_type'] == 'SL') & 
-                   (df_train['time_to_event_days'] == k)).astype(int)
-        
-        mask_train = df_train['time_to_event_days'] >= k
-        
-        if mask_train.sum() < 10:
-            print(f" SKIP (datos insuficientes)")
-            continue
-        
-        X_train_k = df_train.loc[mask_train, feature_cols].fillna(0)
-        y_train_k = y_train[mask_train]
-        
-        if y_train_k.sum() < 2:
-            print(f" SKIP (sin eventos positivos)")
-            continue
-        
-        clf = RandomForestClassifier(
-            n_estimators=100,
-            max_depth=5,
-            min_samples_leaf=10,
-            random_state=42,
-            class_weight='balanced'
-        )
-        clf.fit(X_train_k, y_train_k)
-        models_sl[k] = clf
-        print(" OK")
-    
-    return models_tp, models_sl, feature_cols
+    feature_cols = list(HAZARD_FEATURES)
+    budget = budget or cpu_budget()
+    mode = "pooled" if pooled else "por día"
+    print(f"\n[train_hazard] Entrenando hazard discreto (max_days={max_days}, {mode}, cpu_budget={budget})")
+
+    X_tr, pp_tr = build_person_period(df_train, feature_cols, max_days)
+    X_te, pp_te = build_person_period(df_test, feature_cols, max_days) if len(df_test) > 0 else (None, None)
+    print(f"[train_hazard] Person-period: train={len(X_tr)} filas, test={0 if X_te is None else len(X_te)} filas")
+    k_tr = pp_tr['k'].to_numpy()
+
+    models = {ev: {} for ev in EVENTS}
+    rows = []
+    if pooled:
+        for ev in EVENTS:
+            y = pp_tr[f'y_{ev.lower()}'].to_numpy()
+            if len(y) < 10 or y.sum() < 2:
+                print(f"  {ev} pooled SKIP (datos insuficientes)")
+                continue
+            clf, sec = _fit_timed(X_tr.assign(k=k_tr), y, budget)
+            for k in range(1, max_days + 1):
+                if (k_tr == k).any():
+                    models[ev][k] = PooledHazardDay(clf, k)
+            rows += [{'event': ev, 'k': k, 'n_train': int((k_tr == k).sum()),
+                      'pos_train': int(y[k_tr == k].sum()), 'fit_sec': sec} for k in models[ev]]
+    else:
+        tasks = []
+        for ev in EVENTS:
+            y = pp_tr[f'y_{ev.lower()}'].to_numpy()
+            for k in range(1, max_days + 1):
+                m = k_tr == k
+                if m.sum() < 10:
+                    print(f"  Día {k} ({ev}) SKIP (datos insuficientes)")
+                elif y[m].sum() < 2:
+                    print(f"  Día {k} ({ev}) SKIP (sin eventos positivos)")
+                else:
+                    tasks.append((ev, k, m, y[m]))
+        workers = max(1, min(len(tasks), budget))
+        n_jobs = max(1, budget // workers)
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            futs = [(ev, k, m, yk, ex.submit(_fit_timed, X_tr[m], yk, n_jobs)) for ev, k, m, yk in tasks]
+            for ev, k, m, yk, fut in futs:
+                clf, sec = fut.result()
+                models[ev][k] = clf
+                rows.append({'event': ev, 'k': k, 'n_train': int(m.sum()), 'pos_train': int(yk.sum()),
+                             'fit_sec': sec})
+
+    report = pd.DataFrame(rows, columns=['event', 'k', 'n_train', 'pos_train', 'fit_sec'])
+    calib = pd.DataFrame()
+    if X_te is not None and len(X_te) and len(report):
+        # Evaluación: una predicción por modelo sobre su bloque k del person-period de test
+        k_te = pp_te['k'].to_numpy()
+        preds = []
+        for ev in EVENTS:
+            for k, clf in models[ev].items():
+                m = k_te == k
+                if m.any():
+                    preds.append(pd.DataFrame({'event': ev, 'k': k, 'y': pp_te.loc[m, f'y_{ev.lower()}'].to_numpy(),
+                                               'p': clf.predict_proba(X_te[m])[:, 1]}))
+        if preds:
+            ev_df = pd.concat(preds, ignore_index=True)
+            ev_df['hit'] = ((ev_df['p'] >= 0.5).astype(int) == ev_df['y']).astype(float)
+            ev_df['sq_err'] = (ev_df['p'] - ev_df['y']) ** 2
+            metrics = ev_df.groupby(['event', 'k']).agg(
+                n_test=('y', 'size'), acc=('hit', 'mean'), brier=('sq_err', 'mean'),
+                prob_mean=('p', 'mean'), event_rate=('y', 'mean')).reset_index()
+            report = report.merge(metrics, on=['event', 'k'], how='left')
+            calib = pd.concat([calibration_table(g['y'], g['p']).assign(event=ev, k=k)
+                               for (ev, k), g in ev_df.groupby(['event', 'k'], sort=False)], ignore_index=True)
+
+    for r in report.itertuples():
+        extra = f" acc={r.acc:.3f} brier={r.brier:.4f} p_mean={r.prob_mean:.3f} tasa={r.event_rate:.3f}" \
+            if 'acc' in report.columns and not pd.isna(r.acc) else ""
+        print(f"  Día {r.k} ({r.event}) n={r.n_train} pos={r.pos_train} fit={r.fit_sec:.2f}s{extra}")
+
+    return models['TP'], models['SL'], feature_cols, report, calib
 
 def train_monte_carlo_calibration(df_train):
     """
@@ -166,6 +185,8 @@ def main():
     ap.add_argument("--output-dir", default="models")
     ap.add_argument("--max-days", type=int, default=5, help="Horizonte máximo para hazard discreto")
     ap.add_argument("--test-size", type=float, default=0.2)
+    ap.add_argument("--pooled", action="store_true", help="Un modelo por evento con k como feature (en vez de uno por día)")
+    ap.add_argument("--cpu-budget", type=int, default=None, help="Hilos totales (default: CPU_BUDGET o cpu_count)")
     args = ap.parse_args()
     
     print(f"[train_tth] Cargando {args.input}...")
@@ -182,8 +203,8 @@ def main():
     print(f"[train_tth] Train: {len(df_train)}, Test: {len(df_test)}")
     
     # 1. Hazard discreto
-    models_tp, models_sl, feature_cols = train_hazard_discrete(
-        df_train, df_test, max_days=args.max_days
+    models_tp, models_sl, feature_cols, hazard_report, hazard_calib = train_hazard_discrete(
+        df_train, df_test, max_days=args.max_days, pooled=args.pooled, budget=args.cpu_budget
     )
     
     # 2. Monte Carlo calibration
@@ -197,11 +218,17 @@ def main():
         'models_tp': models_tp,
         'models_sl': models_sl,
         'feature_cols': feature_cols,
-        'max_days': args.max_days
+        'max_days': args.max_days,
+        'pooled': args.pooled,
     }
     hazard_path = os.path.join(args.output_dir, 'tth_hazard_discrete.joblib')
     joblib.dump(hazard_bundle, hazard_path)
     print(f"\n[train_tth] Hazard discreto → {hazard_path}")
+    report_path = os.path.join(args.output_dir, 'tth_hazard_report.csv')
+    hazard_report.to_csv(report_path, index=False)
+    if len(hazard_calib):
+        hazard_calib.to_csv(os.path.join(args.output_dir, 'tth_hazard_calibration.csv'), index=False)
+    print(f"[train_tth] Reporte por día (fit/calibración) → {report_path}")
     
     # Monte Carlo
     if mc_calib:
@@ -217,6 +244,8 @@ def main():
         'feature_cols': feature_cols,
         'tp_models_trained': len(models_tp),
         'sl_models_trained': len(models_sl),
+        'hazard_pooled': args.pooled,
+        'hazard_fit_sec': float(hazard_report['fit_sec'].drop_duplicates().sum()) if len(hazard_report) else 0.0,
         'mc_calibrated': mc_calib is not None
     }
     
@@ -14,6 +14,10 @@ import argparse
 import os
 import joblib
 import json
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from utils.tth_montecarlo import simulate_first_passage
 
 def predict_hazard_discrete(X, hazard_bundle, scale_tp=1.0, scale_sl=1.0, min_haz=1e-4, max_haz=0.5):
     """
@@ -53,84 +57,61 @@ def predict_hazard_discrete(X, hazard_bundle, scale_tp=1.0, scale_sl=1.0, min_ha
     
     X_features = pd.DataFrame(X_features_dict)
     
-    results = []
-    
-    for idx in range(len(X_features)):
-        x_row = X_features.iloc[[idx]]
-        
-        # TP probabilities
-        S_tp = 1.0  # Survival function
-        cum_tp = []
-        
-        for k in range(1, max_days + 1):
-            if k in models_tp:
-                h_k = models_tp[k].predict_proba(x_row)[0, 1]  # P(evento en k)
-            else:
-                h_k = 0.01  # Default bajo si no hay modelo
-            # Calibración y límites de hazard
-            h_k = max(min(h_k * scale_tp, max_haz), min_haz)
-            
-            p_le_k = 1 - S_tp * (1 - h_k)  # P(TP <= k)
-            cum_tp.append(p_le_k)
-            S_tp *= (1 - h_k)  # Actualizar survival
-        
-        # SL probabilities
-        S_sl = 1.0
-        cum_sl = []
-        
-        for k in range(1, max_days + 1):
-            if k in models_sl:
-                h_k = models_sl[k].predict_proba(x_row)[0, 1]
-            else:
-                h_k = 0.01
-            # Piso y calibración para SL (evitar 0 días/immediate event)
-            h_k = max(min(h_k * scale_sl, max_haz), min_haz)
-            
-            p_le_k = 1 - S_sl * (1 - h_k)
-            cum_sl.append(p_le_k)
-            S_sl *= (1 - h_k)
-        
-        # Expected time-to-hit (condicional al evento en el horizonte)
-        # pmf[k] = P(evento en k exactamente)
-        pmf_tp = [cum_tp[0]] + [cum_tp[i] - cum_tp[i-1] for i in range(1, len(cum_tp))]
-        pmf_sl = [cum_sl[0]] + [cum_sl[i] - cum_sl[i-1] for i in range(1, len(cum_sl))]
-        sum_tp = sum(pmf_tp)
-        sum_sl = sum(pmf_sl)
-        etth_tp = (sum((k+1) * pmf_tp[k] for k in range(len(pmf_tp))) / sum_tp) if sum_tp > 1e-6 else max_days
-        etth_sl = (sum((k+1) * pmf_sl[k] for k in range(len(pmf_sl))) / sum_sl) if sum_sl > 1e-6 else max_days
-        
-        # P(TP antes que SL) aproximado
-        # Simplificación: comparar las probabilidades acumuladas finales
-        p_tp_final = cum_tp[-1] if cum_tp else 0.0
-        p_sl_final = cum_sl[-1] if cum_sl else 0.0
-        
-        if p_tp_final + p_sl_final > 0:
-            p_tp_before_sl = p_tp_final / (p_tp_final + p_sl_final)
-        else:
-            p_tp_before_sl = 0.5
-        
+    # Un predict_proba por (evento, k) sobre todas las filas → hazards (filas × k)
+    days = np.arange(1, max_days + 1)
+    cum_tp, pmf_tp, etth_tp = _hazard_curves(X_features, models_tp, days, scale_tp, min_haz, max_haz)
+    cum_sl, pmf_sl, etth_sl = _hazard_curves(X_features, models_sl, days, scale_sl, min_haz, max_haz)
+
+    # P(TP antes que SL) aproximado
+    # Simplificación: comparar las probabilidades acumuladas finales
+    n = len(X_features)
+    p_tp_final = cum_tp[:, -1] if max_days else np.zeros(n)
+    p_sl_final = cum_sl[:, -1] if max_days else np.zeros(n)
+    denom = p_tp_final + p_sl_final
+    with np.errstate(divide="ignore", invalid="ignore"):
+        p_tp_before_sl = np.where(denom > 0, p_tp_final / denom, 0.5)
+
+    def _col(cum, k):
+        return cum[:, k] if cum.shape[1] > k else np.zeros(n)
+
+    return pd.DataFrame({
+        'p_tp_in_1d': _col(cum_tp, 0),
+        'p_tp_in_2d': _col(cum_tp, 1),
+        'p_tp_in_3d': _col(cum_tp, 2),
+        'p_sl_in_1d': _col(cum_sl, 0),
+        'p_sl_in_2d': _col(cum_sl, 1),
+        'p_sl_in_3d': _col(cum_sl, 2),
+        'etth_tp': etth_tp,
+        'etth_sl': etth_sl,
         # ETTH al primer evento (mínimo esperado)
-        etth_first = min(etth_tp, etth_sl)
-        
-        result = {
-            'p_tp_in_1d': cum_tp[0] if len(cum_tp) > 0 else 0.0,
-            'p_tp_in_2d': cum_tp[1] if len(cum_tp) > 1 else 0.0,
-            'p_tp_in_3d': cum_tp[2] if len(cum_tp) > 2 else 0.0,
-            'p_sl_in_1d': cum_sl[0] if len(cum_sl) > 0 else 0.0,
-            'p_sl_in_2d': cum_sl[1] if len(cum_sl) > 1 else 0.0,
-            'p_sl_in_3d': cum_sl[2] if len(cum_sl) > 2 else 0.0,
-            'etth_tp': etth_tp,
-            'etth_sl': etth_sl,
-            'etth_first_event': etth_first,
-            'p_tp_before_sl': p_tp_before_sl,
-        }
-        results.append(result)
-    
-    return pd.DataFrame(results)
+        'etth_first_event': np.minimum(etth_tp, etth_sl),
+        'p_tp_before_sl': p_tp_before_sl,
+    })
+
+def _hazard_curves(X_features, models, days, scale, min_haz, max_haz):
+    """
+    Hazards (filas × k) de un evento → (CDF, PMF, ETTH condicional al horizonte).
+    """
+    n = len(X_features)
+    haz = np.full((n, len(days)), 0.01)  # Default bajo si no hay modelo
+    for j, k in enumerate(days):
+        if k in models and n:
+            haz[:, j] = models[k].predict_proba(X_features)[:, 1]  # P(evento en k)
+    # Calibración y límites de hazard (piso evita 0 días/immediate event)
+    haz = np.maximum(np.minimum(haz * scale, max_haz), min_haz)
+
+    # S_k = prod_{j<=k}(1 - h_j); P(evento <= k) = 1 - S_k
+    cum = 1 - np.cumprod(1 - haz, axis=1)
+    # pmf[k] = P(evento en k exactamente)
+    pmf = np.diff(cum, axis=1, prepend=0.0)
+    total = pmf.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        etth = np.where(total > 1e-6, (pmf * days).sum(axis=1) / total, float(len(days)))
+    return cum, pmf, etth
 
-def simulate_monte_carlo_tth(X, mc_bundle, n_sims=1000, steps_per_day=1):
+def simulate_monte_carlo_tth(X, mc_bundle, n_sims=1000, steps_per_day=1, bridge=False):
     """
-    Simula TTH usando Monte Carlo con GBM.
+    Simula TTH usando Monte Carlo con GBM (utils/tth_montecarlo, vectorizado por lote).
     """
     mu_model = mc_bundle['mu_model']
     sigma_model = mc_bundle['sigma_model']
@@ -166,61 +147,31 @@ def simulate_monte_carlo_tth(X, mc_bundle, n_sims=1000, steps_per_day=1):
     mu = mu_model.predict(X_features)
     sigma = sigma_model.predict(X_features)
     
-    results = []
-    
-    for idx in range(len(X)):
-        row = X.iloc[idx]
-        px0 = 100.0  # Precio normalizado
-        tp_target = px0 * (1 + row.get('tp_pct', 0.06))
-        sl_target = px0 * (1 - row.get('sl_pct', 0.01))
-        H = row.get('horizon_days', 3)
-        
-        mu_i = mu[idx]
-        sigma_i = max(sigma[idx], 0.005)  # Mínimo sigma
-        
-        tp_hits = 0
-        sl_hits = 0
-        ttp_list = []
-        tsl_list = []
-        
-        for _ in range(n_sims):
-            px = px0
-            dt = 1.0 / steps_per_day
-            
-            for s in range(int(H * steps_per_day)):
-                # GBM step
-                z = np.random.randn()
-                px *= np.exp((mu_i - 0.5 * sigma_i**2) * dt + sigma_i * np.sqrt(dt) * z)
-                
-                if px >= tp_target:
-                    tp_hits += 1
-                    ttp_list.append((s + 1) / steps_per_day)
-                    break
-                elif px <= sl_target:
-                    sl_hits += 1
-                    tsl_list.append((s + 1) / steps_per_day)
-                    break
-        
-        p_tp = tp_hits / n_sims
-        p_sl = sl_hits / n_sims
-        
-        etth_tp_mc = np.mean(ttp_list) if ttp_list else H
-        etth_sl_mc = np.mean(tsl_list) if tsl_list else H
-        etth_first_mc = np.mean(ttp_list + tsl_list) if (ttp_list or tsl_list) else H
-        
-        p_tp_before_sl_mc = p_tp / (p_tp + p_sl) if (p_tp + p_sl) > 0 else 0.5
-        
-        result = {
-            'p_tp_mc': p_tp,
-            'p_sl_mc': p_sl,
-            'etth_tp_mc': etth_tp_mc,
-            'etth_sl_mc': etth_sl_mc,
-            'etth_first_mc': etth_first_mc,
-            'p_tp_before_sl_mc': p_tp_before_sl_mc,
-        }
-        results.append(result)
-    
-    return pd.DataFrame(results)
+    n = len(X)
+
+    def col(c, default):
+        return X[c].to_numpy(dtype=float) if c in X.columns else np.full(n, default)
+
+    H = col('horizon_days', 3)
+    sim = simulate_first_passage(
+        tp_pct=col('tp_pct', 0.06),
+        sl_pct=col('sl_pct', 0.01),
+        mu=mu,
+        sigma=np.maximum(sigma, 0.005),  # Mínimo sigma
+        n_steps=(H * steps_per_day).astype(int),
+        dt=1.0 / steps_per_day,
+        n_sims=n_sims,
+        bridge=bridge,
+    )
+
+    return pd.DataFrame({
+        'p_tp_mc': sim['p_tp'],
+        'p_sl_mc': sim['p_sl'],
+        'etth_tp_mc': np.where(sim['etth_tp'].isna(), H, sim['etth_tp']),
+        'etth_sl_mc': np.where(sim['etth_sl'].isna(), H, sim['etth_sl']),
+        'etth_first_mc': np.where(sim['etth_first'].isna(), H, sim['etth_first']),
+        'p_tp_before_sl_mc': sim['p_tp_before_sl'],
+    })
 
 def main():
     ap = argparse.ArgumentParser()
@@ -231,6 +182,7 @@ def main():
     ap.add_argument("--use-mc", action="store_true", help="Añadir predicciones Monte Carlo")
     ap.add_argument("--mc-sims", type=int, default=1000, help="# de simulaciones MC")
     ap.add_argument("--steps-per-day", type=int, default=1, help="Pasos por día en MC (1=diario, intradía usar 26, 78, etc.)")
+    ap.add_argument("--mc-bridge", action="store_true", help="Corrección de puente browniano (permite menos pasos por día)")
     args = ap.parse_args()
     
     print(f"[predict_tth] Cargando {args.input}...")
@@ -290,7 +242,8 @@ def main():
     if args.use_mc and os.path.exists(args.mc_model):
         print(f"[predict_tth] Prediciendo con Monte Carlo ({args.mc_sims} sims)...")
         mc_bundle = joblib.load(args.mc_model)
-        tth_mc = simulate_monte_carlo_tth(df, mc_bundle, n_sims=args.mc_sims, steps_per_day=args.steps_per_day)
+        tth_mc = simulate_monte_carlo_tth(df, mc_bundle, n_sims=args.mc_sims, steps_per_day=args.steps_per_day,
+                                         bridge=args.mc_bridge)
         
         for col in tth_mc.columns:
             df[col] = tth_mc[col]
@@ -12,8 +12,12 @@ from zoneinfo import ZoneInfo
 from pandas.tseries.offsets import BusinessDay
 import yaml
 import json
+import sys
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from utils.forecast_store import get_forecast, is_store
+
 SIGNALS_IN  = Path("data/daily/signals_with_gates.parquet")  # salida de 11_infer_and_gate.py
 PLAN_OUT    = Path("val/trade_plan.csv")
 AUDIT_OUT   = Path("val/trade_plan_audit.parquet")
@@ -250,14 +254,28 @@ def adjust_thresholds_by_health(min_prob_map, health_report):
     
     return adjusted
 
+def load_signals() -> pd.DataFrame | None:
+    """Señales de T-1: del forecast store si tiene esa fecha; si no, de SIGNALS_IN."""
+    t_minus_1 = (pd.Timestamp.now(tz=ZoneInfo("America/New_York")).normalize() - BusinessDay(1)).date()
+    if is_store():  # FORECAST_STORE_DIR o data/forecast_store
+        df = get_forecast(t_minus_1)
+        if len(df):
+            print(f"[INFO] Señales desde forecast store (asof={t_minus_1}, {len(df)} filas)")
+            return df
+    if not SIGNALS_IN.exists():
+        return None
+    return pd.read_parquet(SIGNALS_IN)
+
+
 def main():
     enable_utf8_output()
-    if not SIGNALS_IN.exists():
+    df = load_signals()
+    if df is None:
         print(f"[WARN] No existe {SIGNALS_IN}")
         # Aun así escribir header-only para que validaciones no fallen por CSV vacío
         write_header_only_plan(PLAN_OUT)
         return
-    df = pd.read_parquet(SIGNALS_IN).copy()
+    df = df.copy()
     # Crear entrada_price estándar si no existe
     if 'entry_price' not in df.columns:
         df['entry_price'] = df.get('close', np.nan)
@@ -1,55 +1,57 @@
+import numpy as np
 import pandas as pd
 import os
-import glob
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from utils.first_touch import HIT_LABELS, simulate_exits
+from utils.intraday_store import HistoryStore
 
 HISTORY_5M = "data/intraday5/history/"
 HISTORY_15M = "data/intraday15/history/"
 PREDICTIONS_LOG = "data/trading/predictions_log.csv"
 
 
+def first_touch_batch(days, tp, sl, side):
+    """
+    Primer toque TP/SL de cada predicción sobre las barras de su día (TP gana en empate).
+
+    days: lista de DataFrames (uno por predicción, puede estar vacío). Un solo paso del
+    kernel sobre todas las barras concatenadas. Retorna (outcome, hit_timestamp) por fila.
+    """
+    length = np.array([len(d) for d in days], dtype=np.int64)
+    start = np.cumsum(length) - length
+    bars = pd.concat([d for d in days if len(d)], ignore_index=True) if length.sum() else \
+        pd.DataFrame({c: [np.nan] for c in ('open', 'high', 'low', 'close', 'timestamp')})
+    res = simulate_exits(bars['open'], bars['high'], bars['low'], bars['close'], start, length,
+                         np.asarray(side) == 'BUY', tp, sl, entry=np.ones(len(days)), tie="tp_first")
+    hit = np.isin(res['reason'], (1, 2))
+    ts = bars['timestamp'].iloc[np.where(hit, start + res['exit_bar'], 0)].tolist()
+    outcome = np.where(hit, HIT_LABELS[res['reason']], 'NONE')
+    return list(outcome), [t if h else None for t, h in zip(ts, hit)]
+
 def find_first_touch(df, entry, tp, sl, side):
-    for i, row in df.iterrows():
-        price = row['high'] if side == 'BUY' else row['low']
-        if side == 'BUY':
-            if price >= tp:
-                return 'TP', row['timestamp']
-            if row['low'] <= sl:
-                return 'SL', row['timestamp']
-        else:
-            if price <= tp:
-                return 'TP', row['timestamp']
-            if row['high'] >= sl:
-                return 'SL', row['timestamp']
-    return 'NONE', None
+    (outcome,), (ts,) = first_touch_batch([df], [tp], [sl], [side])
+    return outcome, ts
 
 def evaluate_first_touch():
     if not os.path.exists(PREDICTIONS_LOG):
         print(f"[WARN] No existe {PREDICTIONS_LOG}")
         return
     df_pred = pd.read_csv(PREDICTIONS_LOG)
-    outcomes = []
-    for idx, row in df_pred.iterrows():
-        ticker = row['ticker']
-        date = row['date']
-        entry = row['entry']
-        tp = row['tp']
-        sl = row['sl']
-        side = row.get('side', 'BUY')
-        # Buscar datos 5m
-        fglob = f"{HISTORY_5M}ticker={ticker}/date={date}/*.parquet"
-        files = glob.glob(fglob)
-        df_5m = pd.concat([pd.read_parquet(f) for f in files]) if files else pd.DataFrame()
-        if not df_5m.empty:
-            outcome, ts = find_first_touch(df_5m, entry, tp, sl, side)
-        else:
-            # Fallback 15m
-            fglob = f"{HISTORY_15M}ticker={ticker}/date={date}/*.parquet"
-            files = glob.glob(fglob)
-            df_15m = pd.concat([pd.read_parquet(f) for f in files]) if files else pd.DataFrame()
-            outcome, ts = find_first_touch(df_15m, entry, tp, sl, side) if not df_15m.empty else ('NONE', None)
-        outcomes.append({'outcome': outcome, 'hit_timestamp': ts})
-    df_pred['outcome'] = [o['outcome'] for o in outcomes]
-    df_pred['hit_timestamp'] = [o['hit_timestamp'] for o in outcomes]
+    store_5m, store_15m = HistoryStore(HISTORY_5M), HistoryStore(HISTORY_15M)
+    days = []
+    for ticker, date in zip(df_pred['ticker'], df_pred['date']):
+        # Buscar datos 5m (vía manifiesto); fallback 15m
+        df_day = store_5m.read_day(ticker, date)
+        if df_day.empty:
+            df_day = store_15m.read_day(ticker, date)
+        days.append(df_day)
+    side = df_pred['side'] if 'side' in df_pred.columns else pd.Series('BUY', index=df_pred.index)
+    outcome, ts = first_touch_batch(days, df_pred['tp'].to_numpy(float), df_pred['sl'].to_numpy(float),
+                                    side.to_numpy())
+    df_pred['outcome'] = outcome
+    df_pred['hit_timestamp'] = ts
     df_pred.to_csv(PREDICTIONS_LOG, index=False)
     print(f"[OK] Evaluación first-touch completada y guardada en {PREDICTIONS_LOG}")
 
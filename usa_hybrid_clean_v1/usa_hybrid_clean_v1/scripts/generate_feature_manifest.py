@@ -4,8 +4,38 @@ Ejecutar después de entrenar modelos para capturar el orden y nombres correctos
 """
 import json
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
+FEATURES_DAILY_PATH = Path('data/daily/features_daily_enhanced.parquet')
+
+
+def compute_atr_percentiles(path=FEATURES_DAILY_PATH):
+    """
+    Percentiles p33/p66 de ATR% sobre la historia completa (fallback de régimen en 11_infer_and_gate).
+    Se persisten en el manifiesto para que la inferencia T-1 no tenga que leer toda la historia.
+    """
+    import pyarrow.parquet as pq
+    if not Path(path).exists():
+        return None
+    names = set(pq.read_schema(path).names)
+    if 'atr_pct' in names or 'atr_pct_w' in names:
+        col = 'atr_pct' if 'atr_pct' in names else 'atr_pct_w'
+        vals = pd.read_parquet(path, columns=[col])[col]
+    elif {'atr_14d', 'close', 'ticker', 'timestamp'} <= names:
+        col = 'atr_pct'
+        df = pd.read_parquet(path, columns=['timestamp', 'ticker', 'close', 'atr_14d'])
+        df['ticker'] = df['ticker'].astype(str).str.upper()
+        df = df.sort_values(['ticker', 'timestamp'])
+        vals = df['atr_14d'] / df.groupby('ticker')['close'].shift(1)
+    else:
+        return None
+    vals = vals.dropna()
+    if vals.empty:
+        return None
+    p33, p66 = np.nanpercentile(vals, [33, 66])
+    return {"column": col, "p33": float(p33), "p66": float(p66), "n": int(len(vals))}
+
 def generate_feature_manifest():
     """
     Lee features_enhanced_binary_targets y genera manifiesto con columnas de training.
@@ -35,7 +65,8 @@ def generate_feature_manifest():
         "feature_names": feature_cols,
         "exclude_cols": list(exclude_cols),
         "generated_at": pd.Timestamp.now().isoformat(),
-        "source": str(train_path)
+        "source": str(train_path),
+        "atr_pct_percentiles": compute_atr_percentiles()
     }
     
     manifest_path.parent.mkdir(parents=True, exist_ok=True)
@@ -44,7 +44,8 @@ try {
 
   Write-Host "
 [1/6] Inference..."
-  & $PY scripts/11_infer_and_gate.py
+  # Vía runner de bundles: usa el servidor caliente si INFERENCE_WARM_URL está definido
+  & $PY utils/inference_bundle.py run scripts/11_infer_and_gate.py
 
   Write-Host "
 [2/6] Trade plan..."
@@ -2,11 +2,16 @@
 Validación de trades generados con NUEVA configuración (prob_win≥5%)
 Compara predicciones vs realidad usando datos intraday reales
 """
+import os
+import sys
 import pandas as pd
 import numpy as np
 from pathlib import Path
 from datetime import datetime, time
 
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from utils.first_touch import HIT_NONE, HIT_TP, simulate_exits
+
 def load_intraday_data(ticker, start_date, end_date):
     """Carga datos intraday desde CSV"""
     intraday_dir = Path("data/us/intraday") / ticker
@@ -74,65 +79,29 @@ def validate_trade(trade, intraday_df):
             'reason': 'No intraday data after entry'
         }
     
-    # Check each bar for TP/SL hit
-    for idx, bar in data_after_entry.iterrows():
-        high = bar['High']
-        low = bar['Low']
-        close = bar['Close']
-        
+    # First touch TP/SL (shared kernel); TP is checked first on a bar that hits both
+    out = simulate_exits(
+        data_after_entry['Open'].to_numpy(dtype=float), data_after_entry['High'].to_numpy(dtype=float),
+        data_after_entry['Low'].to_numpy(dtype=float), data_after_entry['Close'].to_numpy(dtype=float),
+        [0], [len(data_after_entry)], direction == 'LONG', tp_price, sl_price,
+        entry=entry_price, tie='tp_first'
+    )
+    if out['reason'][0] != HIT_NONE:
+        hit_tp = out['reason'][0] == HIT_TP
+        idx = data_after_entry.index[out['exit_bar'][0]]
+        exit_price = tp_price if hit_tp else sl_price
         if direction == 'LONG':
-            # Check TP hit (high >= tp_price)
-            if high >= tp_price:
-                pnl = (tp_price - entry_price) / entry_price
-                bars = len(intraday_df[intraday_df.index <= idx])
-                return {
-                    'outcome': 'TP_HIT',
-                    'pnl': pnl,
-                    'bars_held': bars,
-                    'exit_time': idx,
-                    'exit_price': tp_price,
-                    'reason': f'TP hit at {tp_price:.2f}'
-                }
-            
-            # Check SL hit (low <= sl_price)
-            if low <= sl_price:
-                pnl = (sl_price - entry_price) / entry_price
-                bars = len(intraday_df[intraday_df.index <= idx])
-                return {
-                    'outcome': 'SL_HIT',
-                    'pnl': pnl,
-                    'bars_held': bars,
-                    'exit_time': idx,
-                    'exit_price': sl_price,
-                    'reason': f'SL hit at {sl_price:.2f}'
-                }
-        
-        else:  # SHORT
-            # Check TP hit (low <= tp_price)
-            if low <= tp_price:
-                pnl = (entry_price - tp_price) / entry_price
-                bars = len(intraday_df[intraday_df.index <= idx])
-                return {
-                    'outcome': 'TP_HIT',
-                    'pnl': pnl,
-                    'bars_held': bars,
-                    'exit_time': idx,
-                    'exit_price': tp_price,
-                    'reason': f'TP hit at {tp_price:.2f}'
-                }
-            
-            # Check SL hit (high >= sl_price)
-            if high >= sl_price:
-                pnl = (entry_price - sl_price) / entry_price
-                bars = len(intraday_df[intraday_df.index <= idx])
-                return {
-                    'outcome': 'SL_HIT',
-                    'pnl': pnl,
-                    'bars_held': bars,
-                    'exit_time': idx,
-                    'exit_price': sl_price,
-                    'reason': f'SL hit at {sl_price:.2f}'
-                }
+            pnl = (exit_price - entry_price) / entry_price
+        else:
+            pnl = (entry_price - exit_price) / entry_price
+        return {
+            'outcome': 'TP_HIT' if hit_tp else 'SL_HIT',
+            'pnl': pnl,
+            'bars_held': len(intraday_df[intraday_df.index <= idx]),
+            'exit_time': idx,
+            'exit_price': exit_price,
+            'reason': f"{'TP' if hit_tp else 'SL'} hit at {exit_price:.2f}"
+        }
     
     # No TP/SL hit - close at EOD
     last_bar = data_after_entry.iloc[-1]
@@ -152,133 +121,138 @@ def validate_trade(trade, intraday_df):
         'reason': f'Closed at EOD at {exit_price:.2f}'
     }
 
-# Main validation
-dates = ["2025-10-16", "2025-10-17", "2025-10-22", "2025-10-31"]
+def main():
+    # Main validation
+    dates = ["2025-10-16", "2025-10-17", "2025-10-22", "2025-10-31"]
 
-print("=" * 80)
-print("VALIDACIÓN DE TRADES - NUEVA CONFIGURACIÓN (prob_win≥5%)")
-print("=" * 80)
-print()
+    print("=" * 80)
+    print("VALIDACIÓN DE TRADES - NUEVA CONFIGURACIÓN (prob_win≥5%)")
+    print("=" * 80)
+    print()
 
-all_results = []
-for date in dates:
-    plan_path = Path(f"reports/intraday/{date}/trade_plan_intraday.csv")
-    
-    if not plan_path.exists():
-        print(f"⚠️  {date}: No hay plan generado")
-        continue
-    
-    plan = pd.read_csv(plan_path)
-    
-    if len(plan) == 0:
-        print(f"📭 {date}: Plan vacío (0 trades)")
-        continue
-    
-    print(f"\n{'=' * 80}")
-    print(f"📅 FECHA: {date}")
+    all_results = []
+    for date in dates:
+        plan_path = Path(f"reports/intraday/{date}/trade_plan_intraday.csv")
+
+        if not plan_path.exists():
+            print(f"⚠️  {date}: No hay plan generado")
+            continue
+
+        plan = pd.read_csv(plan_path)
+
+        if len(plan) == 0:
+            print(f"📭 {date}: Plan vacío (0 trades)")
+            continue
+
+        print(f"\n{'=' * 80}")
+        print(f"📅 FECHA: {date}")
+        print(f"{'=' * 80}")
+        print(f"Trades en plan: {len(plan)}")
+        print(f"Tickers: {', '.join(plan['ticker'].unique())}")
+        print()
+
+        for idx, trade in plan.iterrows():
+            ticker = trade['ticker']
+            print(f"\n🔹 Trade #{idx+1}: {ticker} {trade['direction']}")
+            print(f"   Entry: ${trade['entry_price']:.2f} @ {trade['timestamp']}")
+            print(f"   TP: ${trade['tp_price']:.2f} (+{((trade['tp_price']/trade['entry_price']-1)*100):.2f}%)")
+            print(f"   SL: ${trade['sl_price']:.2f} ({((trade['sl_price']/trade['entry_price']-1)*100):.2f}%)")
+            print(f"   Qty: {trade['qty']}, Exposure: ${trade['exposure']:.2f}")
+            print(f"   Prob Win: {trade['prob_win']*100:.1f}%, P(TP<SL): {trade['p_tp_before_sl']*100:.1f}%")
+
+            try:
+                # Load intraday data
+                intraday_df = load_intraday_data(ticker, date, date)
+
+                # Validate trade
+                result = validate_trade(trade, intraday_df)
+
+                # Display result
+                outcome_emoji = {
+                    'TP_HIT': '✅',
+                    'SL_HIT': '❌',
+                    'EOD_CLOSE': '⏰',
+                    'NO_DATA': '⚠️'
+                }
+
+                emoji = outcome_emoji.get(result['outcome'], '❓')
+                print(f"\n   {emoji} RESULTADO: {result['outcome']}")
+                print(f"      Razón: {result['reason']}")
+                print(f"      PnL: {result['pnl']*100:+.2f}%")
+                print(f"      Barras sostenidas: {result['bars_held']}")
+                if result['exit_time']:
+                    print(f"      Salida: {result['exit_time']}")
+
+                # Calculate dollar PnL
+                dollar_pnl = result['pnl'] * trade['exposure']
+                print(f"      PnL en USD: ${dollar_pnl:+.2f}")
+
+                # Store result
+                all_results.append({
+                    'date': date,
+                    'ticker': ticker,
+                    'direction': trade['direction'],
+                    'entry_price': trade['entry_price'],
+                    'exit_price': result['exit_price'],
+                    'outcome': result['outcome'],
+                    'pnl_pct': result['pnl'],
+                    'pnl_usd': dollar_pnl,
+                    'exposure': trade['exposure'],
+                    'prob_win': trade['prob_win'],
+                    'bars_held': result['bars_held']
+                })
+
+            except Exception as e:
+                print(f"\n   ⚠️  ERROR: {e}")
+
+    # Summary
+    print(f"\n\n{'=' * 80}")
+    print("📊 RESUMEN GENERAL")
     print(f"{'=' * 80}")
-    print(f"Trades en plan: {len(plan)}")
-    print(f"Tickers: {', '.join(plan['ticker'].unique())}")
-    print()
-    
-    for idx, trade in plan.iterrows():
-        ticker = trade['ticker']
-        print(f"\n🔹 Trade #{idx+1}: {ticker} {trade['direction']}")
-        print(f"   Entry: ${trade['entry_price']:.2f} @ {trade['timestamp']}")
-        print(f"   TP: ${trade['tp_price']:.2f} (+{((trade['tp_price']/trade['entry_price']-1)*100):.2f}%)")
-        print(f"   SL: ${trade['sl_price']:.2f} ({((trade['sl_price']/trade['entry_price']-1)*100):.2f}%)")
-        print(f"   Qty: {trade['qty']}, Exposure: ${trade['exposure']:.2f}")
-        print(f"   Prob Win: {trade['prob_win']*100:.1f}%, P(TP<SL): {trade['p_tp_before_sl']*100:.1f}%")
-        
-        try:
-            # Load intraday data
-            intraday_df = load_intraday_data(ticker, date, date)
-            
-            # Validate trade
-            result = validate_trade(trade, intraday_df)
-            
-            # Display result
-            outcome_emoji = {
-                'TP_HIT': '✅',
-                'SL_HIT': '❌',
-                'EOD_CLOSE': '⏰',
-                'NO_DATA': '⚠️'
-            }
-            
-            emoji = outcome_emoji.get(result['outcome'], '❓')
-            print(f"\n   {emoji} RESULTADO: {result['outcome']}")
-            print(f"      Razón: {result['reason']}")
-            print(f"      PnL: {result['pnl']*100:+.2f}%")
-            print(f"      Barras sostenidas: {result['bars_held']}")
-            if result['exit_time']:
-                print(f"      Salida: {result['exit_time']}")
-            
-            # Calculate dollar PnL
-            dollar_pnl = result['pnl'] * trade['exposure']
-            print(f"      PnL en USD: ${dollar_pnl:+.2f}")
-            
-            # Store result
-            all_results.append({
-                'date': date,
-                'ticker': ticker,
-                'direction': trade['direction'],
-                'entry_price': trade['entry_price'],
-                'exit_price': result['exit_price'],
-                'outcome': result['outcome'],
-                'pnl_pct': result['pnl'],
-                'pnl_usd': dollar_pnl,
-                'exposure': trade['exposure'],
-                'prob_win': trade['prob_win'],
-                'bars_held': result['bars_held']
-            })
-            
-        except Exception as e:
-            print(f"\n   ⚠️  ERROR: {e}")
 
-# Summary
-print(f"\n\n{'=' * 80}")
-print("📊 RESUMEN GENERAL")
-print(f"{'=' * 80}")
+    if all_results:
+        df_results = pd.DataFrame(all_results)
+
+        total_trades = len(df_results)
+        tp_hits = len(df_results[df_results['outcome'] == 'TP_HIT'])
+        sl_hits = len(df_results[df_results['outcome'] == 'SL_HIT'])
+        eod_closes = len(df_results[df_results['outcome'] == 'EOD_CLOSE'])
+
+        total_pnl = df_results['pnl_usd'].sum()
+        avg_pnl = df_results['pnl_usd'].mean()
+
+        win_rate = (tp_hits / total_trades * 100) if total_trades > 0 else 0
+        avg_prob_win = df_results['prob_win'].mean() * 100
+
+        print(f"\n📈 Estadísticas:")
+        print(f"   Total trades: {total_trades}")
+        print(f"   TP hits: {tp_hits} ({tp_hits/total_trades*100:.1f}%)")
+        print(f"   SL hits: {sl_hits} ({sl_hits/total_trades*100:.1f}%)")
+        print(f"   EOD closes: {eod_closes} ({eod_closes/total_trades*100:.1f}%)")
+        print(f"\n💰 Rentabilidad:")
+        print(f"   PnL total: ${total_pnl:+.2f}")
+        print(f"   PnL promedio: ${avg_pnl:+.2f}")
+        print(f"   Win rate real: {win_rate:.1f}%")
+        print(f"   Win rate predicho: {avg_prob_win:.1f}%")
+        print(f"   Error de calibración: {abs(win_rate - avg_prob_win):.1f}%")
+
+        print(f"\n📋 Detalle por ticker:")
+        ticker_summary = df_results.groupby('ticker').agg({
+            'pnl_usd': ['count', 'sum', 'mean'],
+            'outcome': lambda x: (x == 'TP_HIT').sum()
+        }).round(2)
+        print(ticker_summary)
+
+        # Save results
+        output_path = "reports/intraday/validation_new_config_october.csv"
+        df_results.to_csv(output_path, index=False)
+        print(f"\n💾 Resultados guardados: {output_path}")
+
+    else:
+        print("\n⚠️  No se validaron trades (no hay planes o faltan datos)")
+
+    print()
 
-if all_results:
-    df_results = pd.DataFrame(all_results)
-    
-    total_trades = len(df_results)
-    tp_hits = len(df_results[df_results['outcome'] == 'TP_HIT'])
-    sl_hits = len(df_results[df_results['outcome'] == 'SL_HIT'])
-    eod_closes = len(df_results[df_results['outcome'] == 'EOD_CLOSE'])
-    
-    total_pnl = df_results['pnl_usd'].sum()
-    avg_pnl = df_results['pnl_usd'].mean()
-    
-    win_rate = (tp_hits / total_trades * 100) if total_trades > 0 else 0
-    avg_prob_win = df_results['prob_win'].mean() * 100
-    
-    print(f"\n📈 Estadísticas:")
-    print(f"   Total trades: {total_trades}")
-    print(f"   TP hits: {tp_hits} ({tp_hits/total_trades*100:.1f}%)")
-    print(f"   SL hits: {sl_hits} ({sl_hits/total_trades*100:.1f}%)")
-    print(f"   EOD closes: {eod_closes} ({eod_closes/total_trades*100:.1f}%)")
-    print(f"\n💰 Rentabilidad:")
-    print(f"   PnL total: ${total_pnl:+.2f}")
-    print(f"   PnL promedio: ${avg_pnl:+.2f}")
-    print(f"   Win rate real: {win_rate:.1f}%")
-    print(f"   Win rate predicho: {avg_prob_win:.1f}%")
-    print(f"   Error de calibración: {abs(win_rate - avg_prob_win):.1f}%")
-    
-    print(f"\n📋 Detalle por ticker:")
-    ticker_summary = df_results.groupby('ticker').agg({
-        'pnl_usd': ['count', 'sum', 'mean'],
-        'outcome': lambda x: (x == 'TP_HIT').sum()
-    }).round(2)
-    print(ticker_summary)
-    
-    # Save results
-    output_path = "reports/intraday/validation_new_config_october.csv"
-    df_results.to_csv(output_path, index=False)
-    print(f"\n💾 Resultados guardados: {output_path}")
-    
-else:
-    print("\n⚠️  No se validaron trades (no hay planes o faltan datos)")
 
-print()
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ Validate Oct 23 Profit Mode trade
 import pandas as pd
 from pathlib import Path
 
+from validate_new_config_trades import validate_trade
+
 # Load plan
 plan = pd.read_csv("reports/intraday/2025-10-23/trade_plan_intraday.csv")
 print("=" * 80)
@@ -48,52 +50,13 @@ for idx, trade in plan.iterrows():
     
     print(f"📊 Bars after entry: {len(data_after_entry)}")
     
-    # Check for TP/SL hits
-    for bar_idx, bar in data_after_entry.iterrows():
-        high = bar['High']
-        low = bar['Low']
-        close = bar['Close']
-        
-        if direction == 'LONG':
-            if high >= tp_price:
-                pnl_pct = (tp_price - entry_price) / entry_price
-                pnl_usd = pnl_pct * exposure
-                print(f"✅ TP HIT @ {bar_idx}")
-                print(f"   Price: ${tp_price:.2f}")
-                print(f"   PnL: {pnl_pct*100:+.2f}% (${pnl_usd:+.2f})")
-                break
-            elif low <= sl_price:
-                pnl_pct = (sl_price - entry_price) / entry_price
-                pnl_usd = pnl_pct * exposure
-                print(f"❌ SL HIT @ {bar_idx}")
-                print(f"   Price: ${sl_price:.2f}")
-                print(f"   PnL: {pnl_pct*100:+.2f}% (${pnl_usd:+.2f})")
-                break
-        else:  # SHORT
-            if low <= tp_price:
-                pnl_pct = (entry_price - tp_price) / entry_price
-                pnl_usd = pnl_pct * exposure
-                print(f"✅ TP HIT @ {bar_idx}")
-                print(f"   Price: ${tp_price:.2f}")
-                print(f"   PnL: {pnl_pct*100:+.2f}% (${pnl_usd:+.2f})")
-                break
-            elif high >= sl_price:
-                pnl_pct = (entry_price - sl_price) / entry_price
-                pnl_usd = pnl_pct * exposure
-                print(f"❌ SL HIT @ {bar_idx}")
-                print(f"   Price: ${sl_price:.2f}")
-                print(f"   PnL: {pnl_pct*100:+.2f}% (${pnl_usd:+.2f})")
-                break
-    else:
-        # No TP/SL hit - EOD close
-        last_close = data_after_entry.iloc[-1]['Close']
-        if direction == 'LONG':
-            pnl_pct = (last_close - entry_price) / entry_price
-        else:
-            pnl_pct = (entry_price - last_close) / entry_price
-        pnl_usd = pnl_pct * exposure
-        print(f"⏰ EOD CLOSE @ {data_after_entry.index[-1]}")
-        print(f"   Price: ${last_close:.2f}")
-        print(f"   PnL: {pnl_pct*100:+.2f}% (${pnl_usd:+.2f})")
+    # TP/SL hits: mismas reglas que validate_new_config_trades (kernel compartido)
+    result = validate_trade(trade, data_after_entry)
+    pnl_pct = result['pnl']
+    pnl_usd = pnl_pct * exposure
+    label = {'TP_HIT': '✅ TP HIT', 'SL_HIT': '❌ SL HIT', 'EOD_CLOSE': '⏰ EOD CLOSE'}[result['outcome']]
+    print(f"{label} @ {result['exit_time']}")
+    print(f"   Price: ${result['exit_price']:.2f}")
+    print(f"   PnL: {pnl_pct*100:+.2f}% (${pnl_usd:+.2f})")
     
     print()
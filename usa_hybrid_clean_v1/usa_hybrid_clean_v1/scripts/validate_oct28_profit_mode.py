@@ -4,6 +4,8 @@ Validate Oct 28 Profit Mode trades (2 trades: NVDA LONG + AMD SHORT)
 import pandas as pd
 from pathlib import Path
 
+from validate_new_config_trades import validate_trade
+
 # Load plan
 plan = pd.read_csv("reports/intraday/2025-10-28/trade_plan_intraday.csv")
 
@@ -73,69 +75,16 @@ for idx, trade in plan.iterrows():
     
     print(f"📊 Bars after entry: {len(data_after_entry)}")
     
-    # Check for TP/SL hits
-    hit_found = False
-    for bar_idx, bar in data_after_entry.iterrows():
-        high = bar['High']
-        low = bar['Low']
-        close = bar['Close']
-        
-        if direction == 'LONG':
-            if high >= tp_price:
-                pnl_pct = (tp_price - entry_price) / entry_price
-                pnl_usd = pnl_pct * exposure
-                print(f"\n✅ TP HIT @ {bar_idx}")
-                print(f"   Exit price: ${tp_price:.2f}")
-                print(f"   PnL: {pnl_pct*100:+.2f}% (${pnl_usd:+.2f})")
-                print(f"   Bars held: {list(data_after_entry.index).index(bar_idx) + 1}")
-                total_pnl += pnl_usd
-                hit_found = True
-                break
-            elif low <= sl_price:
-                pnl_pct = (sl_price - entry_price) / entry_price
-                pnl_usd = pnl_pct * exposure
-                print(f"\n❌ SL HIT @ {bar_idx}")
-                print(f"   Exit price: ${sl_price:.2f}")
-                print(f"   PnL: {pnl_pct*100:+.2f}% (${pnl_usd:+.2f})")
-                print(f"   Bars held: {list(data_after_entry.index).index(bar_idx) + 1}")
-                total_pnl += pnl_usd
-                hit_found = True
-                break
-        else:  # SHORT
-            if low <= tp_price:
-                pnl_pct = (entry_price - tp_price) / entry_price
-                pnl_usd = pnl_pct * exposure
-                print(f"\n✅ TP HIT @ {bar_idx}")
-                print(f"   Exit price: ${tp_price:.2f}")
-                print(f"   PnL: {pnl_pct*100:+.2f}% (${pnl_usd:+.2f})")
-                print(f"   Bars held: {list(data_after_entry.index).index(bar_idx) + 1}")
-                total_pnl += pnl_usd
-                hit_found = True
-                break
-            elif high >= sl_price:
-                pnl_pct = (entry_price - sl_price) / entry_price
-                pnl_usd = pnl_pct * exposure
-                print(f"\n❌ SL HIT @ {bar_idx}")
-                print(f"   Exit price: ${sl_price:.2f}")
-                print(f"   PnL: {pnl_pct*100:+.2f}% (${pnl_usd:+.2f})")
-                print(f"   Bars held: {list(data_after_entry.index).index(bar_idx) + 1}")
-                total_pnl += pnl_usd
-                hit_found = True
-                break
-    
-    if not hit_found:
-        # No TP/SL hit - EOD close
-        last_close = data_after_entry.iloc[-1]['Close']
-        if direction == 'LONG':
-            pnl_pct = (last_close - entry_price) / entry_price
-        else:
-            pnl_pct = (entry_price - last_close) / entry_price
-        pnl_usd = pnl_pct * exposure
-        print(f"\n⏰ EOD CLOSE @ {data_after_entry.index[-1]}")
-        print(f"   Exit price: ${last_close:.2f}")
-        print(f"   PnL: {pnl_pct*100:+.2f}% (${pnl_usd:+.2f})")
-        print(f"   Bars held: {len(data_after_entry)}")
-        total_pnl += pnl_usd
+    # TP/SL hits: mismas reglas que validate_new_config_trades (kernel compartido)
+    result = validate_trade(trade, data_after_entry)
+    pnl_pct = result['pnl']
+    pnl_usd = pnl_pct * exposure
+    label = {'TP_HIT': '✅ TP HIT', 'SL_HIT': '❌ SL HIT', 'EOD_CLOSE': '⏰ EOD CLOSE'}[result['outcome']]
+    print(f"\n{label} @ {result['exit_time']}")
+    print(f"   Exit price: ${result['exit_price']:.2f}")
+    print(f"   PnL: {pnl_pct*100:+.2f}% (${pnl_usd:+.2f})")
+    print(f"   Bars held: {result['bars_held']}")
+    total_pnl += pnl_usd
 
 print(f"\n{'='*80}")
 print("💰 RESUMEN FINAL")
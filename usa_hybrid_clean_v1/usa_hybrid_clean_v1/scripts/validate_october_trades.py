@@ -2,12 +2,17 @@
 Valida trades de octubre contra datos reales intraday
 Calcula win rate, profit/loss real, y métricas de calidad
 """
+import os
+import sys
 import pandas as pd
 import numpy as np
 from pathlib import Path
 from datetime import datetime, timedelta
 import json
 
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from utils.first_touch import HIT_NONE, HIT_TP, simulate_exits
+
 
 def load_intraday_data(ticker, date_str):
     """Cargar datos intraday de un ticker."""
@@ -79,23 +84,16 @@ def validate_trade(trade, intraday_df):
             'bars_to_exit': 0
         }
     
-    # Buscar TP y SL
-    if direction == 'LONG':
-        # TP: high >= tp_price
-        # SL: low <= sl_price
-        tp_hit = future_data[future_data['high'] >= tp_price]
-        sl_hit = future_data[future_data['low'] <= sl_price]
-    else:  # SHORT
-        # TP: low <= tp_price
-        # SL: high >= sl_price
-        tp_hit = future_data[future_data['low'] <= tp_price]
-        sl_hit = future_data[future_data['high'] >= sl_price]
-    
-    # Determinar qué se alcanzó primero
-    tp_time = tp_hit['timestamp'].iloc[0] if len(tp_hit) > 0 else None
-    sl_time = sl_hit['timestamp'].iloc[0] if len(sl_hit) > 0 else None
+    # Primer toque TP/SL (kernel compartido); si ambos caen en la misma barra cuenta SL
+    out = simulate_exits(
+        future_data['open'].to_numpy(dtype=float), future_data['high'].to_numpy(dtype=float),
+        future_data['low'].to_numpy(dtype=float), future_data['close'].to_numpy(dtype=float),
+        [0], [len(future_data)], direction == 'LONG', tp_price, sl_price,
+        entry=entry_price, tie='sl_first'
+    )
+    exit_bar = int(out['exit_bar'][0])
     
-    if tp_time is None and sl_time is None:
+    if out['reason'][0] == HIT_NONE:
         # EOD force close
         last_bar = future_data.iloc[-1]
         exit_price = last_bar['close']
@@ -113,19 +111,9 @@ def validate_trade(trade, intraday_df):
             'bars_to_exit': len(future_data)
         }
     
-    # Determinar ganador
-    if tp_time and sl_time:
-        hit_first = 'TP' if tp_time < sl_time else 'SL'
-        hit_time = tp_time if hit_first == 'TP' else sl_time
-        exit_price = tp_price if hit_first == 'TP' else sl_price
-    elif tp_time:
-        hit_first = 'TP'
-        hit_time = tp_time
-        exit_price = tp_price
-    else:
-        hit_first = 'SL'
-        hit_time = sl_time
-        exit_price = sl_price
+    hit_first = 'TP' if out['reason'][0] == HIT_TP else 'SL'
+    hit_time = future_data['timestamp'].iloc[exit_bar]
+    exit_price = tp_price if hit_first == 'TP' else sl_price
     
     # Calcular PnL
     if direction == 'LONG':
@@ -133,15 +121,13 @@ def validate_trade(trade, intraday_df):
     else:
         pnl_pct = (entry_price - exit_price) / entry_price
     
-    bars_to_exit = len(future_data[future_data['timestamp'] <= hit_time])
-    
     return {
         'outcome': hit_first,
         'hit_time': hit_time,
         'exit_price': exit_price,
         'pnl_pct': pnl_pct,
         'pnl_usd': pnl_pct * entry_price * qty,
-        'bars_to_exit': bars_to_exit
+        'bars_to_exit': exit_bar + 1
     }
 
 
@@ -0,0 +1,17 @@
+"""Tests de equivalencia de utils/ y scripts/. Correr desde la raíz: python -m pytest -q tests"""
+import importlib.util
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def load_script(relpath: str, name: str = None):
+    """Importa un script numerado (p.ej. scripts/40_make_trade_plan_with_tth.py) como módulo."""
+    path = ROOT / relpath
+    spec = importlib.util.spec_from_file_location(name or path.stem.replace("-", "_"), path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
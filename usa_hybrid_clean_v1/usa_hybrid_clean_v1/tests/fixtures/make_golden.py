@@ -0,0 +1,156 @@
+"""
+Genera tests/fixtures/golden/ con las versiones base (fila a fila) de los módulos que
+después se vectorizaron; los tests comparan el código actual contra estas salidas.
+
+Se corrió una vez. Volver a correrlo solo si cambian a propósito las reglas de negocio
+(y revisar el diff de los CSV):
+
+    cd usa_hybrid_clean_v1/usa_hybrid_clean_v1 && python tests/fixtures/make_golden.py
+
+Cada versión base se lee con `git show <commit>:<ruta>` (BASELINES); los datos de entrada
+salen de los mismos builders de los tests.
+"""
+import contextlib
+import importlib.util
+import io
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+TESTS = Path(__file__).resolve().parents[1]
+ROOT = TESTS.parent
+OUT = Path(__file__).resolve().parent / "golden"
+sys.path[:0] = [str(ROOT), str(TESTS)]
+
+BASELINES = {
+    "trade_plan": ("692dc95^", "utils/trade_plan.py"),
+    "label_time_to_event": ("d0fc6df^", "scripts/37_label_time_to_event.py"),
+    "make_targets_intraday": ("eb52f60^", "intraday/scripts/09_make_targets_intraday.py"),
+    "backtest_comparative_modes": ("5dbffdb^", "backtest_comparative_modes.py"),
+}
+
+# Regla de orden del motor por timestamp (ver test_backtest_comparative_modes): el loop base
+# recibe cada barra dos veces y las recorre por (date, _phase, ticker); en _phase 0 solo
+# evalúa salidas y en _phase 1 solo entradas. Fuera de eso, las reglas por fila no cambian.
+REORDER_RULE = [
+    ("    intraday_df = intraday_df.sort_values(['ticker', 'date'])",
+     "    intraday_df = intraday_df.sort_values(['date', '_phase', 'ticker'])"),
+    ("        if ticker in positions:",
+     "        if ticker in positions and row['_phase'] == 0:"),
+    ("        if ticker not in positions and len(positions) < MAX_POSITIONS",
+     "        if row['_phase'] == 1 and ticker not in positions and len(positions) < MAX_POSITIONS"),
+]
+
+
+def baseline(name, patches=()):
+    rev, rel = BASELINES[name]
+    src = subprocess.run(["git", "show", f"{rev}:./{rel}"], cwd=ROOT, check=True, capture_output=True,
+                         text=True, encoding="utf-8").stdout
+    for old, new in patches:
+        assert src.count(old) == 1, old
+        src = src.replace(old, new)
+    path = Path(tempfile.mkdtemp()) / f"{name}_base.py"
+    path.write_text(src, encoding="utf-8")
+    spec = importlib.util.spec_from_file_location(f"{name}_base", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def plain(obj):
+    return json.loads(json.dumps(obj, default=lambda o: o.item() if hasattr(o, "item") else str(o)))
+
+
+def write(df, name):
+    path = OUT / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(path, index=False, float_format="%.12g")
+
+
+def dump(obj, name):
+    path = OUT / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(plain(obj), indent=1, sort_keys=True), encoding="utf-8")
+
+
+def trade_plan():
+    from test_trade_plan import ASOFS, MODES, _cap, _plan, _prices
+
+    ref = baseline("trade_plan")
+    prices, plan = _prices(), _plan()
+    write(pd.concat([ref.compute_atr14_pct(prices, a).assign(asof=a) for a in ASOFS]), "trade_plan/atr14_pct.csv")
+    etth = ref.add_etth_days_to_trade_plan(plan, ref.compute_atr14_pct(prices, "2024-04-01"))
+    write(etth, "trade_plan/etth.csv")
+    frames, info = [], {}
+    for mode in MODES:
+        df, info[mode] = ref.apply_execution_mode(etth, mode=mode, exposure_cap=_cap(etth), min_prob_win=0.45)
+        frames.append(df.assign(mode=mode))
+    write(pd.concat(frames), "trade_plan/execution_mode.csv")
+    capped, info["exposure_cap"] = ref.apply_exposure_cap(plan, _cap(etth))
+    write(capped, "trade_plan/exposure_cap.csv")
+    dump(info, "trade_plan/execution_info.json")
+
+
+def label_time_to_event():
+    from test_label_time_to_event import _trades
+
+    ref = baseline("label_time_to_event")
+    trades = _trades()
+    write(ref.label_time_to_event(trades), "label_time_to_event/outcome.csv")
+    no_outcome = trades.drop(columns=["outcome"]).assign(close_reason=trades["outcome"])
+    write(ref.label_time_to_event(no_outcome), "label_time_to_event/close_reason.csv")
+
+
+def make_targets_intraday():
+    from test_first_touch_targets import COLS, HORIZONS, LEVELS, SWEEP_PAIRS, _bars, case_id
+
+    ref = baseline("make_targets_intraday")
+    frames = [ref.process_ticker(_bars(seed=seed), tp, sl, h)[COLS].assign(case=case_id(seed, tp, sl, h))
+              for h in HORIZONS for tp, sl in LEVELS for seed in (0, 1)]
+    frames.append(ref.process_ticker(_bars(days=2, per_day=60, seed=5, vol=0.0005), 0.02, 0.02, None)[COLS]
+                  .assign(case="max_bars"))
+    write(pd.concat(frames), "make_targets_intraday/targets.csv")
+    bars = ref.process_ticker(_bars(seed=4), 0.012, 0.003, 10).drop(columns=COLS)
+    sweep = {}
+    for tp, sl in SWEEP_PAIRS:
+        one = ref.calculate_targets(bars, tp, sl, 10)
+        sweep[f"tp={tp}-sl={sl}"] = {"win_rate": one["win"].mean(), "tp_hits": (one["hit_type"] == "TP").sum(),
+                                     "sl_hits": (one["hit_type"] == "SL").sum(),
+                                     "horizon": (one["hit_type"] == "HORIZON").sum()}
+    dump(sweep, "make_targets_intraday/sweep.json")
+
+
+def backtest_comparative_modes():
+    from test_backtest_comparative_modes import CONFIGS, LIMITS, _data, _mc_stub, case_id
+
+    ref = baseline("backtest_comparative_modes", REORDER_RULE)
+    intraday, daily, forecast = _data()
+    both_phases = pd.concat([intraday.assign(_phase=0), intraday.assign(_phase=1)], ignore_index=True)
+    ref.monte_carlo_simulation = _mc_stub
+    frames, equity = [], {}
+    for limits, values in sorted(LIMITS.items()):
+        for name, v in values.items():
+            setattr(ref, name, v)
+        for mode, kw in CONFIGS:
+            case = case_id(limits, mode, kw)
+            with contextlib.redirect_stdout(io.StringIO()):
+                trades, equity[case], _ = ref.run_backtest(mode, both_phases, daily, forecast, **kw)
+            frames.append(trades.assign(case=case))
+    write(pd.concat(frames), "backtest_comparative_modes/trades.csv")
+    dump(equity, "backtest_comparative_modes/equity.json")
+
+    mc = baseline("backtest_comparative_modes")
+    returns = np.random.default_rng(0).normal(0.001, 0.012, 20)
+    np.random.seed(1)
+    dump(mc.monte_carlo_simulation(returns, n_paths=20000), "backtest_comparative_modes/monte_carlo.json")
+
+
+if __name__ == "__main__":
+    for gen in (trade_plan, label_time_to_event, make_targets_intraday, backtest_comparative_modes):
+        gen()
+        print(f"[golden] {gen.__name__} OK")
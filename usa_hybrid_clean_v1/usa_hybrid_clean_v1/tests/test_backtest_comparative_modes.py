@@ -0,0 +1,125 @@
+"""Motor por timestamp de backtest_comparative_modes contra fixtures/golden/backtest_comparative_modes/.
+
+Las salidas golden vienen del loop fila a fila original (commit base, ver fixtures/make_golden.py)
+con una sola regla de orden agregada, que es la que define el motor nuevo:
+
+    En cada timestamp se evalúan primero las salidas de todas las posiciones abiertas y
+    después las entradas, en orden de ticker.
+
+El original recorría las barras por (ticker, date), así que las entradas de un ticker veían
+posiciones de otros tickers que en tiempo real todavía no existían. El MC se reemplaza por
+_mc_stub (determinista) en ambos lados: el bootstrap es aleatorio.
+"""
+import contextlib
+import io
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import load_script
+
+bt = load_script("backtest_comparative_modes.py", "backtest_comparative_modes")
+
+GOLDEN = Path(__file__).parent / "fixtures" / "golden" / "backtest_comparative_modes"
+
+CONFIGS = [
+    ("baseline", {}),
+    ("hybrid", {}),
+    ("hybrid", {"pw_bands": (0.52, 0.58)}),
+    ("hybrid", {"pw_threshold": 0.55}),
+    ("hybrid", {"soft_hybrid": True}),
+    ("probwin_only", {}),
+    ("probwin_only", {"pw_threshold": 0.55}),
+    ("hybrid_full_universe", {}),
+]
+LIMITS = {
+    "loose": dict(MIN_MC_EV=0.0, MAX_POSITIONS=50, MAX_TRADES_PER_DAY=50, MAX_DEPLOY=1e7, CAPITAL=1e7),
+    "binding": dict(MIN_MC_EV=-1.0, MAX_POSITIONS=4, MAX_TRADES_PER_DAY=2, MAX_DEPLOY=1900, CAPITAL=2000),
+}
+
+
+def case_id(limits, mode, kw):
+    return f"{limits}-{mode}-" + ("-".join(f"{k}={v}" for k, v in kw.items()) or "default")
+
+
+def _mc_stub(returns, *args, **kwargs):
+    """MC determinista: estadísticos de la ventana de retornos en lugar del bootstrap."""
+    if len(returns) < 10:
+        return {'ev': 0, 'cvar': 0, 'prob_loss': 1.0, 'score': -999, 'tp_rate': 0, 'sl_rate': 0}
+    r = np.asarray(returns, dtype=float)
+    ev, cvar = float(r.mean()), float(-np.percentile(r, 5))
+    return {'ev': ev, 'cvar': cvar, 'prob_loss': float((r < 0).mean()), 'score': ev - cvar,
+            'tp_rate': float((r >= 0.01).mean()), 'sl_rate': float((r <= -0.01).mean())}
+
+
+def _data(n_tickers=6, n_days=16, seed=3):
+    rng = np.random.default_rng(seed)
+    days = pd.bdate_range("2024-01-01", periods=n_days)
+    rows = []
+    for k in range(n_tickers):
+        p = rng.uniform(20, 300)
+        for d in days:
+            ts = pd.date_range(d + pd.Timedelta("09:30:00"), periods=26, freq="15min")
+            r = rng.normal(0, 0.006, 26)
+            c = p * np.exp(np.cumsum(r))
+            p = c[-1]
+            o = np.r_[c[0] / np.exp(r[0]), c[:-1]]
+            rows.append(pd.DataFrame({
+                "ticker": f"T{k}", "date": ts, "open": o, "close": c, "volume": 1.0,
+                "high": np.maximum(o, c) * (1 + rng.random(26) * 0.004),
+                "low": np.minimum(o, c) * (1 - rng.random(26) * 0.004),
+            })[rng.random(26) > 0.05])  # barras faltantes
+    intraday = pd.concat(rows, ignore_index=True)
+    daily = intraday.groupby(["ticker", intraday["date"].dt.date]).agg(
+        {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}).reset_index()
+    daily["date"] = pd.to_datetime(daily["date"])
+    daily = daily.sort_values(["ticker", "date"])
+    daily["return"] = daily.groupby("ticker")["close"].pct_change()
+    forecast = pd.DataFrame([(f"T{k}", d, rng.uniform(0.4, 0.7)) for k in range(n_tickers - 2) for d in days
+                             if rng.random() > 0.1], columns=["ticker", "date", "prob_win"])
+    return intraday, daily, forecast
+
+
+@pytest.fixture(scope="module")
+def data():
+    return _data()
+
+
+@pytest.fixture(scope="module")
+def golden():
+    return (pd.read_csv(GOLDEN / "trades.csv"), json.loads((GOLDEN / "equity.json").read_text()))
+
+
+@pytest.mark.parametrize("limits", sorted(LIMITS))
+@pytest.mark.parametrize("mode,kw", CONFIGS)
+def test_engine_matches_golden(data, golden, tmp_path, monkeypatch, limits, mode, kw):
+    intraday, daily, forecast = data
+    for name, v in LIMITS[limits].items():
+        monkeypatch.setattr(bt, name, v)
+    monkeypatch.setattr(bt, "monte_carlo_simulation", _mc_stub)
+    with contextlib.redirect_stdout(io.StringIO()):
+        trades, equity, _ = bt.run_backtest(mode, intraday, daily, forecast, **kw)
+
+    case = case_id(limits, mode, kw)
+    trades.to_csv(tmp_path / "trades.csv", index=False)
+    got = pd.read_csv(tmp_path / "trades.csv")
+    want = golden[0][golden[0]["case"] == case].drop(columns="case").reset_index(drop=True)
+    assert len(got) == len(want) > 0
+    pd.testing.assert_frame_equal(got, want, check_dtype=False, rtol=1e-10)
+    assert equity == pytest.approx(golden[1][case], rel=1e-9)
+
+
+def test_monte_carlo_same_distribution():
+    # Estadísticos del bootstrap original (commit base, seed 1) sobre estos retornos
+    rng = np.random.default_rng(0)
+    returns = rng.normal(0.001, 0.012, 20)
+    old = json.loads((GOLDEN / "monte_carlo.json").read_text())
+    np.random.seed(2)
+    new = bt.monte_carlo_simulation(returns, n_paths=20000)
+    for k in ("tp_rate", "sl_rate", "prob_loss"):
+        assert new[k] == pytest.approx(old[k], abs=0.02), k
+    assert new["ev"] == pytest.approx(old["ev"], abs=5e-4)
+    assert bt.monte_carlo_simulation(returns[:5])["score"] == -999
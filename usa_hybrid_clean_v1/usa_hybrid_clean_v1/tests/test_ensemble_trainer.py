@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import ensemble_trainer as et
+from utils.ensemble_trainer import ArtifactCache, data_hash, fit_base_learners, monthly_folds, split_threads
+
+RF = {"rf": {"n_estimators": 10, "random_state": 0}}
+
+
+def _xy(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(rng.normal(size=(n, 4)), columns=list("abcd"))
+    y = (X["a"] + 0.5 * rng.normal(size=n) > 0).astype(int)
+    return X, y
+
+
+def _timestamps(months):
+    # 20 filas por mes, ordenadas en el tiempo
+    return pd.DatetimeIndex([pd.Timestamp(f"{m}-01", tz="UTC") + pd.Timedelta(days=d)
+                             for m in months for d in range(20)])
+
+
+class _Recorder:
+    """make_learner de prueba: registra hilos; solo se llama cuando hay que ajustar."""
+
+    def __init__(self):
+        self.threads, self.fits = {}, 0
+
+    def __call__(self, name, n_threads, params=None):
+        from sklearn.dummy import DummyClassifier
+
+        self.threads[name] = n_threads
+        self.fits += 1
+        return DummyClassifier(strategy="prior")
+
+
+@pytest.mark.parametrize("budget,n,expected", [
+    (8, 3, [3, 3, 2]),
+    (2, 3, [1, 1, 1]),  # nunca menos de 1 hilo por tarea
+    (4, 1, [4]),
+    (5, 0, [5]),
+])
+def test_split_threads(budget, n, expected):
+    assert split_threads(budget, n) == expected
+
+
+def test_fit_base_learners_rf_predicts_and_caches(tmp_path):
+    X, y = _xy()
+    cache = ArtifactCache(tmp_path)
+    out = fit_base_learners(X[:150], y[:150], {"val": X[150:]}, fold="f1", learners=("rf",), params=RF,
+                            budget=2, cache=cache)
+    art = out["rf"]
+    assert not art["cached"] and art["n_threads"] == 2
+    assert art["preds"]["val"].shape == (50,)
+    assert ((art["preds"]["val"] > 0.5) == y[150:].to_numpy()).mean() > 0.7
+    assert len(list(tmp_path.glob("f1-rf-*.joblib"))) == 1
+    report = et.fit_report(out, fold="f1")
+    assert report[["fold", "learner", "cached", "n_threads"]].values.tolist() == [["f1", "rf", False, 2]]
+
+
+def test_cache_hit_skips_fit(tmp_path, monkeypatch):
+    rec = _Recorder()
+    monkeypatch.setattr(et, "make_learner", rec)
+    X, y = _xy()
+    kw = dict(fold="f1", learners=("rf", "xgb"), budget=4, cache=ArtifactCache(tmp_path))
+    first = fit_base_learners(X, y, {"val": X}, **kw)
+    assert rec.fits == 2 and rec.threads == {"rf": 2, "xgb": 2}
+    again = fit_base_learners(X, y, {"val": X}, **kw)
+    assert rec.fits == 2
+    assert all(a["cached"] for a in again.values())
+    np.testing.assert_array_equal(again["rf"]["preds"]["val"], first["rf"]["preds"]["val"])
+
+    # solo falta xgb: recibe todo el presupuesto
+    next(tmp_path.glob("f1-xgb-*.joblib")).unlink()
+    fit_base_learners(X, y, {"val": X}, **kw)
+    assert rec.fits == 3 and rec.threads["xgb"] == 4
+
+
+def test_artifact_keys(tmp_path, monkeypatch):
+    monkeypatch.setattr(et, "make_learner", _Recorder())
+    X, y = _xy()
+    cache = ArtifactCache(tmp_path)
+
+    def new_keys(**kw):
+        """Claves de artefactos que crea una llamada (vacío = todo salió del caché)."""
+        before = {p.stem for p in tmp_path.glob("*.joblib")}
+        args = dict(fold="f1", learners=("rf", "xgb"), cache=cache, budget=2)
+        args.update(kw)
+        fit_base_learners(X, y, args.pop("predict_on", {"val": X}), **args)
+        return {p.stem for p in tmp_path.glob("*.joblib")} - before
+
+    assert len(new_keys()) == 2
+    assert new_keys() == set()
+    # cambiar los hiperparámetros de un learner solo invalida ese learner
+    changed = new_keys(params={"rf": {"n_estimators": 7}})
+    assert len(changed) == 1 and next(iter(changed)).startswith("f1-rf-")
+    assert len(new_keys(fold="f2")) == 2
+    assert len(new_keys(predict_on={"val": X, "test": X})) == 2  # otros conjuntos de predicción
+    assert len(new_keys(data_key="0" * 40)) == 2
+    # caché deshabilitado: no escribe ni lee
+    disabled = ArtifactCache(tmp_path / "off", enabled=False)
+    out = fit_base_learners(X, y, {"val": X}, fold="f1", learners=("rf",), cache=disabled, budget=1)
+    assert not out["rf"]["cached"] and not (tmp_path / "off").exists()
+
+
+def test_monthly_folds_are_stable_when_a_month_is_added():
+    months = ["2024-01", "2024-02", "2024-03", "2024-04", "2024-05"]
+    ts = _timestamps(months)
+    X, y = _xy(len(ts) + 20)
+    folds = monthly_folds(ts, n_test_months=3)
+    assert [f[0] for f in folds] == ["2024-03", "2024-04", "2024-05"]
+    label, train_idx, test_idx = folds[0]
+    assert ts[train_idx].max() < pd.Timestamp("2024-03-01", tz="UTC")
+    assert (ts[test_idx].strftime("%Y-%m") == "2024-03").all()
+
+    def fold_keys(n_rows, folds):
+        Xn, yn = X[:n_rows], y[:n_rows]
+        return {lbl: data_hash(Xn.iloc[tr], yn.iloc[tr], Xn.iloc[te], yn.iloc[te]) for lbl, tr, te in folds}
+
+    old = fold_keys(len(ts), monthly_folds(ts, n_test_months=6))
+    grown = _timestamps(months + ["2024-06"])
+    new = fold_keys(len(grown), monthly_folds(grown, n_test_months=6))
+    assert set(new) - set(old) == {"2024-06"}
+    assert all(new[k] == old[k] for k in old)
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import feature_engine as fe
+
+
+# Referencias: scripts 09/09c previos al motor vectorizado (ticker por ticker)
+def old_compute_daily_features(df):
+    df['ret_1d'] = df['close'].pct_change(1)
+    df['ret_5d'] = df['close'].pct_change(5)
+    df['ret_20d'] = df['close'].pct_change(20)
+    df['vol_5d'] = df['close'].rolling(5).std()
+    df['vol_20d'] = df['close'].rolling(20).std()
+    df['tr'] = np.maximum(df['high'] - df['low'], np.abs(df['high'] - df['close'].shift()), np.abs(df['low'] - df['close'].shift()))
+    df['atr_14d'] = df['tr'].rolling(14).mean()
+    df['pos_in_range_20d'] = (df['close'] - df['low'].rolling(20).min()) / (df['high'].rolling(20).max() - df['low'].rolling(20).min())
+    return df
+
+
+def old_add_context_features(df):
+    df = df.sort_values(['ticker', 'timestamp']).copy()
+    df['prev_close'] = df.groupby('ticker')['close'].shift(1)
+    df['gap_pct'] = (df['open'] - df['prev_close']) / df['prev_close']
+    for w in (20, 60):
+        df[f'hh_{w}'] = df.groupby('ticker')['high'].transform(lambda x: x.rolling(w).max())
+        df[f'll_{w}'] = df.groupby('ticker')['low'].transform(lambda x: x.rolling(w).min())
+    for w in (20, 60):
+        df[f'dist_to_hh_{w}'] = (df['close'] - df[f'hh_{w}']) / df[f'hh_{w}']
+        df[f'dist_to_ll_{w}'] = (df['close'] - df[f'll_{w}']) / df[f'll_{w}']
+    df['tr_norm'] = df['tr'] / df['close']
+    df['dow'] = pd.to_datetime(df['timestamp']).dt.dayofweek
+    for dow in range(5):
+        df[f'dow_{dow}'] = (df['dow'] == dow).astype(int)
+    df['day_of_month'] = pd.to_datetime(df['timestamp']).dt.day
+    df['pos_in_month'] = (df['day_of_month'] - 1) / 30
+    df['vol_avg_20'] = df.groupby('ticker')['volume'].transform(lambda x: x.rolling(20).mean())
+    df['vol_rel'] = df['volume'] / df['vol_avg_20']
+    df['ret_2d'] = df.groupby('ticker')['close'].pct_change(2)
+    df['ret_3d'] = df.groupby('ticker')['close'].pct_change(3)
+    df['vol_ratio'] = df['vol_5d'] / df['vol_20d']
+    df['momentum_strength'] = df['ret_5d'] / (df['vol_5d'] + 1e-6)
+    df['is_up'] = (df['close'] > df['prev_close']).astype(int)
+    df['consec_up'] = df.groupby('ticker')['is_up'].transform(lambda x: x.groupby((x != x.shift()).cumsum()).cumsum())
+    return df
+
+
+def _ohlcv(n=150, seed=0):
+    """Dos tickers con escalas muy distintas: el primero en orden (AAA ~ $500) precede al de centavos."""
+    rng = np.random.default_rng(seed)
+    ts = pd.bdate_range("2024-01-01", periods=n, tz="UTC")
+    frames = []
+    for ticker, base in (("AAA", 500.0), ("BBB", 0.5)):
+        close = base * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+        frames.append(pd.DataFrame({
+            "timestamp": ts, "open": close * (1 + rng.normal(0, 0.005, n)),
+            "high": close * 1.01, "low": close * 0.99, "close": close,
+            "volume": rng.integers(1_000, 1_000_000, n).astype(float), "ticker": ticker,
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def _old_pipeline(df):
+    feats = pd.concat([old_compute_daily_features(df[df['ticker'] == t].copy()) for t in df['ticker'].unique()])
+    return old_add_context_features(feats).reset_index(drop=True)
+
+
+def test_two_ticker_features_match_old_scripts():
+    df = _ohlcv()
+    old = _old_pipeline(df)
+    new = fe.compute_all_features(df.copy())
+    cols = fe.BASE_FEATURES + fe.CONTEXT_FEATURES
+    pd.testing.assert_frame_equal(new[cols], old[cols], check_dtype=False, rtol=1e-12, atol=0)
+
+
+def test_rolling_does_not_leak_across_tickers():
+    df = _ohlcv()
+    new = fe.compute_daily_features(df.copy())
+    low = new[new['ticker'] == 'BBB'].reset_index(drop=True)
+    alone = fe.compute_daily_features(df[df['ticker'] == 'BBB'].copy())
+    np.testing.assert_array_equal(low['vol_5d'].to_numpy(), alone['vol_5d'].to_numpy())
+
+
+def test_incremental_update_and_flat_keep_date_column(tmp_path):
+    df = _ohlcv(n=200)
+    df['date'] = df['timestamp'].dt.strftime('%Y-%m-%d')
+    src = tmp_path / "ohlcv.parquet"
+    dst = tmp_path / "features.parquet"
+    cutoff = df['timestamp'].sort_values().unique()[-10]
+    df[df['timestamp'] < cutoff].to_parquet(src, index=False)
+    rows = fe.update_partitioned(src, dst, fe.compute_daily_features, loader=fe.load_ohlcv_long)
+    fe.write_flat(dst, dst, rows)
+
+    df.to_parquet(src, index=False)
+    rows = fe.update_partitioned(src, dst, fe.compute_daily_features, loader=fe.load_ohlcv_long)
+    assert rows['timestamp'].nunique() == 10
+    flat = fe.write_flat(dst, dst, rows)
+    full = fe.compute_daily_features(fe.normalize_long(df))
+    assert 'date' in flat.columns
+    pd.testing.assert_frame_equal(flat[['ticker', 'date'] + fe.BASE_FEATURES].reset_index(drop=True),
+                                  full[['ticker', 'date'] + fe.BASE_FEATURES].reset_index(drop=True), check_dtype=False)
+    # Sin filas nuevas el parquet único no se reescribe
+    mtime = dst.stat().st_mtime_ns
+    rows = fe.update_partitioned(src, dst, fe.compute_daily_features, loader=fe.load_ohlcv_long)
+    assert fe.write_flat(dst, dst, rows) is None and dst.stat().st_mtime_ns == mtime
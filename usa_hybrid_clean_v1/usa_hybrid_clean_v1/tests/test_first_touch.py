@@ -0,0 +1,111 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from utils.first_touch import (HIT_NONE, HIT_SL, HIT_TP, HIT_TRAIL, _reference_exits, _synthetic_batch,
+                               simulate_exits, window_bounds)
+
+KEYS = ["reason", "exit_bar", "exit_price", "mfe_pct", "mae_pct"]
+
+
+def _assert_same(fast, ref):
+    for k in KEYS:
+        np.testing.assert_allclose(fast[k], ref[k], rtol=1e-12, equal_nan=True, err_msg=k)
+
+
+def _bars(rows):
+    """rows: [(open, high, low, close), ...] → arrays."""
+    return tuple(np.array(c, dtype=float) for c in zip(*rows))
+
+
+# Una ventana de 3 barras desde 100: barra 0 quieta, barra 1 toca 102 y 98, barra 2 cierra en 101
+BARS = _bars([(100, 100.5, 99.5, 100), (100, 102, 98, 100), (100, 101, 99.5, 101)])
+
+
+@pytest.mark.parametrize("tie,code,price", [("sl_first", HIT_SL, 99), ("tp_first", HIT_TP, 101)])
+def test_same_bar_tie_long(tie, code, price):
+    out = simulate_exits(*BARS, [0], [3], True, 101, 99, entry=100, tie=tie)
+    assert out["reason"][0] == code and out["exit_bar"][0] == 1 and out["exit_price"][0] == price
+    _assert_same(out, _reference_exits(*BARS, [0], [3], True, 101, 99, entry=100, tie=tie))
+
+
+@pytest.mark.parametrize("tie,code,price", [("sl_first", HIT_SL, 101), ("tp_first", HIT_TP, 99)])
+def test_same_bar_tie_short(tie, code, price):
+    out = simulate_exits(*BARS, [0], [3], False, 99, 101, entry=100, tie=tie)
+    assert out["reason"][0] == code and out["exit_bar"][0] == 1 and out["exit_price"][0] == price
+    _assert_same(out, _reference_exits(*BARS, [0], [3], False, 99, 101, entry=100, tie=tie))
+
+
+@pytest.mark.parametrize("is_long", [True, False])
+def test_timeout_exits_at_last_close(is_long):
+    tp, sl = (110, 90) if is_long else (90, 110)
+    out = simulate_exits(*BARS, [0, 1], [3, 2], is_long, tp, sl, entry=100)
+    assert list(out["reason"]) == [HIT_NONE, HIT_NONE]
+    assert list(out["exit_bar"]) == [2, 1] and list(out["exit_price"]) == [101, 101]
+    _assert_same(out, _reference_exits(*BARS, [0, 1], [3, 2], is_long, tp, sl, entry=100))
+
+
+def test_empty_window_and_gap_fill():
+    o, h, l, c = _bars([(100, 100.5, 99.5, 100), (97, 97.5, 96, 97)])
+    out = simulate_exits(o, h, l, c, [0, 0], [2, 0], True, 105, 99, entry=100, fill="gap")
+    assert out["reason"][0] == HIT_SL and out["exit_price"][0] == 97  # abre por debajo del SL
+    assert out["exit_bar"][1] == -1 and np.isnan(out["exit_price"][1])
+    _assert_same(out, _reference_exits(o, h, l, c, [0, 0], [2, 0], True, 105, 99, entry=100, fill="gap"))
+
+
+@pytest.mark.parametrize("kw", [
+    dict(),
+    dict(tie="tp_first"),
+    dict(fill="gap"),
+    dict(tie="tp_first", fill="gap"),
+    dict(trail_atr_mult=1.0, trail_activation_atr=0.5),
+    dict(trail_atr_mult=1.5, trail_activation_atr=0.0, break_even_atr=1.0, fill="gap"),
+    dict(fill="open"),
+    dict(trail_atr_mult=1.0, trail_activation_atr=0.5, break_even_atr=1.0, fill="open"),
+])
+def test_kernel_matches_scalar_reference(kw):
+    args, atr = _synthetic_batch(400, 40, seed=7)
+    if kw.get("trail_atr_mult"):
+        kw = dict(kw, atr=atr)
+    fast = simulate_exits(*args, **kw)
+    _assert_same(fast, _reference_exits(*args, **kw))
+    reasons = set(fast["reason"].tolist())
+    assert {HIT_TP, HIT_SL, HIT_NONE} <= reasons
+    if kw.get("trail_atr_mult"):
+        assert HIT_TRAIL in reasons
+
+
+def test_open_fill():
+    # barra 1 abre en 101: TP LONG en 102 sale al open (101); SL LONG en 99.7 también sale al open
+    o, h, l, c = _bars([(100, 100.5, 99.8, 100), (101, 102.5, 99.5, 101)])
+    out = simulate_exits(o, h, l, c, [0, 0], [2, 2], True, [102, 110], [99, 99.7], entry=100, fill="open")
+    assert list(out["reason"]) == [HIT_TP, HIT_SL] and list(out["exit_price"]) == [101, 101]
+    out = simulate_exits(o, h, l, c, [0], [2], False, 90, 102, entry=100, fill="open")
+    assert out["reason"][0] == HIT_SL and out["exit_price"][0] == 101  # SHORT: min(sl, open)
+    _assert_same(out, _reference_exits(o, h, l, c, [0], [2], False, 90, 102, entry=100, fill="open"))
+
+
+def test_window_bounds():
+    group = np.array([0, 0, 0, 1, 1, 1, 1])
+    ts = np.array([1, 2, 3, 1, 2, 3, 4])
+    start, length = window_bounds(group, ts, [0, 1, 1], [2, 2, 5], [3, 3, 9])
+    assert list(start) == [1, 4, 7] and list(length) == [2, 2, 0]
+    start, length = window_bounds(group, ts, [1], [3])
+    assert list(start) == [5] and list(length) == [2]
+    start, length = window_bounds(group, ts, [0, 1], [2, 4], after=True)
+    assert list(start) == [2, 7] and list(length) == [1, 0]
+
+
+# Copias desplegadas con bmv_hybrid_clean_v3 e Intradia (ver docstring de utils/first_touch.py)
+VENDORED = ["bmv_hybrid_clean_v3/src/execution/first_touch.py", "bmv_hybrid_clean_v3/wf_box/scripts/first_touch.py",
+            "Intradia/intraday_v2/first_touch.py"]
+
+
+@pytest.mark.parametrize("rel", VENDORED)
+def test_vendored_copies_match(rel):
+    canon = Path(__file__).resolve().parents[1] / "utils" / "first_touch.py"
+    copy = Path(__file__).resolve().parents[3] / rel
+    if not copy.exists():
+        pytest.skip(f"{rel} no está en este checkout")
+    assert copy.read_bytes() == canon.read_bytes(), f"{rel} difiere de utils/first_touch.py"
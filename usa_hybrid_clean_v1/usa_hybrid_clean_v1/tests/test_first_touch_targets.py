@@ -0,0 +1,92 @@
+"""Targets de primer toque de 09_make_targets_intraday contra fixtures/golden/make_targets_intraday/
+(loop barra por barra del commit base, ver fixtures/make_golden.py)."""
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import load_script
+from utils.first_touch import HIT_LABELS, session_first_touch
+
+tgt = load_script("intraday/scripts/09_make_targets_intraday.py", "make_targets_intraday")
+
+GOLDEN = Path(__file__).parent / "fixtures" / "golden" / "make_targets_intraday"
+COLS = ["direction", "win", "tte_bars", "hit_type"]
+HORIZONS = [None, 3, 10, 40]
+LEVELS = [(0.012, 0.003), (0.004, 0.004), (0.002, 0.01)]
+SWEEP_PAIRS = [(0.012, 0.003), (0.004, 0.004)]
+
+
+def _bars(ticker="AMD", days=4, per_day=26, seed=0, vol=0.004):
+    rng = np.random.default_rng(seed)
+    ts = np.concatenate([
+        pd.date_range(f"2025-03-{3 + d:02d} 09:30", periods=per_day, freq="15min") for d in range(days)
+    ])
+    n = len(ts)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, vol, n)))
+    open_ = np.r_[close[0], close[:-1]]
+    return pd.DataFrame({
+        "ticker": ticker, "timestamp": ts, "open": open_,
+        "high": np.maximum(open_, close) * (1 + rng.random(n) * vol),
+        "low": np.minimum(open_, close) * (1 - rng.random(n) * vol),
+        "close": close, "volume": rng.integers(1_000, 50_000, n).astype(float),
+    })
+
+
+def case_id(seed, tp, sl, horizon):
+    return f"seed={seed}-tp={tp}-sl={sl}-h={horizon}"
+
+
+def _targets(bars, tp, sl, horizon, tmp_path):
+    tgt.process_ticker(bars, tp, sl, horizon)[COLS].to_csv(tmp_path / "out.csv", index=False)
+    return pd.read_csv(tmp_path / "out.csv")
+
+
+def _golden(case):
+    df = pd.read_csv(GOLDEN / "targets.csv")
+    return df[df["case"] == case].drop(columns="case").reset_index(drop=True)
+
+
+@pytest.mark.parametrize("horizon", HORIZONS)
+@pytest.mark.parametrize("tp,sl", LEVELS)
+def test_targets_match_golden(horizon, tp, sl, tmp_path):
+    for seed in (0, 1):
+        new = _targets(_bars(seed=seed), tp, sl, horizon, tmp_path)
+        old = _golden(case_id(seed, tp, sl, horizon))
+        assert set(old["direction"]) == {"LONG", "SHORT"}
+        pd.testing.assert_frame_equal(new, old, check_dtype=False)
+
+
+def test_groups_do_not_cross_tickers():
+    a, b = _bars("AMD", days=1, seed=2), _bars("NVDA", days=1, seed=3)
+    both = pd.concat([a, b], ignore_index=True)
+    day = both["timestamp"].dt.normalize().to_numpy()
+    group = pd.factorize(both["ticker"])[0]
+    is_long = np.ones(len(both), dtype=bool)
+    hit, tte = session_first_touch(both["high"], both["low"], both["close"], is_long, 0.01, 0.01, day, group=group)
+    for part, sl in ((a, slice(0, len(a))), (b, slice(len(a), None))):
+        h1, t1 = session_first_touch(part["high"], part["low"], part["close"], is_long[sl], 0.01, 0.01,
+                                     part["timestamp"].dt.normalize().to_numpy())
+        np.testing.assert_array_equal(hit[sl], h1)
+        np.testing.assert_array_equal(tte[sl], t1)
+    assert HIT_LABELS[hit[len(a) - 1, 0]] == "NONE"
+
+
+def test_sweep_matches_single_pair_runs():
+    bars = tgt.process_ticker(_bars(seed=4), 0.012, 0.003, 10)
+    sweep = tgt.sweep_targets(bars, SWEEP_PAIRS, horizon_bars=10)
+    golden = json.loads((GOLDEN / "sweep.json").read_text())
+    for (tp, sl), row in zip(SWEEP_PAIRS, sweep.itertuples()):
+        one = golden[f"tp={tp}-sl={sl}"]
+        assert row.win_rate == pytest.approx(one["win_rate"])
+        assert (row.tp_hits, row.sl_hits, row.horizon) == (one["tp_hits"], one["sl_hits"], one["horizon"])
+
+
+def test_max_bars_cap_matches_golden(tmp_path):
+    # Sesiones largas y poca volatilidad: el corte de 26 barras sin toque → EOD
+    new = _targets(_bars(days=2, per_day=60, seed=5, vol=0.0005), 0.02, 0.02, None, tmp_path)
+    old = _golden("max_bars")
+    assert (old["tte_bars"] == 27).any()
+    pd.testing.assert_frame_equal(new, old, check_dtype=False)
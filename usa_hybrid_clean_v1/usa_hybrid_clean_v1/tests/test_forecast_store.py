@@ -0,0 +1,43 @@
+import pandas as pd
+
+from utils import forecast_store as fs
+
+
+def _signals(day, prob):
+    return pd.DataFrame({"date": [day, day], "ticker": ["AMD", "NVDA"], "prob_win": [prob, prob]})
+
+
+def test_newest_version_key_wins_even_if_older_written_last(tmp_path):
+    fs.put_forecast(_signals("2025-11-03", 0.7), version="20251104T010000Z-bbbb", root=tmp_path)
+    fs.put_forecast(_signals("2025-11-03", 0.5), version="20251101T010000Z-aaaa", root=tmp_path)  # backfill
+    df = fs.get_forecast("2025-11-03", ["AMD"], root=tmp_path)
+    assert df["model_version"].tolist() == ["20251104T010000Z-bbbb"]
+    assert df["prob_win"].tolist() == [0.7]
+
+
+def test_store_dir_env_override(tmp_path, monkeypatch):
+    monkeypatch.setenv("FORECAST_STORE_DIR", str(tmp_path))
+    assert not fs.is_store()
+    fs.put_forecast(_signals("2025-11-03", 0.6))
+    assert fs.is_store() and (tmp_path / fs.INDEX_NAME).exists()
+    assert len(fs.get_forecast("2025-11-03")) == 2
+
+
+def test_rerun_replaces_partition(tmp_path):
+    v = "20251104T010000Z-bbbb"
+    fs.put_forecast(_signals("2025-11-03", 0.7), version=v, root=tmp_path, asof="2025-11-03")
+    # Re-corrida con gates más estrictos: solo pasa AMD
+    fs.put_forecast(_signals("2025-11-03", 0.8).iloc[:1], version=v, root=tmp_path, asof="2025-11-03")
+    df = fs.get_forecast("2025-11-03", root=tmp_path)
+    assert df["ticker"].tolist() == ["AMD"] and df["prob_win"].tolist() == [0.8]
+    # Re-corrida sin señales: la partición queda vacía
+    assert fs.put_forecast(_signals("2025-11-03", 0.8).iloc[:0], version=v, root=tmp_path, asof="2025-11-03")
+    assert fs.get_forecast("2025-11-03", root=tmp_path).empty
+    assert fs.get_forecast("2025-11-03", ["AMD"], root=tmp_path).empty
+
+
+def test_merge_keeps_other_tickers(tmp_path):
+    fs.put_forecast(_signals("2025-11-03", 0.7), root=tmp_path)
+    fs.put_forecast(_signals("2025-11-03", 0.8).iloc[:1], root=tmp_path, merge=True)
+    df = fs.get_forecast("2025-11-03", root=tmp_path).sort_values("ticker")
+    assert df["prob_win"].tolist() == [0.8, 0.7]
@@ -0,0 +1,81 @@
+import json
+import sys
+import threading
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+from utils import inference_bundle as ib
+
+
+@pytest.fixture
+def server():
+    srv = ib.make_server("127.0.0.1", 0, token="s3cret")
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+
+
+def _post(url, payload, headers):
+    req = Request(f"{url}/run", data=json.dumps(payload).encode(), headers=headers)
+    try:
+        with urlopen(req, timeout=10) as resp:
+            return resp.status
+    except HTTPError as e:
+        return e.code
+
+
+def test_resolve_warm_request_allowlist_and_cwd(tmp_path):
+    script, cwd = ib.resolve_warm_request("scripts/11_infer_and_gate.py")
+    assert script == (ib.PROJECT_ROOT / "scripts/11_infer_and_gate.py").resolve()
+    assert cwd == ib.PROJECT_ROOT
+    with pytest.raises(ValueError):
+        ib.resolve_warm_request("scripts/../utils/inference_bundle.py")
+    with pytest.raises(ValueError):
+        ib.resolve_warm_request(str(tmp_path / "evil.py"))
+    with pytest.raises(ValueError):
+        ib.resolve_warm_request("scripts/11_infer_and_gate.py", cwd=str(tmp_path))
+
+
+def test_server_requires_json_token_and_allowlisted_script(server, tmp_path):
+    evil = tmp_path / "evil.py"
+    evil.write_text("open(r'%s', 'w').write('x')\n" % (tmp_path / "pwned"))
+    ok = {"Content-Type": "application/json", "X-Warm-Token": "s3cret"}
+    assert _post(server, {"script": str(evil)}, {"Content-Type": "text/plain", "X-Warm-Token": "s3cret"}) == 415
+    assert _post(server, {"script": str(evil)}, {"Content-Type": "application/json"}) == 403
+    assert _post(server, {"script": str(evil)}, ok) == 403
+    assert _post(server, {"script": "scripts/11_infer_and_gate.py", "cwd": str(tmp_path)}, ok) == 403
+    assert not (tmp_path / "pwned").exists()
+
+
+def test_run_inprocess_restores_sys_path(tmp_path):
+    script = tmp_path / "touch_path.py"
+    script.write_text("import sys\nsys.path.insert(0, 'zzz')\n")
+    before = list(sys.path)
+    assert ib.run_script_inprocess(script)["returncode"] == 0
+    assert sys.path == before
+
+
+def test_spawn_server_runs_in_its_own_process():
+    import os
+    import socket
+    import time
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    proc = ib.spawn_server("127.0.0.1", port, token="s3cret")
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 30
+        health = None
+        while health is None and time.time() < deadline:
+            health = ib.warm_health(url, timeout=1)
+            time.sleep(0.1)
+        assert health and health["pid"] == proc.pid != os.getpid()
+        assert _post(url, {"script": "scripts/11_infer_and_gate.py"}, {"Content-Type": "application/json"}) == 403
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    assert ib.warm_health(url, timeout=1) is None
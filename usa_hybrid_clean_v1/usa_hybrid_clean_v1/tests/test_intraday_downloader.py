@@ -0,0 +1,89 @@
+from datetime import date, timedelta
+
+import pandas as pd
+
+from utils import intraday_downloader
+from utils.intraday_downloader import Checkpoint, backfill, missing_ranges, trading_days
+from utils.intraday_store import HistoryStore
+
+
+def _session(day, n=26, ticker="AMD"):
+    ts = pd.date_range(pd.Timestamp(day, tz="UTC") + pd.Timedelta(hours=13, minutes=30), periods=n, freq="15min")
+    return pd.DataFrame({"timestamp": ts, "open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0,
+                         "volume": 100.0, "ticker": ticker})
+
+
+class FakeSource:
+    vendor = "fake"
+
+    def __init__(self, bars_per_day=26):
+        self.calls = []
+        self.bars_per_day = bars_per_day
+
+    def fetch(self, ticker, start, end, interval):
+        self.calls.append((ticker, start, end))
+        days = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1)).date
+        return pd.concat([_session(d, self.bars_per_day, ticker) for d in days]) if len(days) else pd.DataFrame()
+
+
+def test_missing_ranges_uses_days_with_bars_not_min_max():
+    # lunes y viernes con barras, martes parcial: min..max ya no cuenta como cubierto
+    counts = {date(2024, 3, 4): 26, date(2024, 3, 5): 3, date(2024, 3, 8): 26}
+    gaps = missing_ranges(counts, date(2024, 3, 4), date(2024, 3, 9), min_bars=13, today=date(2024, 4, 1))
+    assert gaps == [(date(2024, 3, 5), date(2024, 3, 8))]
+
+
+def test_missing_ranges_always_refetches_today():
+    today = date(2024, 3, 8)
+    counts = {date(2024, 3, 7): 26, today: 26}
+    assert missing_ranges(counts, date(2024, 3, 7), date(2024, 3, 9), min_bars=13, today=today) == [(today, date(2024, 3, 9))]
+
+
+def test_checkpoint_keeps_closed_empty_chunks_and_skips_current_day(tmp_path):
+    cp = Checkpoint(tmp_path / "cp.json")
+    today = date(2024, 3, 8)
+    assert cp.mark("AMD", date(2024, 3, 1), date(2024, 3, 2), 0, today=today)
+    assert not cp.mark("AMD", date(2024, 3, 7), today + timedelta(days=1), 26, today=today)
+    assert cp.mark("AMD", date(2024, 3, 4), date(2024, 3, 5), 26, today=today)
+    assert Checkpoint(tmp_path / "cp.json").done == {"AMD|2024-03-01|2024-03-02": 0, "AMD|2024-03-04|2024-03-05": 26}
+    assert cp.is_done("AMD", date(2024, 3, 1), date(2024, 3, 2))
+
+
+def test_missing_ranges_skips_nyse_holidays():
+    # Good Friday 2024-03-29 y 4 de julio (jueves): no son huecos
+    counts = {date(2024, 3, 28): 26, date(2024, 4, 1): 26}
+    assert missing_ranges(counts, date(2024, 3, 28), date(2024, 4, 2), min_bars=13, today=date(2024, 5, 1)) == []
+    counts = {d: 26 for d in pd.bdate_range("2024-07-01", "2024-07-05").date}
+    assert missing_ranges(counts, date(2024, 7, 1), date(2024, 7, 6), min_bars=13, today=date(2024, 8, 1)) == []
+    assert date(2022, 12, 30) in trading_days(date(2022, 12, 26), date(2023, 1, 3))  # Año Nuevo en sábado
+    assert date(2022, 12, 26) not in trading_days(date(2022, 12, 26), date(2023, 1, 3))
+
+
+def test_trading_days_reads_calendar_file(tmp_path, monkeypatch):
+    (tmp_path / "nyse_holidays_2025.json").write_text('{"holidays": [{"date": "2025-01-09", "name": "Carter"}]}')
+    monkeypatch.setattr(intraday_downloader, "CALENDAR_DIR", tmp_path)
+    assert trading_days(date(2025, 1, 8), date(2025, 1, 11)) == [date(2025, 1, 8), date(2025, 1, 10)]
+
+
+def test_backfill_refetches_partial_days_only(tmp_path):
+    store = HistoryStore(tmp_path / "history")
+    store.merge_bars(pd.concat([_session("2024-03-04"), _session("2024-03-05", n=4), _session("2024-03-08")]))
+    src = FakeSource()
+    cp = Checkpoint(tmp_path / "cp.json")
+    summary = backfill(["AMD"], date(2024, 3, 4), date(2024, 3, 9), "15m", src, store, workers=2, checkpoint=cp)
+    assert src.calls == [("AMD", date(2024, 3, 5), date(2024, 3, 8))]
+    assert (summary["status"] == "ok").all()
+    assert store.day_counts("AMD").to_dict() == {date(2024, 3, d): 26 for d in (4, 5, 6, 7, 8)}
+    src.calls.clear()
+    backfill(["AMD"], date(2024, 3, 4), date(2024, 3, 9), "15m", src, store, workers=2, checkpoint=cp)
+    assert src.calls == []
+
+
+def test_backfill_clamps_start_to_vendor_lookback(tmp_path):
+    src = FakeSource()
+    src.lookback_days = {"15m": 60}
+    today = pd.Timestamp.now(tz="UTC").date()
+    summary = backfill(["AMD"], today - timedelta(days=180), today, "15m", src, HistoryStore(tmp_path / "history"),
+                       workers=1, checkpoint=Checkpoint(tmp_path / "cp.json"))
+    assert min(a for _, a, _ in src.calls) >= today - timedelta(days=59)
+    assert (summary["status"] == "ok").all()
@@ -0,0 +1,80 @@
+import pandas as pd
+
+from utils.intraday_store import HistoryStore
+
+
+def _bars(start, n, ticker="amd", close=1.0, freq="15min"):
+    ts = pd.date_range(pd.Timestamp(start, tz="UTC"), periods=n, freq=freq)
+    return pd.DataFrame({"ticker": ticker, "timestamp": ts, "open": close, "high": close, "low": close,
+                         "close": close, "volume": 100.0})
+
+
+def _files(root):
+    return sorted(p.relative_to(root).as_posix() for p in root.rglob("part-0.parquet"))
+
+
+def test_merge_bars_dedups_and_newest_row_wins(tmp_path):
+    store = HistoryStore(tmp_path)
+    store.merge_bars(_bars("2024-03-04 14:30", 4))
+    store.merge_bars(_bars("2024-03-04 15:00", 4, close=2.0))  # 2 barras repetidas + 2 nuevas
+    out = store.read_bars(["AMD"])
+    assert len(out) == 6
+    assert out["timestamp"].is_monotonic_increasing
+    assert out["close"].tolist() == [1.0, 1.0, 2.0, 2.0, 2.0, 2.0]
+    assert _files(tmp_path) == ["ticker=AMD/date=2024-03-04/part-0.parquet"]
+
+
+def test_compact_and_late_bar_into_compacted_month(tmp_path):
+    store = HistoryStore(tmp_path)
+    store.merge_bars(pd.concat([_bars("2024-02-28 14:30", 3), _bars("2024-02-29 14:30", 3),
+                                _bars("2024-03-01 14:30", 3)]))
+    done = store.compact(before="2024-03-01")
+    assert [p.relative_to(tmp_path).as_posix() for p in done] == ["ticker=AMD/month=2024-02/part-0.parquet"]
+    assert _files(tmp_path) == ["ticker=AMD/date=2024-03-01/part-0.parquet",
+                                "ticker=AMD/month=2024-02/part-0.parquet"]
+    assert not (tmp_path / "ticker=AMD" / "date=2024-02-28").exists()
+
+    # barra tardía (y una corrección) de febrero: va directo al archivo mensual
+    late = pd.concat([_bars("2024-02-28 14:15", 1, close=3.0), _bars("2024-02-29 14:30", 1, close=4.0)])
+    written = store.merge_bars(late)
+    assert {p.relative_to(tmp_path).as_posix() for p in written} == {"ticker=AMD/month=2024-02/part-0.parquet"}
+    assert "ticker=AMD/date=2024-02-28/part-0.parquet" not in _files(tmp_path)
+    feb = store.read_bars(["AMD"], "2024-02-01", "2024-02-29 23:59")
+    assert len(feb) == 7
+    assert feb["timestamp"].is_monotonic_increasing
+    assert feb.set_index("timestamp").loc[pd.Timestamp("2024-02-29 14:30", tz="UTC"), "close"] == 4.0
+    man = store.manifest().set_index("path")
+    assert man.loc["ticker=AMD/month=2024-02/part-0.parquet", "rows"] == 7
+    assert man.loc["ticker=AMD/month=2024-02/part-0.parquet", "min_ts"] == pd.Timestamp("2024-02-28 14:15", tz="UTC")
+
+
+def test_rebuild_manifest_matches_incremental(tmp_path):
+    store = HistoryStore(tmp_path)
+    store.merge_bars(pd.concat([_bars("2024-02-28 14:30", 3), _bars("2024-03-01 14:30", 2, ticker="msft")]))
+    store.compact(before="2024-03-01")
+    incremental = store.manifest().sort_values("path").reset_index(drop=True)
+    (tmp_path / "_manifest.parquet").unlink()
+    rebuilt = HistoryStore(tmp_path).manifest().sort_values("path").reset_index(drop=True)
+    pd.testing.assert_frame_equal(rebuilt, incremental, check_dtype=False)
+    assert (tmp_path / "_manifest.parquet").exists()
+    assert HistoryStore(tmp_path).tickers() == ["AMD", "MSFT"]
+
+
+def test_read_bars_pushdown_on_legacy_naive_files(tmp_path):
+    # archivo viejo con timestamp sin zona (UTC implícito), escrito fuera del store
+    legacy = _bars("2024-01-02 14:30", 26)
+    legacy["timestamp"] = legacy["timestamp"].dt.tz_localize(None)
+    path = tmp_path / "ticker=AMD" / "date=2024-01-02" / "part-0.parquet"
+    path.parent.mkdir(parents=True)
+    legacy.assign(ticker="AMD").to_parquet(path, index=False)
+    store = HistoryStore(tmp_path)
+    store.merge_bars(_bars("2024-01-03 14:30", 26))
+
+    out = store.read_bars(["AMD"], "2024-01-02 15:00", pd.Timestamp("2024-01-03 09:45", tz="America/New_York"))
+    assert str(out["timestamp"].dt.tz) == "UTC"
+    assert out["timestamp"].min() == pd.Timestamp("2024-01-02 15:00", tz="UTC")
+    assert out["timestamp"].max() == pd.Timestamp("2024-01-03 14:45", tz="UTC")
+    assert len(out) == 24 + 2
+    assert store.locate(["AMD"], "2024-01-03", "2024-01-04")["path"].tolist() == [
+        "ticker=AMD/date=2024-01-03/part-0.parquet"]
+    assert store.day_counts("AMD").tolist() == [26, 26]
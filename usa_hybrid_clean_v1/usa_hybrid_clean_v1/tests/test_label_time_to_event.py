@@ -0,0 +1,69 @@
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import load_script
+
+lab = load_script("scripts/37_label_time_to_event.py", "label_tth")
+
+# Salidas de la versión fila a fila (commit base, ver fixtures/make_golden.py)
+GOLDEN = Path(__file__).parent / "fixtures" / "golden" / "label_time_to_event"
+
+
+def _trades(n=60, seed=3, month="2025-01"):
+    rng = np.random.default_rng(seed)
+    entry = pd.Timestamp(f"{month}-02") + pd.to_timedelta(rng.integers(0, 20, n), unit="D")
+    exit_ = entry + pd.to_timedelta(rng.integers(1, 8, n), unit="D")
+    df = pd.DataFrame({
+        "ticker": rng.choice(["AMD", "NVDA", "XOM"], n),
+        "entry_date": entry.strftime("%Y-%m-%d"),
+        "exit_date": exit_.strftime("%Y-%m-%d"),
+        "outcome": rng.choice(["TP", "SL", "WIN", "loss", "EXPIRE", "horizon", "TP_PARTIAL"], n),
+        "prob_win": rng.uniform(0.4, 0.8, n), "y_hat": rng.normal(0, 0.02, n),
+        "tp_pct": 0.05, "horizon_days": rng.integers(2, 6, n), "sector": "tech", "pnl": rng.normal(0, 10, n),
+    })
+    df.loc[::7, "exit_date"] = None
+    return df
+
+
+@pytest.mark.parametrize("variant", ["outcome", "close_reason"])
+def test_label_matches_golden(variant, tmp_path):
+    trades = _trades()
+    if variant == "close_reason":
+        trades = trades.drop(columns=["outcome"]).assign(close_reason=trades["outcome"])
+    lab.label_time_to_event(trades).to_csv(tmp_path / "out.csv", index=False)
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "out.csv"), pd.read_csv(GOLDEN / f"{variant}.csv"),
+                                  check_dtype=False)
+
+
+def _run(monkeypatch, trades_dir, output):
+    monkeypatch.setattr(sys, "argv", ["37", "--trades-dir", str(trades_dir), "--output", str(output), "--incremental"])
+    lab.main()
+    return pd.read_parquet(output)
+
+
+def test_incremental_detects_files_changed_with_older_mtime(tmp_path, monkeypatch):
+    trades_dir, output = tmp_path / "reports", tmp_path / "out" / "tte.parquet"
+    for i, month in enumerate(("2025-01", "2025-02")):
+        (trades_dir / month).mkdir(parents=True)
+        _trades(seed=i, month=month).to_csv(trades_dir / month / "trades_detailed.csv", index=False)
+    old_t = 1_600_000_000
+    os.utime(trades_dir / "2025-01" / "trades_detailed.csv", (old_t, old_t))
+    first = _run(monkeypatch, trades_dir, output)
+
+    # Reescritura de enero con un mtime anterior al watermark global (p.ej. copia que preserva mtime)
+    f = trades_dir / "2025-01" / "trades_detailed.csv"
+    _trades(n=30, seed=9, month="2025-01").to_csv(f, index=False)
+    os.utime(f, (old_t + 1, old_t + 1))
+    second = _run(monkeypatch, trades_dir, output)
+    assert (second["month"] == "2025-01").sum() != (first["month"] == "2025-01").sum()
+    pd.testing.assert_frame_equal(second[second["month"] == "2025-02"].reset_index(drop=True),
+                                  first[first["month"] == "2025-02"].reset_index(drop=True))
+
+    mtime = output.stat().st_mtime_ns
+    _run(monkeypatch, trades_dir, output)
+    assert output.stat().st_mtime_ns == mtime
@@ -0,0 +1,66 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import load_script
+from utils.intraday_store import HistoryStore
+
+feat = load_script("scripts/09b_make_features_intraday.py", "make_features_intraday")
+
+
+def _bars(day, ticker="AMD", n=30, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.2, n))
+    return pd.DataFrame({
+        "ticker": ticker, "timestamp": pd.date_range(f"{day} 14:30", periods=n, freq="5min", tz="UTC"),
+        "open": close, "high": close + 0.1, "low": close - 0.1, "close": close, "volume": 1000.0,
+    })
+
+
+def test_watch_sees_bars_written_by_another_process(tmp_path, monkeypatch):
+    hist, out = tmp_path / "history", tmp_path / "features.parquet"
+    HistoryStore(hist).merge_bars(_bars("2025-03-03"))
+    sleeps = []
+
+    def fake_sleep(_):
+        if sleeps:
+            raise KeyboardInterrupt
+        sleeps.append(1)
+        HistoryStore(hist).merge_bars(_bars("2025-03-04", seed=1))  # otro proceso (downloader)
+
+    monkeypatch.setattr(feat.time, "sleep", fake_sleep)
+    monkeypatch.setattr(sys, "argv", ["09b", "--input-dir", str(hist), "--output", str(out), "--watch", "1"])
+    with pytest.raises(KeyboardInterrupt):
+        feat.main()
+    days = set(pd.read_parquet(out)["date"].astype(str))
+    assert days == {"2025-03-03", "2025-03-04"}
+
+
+def test_incremental_reads_each_ticker_from_its_own_last_ts(tmp_path, monkeypatch):
+    hist, out = tmp_path / "history", tmp_path / "features.parquet"
+    store = HistoryStore(hist)
+    store.merge_bars(pd.concat([_bars("2025-03-03"), _bars("2025-03-03", "MSFT", seed=2),
+                                _bars("2025-03-04", "MSFT", seed=3), _bars("2025-03-05", "MSFT", seed=4)]))
+    feat.run(HistoryStore(hist), str(out), str(out) + ".state")
+    # AMD quedó en el 03-03; llega un día nuevo para ambos
+    HistoryStore(hist).merge_bars(pd.concat([_bars("2025-03-06", seed=5), _bars("2025-03-06", "MSFT", seed=6)]))
+    reads = []
+    real = HistoryStore.read_bars
+
+    def spy(self, tickers=None, start=None, end=None, columns=None):
+        df = real(self, tickers, start, end, columns)
+        reads.append((tuple(tickers), start, len(df)))
+        return df
+
+    monkeypatch.setattr(HistoryStore, "read_bars", spy)
+    assert feat.run(HistoryStore(hist), str(out), str(out) + ".state") == 2
+    assert sorted(r[:2] for r in reads) == [(("AMD",), pd.Timestamp("2025-03-03 16:55", tz="UTC")),
+                                            (("MSFT",), pd.Timestamp("2025-03-05 16:55", tz="UTC"))]
+    assert sum(n for *_, n in reads) == 2 * 31  # la última barra vista + el día nuevo, por ticker
+    monkeypatch.undo()
+    incremental = pd.read_parquet(out).reset_index(drop=True)
+    full = tmp_path / "full.parquet"
+    feat.run(HistoryStore(hist), str(full), str(full) + ".state", full=True)
+    pd.testing.assert_frame_equal(incremental, pd.read_parquet(full).reset_index(drop=True))
@@ -0,0 +1,83 @@
+import itertools
+import time
+
+import numpy as np
+import pytest
+
+from utils import plan_selection as ps
+
+
+def _brute_force(price, ticker, sector, value, per_trade_cash, capital_max, max_open, max_sector_share):
+    """Mejor valor por enumeración (max_per_ticker=1: el mejor rankeado de cada ticker)."""
+    qty = np.floor_divide(per_trade_cash, price)
+    exp = qty * price
+    gain = value * exp
+    seen, pool = set(), []
+    for i in range(len(price)):
+        if qty[i] >= 1 and gain[i] > 0 and ticker[i] not in seen:
+            seen.add(ticker[i])
+            pool.append(i)
+    best = 0.0
+    for k in range(1, max_open + 1):
+        for c in map(list, itertools.combinations(pool, k)):
+            if np.ceil(exp[c] - 1e-9).sum() > capital_max:
+                continue
+            if any(exp[[i for i in c if sector[i] == s]].sum() > capital_max * max_sector_share for s in set(sector)):
+                continue
+            best = max(best, gain[c].sum())
+    return best, exp, gain
+
+
+def _case(rng, n):
+    price = rng.choice([30, 80, 120, 240, 330], n) * rng.uniform(0.9, 1.1, n)
+    return (price, rng.choice(list("ABCDE"), n), rng.choice(list("xyz"), n), rng.uniform(-0.01, 0.03, n))
+
+
+def test_knapsack_matches_brute_force():
+    rng = np.random.default_rng(1)
+    for _ in range(150):
+        price, tk, sec, val = _case(rng, int(rng.integers(1, 9)))
+        K, cap, share = int(rng.integers(1, 4)), float(rng.choice([500, 900])), float(rng.choice([0.5, 1.0]))
+        pos, ex = ps.knapsack_select(price, tk, sec, val, 300.0, cap, K, 1, share)
+        best, exp, gain = _brute_force(price, tk, sec, val, 300.0, cap, K, share)
+        assert gain[pos].sum() == pytest.approx(best, abs=1e-9)
+        assert len(pos) <= K and ex.sum() <= cap
+        np.testing.assert_allclose(ex, exp[pos])
+
+
+def test_bucketed_capital_never_exceeds_cap():
+    rng = np.random.default_rng(2)
+    for _ in range(40):
+        price, tk, sec, val = _case(rng, int(rng.integers(2, 9)))
+        cap = float(rng.integers(20_000, 60_000))
+        per = cap / 3
+        pos, ex = ps.knapsack_select(price * 50, tk, sec, val, per, cap, 3, 1, 1.0)
+        best, exp, gain = _brute_force(price * 50, tk, sec, val, per, cap, 3, 1.0)
+        assert ex.sum() <= cap and len(pos) <= 3
+        # la discretización solo puede perder combinaciones que caben justo
+        assert gain[pos].sum() <= best + 1e-9
+        assert gain[pos].sum() >= 0.9 * best
+
+
+def test_large_capital_is_fast():
+    rng = np.random.default_rng(0)
+    n = 200
+    price = rng.uniform(10, 600, n)
+    tk = rng.choice([f"T{i}" for i in range(80)], n)
+    sec = rng.choice(list("abcd"), n)
+    val = rng.uniform(-0.005, 0.02, n)
+    t0 = time.perf_counter()
+    pos, ex = ps.knapsack_select(price, tk, sec, val, 10_000, 100_000, 10, 1, 1.0)
+    assert time.perf_counter() - t0 < 2.0
+    assert len(pos) == 10 and ex.sum() <= 100_000
+
+
+def test_sector_options_drop_dominated():
+    cost = np.array([100, 100, 200, 300])
+    exposure = cost.astype(float)
+    gain = np.array([5.0, 3.0, 4.0, 9.0])
+    opts = ps._sector_options(np.arange(4), cost, exposure, gain, 2, 1000, 1e9)
+    keys = {(k, c) for k, c, _, _ in opts}
+    assert (1, 200) not in keys  # 4.0 con costo 200 < 5.0 con costo 100
+    assert (1, 100) in keys and (2, 400) in keys
+    assert all(v > 0 for _, _, v, _ in opts)
@@ -0,0 +1,103 @@
+"""utils/trade_plan vectorizado contra fixtures/golden/trade_plan/ (versión fila a fila del commit base,
+ver fixtures/make_golden.py)."""
+import gc
+import json
+import weakref
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import trade_plan as tp
+
+GOLDEN = Path(__file__).parent / "fixtures" / "golden" / "trade_plan"
+ASOFS = ["2024-01-03", "2024-01-25", "2024-03-15", "2024-04-30"]
+MODES = ["intraday", "fast", "balanced", "conservative"]
+
+
+def _prices(n=80, seed=1):
+    rng = np.random.default_rng(seed)
+    frames = []
+    for i, (ticker, base) in enumerate((("AAA", 800.0), ("BBB", 0.4), ("CCC", 35.0), ("DDD", 12.0))):
+        close = base * np.exp(np.cumsum(rng.normal(0, 0.03, n)))
+        df = pd.DataFrame({
+            "date": pd.bdate_range("2024-01-01", periods=n)[i:],  # tickers que empiezan en fechas distintas
+            "ticker": ticker, "open": close[i:], "high": close[i:] * (1 + rng.uniform(0, 0.03, n - i)),
+            "low": close[i:] * (1 - rng.uniform(0, 0.03, n - i)), "close": close[i:], "volume": 1e5,
+        })
+        df.loc[df.sample(frac=0.05, random_state=i).index, "high"] = np.nan
+        frames.append(df)
+    return pd.concat(frames, ignore_index=True).sample(frac=1.0, random_state=0).reset_index(drop=True)
+
+
+def _plan(seed=2):
+    rng = np.random.default_rng(seed)
+    n = 12
+    entry = rng.uniform(5, 100, n)
+    side = rng.choice(["BUY", "SELL"], n)
+    plan = pd.DataFrame({
+        "ticker": rng.choice(["AAA", "BBB", "CCC", "DDD", "ZZZ"], n), "side": side, "entry": entry,
+        "tp_price": np.where(side == "BUY", entry * 1.05, entry * 0.95),
+        "strength": rng.uniform(0, 1, n), "prob_win": rng.uniform(0.4, 0.8, n),
+        "qty": rng.integers(0, 20, n).astype(float),
+    })
+    plan["exposure"] = plan["qty"] * plan["entry"]
+    return plan
+
+
+def _roundtrip(df, tmp_path, name="out.csv"):
+    df.to_csv(tmp_path / name, index=False)
+    return pd.read_csv(tmp_path / name)
+
+
+def _golden(name, key, value):
+    df = pd.read_csv(GOLDEN / name)
+    return df[df[key] == value].drop(columns=key).reset_index(drop=True)
+
+
+def _cap(plan):
+    return float(plan["exposure"].sum()) * 0.4
+
+
+@pytest.mark.parametrize("asof", ASOFS)
+def test_atr14_pct_matches_golden(asof, tmp_path):
+    tp.clear_atr_cache()
+    new = _roundtrip(tp.compute_atr14_pct(_prices(), asof), tmp_path)
+    pd.testing.assert_frame_equal(new, _golden("atr14_pct.csv", "asof", asof), check_dtype=False, rtol=1e-10, atol=0)
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_etth_and_execution_mode_match_golden(mode, tmp_path):
+    prices, plan = _prices(), _plan()
+    new = tp.add_etth_days_to_trade_plan(plan, tp.compute_atr14_pct(prices, "2024-04-01"))
+    pd.testing.assert_frame_equal(_roundtrip(new, tmp_path), pd.read_csv(GOLDEN / "etth.csv"), check_dtype=False)
+
+    info = json.loads((GOLDEN / "execution_info.json").read_text())
+    new_df, new_info = tp.apply_execution_mode(new, mode=mode, exposure_cap=_cap(new), min_prob_win=0.45)
+    pd.testing.assert_frame_equal(_roundtrip(new_df, tmp_path), _golden("execution_mode.csv", "mode", mode),
+                                  check_dtype=False)
+    assert json.loads(json.dumps(new_info)) == info[mode]
+
+    new_capped, new_cap_info = tp.apply_exposure_cap(plan, _cap(new))
+    pd.testing.assert_frame_equal(_roundtrip(new_capped, tmp_path), pd.read_csv(GOLDEN / "exposure_cap.csv"),
+                                  check_dtype=False)
+    assert json.loads(json.dumps(new_cap_info)) == info["exposure_cap"]
+
+
+def test_atr_cache_follows_content_and_does_not_hold_frame():
+    prices = _prices()
+    tp.clear_atr_cache()
+    first = tp.compute_atr14_pct(prices, "2024-04-30")
+    # misma huella → reutiliza; nueva fila al final → recalcula
+    more = pd.concat([prices, pd.DataFrame([{"date": pd.Timestamp("2024-05-01"), "ticker": "BBB", "open": 9.0,
+                                             "high": 10.0, "low": 8.0, "close": 9.0, "volume": 1.0}])],
+                     ignore_index=True)
+    second = tp.compute_atr14_pct(more, "2024-05-01")
+    assert second.set_index("ticker").loc["BBB", "last_close_used"] == 9.0
+    assert first.set_index("ticker").loc["BBB", "last_close_used"] != 9.0
+
+    ref_ = weakref.ref(more)
+    del more
+    gc.collect()
+    assert ref_() is None
@@ -0,0 +1,38 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.tth_montecarlo import simulate_first_passage
+
+
+def _p_touch_up(b, sigma, t):
+    # P(max de sigma·W en [0, t] >= b) para movimiento browniano sin drift (principio de reflexión)
+    return 2.0 * (1.0 - 0.5 * (1.0 + math.erf(b / (sigma * math.sqrt(t) * math.sqrt(2.0)))))
+
+
+def test_bridge_with_few_steps_matches_single_barrier_analytic():
+    # mu = sigma²/2 anula el drift del log-precio; SL inalcanzable => una sola barrera
+    sigma, tp = 0.3, 0.05
+    exact = _p_touch_up(math.log1p(tp), sigma, 0.1)
+    kw = dict(tp_pct=tp, sl_pct=0.99, mu=0.5 * sigma ** 2, sigma=sigma, n_steps=5, dt=0.02, n_sims=40000)
+    bridged = simulate_first_passage(bridge=True, rng=np.random.default_rng(7), **kw)
+    plain = simulate_first_passage(bridge=False, rng=np.random.default_rng(7), **kw)
+    assert bridged["p_tp"].iloc[0] == pytest.approx(exact, abs=0.01)
+    assert plain["p_tp"].iloc[0] < exact - 0.05  # sin puente, 5 pasos no ven los toques intra-paso
+    assert bridged["n_sl"].iloc[0] == 0
+
+
+@pytest.mark.parametrize("bridge", [False, True])
+def test_chunked_and_unchunked_give_same_counts(bridge):
+    rng = np.random.default_rng(0)
+    n = 7
+    args = dict(tp_pct=rng.uniform(0.01, 0.05, n), sl_pct=rng.uniform(0.01, 0.05, n),
+                mu=rng.normal(0, 0.1, n), sigma=rng.uniform(0.2, 0.5, n), n_steps=rng.integers(3, 30, n),
+                dt=1 / 26, n_sims=300, bridge=bridge)
+    whole = simulate_first_passage(rng=np.random.default_rng(11), max_cells=10 ** 9, **args)
+    for max_cells in (40, 1000, 5000, 30000):  # troceo por sims y por filas
+        chunked = simulate_first_passage(rng=np.random.default_rng(11), max_cells=max_cells, **args)
+        pd.testing.assert_frame_equal(chunked, whole)
+    assert whole["n_tp"].sum() > 0 and whole["n_sl"].sum() > 0
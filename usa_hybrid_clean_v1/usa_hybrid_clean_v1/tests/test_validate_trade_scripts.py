@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+from conftest import load_script
+
+october = load_script("scripts/validate_october_trades.py", "validate_october_trades")
+new_config = load_script("scripts/validate_new_config_trades.py", "validate_new_config_trades")
+
+# (open, high, low, close) en barras de 15m desde 15:00; la barra de 15:30 toca TP y SL
+BARS = [(100.0, 100.4, 99.8, 100.2), (100.2, 100.6, 99.9, 100.5), (100.5, 101.5, 98.5, 100.0),
+        (100.0, 102.0, 99.9, 101.5), (101.5, 103.0, 101.0, 102.5)]
+TS = pd.date_range("2025-10-20 15:00", periods=len(BARS), freq="15min")
+
+
+def _october_bars():
+    return pd.DataFrame([(t, c, h, l, o, 1.0) for t, (o, h, l, c) in zip(TS, BARS)],
+                        columns=["timestamp", "close", "high", "low", "open", "volume"])
+
+
+def _new_config_bars():
+    return pd.DataFrame(BARS, index=TS, columns=["Open", "High", "Low", "Close"])
+
+
+def _trade(entry, tp, sl, direction="LONG"):
+    return {"ticker": "X", "direction": direction, "timestamp": str(entry), "entry_price": 100.0,
+            "tp_price": tp, "sl_price": sl, "qty": 2}
+
+
+@pytest.mark.parametrize("tp,sl,outcome,exit_bar", [
+    (101.0, 99.0, "SL", 2),         # ambos en la misma barra: SL
+    (100.5, 99.0, "TP", 1),
+    (110.0, 90.0, "EOD_CLOSE", 3),  # corta a las 15:55 (la barra de 16:00 no cuenta)
+])
+def test_october_validate_trade(tp, sl, outcome, exit_bar):
+    res = october.validate_trade(_trade(TS[0], tp, sl), _october_bars())
+    assert res["outcome"] == outcome
+    assert res["hit_time"] == TS[exit_bar]
+    assert res["bars_to_exit"] == exit_bar  # barras posteriores a la entrada
+    exit_price = {"TP": tp, "SL": sl}.get(outcome, BARS[exit_bar][3])
+    assert res["exit_price"] == exit_price
+    assert res["pnl_usd"] == pytest.approx((exit_price - 100.0) / 100.0 * 100.0 * 2)
+
+
+def test_october_validate_trade_short_and_no_data():
+    res = october.validate_trade(_trade(TS[0], 99.0, 101.2, "SHORT"), _october_bars())
+    assert (res["outcome"], res["hit_time"], res["exit_price"]) == ("SL", TS[2], 101.2)
+    assert october.validate_trade(_trade(TS[-1], 110.0, 90.0), _october_bars())["outcome"] == "NO_DATA"
+
+
+@pytest.mark.parametrize("tp,sl,outcome,exit_bar", [
+    (101.0, 99.0, "TP_HIT", 2),     # ambos en la misma barra: TP (se revisa primero)
+    (110.0, 99.85, "SL_HIT", 0),
+    (110.0, 90.0, "EOD_CLOSE", 4),
+])
+def test_new_config_validate_trade(tp, sl, outcome, exit_bar):
+    bars = _new_config_bars()
+    res = new_config.validate_trade(_trade(TS[0], tp, sl), bars)
+    assert res["outcome"] == outcome
+    assert res["exit_time"] == TS[exit_bar]
+    assert res["bars_held"] == exit_bar + 1  # incluye la barra de entrada
+    assert res["exit_price"] == {"TP_HIT": tp, "SL_HIT": sl}.get(outcome, BARS[exit_bar][3])
+
+
+def test_new_config_bars_held_counts_from_file_start():
+    bars = _new_config_bars()
+    res = new_config.validate_trade(_trade(TS[1], 98.0, 101.2, "SHORT"), bars)
+    assert (res["outcome"], res["exit_time"], res["bars_held"]) == ("SL_HIT", TS[2], 3)
+    assert res["pnl"] == pytest.approx(-0.012)
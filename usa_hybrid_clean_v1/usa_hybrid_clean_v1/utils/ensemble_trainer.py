@@ -0,0 +1,226 @@
+"""
+Orquestador de entrenamiento del ensemble de dirección (RF, XGBoost, CatBoost + meta).
+
+- Presupuesto global de CPU (CPU_BUDGET, por defecto os.cpu_count()): se reparte
+  entre los learners que corren a la vez y cada uno recibe su número de hilos
+  explícito (RF n_jobs, XGB n_jobs/nthread, CatBoost thread_count), así no se
+  sobre-suscriben núcleos.
+- Los learners base se ajustan en paralelo (hilos; las tres librerías liberan el GIL).
+- Caché en disco por (fold, learner, hiperparámetros, hash de datos): guarda el
+  modelo y sus predicciones sobre los conjuntos pedidos. Cambiar solo el
+  meta-learner o la calibración no vuelve a ajustar los modelos base.
+- Reporte por learner: tiempo de ajuste, delta de RSS del proceso (aproximado si
+  hay learners concurrentes) y tamaño del artefacto.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+CACHE_DIR = Path("models/cache/ensemble")
+BASE_LEARNERS = ("rf", "xgb", "cat")
+
+DEFAULT_PARAMS = {
+    "rf": {"n_estimators": 100, "random_state": 42},
+    "xgb": {"n_estimators": 100, "random_state": 42, "eval_metric": "logloss"},
+    "cat": {"iterations": 100, "verbose": 0, "random_state": 42},
+}
+
+
+def cpu_budget(default=None) -> int:
+    env = os.environ.get("CPU_BUDGET")
+    if env:
+        try:
+            return max(1, int(env))
+        except ValueError:
+            pass
+    return max(1, int(default or os.cpu_count() or 1))
+
+
+def split_threads(budget: int, n: int) -> list:
+    """Reparte `budget` hilos entre `n` tareas concurrentes (al menos 1 cada una)."""
+    n = max(1, n)
+    base, extra = divmod(max(budget, n), n)
+    return [base + (1 if i < extra else 0) for i in range(n)]
+
+
+def make_learner(name: str, n_threads: int, params: dict | None = None):
+    p = dict(DEFAULT_PARAMS.get(name, {}))
+    p.update(params or {})
+    if name == "rf":
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(n_jobs=n_threads, **p)
+    if name == "xgb":
+        from xgboost import XGBClassifier
+        return XGBClassifier(n_jobs=n_threads, **p)
+    if name == "cat":
+        from catboost import CatBoostClassifier
+        return CatBoostClassifier(thread_count=n_threads, **p)
+    raise ValueError(f"Learner desconocido: {name}")
+
+
+def data_hash(*arrays) -> str:
+    """Hash estable del contenido (X, y, ...) para claves de caché."""
+    h = hashlib.sha1()
+    for a in arrays:
+        if isinstance(a, (pd.DataFrame, pd.Series)):
+            h.update(pd.util.hash_pandas_object(a, index=False).values.tobytes())
+            if isinstance(a, pd.DataFrame):
+                h.update("|".join(map(str, a.columns)).encode("utf-8"))
+        else:
+            a = np.ascontiguousarray(a)
+            h.update(str((a.shape, a.dtype.str)).encode("utf-8"))
+            h.update(a.tobytes())
+    return h.hexdigest()
+
+
+def params_hash(obj) -> str:
+    return hashlib.sha1(json.dumps(obj, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def _rss_mb():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1e6
+    except Exception:
+        return None
+
+
+class ArtifactCache:
+    """Artefactos por clave: <root>/<key>.joblib (escritura atómica)."""
+
+    def __init__(self, root=CACHE_DIR, enabled: bool = True):
+        self.root = Path(root)
+        self.enabled = enabled
+
+    def path(self, key: str) -> Path:
+        return self.root / f"{key}.joblib"
+
+    def get(self, key: str):
+        p = self.path(key)
+        if not self.enabled or not p.exists():
+            return None
+        try:
+            return joblib.load(p)
+        except Exception as e:
+            print(f"[cache] WARN: artefacto ilegible {p.name} ({e}); se recalcula")
+            return None
+
+    def put(self, key: str, value) -> int:
+        if not self.enabled:
+            return 0
+        self.root.mkdir(parents=True, exist_ok=True)
+        p = self.path(key)
+        tmp = p.with_name(f"{p.name}.{threading.get_ident()}.tmp")
+        joblib.dump(value, tmp)
+        os.replace(tmp, p)
+        return p.stat().st_size
+
+
+def _fit_one(name, n_threads, params, X_train, y_train, predict_on, cache, key):
+    hit = cache.get(key)
+    if hit is not None:
+        return {**hit, "cached": True, "model_mb": round(cache.path(key).stat().st_size / 1e6, 2)}
+    model = make_learner(name, n_threads, params)
+    rss0 = _rss_mb()
+    t0 = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_sec = time.perf_counter() - t0
+    rss1 = _rss_mb()
+    preds = {k: model.predict_proba(Xp)[:, 1] for k, Xp in predict_on.items()}
+    art = {
+        "learner": name,
+        "model": model,
+        "preds": preds,
+        "fit_sec": round(fit_sec, 3),
+        "rss_delta_mb": round(rss1 - rss0, 1) if rss0 is not None and rss1 is not None else None,
+        "n_threads": n_threads,
+    }
+    art["model_mb"] = round(cache.put(key, art) / 1e6, 2)
+    return {**art, "cached": False}
+
+
+def fit_base_learners(X_train, y_train, predict_on: dict, fold: str = "holdout", learners=BASE_LEARNERS,
+                      params: dict | None = None, budget: int | None = None, cache: ArtifactCache | None = None,
+                      data_key: str | None = None) -> dict:
+    """Ajusta los learners base en paralelo y devuelve {learner: artefacto}.
+
+    `predict_on` = {"val": X_val, ...}: conjuntos sobre los que se guardan
+    predicciones (OOF/holdout) en el caché. `data_key` permite pasar un hash ya
+    calculado de los datos del fold (por defecto hash de X_train, y_train y
+    de cada conjunto de predicción).
+    """
+    cache = cache or ArtifactCache()
+    params = params or {}
+    budget = budget or cpu_budget()
+    if data_key is None:
+        data_key = data_hash(X_train, y_train, *[predict_on[k] for k in sorted(predict_on)])
+    pred_sets = ",".join(sorted(predict_on))
+    keys = {name: f"{fold}-{name}-{params_hash([params.get(name), DEFAULT_PARAMS.get(name), pred_sets])}-{data_key[:16]}"
+            for name in learners}
+    todo = [n for n in learners if not (cache.enabled and cache.path(keys[n]).exists())]
+    threads = dict(zip(todo, split_threads(budget, len(todo)))) if todo else {}
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, len(learners))) as ex:
+        futs = {
+            name: ex.submit(_fit_one, name, threads.get(name, 1), params.get(name), X_train, y_train,
+                            predict_on, cache, keys[name])
+            for name in learners
+        }
+        for name, fut in futs.items():
+            results[name] = fut.result()
+    return results
+
+
+def stack_preds(results: dict, split: str, learners=BASE_LEARNERS) -> np.ndarray:
+    return np.column_stack([results[n]["preds"][split] for n in learners])
+
+
+def fit_report(results: dict, fold: str = "holdout") -> pd.DataFrame:
+    rows = []
+    for name, art in results.items():
+        rows.append({
+            "fold": fold,
+            "learner": name,
+            "cached": art.get("cached", False),
+            "fit_sec": art.get("fit_sec"),
+            "n_threads": art.get("n_threads"),
+            "rss_delta_mb": art.get("rss_delta_mb"),
+            "model_mb": art.get("model_mb"),
+        })
+    return pd.DataFrame(rows)
+
+
+def monthly_folds(timestamps, n_test_months: int = 6):
+    """Folds walk-forward anclados a meses calendario (ventana de train expansiva).
+
+    Fold k: train = filas con fecha < inicio del mes k, test = filas del mes k.
+    Un mes nuevo agrega un fold y no mueve las fronteras de los anteriores, así
+    que sus artefactos cacheados siguen siendo válidos.
+    Devuelve [(etiqueta 'YYYY-MM', train_idx, test_idx), ...].
+    """
+    ts = pd.to_datetime(pd.Series(timestamps), utc=True)
+    months = ts.dt.tz_localize(None).dt.to_period("M")
+    uniq = sorted(months.unique())
+    folds = []
+    for m in uniq[1:][-n_test_months:]:
+        train_idx = np.flatnonzero((months < m).to_numpy())
+        test_idx = np.flatnonzero((months == m).to_numpy())
+        folds.append((str(m), train_idx, test_idx))
+    return folds
+
+
+def calibration_table(y_true, prob, n_bins: int = 10) -> pd.DataFrame:
+    """Curva de calibración por bins uniformes de probabilidad."""
+    bins = np.clip((np.asarray(prob) * n_bins).astype(int), 0, n_bins - 1)
+    df = pd.DataFrame({"bin": bins, "y": np.asarray(y_true), "p": np.asarray(prob)})
+    out = df.groupby("bin").agg(n=("y", "size"), prob_mean=("p", "mean"), hit_rate=("y", "mean")).reset_index()
+    return out
@@ -0,0 +1,294 @@
+"""
+Motor de features diarios sobre la tabla long (ticker, timestamp, OHLCV).
+
+Todas las operaciones son vectorizadas sobre la tabla ordenada por
+(ticker, timestamp): los shifts usan groupby().shift y las ventanas móviles
+groupby().rolling, sin filtrar ni concatenar ticker por ticker. Las ventanas se
+calculan por ticker (no sobre la columna completa): std/mean acumulan sumas
+móviles y el residuo de punto flotante del ticker anterior contaminaría al
+siguiente (p.ej. vol_5d de un ticker de $0.5 después de uno de $500).
+
+Actualización incremental (update_partitioned): solo se recalculan las fechas
+posteriores a la última partición escrita, leyendo WARMUP_DAYS días previos
+para llenar las ventanas; tickers nuevos se calculan con su historia completa.
+"""
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.parquet_io import (
+    PARTITION_KEY,
+    days_back,
+    latest_date,
+    partitioned_path,
+    read_date_window,
+    resolve_dataset,
+    write_date_partitions,
+)
+
+OHLCV = ["open", "high", "low", "close", "volume"]
+KEY_COLS = ["ticker", "timestamp"]
+# Ventana más larga = 60 sesiones (hh_60/ll_60) ~ 90 días calendario; margen para feriados
+WARMUP_DAYS = 120
+# Columna 'date' de los datos: en el dataset particionado choca con la clave date=...
+STORED_DATE_COL = "_date"
+
+BASE_FEATURES = ["ret_1d", "ret_5d", "ret_20d", "vol_5d", "vol_20d", "tr", "atr_14d", "pos_in_range_20d"]
+CONTEXT_FEATURES = [
+    'gap_pct', 'dist_to_hh_20', 'dist_to_ll_20', 'dist_to_hh_60', 'dist_to_ll_60',
+    'tr_norm', 'dow_0', 'dow_1', 'dow_2', 'dow_3', 'dow_4', 'pos_in_month',
+    'vol_rel', 'ret_2d', 'ret_3d', 'vol_ratio', 'momentum_strength', 'consec_up'
+]
+
+
+# -----------------------
+# Primitivas agrupadas
+# -----------------------
+
+def sort_long(df: pd.DataFrame) -> pd.DataFrame:
+    return df.sort_values(KEY_COLS, kind="mergesort").reset_index(drop=True)
+
+
+def grouped_rolling(df: pd.DataFrame, col: str, window: int, how: str) -> pd.Series:
+    """rolling(window).<how>() de `col` dentro de cada ticker, alineado con df."""
+    out = getattr(df.groupby("ticker", sort=False)[col].rolling(window), how)()
+    return out.reset_index(level=0, drop=True).reindex(df.index)
+
+
+def grouped_shift(df: pd.DataFrame, col: str, n: int = 1) -> pd.Series:
+    return df.groupby("ticker", sort=False)[col].shift(n)
+
+
+def grouped_pct_change(df: pd.DataFrame, col: str, n: int) -> pd.Series:
+    return df[col] / grouped_shift(df, col, n) - 1
+
+
+def run_length(flag: pd.Series, tickers: pd.Series) -> pd.Series:
+    """Largo de la racha actual de `flag` por ticker (0 donde flag == 0)."""
+    new_run = (flag != flag.groupby(tickers, sort=False).shift()).astype(int)
+    run_id = new_run.cumsum()
+    counts = flag.groupby(run_id, sort=False).cumsum()
+    return counts.astype(flag.dtype)
+
+
+# -----------------------
+# Features
+# -----------------------
+
+def compute_daily_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Features base de 09_make_features_daily (momentum, volatilidad, ATR, rango)."""
+    df = sort_long(df)
+    prev_close = grouped_shift(df, 'close')
+    # Momentum multi-ventana
+    df['ret_1d'] = df['close'] / prev_close - 1
+    df['ret_5d'] = grouped_pct_change(df, 'close', 5)
+    df['ret_20d'] = grouped_pct_change(df, 'close', 20)
+    # Volatilidad
+    df['vol_5d'] = grouped_rolling(df, 'close', 5, 'std')
+    df['vol_20d'] = grouped_rolling(df, 'close', 20, 'std')
+    # ATR: misma definición histórica max(H-L, |H-C_prev|); el término |L-C_prev| nunca
+    # entró (se pasaba como `out` de np.maximum) y los modelos están entrenados así.
+    df['tr'] = np.maximum(df['high'] - df['low'], (df['high'] - prev_close).abs())
+    df['atr_14d'] = grouped_rolling(df, 'tr', 14, 'mean')
+    # Position in range
+    ll20 = grouped_rolling(df, 'low', 20, 'min')
+    hh20 = grouped_rolling(df, 'high', 20, 'max')
+    df['pos_in_range_20d'] = (df['close'] - ll20) / (hh20 - ll20)
+    return df
+
+
+def add_context_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Features de contexto de 09c (gap, HH/LL, día de semana, volumen relativo, rachas)."""
+    df = sort_long(df)
+
+    # 1. Gap de apertura
+    df['prev_close'] = grouped_shift(df, 'close')
+    df['gap_pct'] = (df['open'] - df['prev_close']) / df['prev_close']
+
+    # 2. Distancia a HH/LL
+    for w in (20, 60):
+        df[f'hh_{w}'] = grouped_rolling(df, 'high', w, 'max')
+        df[f'll_{w}'] = grouped_rolling(df, 'low', w, 'min')
+    for w in (20, 60):
+        df[f'dist_to_hh_{w}'] = (df['close'] - df[f'hh_{w}']) / df[f'hh_{w}']
+        df[f'dist_to_ll_{w}'] = (df['close'] - df[f'll_{w}']) / df[f'll_{w}']
+
+    # 3. Rango verdadero normalizado (True Range / Close)
+    df['tr_norm'] = df['tr'] / df['close']
+
+    # 4. Day of week (Monday=0, Friday=4) + one-hot
+    ts = pd.to_datetime(df['timestamp'])
+    df['dow'] = ts.dt.dayofweek
+    for dow in range(5):
+        df[f'dow_{dow}'] = (df['dow'] == dow).astype(int)
+
+    # 5. Posición en mes (0-1, donde 0=inicio, 1=fin)
+    df['day_of_month'] = ts.dt.day
+    df['pos_in_month'] = (df['day_of_month'] - 1) / 30  # Aprox
+
+    # 6. Volumen relativo (vs promedio 20d)
+    df['vol_avg_20'] = grouped_rolling(df, 'volume', 20, 'mean')
+    df['vol_rel'] = df['volume'] / df['vol_avg_20']
+
+    # 7. Momentum de corto plazo
+    df['ret_2d'] = grouped_pct_change(df, 'close', 2)
+    df['ret_3d'] = grouped_pct_change(df, 'close', 3)
+
+    # 8-9. Volatility ratio y fuerza del momentum
+    df['vol_ratio'] = df['vol_5d'] / df['vol_20d']
+    df['momentum_strength'] = df['ret_5d'] / (df['vol_5d'] + 1e-6)
+
+    # 10. Días consecutivos al alza
+    df['is_up'] = (df['close'] > df['prev_close']).astype(int)
+    df['consec_up'] = run_length(df['is_up'], df['ticker'])
+    return df
+
+
+def compute_all_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Base + contexto en una sola pasada (equivale a 09 seguido de 09c)."""
+    return add_context_features(compute_daily_features(df))
+
+
+# -----------------------
+# Carga de OHLCV (long o wide)
+# -----------------------
+
+def wide_to_long(df_wide: pd.DataFrame) -> pd.DataFrame:
+    """Columnas MultiIndex serializadas como "('open', 'AMD')" -> tabla long."""
+    import ast
+    df_wide = df_wide.copy()
+    df_wide.columns = pd.MultiIndex.from_tuples(
+        [ast.literal_eval(c) if isinstance(c, str) and c.startswith("(") else (c, '') for c in df_wide.columns]
+    )
+    timestamp_col = df_wide[('timestamp', '')]
+    records = []
+    for ticker in [c[1] for c in df_wide.columns if c[1] and c[0] == 'open']:
+        records.append(pd.DataFrame({
+            'timestamp': timestamp_col,
+            **{f: df_wide[(f, ticker)] for f in OHLCV},
+            'ticker': ticker,
+        }))
+    return pd.concat(records, ignore_index=True)
+
+
+def normalize_long(df: pd.DataFrame) -> pd.DataFrame:
+    """timestamp UTC (derivado de 'date' si falta); 'date' se conserva como en los scripts previos."""
+    df = from_partition(df).copy()
+    if 'timestamp' not in df.columns:
+        if 'date' not in df.columns:
+            raise SystemExit("Dataset long sin 'date' ni 'timestamp'")
+        df['timestamp'] = df['date']
+    df['timestamp'] = pd.to_datetime(df['timestamp'], utc=True, errors='coerce')
+    return df.dropna(subset=['close'])
+
+
+def to_partition(df: pd.DataFrame) -> pd.DataFrame:
+    return df.rename(columns={PARTITION_KEY: STORED_DATE_COL}) if PARTITION_KEY in df.columns else df
+
+
+def from_partition(df: pd.DataFrame) -> pd.DataFrame:
+    return df.rename(columns={STORED_DATE_COL: PARTITION_KEY}) if STORED_DATE_COL in df.columns else df
+
+
+def load_ohlcv_long(path, start=None, end=None, tickers=None) -> pd.DataFrame:
+    """OHLCV en formato long; con pushdown de fechas/tickers si el archivo ya es long."""
+    import pyarrow.dataset as ds
+
+    src = resolve_dataset(path)
+    names = ds.dataset(src, format="parquet", partitioning="hive").schema.names
+    if 'ticker' in names and set(OHLCV).issubset(names):
+        ts_col = 'timestamp' if 'timestamp' in names else 'date'
+        df = read_date_window(src, start, end, ts_col=ts_col, tickers=tickers)
+        return normalize_long(df)
+    df = normalize_long(wide_to_long(pd.read_parquet(src)))
+    d = df['timestamp'].dt.date
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= d >= pd.Timestamp(start).date()
+    if end is not None:
+        mask &= d <= pd.Timestamp(end).date()
+    if tickers is not None:
+        mask &= df['ticker'].isin(list(tickers))
+    return df[mask]
+
+
+def load_long(path, start=None, end=None, tickers=None) -> pd.DataFrame:
+    return from_partition(read_date_window(resolve_dataset(path), start, end, tickers=tickers))
+
+
+# -----------------------
+# Escritura incremental
+# -----------------------
+
+def _utc_dates(ts: pd.Series) -> pd.Series:
+    return pd.to_datetime(ts, utc=True, errors="coerce").dt.date
+
+
+def update_partitioned(src, dst, transform, loader=load_long, full: bool = False,
+                       warmup_days: int = WARMUP_DAYS) -> pd.DataFrame:
+    """Aplica `transform` a src y escribe el resultado en el dataset particionado dst.
+
+    Sin `full`, y si dst ya existe, solo se escriben fechas > última partición
+    (más la historia completa de tickers que dst aún no tiene). Devuelve las
+    filas escritas.
+    """
+    dst = partitioned_path(dst)
+    last = None if full or not dst.is_dir() else latest_date(dst)
+
+    if last is None:
+        out = transform(loader(src))
+        tmp = dst.with_name(dst.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        write_date_partitions(to_partition(out), tmp, sort_cols=KEY_COLS)
+        shutil.rmtree(dst, ignore_errors=True)
+        tmp.rename(dst)
+        print(f"[INFO] Reconstrucción completa: {len(out)} filas -> {dst}")
+        out.attrs["full_rebuild"] = True
+        return out
+
+    window = loader(src, days_back(last, warmup_days), None)
+    if window.empty or _utc_dates(window['timestamp']).max() <= last:
+        print(f"[INFO] {dst} al día (última fecha {last}); nada que agregar")
+        return window.iloc[0:0]
+
+    known = set(read_date_window(dst, last, last, columns=['ticker'])['ticker'])
+    new_tickers = sorted(set(window['ticker']) - known)
+    if new_tickers:
+        print(f"[INFO] {len(new_tickers)} tickers nuevos; calculando su historia completa")
+        hist = loader(src, None, None, tickers=new_tickers)
+        window = pd.concat([window[~window['ticker'].isin(new_tickers)], hist], ignore_index=True)
+
+    out = transform(window)
+    keep = (_utc_dates(out['timestamp']) > last) | out['ticker'].isin(new_tickers)
+    out = out[keep]
+    days = write_date_partitions(to_partition(out), dst, sort_cols=KEY_COLS, merge_on=KEY_COLS)
+    print(f"[INFO] Incremental: {len(out)} filas en {len(days)} particiones (> {last}) -> {dst}")
+    return out
+
+
+def write_flat(dst, flat_path, new_rows=None):
+    """Actualiza el parquet único que leen los scripts legacy → tabla escrita (None si no cambió).
+
+    Con `new_rows` (lo que devolvió update_partitioned) solo se combinan esas filas con el
+    archivo existente, sin releer el dataset particionado; sin filas nuevas no se toca.
+    Tras una reconstrucción completa, o si el archivo no existe, se consolida todo.
+    """
+    flat_path = Path(flat_path)
+    if new_rows is not None and new_rows.attrs.get("full_rebuild"):
+        df = new_rows
+    elif new_rows is not None and flat_path.exists():
+        if new_rows.empty:
+            return None
+        old = pd.read_parquet(flat_path)
+        old_keys = pd.MultiIndex.from_arrays([old['ticker'], pd.to_datetime(old['timestamp'], utc=True)])
+        new_keys = pd.MultiIndex.from_arrays([new_rows['ticker'], pd.to_datetime(new_rows['timestamp'], utc=True)])
+        df = pd.concat([old[~old_keys.isin(new_keys)], new_rows], ignore_index=True)
+    else:
+        df = from_partition(read_date_window(partitioned_path(dst)))
+    df = sort_long(df)
+    tmp = flat_path.with_name(flat_path.name + ".tmp")
+    df.to_parquet(tmp, index=False, compression='snappy')
+    tmp.replace(flat_path)
+    return df
@@ -0,0 +1,205 @@
+"""
+Store de forecasts/señales particionado por modelo, versión y fecha as-of.
+
+    data/forecast_store/model=<m>/version=<v>/asof=YYYY-MM-DD/part-0.parquet
+    data/forecast_store/_index.json    {modelo: {versión: {first, last, rows_written, updated_at}}}
+
+get_forecast(asof, tickers, model=...) construye los paths de las fechas pedidas
+(sin listar el histórico) y lee solo esas particiones, con filtro de tickers
+empujado a pyarrow. Sin `version`, para cada fecha gana la versión de clave mayor
+que tenga esa partición: las claves deben ordenar cronológicamente como texto
+(11_infer_and_gate usa <creación UTC del bundle>-<hash>). El directorio sale de
+`root`, o de FORECAST_STORE_DIR, o de STORE_DIR.
+
+Migración de archivos existentes:
+    python utils/forecast_store.py import data/daily/signals_with_gates.parquet --model direction_daily
+    python utils/forecast_store.py get 2025-11-03 --model direction_daily --tickers AMD,NVDA
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+STORE_DIR = Path("data/forecast_store")
+INDEX_NAME = "_index.json"
+DEFAULT_MODEL = "direction_daily"
+DEFAULT_VERSION = "default"
+DATE_CANDIDATES = ["date", "Date", "forecast_date", "asof_date", "datetime", "timestamp"]
+
+_INDEX_LOCK = threading.Lock()
+
+
+def detect_date_col(df: pd.DataFrame) -> str:
+    for col in DATE_CANDIDATES:
+        if col in df.columns:
+            return col
+    raise ValueError("No se encontró columna de fecha en forecast")
+
+
+def _day(value):
+    return pd.Timestamp(value).date()
+
+
+def store_root(root=None) -> Path:
+    return Path(root or os.getenv("FORECAST_STORE_DIR") or STORE_DIR)
+
+
+def is_store(path=None) -> bool:
+    path = store_root(path)
+    return path.is_dir() and (path / INDEX_NAME).exists()
+
+
+def partition_path(asof, model: str, version: str, root=None) -> Path:
+    return store_root(root) / f"model={model}" / f"version={version}" / f"asof={_day(asof).isoformat()}" / "part-0.parquet"
+
+
+def read_index(root=None) -> dict:
+    p = store_root(root) / INDEX_NAME
+    if not p.exists():
+        return {}
+    return json.loads(p.read_text(encoding="utf-8"))
+
+
+def _update_index(root: Path, model: str, version: str, days: list, rows: int) -> None:
+    with _INDEX_LOCK:
+        idx = read_index(root)
+        ent = idx.setdefault(model, {}).setdefault(version, {"first": None, "last": None, "rows_written": 0})
+        ds = sorted(d.isoformat() for d in days)
+        ent["first"] = min(filter(None, [ent["first"], ds[0]]))
+        ent["last"] = max(filter(None, [ent["last"], ds[-1]]))
+        ent["rows_written"] = int(ent.get("rows_written", 0)) + int(rows)
+        ent["updated_at"] = time.time()
+        root.mkdir(parents=True, exist_ok=True)
+        tmp = root / (INDEX_NAME + ".tmp")
+        tmp.write_text(json.dumps(idx, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp, root / INDEX_NAME)
+
+
+def list_versions(model: str = DEFAULT_MODEL, root=None) -> list:
+    """Versiones del modelo por clave de versión, de la más nueva a la más antigua.
+
+    No se usa `updated_at`: reescribir una fecha con una versión vieja (backfill) no la
+    vuelve la preferida.
+    """
+    return sorted(read_index(root).get(model, {}), reverse=True)
+
+
+def put_forecast(df: pd.DataFrame, model: str = DEFAULT_MODEL, version: str = DEFAULT_VERSION,
+                 root=None, date_col: str | None = None, asof=None, merge: bool = False) -> list:
+    """Escribe una partición por fecha as-of, reemplazándola completa (igual que el archivo plano).
+
+    asof: fecha de la corrida; si df viene vacío se escribe esa partición vacía, para que una
+    re-corrida sin señales no deje vivas las de la corrida anterior. merge=True combina con lo
+    existente (gana lo nuevo por ticker+fecha), p.ej. para importar archivos parciales.
+    """
+    from utils.parquet_io import write_date_partitions
+
+    root = store_root(root)
+    if df is None or df.empty:
+        if asof is None:
+            return []
+        p = partition_path(asof, model, version, root)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        empty = (df if df is not None else pd.DataFrame()).copy()
+        empty["date"] = pd.Series(dtype="datetime64[ns]")
+        empty = empty.astype({c: "string" for c in empty.columns[empty.dtypes == object]})  # no null type
+        tmp = p.with_name(p.name + ".tmp")
+        empty.to_parquet(tmp, index=False)
+        os.replace(tmp, p)
+        _update_index(root, model, version, [_day(asof)], 0)
+        return [_day(asof)]
+    date_col = date_col or detect_date_col(df)
+    out = df.copy()
+    d = pd.to_datetime(out[date_col])
+    if d.dt.tz is not None:
+        d = d.dt.tz_convert("UTC").dt.tz_localize(None)
+    out["date"] = d.dt.normalize()
+    merge_on = [c for c in ("ticker", "date", "side") if c in out.columns] if merge else None
+    base = root / f"model={model}" / f"version={version}"
+    days = write_date_partitions(out, base, ts_col="date", key="asof",
+                                 sort_cols=["ticker"] if "ticker" in out.columns else None,
+                                 merge_on=merge_on or None)
+    if days:
+        _update_index(root, model, version, days, len(out))
+    return days
+
+
+def get_forecast(asof, tickers=None, model: str = DEFAULT_MODEL, version: str | None = None,
+                 lookback_days: int = 0, columns=None, root=None) -> pd.DataFrame:
+    """Forecasts con fecha en [asof - lookback_days, asof] leyendo solo esas particiones."""
+    import pyarrow.dataset as ds
+
+    root = store_root(root)
+    versions = [version] if version else list_versions(model, root)
+    end = _day(asof)
+    frames = []
+    for day in pd.date_range(end - pd.Timedelta(days=lookback_days), end).date:
+        for v in versions:
+            p = partition_path(day, model, v, root)
+            if not p.exists():
+                continue
+            dataset = ds.dataset(p, format="parquet")
+            flt = ds.field("ticker").isin(sorted({str(t).upper() for t in tickers})) \
+                if tickers is not None and "ticker" in dataset.schema.names else None
+            cols = None if columns is None else [c for c in dict.fromkeys(list(columns) + ["date"]) if c in dataset.schema.names]
+            df = dataset.to_table(columns=cols, filter=flt).to_pandas()
+            df["model_version"] = v
+            frames.append(df)
+            break
+    if not frames:
+        return pd.DataFrame(columns=list(columns or []) + ["date"])
+    out = pd.concat(frames, ignore_index=True)
+    out["date"] = pd.to_datetime(out["date"])
+    return out
+
+
+def latest_asof(model: str = DEFAULT_MODEL, until=None, root=None):
+    """Fecha as-of más reciente (<= until) registrada en el índice para el modelo."""
+    from utils.parquet_io import list_partition_dates
+
+    root = store_root(root)
+    until = _day(until) if until is not None else None
+    best = None
+    for v in list_versions(model, root):
+        for d in list_partition_dates(root / f"model={model}" / f"version={v}", key="asof"):
+            if (until is None or d <= until) and (best is None or d > best):
+                best = d
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Store de forecasts por fecha as-of")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    i = sub.add_parser("import", help="Importa un CSV/Parquet de forecast al store")
+    i.add_argument("path")
+    i.add_argument("--model", default=DEFAULT_MODEL)
+    i.add_argument("--version", default=DEFAULT_VERSION)
+    g = sub.add_parser("get", help="Muestra el forecast de una fecha")
+    g.add_argument("asof")
+    g.add_argument("--model", default=DEFAULT_MODEL)
+    g.add_argument("--tickers", default=None)
+    g.add_argument("--lookback-days", type=int, default=0)
+    for p in (i, g):
+        p.add_argument("--root", default=None)
+    a = ap.parse_args()
+
+    if a.cmd == "import":
+        path = Path(a.path)
+        df = pd.read_parquet(path) if path.suffix.lower() == ".parquet" else pd.read_csv(path)
+        days = put_forecast(df, a.model, a.version, a.root)
+        print(f"[forecast_store] {path} → {len(days)} particiones ({a.model}/{a.version})")
+        return 0
+    tickers = [t.strip().upper() for t in a.tickers.split(",")] if a.tickers else None
+    df = get_forecast(a.asof, tickers, a.model, lookback_days=a.lookback_days, root=a.root)
+    print(df.to_string(index=False) if len(df) else "[forecast_store] sin datos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    sys.exit(main())
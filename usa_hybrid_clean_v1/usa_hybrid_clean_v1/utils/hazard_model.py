@@ -0,0 +1,54 @@
+"""
+Utilidades del modelo de hazard discreto (TTH): dataset "person-period" y
+adaptador del modelo agrupado.
+
+Cada trade con time_to_event_days = T aporta una fila por día k = 1..min(T, max_days)
+(sobrevivió hasta k-1); la etiqueta del evento E en k es (event_type == E) & (T == k).
+El dataset se construye una vez y se reutiliza para todos los k y ambos eventos.
+"""
+import numpy as np
+import pandas as pd
+
+
+def person_period(durations, max_days: int):
+    """(row_idx, k) de la expansión person-period; duraciones NaN o < 1 no aportan filas."""
+    t = np.nan_to_num(np.asarray(durations, dtype=float), nan=0.0)
+    n_k = np.clip(np.floor(t), 0, max_days).astype(np.int64)
+    row_idx = np.repeat(np.arange(len(t)), n_k)
+    starts = np.cumsum(n_k) - n_k
+    k = np.arange(len(row_idx)) - np.repeat(starts, n_k) + 1
+    return row_idx, k
+
+
+def build_person_period(df: pd.DataFrame, feature_cols: list, max_days: int) -> tuple:
+    """
+    Retorna (X, meta): X con feature_cols (NaN → 0) repetidas por periodo y
+    meta con k, y_tp, y_sl alineados por posición.
+    """
+    row_idx, k = person_period(df["time_to_event_days"], max_days)
+    X = df[feature_cols].fillna(0).iloc[row_idx].reset_index(drop=True)
+    t = df["time_to_event_days"].to_numpy(dtype=float)[row_idx]
+    ev = df["event_type"].astype(str).to_numpy()[row_idx]
+    meta = pd.DataFrame({
+        "k": k,
+        "y_tp": ((ev == "TP") & (t == k)).astype(int),
+        "y_sl": ((ev == "SL") & (t == k)).astype(int),
+    })
+    return X, meta
+
+
+class PooledHazardDay:
+    """
+    Vista del modelo agrupado (features + k) fijada en un día k, con la misma
+    interfaz predict_proba(X) que los modelos por día del bundle.
+    """
+
+    def __init__(self, model, k: int):
+        self.model = model
+        self.k = int(k)
+
+    def predict_proba(self, X):
+        if isinstance(X, pd.DataFrame):
+            return self.model.predict_proba(X.assign(k=self.k))
+        X = np.asarray(X, dtype=float)
+        return self.model.predict_proba(np.column_stack([X, np.full(len(X), self.k)]))
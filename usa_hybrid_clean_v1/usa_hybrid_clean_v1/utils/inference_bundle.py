@@ -0,0 +1,394 @@
+"""
+Bundle de inferencia versionado: modelos + calibradores + metadata (manifiesto,
+temperatura, umbrales) en un solo artefacto joblib con hash de contenido.
+
+    models/bundles/<name>.bundle.joblib   objetos ya deserializados
+    models/bundles/<name>.bundle.json     hash, versión y huella de las fuentes
+
+load_bundle() se memoiza en el proceso: mientras las fuentes (mtime/size) y la
+metadata no cambien, las llamadas siguientes no tocan disco. Si cambian, el
+bundle se reconstruye y se reescribe.
+
+Modo servidor caliente: un proceso de larga vida ejecuta los scripts de
+inferencia en el mismo intérprete (runpy), de modo que el caché de bundles
+sobrevive entre corridas del pipeline:
+
+    python utils/inference_bundle.py serve --port 8790
+    INFERENCE_WARM_URL=http://127.0.0.1:8790 \
+        python utils/inference_bundle.py run scripts/11_infer_and_gate.py
+
+`run` usa el servidor si responde y, si no, ejecuta el script localmente. run_script_inprocess
+cambia cwd, argv y stdout del proceso, así que el servidor corre siempre en su propio proceso
+(dashboard_api lo lanza con spawn_server, nunca dentro de su servidor Flask). El servidor
+solo acepta POST JSON, solo ejecuta los scripts de WARM_SCRIPTS, con cwd dentro del
+proyecto, y si INFERENCE_WARM_TOKEN está definido exige el header X-Warm-Token.
+"""
+import argparse
+import contextlib
+import hashlib
+import hmac
+import io
+import json
+import os
+import runpy
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.request import Request, urlopen
+
+import joblib
+
+BUNDLE_DIR = Path("models/bundles")
+BUNDLE_FORMAT = 1
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+# Únicos scripts que el servidor caliente ejecuta (los que cargan bundles)
+WARM_SCRIPTS = (
+    "scripts/11_infer_and_gate.py",
+    "intraday/scripts/39_predict_tth_intraday.py",
+)
+
+_CACHE: dict = {}
+_CACHE_LOCK = threading.Lock()
+_RUN_LOCK = threading.Lock()
+
+
+class InferenceBundle:
+    def __init__(self, name: str, content_hash: str, components: dict, meta: dict, sources: dict, created_at: str):
+        self.name = name
+        self.hash = content_hash
+        self.components = components
+        self.meta = meta
+        self.sources = sources
+        self.created_at = created_at
+
+    @property
+    def version(self) -> str:
+        return self.hash[:12]
+
+    def __getitem__(self, key):
+        return self.components[key]
+
+    def get(self, key, default=None):
+        return self.components.get(key, default)
+
+    def info(self) -> dict:
+        return {
+            "name": self.name,
+            "version": self.version,
+            "hash": self.hash,
+            "created_at": self.created_at,
+            "components": sorted(self.components),
+        }
+
+
+def _meta_json(meta: dict | None) -> str:
+    return json.dumps(meta or {}, sort_keys=True, default=str)
+
+
+def source_fingerprint(components: dict, meta: dict | None = None) -> str:
+    """Huella barata (path, mtime_ns, size) de las fuentes + metadata; no lee contenido."""
+    parts = []
+    for key in sorted(components):
+        p = Path(components[key])
+        try:
+            st = p.stat()
+            parts.append(f"{key}={p}:{st.st_mtime_ns}:{st.st_size}")
+        except OSError:
+            parts.append(f"{key}={p}:missing")
+    parts.append(_meta_json(meta))
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def content_hash(components: dict, meta: dict | None = None) -> str:
+    """sha256 del contenido de cada artefacto (en orden de clave) + metadata."""
+    h = hashlib.sha256()
+    for key in sorted(components):
+        p = Path(components[key])
+        if not p.exists():
+            continue
+        h.update(key.encode("utf-8"))
+        with open(p, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    h.update(_meta_json(meta).encode("utf-8"))
+    return h.hexdigest()
+
+
+def bundle_paths(name: str, out_dir=BUNDLE_DIR) -> tuple:
+    out_dir = Path(out_dir)
+    return out_dir / f"{name}.bundle.joblib", out_dir / f"{name}.bundle.json"
+
+
+def build_bundle(name: str, components: dict, meta: dict | None = None, out_dir=BUNDLE_DIR, required=()) -> InferenceBundle:
+    """Deserializa cada componente una vez y guarda el bundle (componentes faltantes se omiten salvo `required`)."""
+    missing = [k for k in required if not Path(components[k]).exists()]
+    if missing:
+        raise FileNotFoundError(f"Bundle {name}: faltan artefactos requeridos {[str(components[k]) for k in missing]}")
+    present = {k: str(v) for k, v in components.items() if Path(v).exists()}
+    objs = {k: joblib.load(v) for k, v in present.items()}
+    bundle = InferenceBundle(
+        name=name,
+        content_hash=content_hash(present, meta),
+        components=objs,
+        meta=dict(meta or {}),
+        sources=present,
+        created_at=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    )
+    bundle_file, sidecar = bundle_paths(name, out_dir)
+    try:
+        bundle_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = bundle_file.with_name(bundle_file.name + ".tmp")
+        joblib.dump({"format": BUNDLE_FORMAT, **bundle.__dict__}, tmp)
+        os.replace(tmp, bundle_file)
+        side = {**bundle.info(), "format": BUNDLE_FORMAT, "sources": present,
+                "source_fingerprint": source_fingerprint(components, meta)}
+        sidecar.write_text(json.dumps(side, indent=2, ensure_ascii=False), encoding="utf-8")
+    except OSError as e:
+        print(f"[bundle] WARN: no se pudo persistir {bundle_file}: {e}")
+    print(f"[bundle] {name} construido v{bundle.version} ({len(objs)} componentes)")
+    return bundle
+
+
+def _read_bundle(name: str, fp: str, out_dir) -> InferenceBundle | None:
+    bundle_file, sidecar = bundle_paths(name, out_dir)
+    if not (bundle_file.exists() and sidecar.exists()):
+        return None
+    try:
+        side = json.loads(sidecar.read_text(encoding="utf-8"))
+        if side.get("format") != BUNDLE_FORMAT or side.get("source_fingerprint") != fp:
+            return None
+        raw = joblib.load(bundle_file)
+        raw.pop("format", None)
+        if raw.get("hash") != side.get("hash"):
+            return None
+        b = InferenceBundle.__new__(InferenceBundle)
+        b.__dict__.update(raw)
+        return b
+    except Exception as e:
+        print(f"[bundle] WARN: bundle {bundle_file} ilegible ({e}); se reconstruye")
+        return None
+
+
+def load_bundle(name: str, components: dict, meta: dict | None = None, out_dir=BUNDLE_DIR, required=()) -> InferenceBundle:
+    """Bundle memoizado en proceso; reconstruye solo si cambian las fuentes o la metadata."""
+    fp = source_fingerprint(components, meta)
+    key = (name, str(Path(out_dir).resolve()))
+    with _CACHE_LOCK:
+        hit = _CACHE.get(key)
+        if hit is not None and hit[0] == fp:
+            return hit[1]
+        bundle = _read_bundle(name, fp, out_dir)
+        if bundle is None:
+            bundle = build_bundle(name, components, meta, out_dir, required)
+        else:
+            print(f"[bundle] {name} v{bundle.version} cargado de {bundle_paths(name, out_dir)[0]}")
+        _CACHE[key] = (fp, bundle)
+        return bundle
+
+
+def cached_bundles() -> list:
+    with _CACHE_LOCK:
+        return [b.info() for _, b in _CACHE.values()]
+
+
+def clear_cache() -> None:
+    with _CACHE_LOCK:
+        _CACHE.clear()
+
+
+# -----------------------
+# Modo servidor caliente
+# -----------------------
+
+def run_script_inprocess(script, args=None, cwd=None) -> dict:
+    """Ejecuta un script como __main__ en este intérprete (serializado: argv/cwd son globales)."""
+    script = Path(script)
+    out, err = io.StringIO(), io.StringIO()
+    code = 0
+    with _RUN_LOCK:
+        old_argv, old_cwd, old_path = sys.argv, os.getcwd(), list(sys.path)
+        try:
+            if cwd:
+                os.chdir(cwd)
+            sys.argv = [str(script)] + list(args or [])
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+                try:
+                    runpy.run_path(str(script), run_name="__main__")
+                except SystemExit as e:
+                    if e.code is None or isinstance(e.code, int):
+                        code = e.code or 0
+                    else:
+                        print(e.code, file=sys.stderr)
+                        code = 1
+                except Exception:
+                    import traceback
+                    traceback.print_exc()
+                    code = 1
+        finally:
+            sys.argv = old_argv
+            sys.path[:] = old_path
+            os.chdir(old_cwd)
+    return {"returncode": code, "stdout": out.getvalue(), "stderr": err.getvalue()}
+
+
+def warm_url() -> str:
+    return (os.getenv("INFERENCE_WARM_URL") or "").strip().rstrip("/")
+
+
+def warm_token() -> str:
+    return (os.getenv("INFERENCE_WARM_TOKEN") or "").strip()
+
+
+def _inside(path: Path, root: Path) -> bool:
+    try:
+        path.relative_to(root)
+        return True
+    except ValueError:
+        return False
+
+
+def resolve_warm_request(script, cwd=None):
+    """Valida un pedido del servidor caliente → (script, cwd) resueltos; ValueError si no se permite."""
+    allowed = {(PROJECT_ROOT / s).resolve() for s in WARM_SCRIPTS}
+    path = Path(script)
+    path = (path if path.is_absolute() else PROJECT_ROOT / path).resolve()
+    if path not in allowed:
+        raise ValueError(f"script no permitido: {script}")
+    workdir = Path(cwd).resolve() if cwd else PROJECT_ROOT
+    if not _inside(workdir, PROJECT_ROOT):
+        raise ValueError(f"cwd fuera del proyecto: {cwd}")
+    return path, workdir
+
+
+def run_script(script, args=None, cwd=None, timeout: float = 1800.0) -> dict:
+    """Corre el script en el servidor caliente si está configurado; si no, localmente en este proceso."""
+    url = warm_url()
+    if url:
+        body = json.dumps({"script": str(Path(script).resolve()), "args": list(args or []),
+                           "cwd": str(Path(cwd or os.getcwd()).resolve())}).encode("utf-8")
+        try:
+            headers = {"Content-Type": "application/json"}
+            if warm_token():
+                headers["X-Warm-Token"] = warm_token()
+            req = Request(f"{url}/run", data=body, headers=headers)
+            with urlopen(req, timeout=timeout) as resp:
+                return json.loads(resp.read().decode("utf-8"))
+        except Exception as e:
+            print(f"[bundle] WARN: servidor caliente no disponible ({e}); ejecución local", file=sys.stderr)
+    return run_script_inprocess(script, args, cwd)
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8790, token=None):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    token = warm_token() if token is None else token
+
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, payload, status=200):
+            data = json.dumps(payload, default=str).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/health":
+                self._send({"ok": True, "pid": os.getpid(), "bundles": cached_bundles()})
+            else:
+                self._send({"ok": False, "error": "not found"}, 404)
+
+        def do_POST(self):
+            if self.path.rstrip("/") != "/run":
+                self._send({"ok": False, "error": "not found"}, 404)
+                return
+            # JSON obligatorio: un formulario/fetch "simple" de un navegador no puede enviarlo sin preflight
+            if (self.headers.get("Content-Type") or "").split(";")[0].strip().lower() != "application/json":
+                self._send({"ok": False, "error": "Content-Type debe ser application/json"}, 415)
+                return
+            if token and not hmac.compare_digest(self.headers.get("X-Warm-Token") or "", token):
+                self._send({"ok": False, "error": "token inválido"}, 403)
+                return
+            try:
+                n = int(self.headers.get("Content-Length") or 0)
+                req = json.loads(self.rfile.read(n).decode("utf-8") or "{}")
+                script, args = req["script"], [str(a) for a in (req.get("args") or [])]
+            except Exception as e:
+                self._send({"ok": False, "error": f"request inválido: {e}"}, 400)
+                return
+            try:
+                script, cwd = resolve_warm_request(script, req.get("cwd"))
+            except ValueError as e:
+                self._send({"ok": False, "error": str(e)}, 403)
+                return
+            t0 = time.perf_counter()
+            result = run_script_inprocess(script, args, cwd)
+            result["elapsed_sec"] = round(time.perf_counter() - t0, 3)
+            self._send(result)
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def spawn_server(host: str = "127.0.0.1", port: int = 8790, token=None) -> subprocess.Popen:
+    """Lanza `serve` en un proceso hijo dedicado (cwd/argv/stdout propios); el llamador lo termina."""
+    env = dict(os.environ)
+    if token:
+        env["INFERENCE_WARM_TOKEN"] = token
+    cmd = [sys.executable, str(Path(__file__).resolve()), "serve", "--host", host, "--port", str(port)]
+    return subprocess.Popen(cmd, cwd=str(PROJECT_ROOT), env=env)
+
+
+def warm_health(url=None, timeout: float = 2.0) -> dict | None:
+    """GET /health del servidor caliente; None si no está configurado o no responde."""
+    url = (url or warm_url()).rstrip("/")
+    if not url:
+        return None
+    try:
+        with urlopen(f"{url}/health", timeout=timeout) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+    except Exception:
+        return None
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Bundles de inferencia / servidor caliente")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("serve", help="Servidor caliente que ejecuta scripts in-process")
+    s.add_argument("--host", default="127.0.0.1")
+    s.add_argument("--port", type=int, default=int(os.getenv("INFERENCE_WARM_PORT", "8790")))
+    r = sub.add_parser("run", help="Ejecuta un script vía servidor caliente (o local)")
+    r.add_argument("script")
+    r.add_argument("args", nargs=argparse.REMAINDER)
+    i = sub.add_parser("info", help="Muestra los sidecars de bundles existentes")
+    i.add_argument("--dir", default=str(BUNDLE_DIR))
+    a = ap.parse_args()
+
+    if a.cmd == "serve":
+        server = make_server(a.host, a.port)
+        print(f"[bundle] servidor caliente en http://{a.host}:{a.port} (pid {os.getpid()})")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return 0
+    if a.cmd == "run":
+        result = run_script(a.script, a.args)
+        sys.stdout.write(result.get("stdout", ""))
+        sys.stderr.write(result.get("stderr", ""))
+        return int(result.get("returncode", 1) or 0)
+    for side in sorted(Path(a.dir).glob("*.bundle.json")):
+        print(side.read_text(encoding="utf-8"))
+    return 0
+
+
+if __name__ == "__main__":
+    # Mismo módulo que importan los scripts (utils.inference_bundle), para compartir el caché
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    from utils import inference_bundle
+    sys.exit(inference_bundle.main())
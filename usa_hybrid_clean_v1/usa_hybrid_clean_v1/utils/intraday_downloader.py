@@ -0,0 +1,425 @@
+"""
+Descarga intradía concurrente y reanudable.
+
+- Pool de workers acotado; cada vendor tiene su rate limiter (token bucket)
+  compartido por todos los workers.
+- Fuente enchufable (BarSource): YFinanceSource para producción y HttpJsonSource
+  para apuntar a un servidor local de fixtures en pruebas.
+- backfill(): detecta huecos contra las barras por sesión NYSE del HistoryStore
+  (sesiones sin barras, parciales o el día en curso; fines de semana y feriados no
+  cuentan) y solo pide esos rangos, en chunks de `chunk_days`. El inicio se recorta
+  a lo que el vendor todavía sirve para el intervalo (yfinance: 60 días en 5m/15m,
+  730 en 1h). Cada chunk cerrado (sin el día en curso) queda en un checkpoint JSON
+  (ticker, inicio, fin), también si vino vacío; si la corrida se corta, la
+  siguiente retoma donde quedó.
+
+CLI:
+    python utils/intraday_downloader.py backfill --interval 15m --tickers AMD,NVDA
+    python utils/intraday_downloader.py backfill --interval 1h --days 365 --tickers-file data/us/tickers_master.csv \
+        --source http://127.0.0.1:8799
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from pathlib import Path
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+import pandas as pd
+from pandas.tseries.holiday import (AbstractHolidayCalendar, GoodFriday, Holiday, USLaborDay,
+                                    USMartinLutherKingJr, USMemorialDay, USPresidentsDay,
+                                    USThanksgivingDay, nearest_workday, sunday_to_monday)
+
+OHLCV = ["open", "high", "low", "close", "volume"]
+CHECKPOINT_DIR = Path("data/intraday_checkpoints")
+HISTORY_DIRS = {"5m": "data/intraday5/history", "15m": "data/intraday15/history"}
+CALENDAR_DIR = Path("data/calendar")  # nyse_holidays_<año>.json: cierres extra (duelo nacional, etc.)
+RATE_LIMITS = {"yfinance": 2.0, "http": 50.0}  # requests/seg por vendor
+CHUNK_DAYS = {"1m": 7, "2m": 30, "5m": 30, "15m": 30, "30m": 30, "1h": 180}
+# Media sesión regular: un día con menos barras se considera parcial (los cierres anticipados pasan)
+MIN_DAY_BARS = {"1m": 195, "2m": 97, "5m": 39, "15m": 13, "30m": 7, "1h": 4}
+# Días hacia atrás que yfinance sirve por intervalo; antes de eso devuelve vacío o error
+YF_LOOKBACK_DAYS = {"1m": 30, "2m": 60, "5m": 60, "15m": 60, "30m": 60, "90m": 60, "60m": 730, "1h": 730}
+
+
+# ---------- rate limiting ----------
+
+class RateLimiter:
+    """Token bucket thread-safe: `rate` requests/seg con ráfaga `burst`."""
+
+    def __init__(self, rate: float, burst: int | None = None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1, int(rate)))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_LIMITERS: dict = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def limiter_for(vendor: str) -> RateLimiter:
+    with _LIMITERS_LOCK:
+        if vendor not in _LIMITERS:
+            env = os.getenv(f"DOWNLOAD_RATE_{vendor.upper()}")
+            _LIMITERS[vendor] = RateLimiter(float(env) if env else RATE_LIMITS.get(vendor, 5.0))
+        return _LIMITERS[vendor]
+
+
+# ---------- fuentes ----------
+
+def normalize_vendor_frame(df: pd.DataFrame, ticker: str) -> pd.DataFrame:
+    """Aplana columnas del vendor a timestamp, ohlcv, ticker (timestamp tal cual lo entrega el vendor)."""
+    if df is None or df.empty:
+        return pd.DataFrame(columns=["timestamp"] + OHLCV + ["ticker"])
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = df.columns.get_level_values(0)
+    df = df.reset_index()
+    df = df.rename(columns={c: c.lower() for c in df.columns if isinstance(c, str)})
+    for c in ("datetime", "date", "time", "index"):
+        if "timestamp" not in df.columns and c in df.columns:
+            df = df.rename(columns={c: "timestamp"})
+    missing = [c for c in ["timestamp"] + OHLCV if c not in df.columns]
+    if missing:
+        raise ValueError(f"{ticker}: columnas faltantes {missing}")
+    df = df[["timestamp"] + OHLCV].copy()
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    df["ticker"] = ticker
+    return df.drop_duplicates(subset=["timestamp"]).sort_values("timestamp").reset_index(drop=True)
+
+
+class YFinanceSource:
+    """yfinance; `history_kwargs` se pasan tal cual a Ticker.history (p.ej. auto_adjust=True).
+
+    Usa yf.Ticker(t).history y no yf.download: download comparte estado global entre
+    llamadas y no es seguro desde varios threads.
+    """
+
+    vendor = "yfinance"
+    lookback_days = YF_LOOKBACK_DAYS
+
+    def __init__(self, **history_kwargs):
+        self.history_kwargs = history_kwargs
+
+    def fetch(self, ticker: str, start, end, interval: str) -> pd.DataFrame:
+        import yfinance as yf
+
+        df = yf.Ticker(ticker).history(start=str(start), end=str(end), interval=interval, **self.history_kwargs)
+        return normalize_vendor_frame(df, ticker)
+
+
+class HttpJsonSource:
+    """GET <base>/bars?ticker=&start=&end=&interval= → JSON [{timestamp, open, ...}] (servidor de fixtures)."""
+
+    vendor = "http"
+
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def fetch(self, ticker: str, start, end, interval: str) -> pd.DataFrame:
+        q = urlencode({"ticker": ticker, "start": str(start), "end": str(end), "interval": interval})
+        with urlopen(f"{self.base_url}/bars?{q}", timeout=self.timeout) as resp:
+            rows = json.loads(resp.read().decode("utf-8"))
+        return normalize_vendor_frame(pd.DataFrame(rows), ticker)
+
+
+def make_source(spec: str | None):
+    if spec and spec.startswith(("http://", "https://")):
+        return HttpJsonSource(spec)
+    return YFinanceSource(auto_adjust=True)
+
+
+def fetch_with_retry(source, ticker, start, end, interval, max_retries: int = 3, backoff: float = 1.5):
+    limiter = limiter_for(source.vendor)
+    for attempt in range(1, max_retries + 1):
+        limiter.acquire()
+        try:
+            return source.fetch(ticker, start, end, interval)
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            print(f"[download] {ticker} {start}->{end} intento {attempt} falló ({e}); reintento")
+            time.sleep(backoff ** attempt)
+
+
+# ---------- rangos / huecos ----------
+
+def _day(v) -> date:
+    return pd.Timestamp(v).date()
+
+
+def chunk_range(start, end, days: int) -> list:
+    """[start, end) en sub-rangos de `days` días."""
+    start, end = _day(start), _day(end)
+    out = []
+    cur = start
+    while cur < end:
+        nxt = min(end, cur + timedelta(days=days))
+        out.append((cur, nxt))
+        cur = nxt
+    return out
+
+
+def _today() -> date:
+    return pd.Timestamp.now(tz="UTC").date()
+
+
+class NYSEHolidayCalendar(AbstractHolidayCalendar):
+    """Feriados regulares de NYSE (Año Nuevo en sábado no se traslada al viernes)."""
+
+    rules = [
+        Holiday("NewYearsDay", month=1, day=1, observance=sunday_to_monday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday("Juneteenth", month=6, day=19, start_date="2022-01-01", observance=nearest_workday),
+        Holiday("IndependenceDay", month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday("Christmas", month=12, day=25, observance=nearest_workday),
+    ]
+
+
+def _calendar_file_holidays(years) -> list:
+    """Fechas de CALENDAR_DIR/nyse_holidays_<año>.json (lista de fechas o de {date, name})."""
+    out = []
+    for y in years:
+        path = CALENDAR_DIR / f"nyse_holidays_{y}.json"
+        if not path.exists():
+            continue
+        try:
+            items = json.loads(path.read_text(encoding="utf-8")).get("holidays", [])
+        except Exception as e:
+            print(f"[download] WARN: calendario ilegible {path} ({e}); se ignora")
+            continue
+        for item in items:
+            dt = item.get("date") if isinstance(item, dict) else item
+            if dt:
+                out.append(_day(dt))
+    return out
+
+
+def trading_days(start, end) -> list:
+    """Sesiones NYSE en [start, end): días hábiles sin feriados."""
+    start, end = _day(start), _day(end)
+    if start >= end:
+        return []
+    last = end - timedelta(days=1)
+    holidays = list(NYSEHolidayCalendar().holidays(start, last).date)
+    holidays += _calendar_file_holidays(range(start.year, last.year + 1))
+    return list(pd.bdate_range(start, last, freq="C", holidays=holidays).date)
+
+
+def earliest_start(interval: str, source, today=None):
+    """Primer día que `source` todavía sirve para `interval` (None: sin límite conocido)."""
+    days = getattr(source, "lookback_days", {}).get(interval)
+    if days is None:
+        return None
+    today = _day(today) if today is not None else _today()
+    return today - timedelta(days=days - 1)
+
+
+def missing_ranges(day_bars, start, end, min_bars: int = 1, today=None) -> list:
+    """Rangos [a, b) de sesiones NYSE en [start, end) sin cobertura completa.
+
+    `day_bars` = barras por día ({date: n}, p.ej. HistoryStore.day_counts). Un día está
+    cubierto si tiene >= `min_bars` barras y es anterior a `today` (default: hoy UTC);
+    los días parciales y el día en curso se vuelven a pedir.
+    """
+    today = _day(today) if today is not None else _today()
+    days = trading_days(start, end)
+    counts = dict(day_bars.items()) if day_bars is not None else {}
+    gaps, run = [], []
+    for d in days:
+        if d < today and counts.get(d, 0) >= min_bars:
+            if run:
+                gaps.append((run[0], run[-1] + timedelta(days=1)))
+                run = []
+        else:
+            if run and (d - run[-1]).days > 4:
+                gaps.append((run[0], run[-1] + timedelta(days=1)))
+                run = []
+            run.append(d)
+    if run:
+        gaps.append((run[0], run[-1] + timedelta(days=1)))
+    return gaps
+
+
+# ---------- checkpoints ----------
+
+class Checkpoint:
+    """Chunks completados por (ticker, inicio, fin) en un JSON reescrito de forma atómica."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.done = {}
+        if self.path.exists():
+            try:
+                self.done = json.loads(self.path.read_text(encoding="utf-8"))
+            except Exception as e:
+                print(f"[download] WARN: checkpoint ilegible {self.path} ({e}); se ignora")
+
+    @staticmethod
+    def key(ticker, start, end) -> str:
+        return f"{ticker}|{start}|{end}"
+
+    def is_done(self, ticker, start, end) -> bool:
+        return self.key(ticker, start, end) in self.done
+
+    def mark(self, ticker, start, end, rows: int, today=None) -> bool:
+        """Registra el chunk si ya cerró (no incluye el día en curso), aunque venga vacío:
+        un rango pasado sin barras (ticker sin historia, cierre no previsto) no cambia al
+        repetirlo."""
+        today = _day(today) if today is not None else _today()
+        if _day(end) > today:
+            return False
+        with self._lock:
+            self.done[self.key(ticker, start, end)] = rows
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text(json.dumps(self.done, indent=0, sort_keys=True), encoding="utf-8")
+            os.replace(tmp, self.path)
+        return True
+
+
+# ---------- orquestación ----------
+
+def fetch_many(tickers, start, end, interval: str, source=None, workers: int = 8) -> dict:
+    """Descarga concurrente en memoria: {ticker: DataFrame} (tickers fallidos/vacíos se omiten)."""
+    source = source or YFinanceSource()
+    out = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        futs = {ex.submit(fetch_with_retry, source, t, start, end, interval): t for t in tickers}
+        for fut in as_completed(futs):
+            t = futs[fut]
+            try:
+                df = fut.result()
+            except Exception as e:
+                print(f"[download] ERROR {t}: {e}")
+                continue
+            if df is not None and not df.empty:
+                out[t] = df
+            else:
+                print(f"[download] WARN {t}: sin datos")
+    return {t: out[t] for t in tickers if t in out}
+
+
+def backfill(tickers, start, end, interval: str = "15m", source=None, store=None, workers: int = 8,
+             chunk_days: int | None = None, checkpoint: Checkpoint | None = None) -> pd.DataFrame:
+    """Rellena la historia de `tickers` en [start, end) pidiendo solo lo que falta.
+
+    `start` se recorta a earliest_start() del vendor. Devuelve un resumen por chunk
+    (ticker, start, end, rows, status).
+    """
+    from utils.intraday_store import HistoryStore
+
+    source = source or YFinanceSource(auto_adjust=True)
+    floor = earliest_start(interval, source)
+    if floor is not None and _day(start) < floor:
+        print(f"[download] WARN: {source.vendor} solo sirve {interval} desde {floor}; inicio {_day(start)} -> {floor}")
+        start = floor
+    store = store or HistoryStore(HISTORY_DIRS.get(interval, f"data/intraday_{interval}/history"))
+    checkpoint = checkpoint or Checkpoint(CHECKPOINT_DIR / f"{interval}.json")
+    chunk_days = chunk_days or CHUNK_DAYS.get(interval, 30)
+    min_bars = MIN_DAY_BARS.get(interval, 1)
+    last = pd.Timestamp(_day(end)) - pd.Timedelta(microseconds=1)
+
+    tasks = []
+    for t in tickers:
+        counts = store.day_counts(t, _day(start), last)
+        for a, b in missing_ranges(counts, start, end, min_bars):
+            for ca, cb in chunk_range(a, b, chunk_days):
+                if not checkpoint.is_done(t, ca, cb):
+                    tasks.append((t, ca, cb))
+    print(f"[download] {len(tickers)} tickers | {len(tasks)} chunks pendientes ({interval}, {workers} workers)")
+
+    write_lock = threading.Lock()
+    summary = []
+
+    def run(task):
+        t, a, b = task
+        df = fetch_with_retry(source, t, a, b, interval)
+        if df is not None and not df.empty:
+            with write_lock:
+                store.merge_bars(df)
+        checkpoint.mark(t, a, b, 0 if df is None else len(df))
+        return 0 if df is None else len(df)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        futs = {ex.submit(run, task): task for task in tasks}
+        for fut in as_completed(futs):
+            t, a, b = futs[fut]
+            try:
+                rows, status = fut.result(), "ok"
+            except Exception as e:
+                rows, status = 0, f"error: {e}"
+                print(f"[download] ERROR {t} {a}->{b}: {e}")
+            summary.append({"ticker": t, "start": a, "end": b, "rows": rows, "status": status})
+    return pd.DataFrame(summary, columns=["ticker", "start", "end", "rows", "status"])
+
+
+def load_tickers_arg(tickers: str | None, tickers_file: str | None) -> list:
+    if tickers:
+        return [t.strip().upper() for t in tickers.split(",") if t.strip()]
+    if tickers_file:
+        df = pd.read_csv(tickers_file)
+        return df["ticker"].dropna().astype(str).str.upper().unique().tolist()
+    raise ValueError("Debe especificar --tickers o --tickers-file")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Descarga intradía concurrente y reanudable")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("backfill", help="Rellena huecos de la historia intradía")
+    b.add_argument("--tickers")
+    b.add_argument("--tickers-file")
+    b.add_argument("--interval", default="15m")
+    b.add_argument("--days", type=int, default=None,
+                   help="Ventana hacia atrás desde --end (default: lo que sirve el vendor, 15m: 60; 180 sin límite)")
+    b.add_argument("--end", default=None, help="Fin exclusivo YYYY-MM-DD (default: mañana UTC)")
+    b.add_argument("--workers", type=int, default=8)
+    b.add_argument("--chunk-days", type=int, default=None)
+    b.add_argument("--source", default=None, help="URL de servidor de fixtures (default: yfinance)")
+    b.add_argument("--history-dir", default=None)
+    a = ap.parse_args()
+
+    from utils.intraday_store import HistoryStore
+
+    tickers = load_tickers_arg(a.tickers, a.tickers_file)
+    source = make_source(a.source)
+    end = _day(a.end) if a.end else pd.Timestamp.now(tz="UTC").date() + timedelta(days=1)
+    start = end - timedelta(days=a.days or getattr(source, "lookback_days", {}).get(a.interval, 180))
+    store = HistoryStore(a.history_dir or HISTORY_DIRS.get(a.interval, f"data/intraday_{a.interval}/history"))
+    t0 = time.perf_counter()
+    summary = backfill(tickers, start, end, a.interval, source, store, a.workers, a.chunk_days)
+    errors = summary[summary["status"] != "ok"]
+    print(f"[download] {len(summary)} chunks, {int(summary['rows'].sum())} filas, {len(errors)} errores "
+          f"en {time.perf_counter() - t0:.1f}s")
+    return 1 if len(errors) else 0
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+    sys.exit(main())
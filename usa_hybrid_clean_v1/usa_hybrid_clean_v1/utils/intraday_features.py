@@ -0,0 +1,316 @@
+"""
+Features intradía incrementales con estado por ticker.
+
+En lugar de recalcular indicadores rolling sobre el día completo cada vez que
+llega una barra, cada calculador guarda por ticker el estado mínimo (EMAs, colas
+de las últimas N barras, sumas acumuladas) y calcula features solo para las
+barras nuevas, en O(1) por barra:
+
+    feats = IncrementalIntradayFeatures()
+    out = feats.update(bars_nuevas)   # ticker, timestamp, open, high, low, close, volume
+
+- IncrementalIntradayFeatures: las de intraday/scripts/09_make_targets_intraday
+  (RSI, EMA, MACD, ATR, Bollinger, volumen, VWAP, liquidez, hora, dirección).
+- IncrementalContextFeatures: las de scripts/09b_make_features_intraday
+  (volatilidad, ATR corto, cruce de EMAs, colas, breakouts).
+
+Semántica idéntica al cálculo por lotes de cada script sobre la serie del ticker
+dentro del día: el estado de un ticker se reinicia cuando cambia la fecha de sus
+barras (timestamp.dt.date, en la zona horaria de los datos). Vectorizado entre
+tickers: cada update itera solo sobre el k-ésimo bar nuevo de cada ticker
+(normalmente k = 1). save()/load() persisten el estado (checkpoint) para que un
+reinicio continúe sin recalcular la sesión.
+"""
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+CHECKPOINT_FORMAT = 1
+
+WINDOW = 20  # ventana rolling más larga (Bollinger, volumen, turnover)
+RSI_PERIODS = (7, 14)
+EMA_SPANS = {"EMA_9": 9, "EMA_20": 20, "EMA_50": 50, "_ema12": 12, "_ema26": 26, "_macd_signal": 9}
+WARMUP_COLS = ["RSI_14", "EMA_20", "MACD", "ATR_14"]
+
+
+def _alpha(span):
+    return 1.0 / (1.0 + (span - 1) / 2.0)
+
+
+def _ewm_step(prev, x, span):
+    """Un paso de ewm(span, adjust=False).mean(), con la aritmética de pandas."""
+    alpha = _alpha(span)
+    old_wt = 1.0 - alpha
+    out = (old_wt * prev + alpha * x) / (old_wt + alpha)
+    return np.where(np.isnan(prev), x, out)
+
+
+def _ewm_adjust_step(weighted, old_wt, x, span):
+    """Un paso de ewm(span).mean() (adjust=True) → (media, peso acumulado), aritmética de pandas."""
+    old_wt = old_wt * (1.0 - _alpha(span))
+    out = (old_wt * weighted + x) / (old_wt + 1.0)
+    first = np.isnan(weighted)
+    return np.where(first, x, out), np.where(first, 1.0, old_wt + 1.0)
+
+
+def _last(buf, p):
+    return buf[:, buf.shape[1] - p:]
+
+
+class _TickerState:
+    """
+    Estado incremental por ticker: escalares (SCALARS: nombre → valor inicial) y colas
+    de las últimas barras (BUFFERS: nombre → largo). Las subclases implementan
+    _step(s, bars) → {feature: array} para una barra por slot, y _frame().
+    """
+
+    SCALARS: dict = {}
+    BUFFERS: dict = {}
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Descartar el estado de todos los tickers."""
+        self.slot = {}
+        self.last_ts = {}
+        self.day = np.array([], dtype=object)
+        self.state = {k: np.zeros(0) for k in self.SCALARS}
+        self.state.update({k: np.zeros((0, n)) for k, n in self.BUFFERS.items()})
+
+    def _clear(self, s):
+        for k, v in self.SCALARS.items():
+            self.state[k][s] = v
+        for k in self.BUFFERS:
+            self.state[k][s] = np.nan
+
+    def _slots(self, tickers) -> np.ndarray:
+        new = [t for t in pd.unique(tickers) if t not in self.slot]
+        if new:
+            base = len(self.slot)
+            self.slot.update({t: base + i for i, t in enumerate(new)})
+            for k, v in self.SCALARS.items():
+                self.state[k] = np.r_[self.state[k], np.full(len(new), v, dtype=float)]
+            for k, n in self.BUFFERS.items():
+                self.state[k] = np.vstack([self.state[k], np.full((len(new), n), np.nan)])
+            self.day = np.r_[self.day, np.full(len(new), None, dtype=object)]
+        return np.array([self.slot[t] for t in tickers], dtype=np.int64)
+
+    def _push(self, k, s, x):
+        """Agrega x al final de la cola k de los slots s; retorna las colas actualizadas."""
+        buf = self.state[k][s]
+        buf[:, :-1] = buf[:, 1:]
+        buf[:, -1] = x
+        self.state[k][s] = buf
+        return buf
+
+    def update(self, bars: pd.DataFrame) -> pd.DataFrame:
+        """
+        Features de las barras nuevas (columnas de bars + features), en el orden
+        (ticker, timestamp). Barras con timestamp <= la última vista del ticker se
+        ignoran (reentregas del mismo archivo); duplicados en el lote, la última gana.
+        """
+        bars = bars.drop_duplicates(["ticker", "timestamp"], keep="last")
+        bars = bars.sort_values(["ticker", "timestamp"], kind="stable")
+        known = bars["ticker"].isin(self.last_ts.keys()).to_numpy()
+        fresh = ~known
+        if known.any():
+            seen = bars.loc[known, "ticker"].map(self.last_ts)
+            fresh[known] = (bars.loc[known, "timestamp"] > seen).to_numpy()
+        bars = bars[fresh].reset_index(drop=True)
+        if bars.empty:
+            return self._frame(bars, {})
+        slots = self._slots(bars["ticker"].to_numpy())
+        days = bars["timestamp"].dt.date.to_numpy()
+        rank = bars.groupby("ticker", sort=False).cumcount().to_numpy()
+        cols = {}
+        for r in range(int(rank.max()) + 1):
+            rows = np.flatnonzero(rank == r)
+            s = slots[rows]
+            new_day = self.day[s] != days[rows]
+            if new_day.any():
+                self._clear(s[new_day])
+                self.day[s] = days[rows]
+            for k, v in self._step(s, bars.iloc[rows]).items():
+                cols.setdefault(k, np.full(len(bars), np.nan))[rows] = v
+        self.last_ts.update(bars.groupby("ticker", sort=False)["timestamp"].max().to_dict())
+        return self._frame(bars, cols)
+
+    def _step(self, s, bars) -> dict:
+        raise NotImplementedError
+
+    @staticmethod
+    def _frame(bars: pd.DataFrame, cols: dict) -> pd.DataFrame:
+        return pd.concat([bars, pd.DataFrame(cols, index=bars.index)], axis=1)
+
+    def save(self, path) -> None:
+        """Checkpoint atómico del estado (joblib)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        joblib.dump({"format": CHECKPOINT_FORMAT, "kind": type(self).__name__, "slot": self.slot,
+                     "last_ts": self.last_ts, "day": self.day, "state": self.state}, tmp)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        """Estado desde un checkpoint de save(); None si no existe o no es compatible."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        data = joblib.load(path)
+        if data.get("format") != CHECKPOINT_FORMAT or data.get("kind") != cls.__name__ \
+                or set(data["state"]) != set(cls.SCALARS) | set(cls.BUFFERS):
+            return None
+        obj = cls()
+        obj.slot, obj.last_ts, obj.day, obj.state = data["slot"], data["last_ts"], data["day"], data["state"]
+        return obj
+
+
+class IncrementalIntradayFeatures(_TickerState):
+    """Features de 09_make_targets_intraday (calculate_technical/liquidity/time_features + dirección)."""
+
+    SCALARS = {"prev_close": np.nan, "cum_pv": 0.0, "cum_v": 0.0, **{k: np.nan for k in EMA_SPANS}}
+    BUFFERS = {"close": WINDOW, "volume": WINDOW, "turnover": WINDOW, "tr": 14, "gain": 14, "loss": 14}
+
+    def _step(self, s, b) -> dict:
+        st = self.state
+        c = b["close"].to_numpy(float)
+        h = b["high"].to_numpy(float)
+        lo = b["low"].to_numpy(float)
+        v = b["volume"].to_numpy(float)
+        prev = st["prev_close"][s]
+
+        delta = c - prev
+        turnover = v * c
+        buf = {
+            "close": self._push("close", s, c),
+            "volume": self._push("volume", s, v),
+            "turnover": self._push("turnover", s, turnover),
+            "tr": self._push("tr", s, np.fmax(np.fmax(h - lo, np.abs(h - prev)), np.abs(lo - prev))),
+            "gain": self._push("gain", s, np.where(delta > 0, delta, 0.0)),
+            "loss": self._push("loss", s, -np.where(delta < 0, delta, 0.0)),
+        }
+
+        for k, span in EMA_SPANS.items():
+            if k != "_macd_signal":
+                st[k][s] = _ewm_step(st[k][s], c, span)
+        macd = st["_ema12"][s] - st["_ema26"][s]
+        st["_macd_signal"][s] = _ewm_step(st["_macd_signal"][s], macd, EMA_SPANS["_macd_signal"])
+
+        pv = c * v
+        st["cum_pv"][s] += np.nan_to_num(pv)
+        st["cum_v"][s] += np.nan_to_num(v)
+        st["prev_close"][s] = c
+
+        out = {}
+        for p in RSI_PERIODS:
+            gain = _last(buf["gain"], p).mean(axis=1)
+            loss = _last(buf["loss"], p).mean(axis=1)
+            out[f"RSI_{p}"] = 100 - (100 / (1 + gain / (loss + 1e-10)))
+        out["EMA_9"], out["EMA_20"], out["EMA_50"] = st["EMA_9"][s], st["EMA_20"][s], st["EMA_50"][s]
+        out["MACD"] = macd
+        out["MACD_signal"] = st["_macd_signal"][s]
+        out["MACD_hist"] = macd - out["MACD_signal"]
+        out["ATR_14"] = buf["tr"].mean(axis=1)
+        out["ATR_pct"] = out["ATR_14"] / c
+        bb_mid = buf["close"].mean(axis=1)
+        bb_std = buf["close"].std(axis=1, ddof=1)
+        out["BB_middle"] = bb_mid
+        out["BB_upper"] = bb_mid + bb_std * 2
+        out["BB_lower"] = bb_mid - bb_std * 2
+        out["BB_width"] = (out["BB_upper"] - out["BB_lower"]) / bb_mid
+        vol_ma = buf["volume"].mean(axis=1)
+        out["volume_ma_20"] = vol_ma
+        out["volume_ratio"] = v / (vol_ma + 1)
+        out["volume_zscore"] = (v - vol_ma) / (buf["volume"].std(axis=1, ddof=1) + 1e-10)
+        vwap = np.where(np.isnan(pv), np.nan, st["cum_pv"][s] / st["cum_v"][s])
+        out["VWAP"] = vwap
+        out["VWAP_dev"] = (c - vwap) / vwap
+        out["spread_pct"] = (h - lo) / c
+        out["spread_bps"] = out["spread_pct"] * 10000
+        out["turnover"] = turnover
+        out["turnover_ma_20"] = buf["turnover"].mean(axis=1)
+        out["turnover_ratio"] = turnover / (out["turnover_ma_20"] + 1)
+        return out
+
+    @staticmethod
+    def _frame(bars: pd.DataFrame, cols: dict) -> pd.DataFrame:
+        out = pd.concat([bars, pd.DataFrame(cols, index=bars.index)], axis=1)
+        ts = out["timestamp"]
+        out["hour"] = ts.dt.hour
+        out["minute"] = ts.dt.minute
+        out["time_numeric"] = out["hour"] + out["minute"] / 60
+        out["dist_to_open"] = out["time_numeric"] - 9.5
+        out["dist_to_close"] = 16.0 - out["time_numeric"]
+        out["is_first_hour"] = (out["dist_to_open"] <= 1).astype(int)
+        out["is_last_hour"] = (out["dist_to_close"] <= 1).astype(int)
+        if len(out):
+            short = ((out["close"] < out["EMA_50"]) & (out["RSI_14"] > 30) &
+                     (out["MACD"] < 0) & (out["close"] < out["BB_upper"]))
+            out["direction"] = np.where(short, "SHORT", "LONG")
+        else:
+            out["direction"] = pd.Series(dtype=object)
+        return out
+
+
+class IncrementalContextFeatures(_TickerState):
+    """
+    Features de 09b_make_features_intraday.compute_intraday_features. Mantiene su
+    definición de TR (max(high-low, |high-prev_close|), NaN en la primera barra) y
+    las EMAs con adjust=True.
+    """
+
+    SCALARS = {"prev_close": np.nan, "ema_8": np.nan, "ema_8_wt": 0.0, "ema_21": np.nan, "ema_21_wt": 0.0}
+    BUFFERS = {"close": 12, "tr": 9, "high": 20, "low": 20}
+
+    def _step(self, s, b) -> dict:
+        st = self.state
+        o = b["open"].to_numpy(float)
+        c = b["close"].to_numpy(float)
+        h = b["high"].to_numpy(float)
+        lo = b["low"].to_numpy(float)
+        prev = st["prev_close"][s]
+
+        tr = np.maximum(h - lo, np.abs(h - prev))
+        close_buf = self._push("close", s, c)
+        tr_buf = self._push("tr", s, tr)
+        high_buf = self._push("high", s, h)
+        low_buf = self._push("low", s, lo)
+        for span in (8, 21):
+            k = f"ema_{span}"
+            st[k][s], st[f"{k}_wt"][s] = _ewm_adjust_step(st[k][s], st[f"{k}_wt"][s], c, span)
+        st["prev_close"][s] = c
+
+        out = {
+            "vol_30m": _last(close_buf, 6).std(axis=1, ddof=1),  # 6*5m=30m
+            "vol_60m": close_buf.std(axis=1, ddof=1),
+            "tr": tr,
+            "atr_5m": _last(tr_buf, 3).mean(axis=1),
+            "atr_15m": tr_buf.mean(axis=1),
+            "ema_8": st["ema_8"][s],
+            "ema_21": st["ema_21"][s],
+        }
+        out["ema_cross"] = (out["ema_8"] > out["ema_21"]).astype(int)
+        out["upper_tail"] = h - np.maximum(o, c)
+        out["lower_tail"] = np.minimum(o, c) - lo
+        out["tail_ratio"] = out["upper_tail"] / (out["lower_tail"] + 1e-6)
+        with np.errstate(invalid="ignore"):
+            out["hh_20"] = (h >= high_buf.max(axis=1)).astype(int)
+            out["ll_20"] = (lo <= low_buf.min(axis=1)).astype(int)
+        return out
+
+    @staticmethod
+    def _frame(bars: pd.DataFrame, cols: dict) -> pd.DataFrame:
+        out = pd.concat([bars, pd.DataFrame(cols, index=bars.index)], axis=1)
+        for k in ("ema_cross", "hh_20", "ll_20"):
+            if k in out:
+                out[k] = out[k].astype(int)
+        return out
+
+
+def ready_mask(df: pd.DataFrame) -> pd.Series:
+    """Filas fuera del warmup (mismo criterio que 09_make_targets_intraday)."""
+    return df[WARMUP_COLS].notna().all(axis=1)
@@ -0,0 +1,292 @@
+"""
+Inferencia y gate intradía compartidos por 11_infer_and_gate_intraday (una corrida
+por día) y 11b_infer_worker_intraday (proceso residente durante la sesión).
+
+- load_inference_bundle(): modelo + scaler + feature_cols (bundle memoizado).
+- predict_probabilities(): prob_win con el contrato de features del modelo.
+- spread_caps(): spread máximo adaptativo vectorizado (hora, ATR, volumen).
+- apply_basic_gate(): filtros prob/whitelist/dirección/ATR/spread/volumen.
+- IntradayInferenceWorker: mantiene modelo, scaler, config y estado de features
+  en memoria; process(bars) calcula features solo de las barras nuevas, las
+  puntúa y aplica el gate.
+"""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from utils.inference_bundle import load_bundle
+from utils.intraday_features import IncrementalIntradayFeatures, ready_mask
+
+FALLBACK_FEATURES = [
+    'RSI_14', 'EMA_9', 'EMA_20', 'EMA_50',
+    'MACD', 'MACD_signal', 'MACD_hist',
+    'ATR_14', 'ATR_pct', 'BB_width',
+    'volume_ratio', 'volume_zscore', 'VWAP_dev',
+    'spread_bps', 'turnover_ratio', 'hour', 'minute',
+    'dist_to_open', 'dist_to_close', 'is_first_hour', 'is_last_hour'
+]
+
+_FEATURE_COLS_CACHE: dict = {}
+
+
+def load_inference_bundle(model_path, scaler_path):
+    """Bundle versionado (modelo + scaler + features); memoizado en proceso."""
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Modelo no encontrado: {model_path}")
+    components = {"model": model_path}
+    if scaler_path:
+        components["scaler"] = scaler_path
+    meta = {"feature_cols": get_feature_columns(model_path)}
+    bundle = load_bundle(f"intraday_{Path(model_path).stem}", components, meta,
+                         out_dir=Path(model_path).parent / "bundles", required=("model",))
+    print(f"[infer_intraday] Modelo cargado: {model_path} (bundle v{bundle.version})")
+    if bundle.get("scaler") is not None:
+        print(f"[infer_intraday] Scaler cargado: {scaler_path}")
+    else:
+        print("[infer_intraday] Scaler: N/A (modelo con preprocesamiento o no provisto)")
+    return bundle
+
+
+def _metadata_candidates(model_path):
+    p = Path(model_path)
+    return [
+        # 1) YAML al lado del modelo (compatibilidad antigua)
+        (model_path.replace('.joblib', '_metadata.yaml'), ('feature_names', 'features')),
+        # 2) JSON con mismo stem
+        (model_path.replace('.joblib', '_metadata.json'), ('features', 'feature_names')),
+        # 3) JSON estándar del BRF (clf_intraday_brf_metadata.json)
+        (str(p.with_name('clf_intraday_brf_metadata.json')), ('features', 'feature_names')),
+    ]
+
+
+def get_feature_columns(model_path):
+    """Obtener lista de features del metadata (YAML o JSON); memoizado por mtime de los archivos."""
+    candidates = _metadata_candidates(model_path)
+    key = (model_path, tuple(os.path.getmtime(f) if os.path.exists(f) else None for f, _ in candidates))
+    if key in _FEATURE_COLS_CACHE:
+        return list(_FEATURE_COLS_CACHE[key])
+    cols = None
+    for path, keys in candidates:
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            metadata = yaml.safe_load(f) if path.endswith('.yaml') else json.load(f)
+        cols = metadata.get(keys[0]) or metadata.get(keys[1])
+        if cols:
+            break
+    # Fallback: features básicos
+    cols = list(cols or FALLBACK_FEATURES)
+    _FEATURE_COLS_CACHE[key] = cols
+    return list(cols)
+
+
+def predict_probabilities(df, feature_cols, model, scaler, verbose=True):
+    """Predecir probabilidades y dirección.
+    Si scaler es None, asumimos que el modelo incluye preprocesamiento (Pipeline).
+    """
+    # Asegurar 'direction_num' si el modelo lo requiere
+    if 'direction_num' in feature_cols and 'direction_num' not in df.columns:
+        if 'direction' in df.columns:
+            df['direction_num'] = df['direction'].map({'LONG': 1, 'SHORT': 0}).fillna(0)
+        else:
+            df['direction_num'] = 1  # default LONG si no existe 'direction'
+
+    # Verificar que tenemos todas las features (tras crear direction_num)
+    missing = [f for f in feature_cols if f not in df.columns]
+    if missing:
+        if verbose:
+            print(f"[infer_intraday] WARN: Features faltantes: {missing}")
+        # Agregar con NaN para que el imputer del Pipeline las gestione
+        for f in missing:
+            df[f] = np.nan
+
+    keep_cols = ['ticker', 'timestamp']
+    extras = [c for c in keep_cols if c in df.columns]
+    df_pred = df[feature_cols + extras].copy()
+
+    # Si hay scaler externo, forzar filas completas; en Pipeline, el imputer maneja NaNs
+    if scaler is not None:
+        df_pred = df_pred.dropna(subset=feature_cols)
+        if df_pred.empty:
+            if verbose:
+                print("[infer_intraday] WARN: No hay filas con features completas")
+            return df
+
+    # Preparar X respetando el contrato del modelo
+    X_input = df_pred[feature_cols]
+    if scaler is not None:
+        # Ruta antigua: scaler externo + modelo sin pipeline
+        X_arr = scaler.transform(X_input.values)
+        proba = model.predict_proba(X_arr)[:, 1]
+    else:
+        # Ruta nueva: modelo es Pipeline/Calibrated con preprocesamiento
+        proba = model.predict_proba(X_input)[:, 1]
+
+    # Crear DF de resultados con direction categórica original
+    results = pd.DataFrame({
+        'ticker': df_pred['ticker'],
+        'timestamp': df_pred['timestamp'] if 'timestamp' in df_pred.columns else df.index,
+        'prob_win': proba
+    })
+    # Mantener direction original si existe
+    # Merge de vuelta
+    df = df.merge(
+        results,
+        on=[c for c in ['ticker', 'timestamp'] if c in results.columns],
+        how='left'
+    )
+
+    if not verbose:
+        return df
+    print(f"[infer_intraday] Predicciones: {(~df['prob_win'].isna()).sum()} filas")
+    print(f"[infer_intraday]   Prob media: {df['prob_win'].mean():.3f}")
+    print(f"[infer_intraday]   Prob mediana: {df['prob_win'].median():.3f}")
+
+    # Verificar si direction está presente antes de contar
+    if 'direction' in df.columns:
+        print(f"[infer_intraday]   LONG: {(df['direction'] == 'LONG').sum()}, SHORT: {(df['direction'] == 'SHORT').sum()}")
+    else:
+        print("[infer_intraday]   Direction: N/A (columna no presente)")
+
+    return df
+
+
+def dynamic_spread_cap(timestamp, atr_pct, volume_ratio, config):
+    """Spread máximo adaptativo para una sola barra (ver spread_caps)."""
+    return spread_caps(pd.Series([timestamp]), [atr_pct], [volume_ratio], config)[0].item()
+
+
+def spread_caps(timestamps, atr_pct, volume_ratio, config):
+    """Calcular spread máximo adaptativo según hora y condiciones (vectorizado).
+
+    Política:
+    - Normal: 8 bps
+    - Late session: 12 bps
+    - Alta vol + liquidez: 15 bps
+    - Extremo (ATR > 1.5% con vol): 25 bps (días especiales)
+
+    ATR/volumen NaN cuentan como 0.
+    """
+    filters = config.get('filters', {})
+    base_bps = filters.get('spread_base_bps', 8)
+    late_bps = filters.get('spread_late_bps', 12)
+    high_vol_bps = filters.get('spread_high_vol_bps', 15)
+
+    ts = pd.Series(timestamps)
+    atr = np.nan_to_num(np.asarray(atr_pct, dtype=float), nan=0.0)
+    vol = np.nan_to_num(np.asarray(volume_ratio, dtype=float), nan=0.0)
+
+    # Late session (15:00-16:00 NY)
+    tod = (ts.dt.hour * 3600 + ts.dt.minute * 60 + ts.dt.second + ts.dt.microsecond / 1e6).to_numpy()
+    cap = np.where((tod >= 15 * 3600) & (tod <= 16 * 3600), late_bps, base_bps)
+
+    # Alta volatilidad con liquidez
+    cap = np.where((atr >= 0.009) & (vol >= 0.5), np.maximum(cap, high_vol_bps), cap)
+
+    # Extremo: días muy volátiles (ej: elecciones, FOMC) → hasta 25 bps
+    cap = np.where((atr >= 0.015) & (vol >= 0.4), np.maximum(cap, 25), cap)
+    return cap
+
+
+def apply_basic_gate(df, prob_min, config, verbose=True):
+    """Aplicar filtros básicos con spread adaptativo."""
+    filters = config.get('filters', {})
+    log = print if verbose else (lambda *a, **k: None)
+
+    # Probabilidad mínima
+    df = df[df['prob_win'] >= prob_min].copy()
+    log(f"[infer_intraday] Después de prob_win >= {prob_min:.2f}: {len(df)} filas")
+
+    # Whitelist de tickers
+    ticker_whitelist = filters.get('ticker_whitelist', [])
+    if ticker_whitelist and 'ticker' in df.columns:
+        df = df[df['ticker'].isin(ticker_whitelist)]
+        log(f"[infer_intraday] Después de whitelist {len(ticker_whitelist)} tickers: {len(df)} filas")
+
+    # Filtro de dirección (allow_short)
+    allow_short = filters.get('allow_short', True)
+    if not allow_short and 'direction' in df.columns:
+        df = df[df['direction'] == 'LONG']
+        log(f"[infer_intraday] Después de LONG only: {len(df)} filas")
+
+    # ATR
+    atr_min = filters.get('atr15m_min', 0.004)
+    atr_max = filters.get('atr15m_max', 0.025)
+    if 'ATR_pct' in df.columns:
+        df = df[(df['ATR_pct'] >= atr_min) & (df['ATR_pct'] <= atr_max)]
+        log(f"[infer_intraday] Después de ATR {atr_min:.3%}-{atr_max:.3%}: {len(df)} filas")
+
+    # Spread adaptativo
+    if 'spread_bps' in df.columns and 'timestamp' in df.columns:
+        atr_series = df['ATR_pct'] if 'ATR_pct' in df.columns else pd.Series(0, index=df.index)
+        vol_series = df['volume_ratio'] if 'volume_ratio' in df.columns else pd.Series(0, index=df.index)
+        df = df.copy()
+        df['spread_cap_bps'] = spread_caps(df['timestamp'], atr_series, vol_series, config)
+        base = filters.get('spread_base_bps', 18)
+        high = filters.get('spread_high_vol_bps', 35)
+
+        # Log spreads antes del filtro (para diagnóstico)
+        if len(df) > 0 and len(df) <= 10:
+            log(f"[DEBUG] Spreads antes de filtrar (caps): {df[['ticker', 'spread_bps', 'spread_cap_bps']].values.tolist()}")
+
+        df = df[df['spread_bps'] <= df['spread_cap_bps']]
+        log(f"[infer_intraday] Después de spread adaptativo ({base}-{high} bps): {len(df)} filas")
+
+    # Volumen
+    vol_min_pct = filters.get('volume_min_percentile', 40) / 100.0
+    if 'volume_ratio' in df.columns:
+        df = df[df['volume_ratio'] >= vol_min_pct]
+        log(f"[infer_intraday] Después de volumen >= {vol_min_pct:.1%}x MA: {len(df)} filas")
+
+    return df
+
+
+class IntradayInferenceWorker:
+    """
+    Inferencia residente de una sesión: modelo, scaler, feature_cols y config se
+    cargan una vez; cada process(bars) calcula features solo de las barras nuevas
+    (estado incremental por ticker), puntúa las que salieron del warmup y aplica
+    el gate. El estado se reinicia al cambiar la fecha de las barras.
+    """
+
+    def __init__(self, model, scaler, feature_cols, config, prob_min):
+        self.model = model
+        self.scaler = scaler
+        self.feature_cols = list(feature_cols)
+        self.config = config or {}
+        self.prob_min = prob_min
+        self.features = IncrementalIntradayFeatures()
+        self.session = None
+        self.candidates = []
+
+    @classmethod
+    def from_paths(cls, model_path, scaler_path, config, prob_min):
+        bundle = load_inference_bundle(model_path, scaler_path)
+        return cls(bundle["model"], bundle.get("scaler"), bundle.meta["feature_cols"], config, prob_min)
+
+    def process(self, bars: pd.DataFrame) -> tuple:
+        """(scored, candidates) de las barras nuevas de bars; vacíos si no hay nada listo."""
+        if bars is None or bars.empty:
+            return pd.DataFrame(), pd.DataFrame()
+        day = bars['timestamp'].max().date()
+        if day != self.session:
+            self.features.reset()
+            self.session, self.candidates = day, []
+        feats = self.features.update(bars)
+        feats = feats[ready_mask(feats)] if len(feats) else feats
+        if feats.empty:
+            return feats, feats
+        scored = predict_probabilities(feats.reset_index(drop=True), self.feature_cols,
+                                       self.model, self.scaler, verbose=False)
+        candidates = apply_basic_gate(scored, self.prob_min, self.config, verbose=False)
+        self.candidates.append(candidates)
+        return scored, candidates
+
+    def forecast(self) -> pd.DataFrame:
+        """Candidatos acumulados de la sesión (mismo contenido que forecast_intraday.parquet de 11)."""
+        parts = [c for c in self.candidates if len(c)]
+        return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
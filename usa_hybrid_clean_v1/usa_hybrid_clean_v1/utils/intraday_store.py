@@ -0,0 +1,232 @@
+"""
+Historia intradía (5m/15m) particionada por ticker, con merge, compactación y manifiesto.
+
+Layout bajo <root> (p.ej. data/intraday5/history):
+
+    ticker=T/date=YYYY-MM-DD/part-0.parquet   días del mes en curso (partición caliente)
+    ticker=T/month=YYYY-MM/part-0.parquet     meses cerrados, compactados y ordenados
+    _manifest.parquet                         (ticker, path, min_ts, max_ts, rows)
+
+- merge_bars(): combina barras nuevas con la partición existente (dedup por
+  ticker+timestamp, gana la fila nueva). Si el mes ya está compactado, la barra
+  tardía entra directamente al archivo mensual.
+- compact(): junta los date= de meses cerrados en un archivo mensual ordenado por
+  timestamp con row groups acotados (pushdown eficiente por rango).
+- read_bars(): localiza archivos vía manifiesto (sin glob) y filtra por rango.
+"""
+from pathlib import Path
+
+import pandas as pd
+
+MANIFEST_NAME = "_manifest.parquet"
+MANIFEST_COLS = ["ticker", "path", "min_ts", "max_ts", "rows"]
+KEY_COLS = ["ticker", "timestamp"]
+ROW_GROUP_SIZE = 2048
+
+
+def _utc(ts) -> pd.Timestamp:
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+def normalize_bars(df: pd.DataFrame, ticker: str | None = None) -> pd.DataFrame:
+    df = df.copy()
+    if ticker is not None and "ticker" not in df.columns:
+        df["ticker"] = ticker
+    df["ticker"] = df["ticker"].astype(str).str.upper()
+    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True, errors="coerce")
+    return df.dropna(subset=["timestamp"])
+
+
+def _atomic_write(df: pd.DataFrame, path: Path, row_group_size: int | None = None) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, tmp, compression="snappy", row_group_size=row_group_size)
+    tmp.replace(path)
+
+
+def _merge(old: pd.DataFrame | None, new: pd.DataFrame) -> pd.DataFrame:
+    if old is not None and not old.empty:
+        new = pd.concat([normalize_bars(old), new], ignore_index=True)
+    return new.drop_duplicates(subset=KEY_COLS, keep="last").sort_values("timestamp").reset_index(drop=True)
+
+
+class HistoryStore:
+    def __init__(self, root):
+        self.root = Path(root)
+        self._manifest: pd.DataFrame | None = None
+
+    # ---------- manifiesto ----------
+    @property
+    def manifest_path(self) -> Path:
+        return self.root / MANIFEST_NAME
+
+    def manifest(self) -> pd.DataFrame:
+        if self._manifest is None:
+            if self.manifest_path.exists():
+                self._manifest = pd.read_parquet(self.manifest_path)
+            else:
+                self._manifest = self.rebuild_manifest()
+        return self._manifest
+
+    def _entry(self, ticker: str, path: Path, df: pd.DataFrame) -> dict:
+        return {
+            "ticker": ticker,
+            "path": path.relative_to(self.root).as_posix(),
+            "min_ts": df["timestamp"].min(),
+            "max_ts": df["timestamp"].max(),
+            "rows": int(len(df)),
+        }
+
+    def _save_manifest(self, entries: list, removed=()) -> None:
+        man = self.manifest()
+        drop = {e["path"] for e in entries} | {Path(p).relative_to(self.root).as_posix() for p in removed}
+        man = man[~man["path"].isin(drop)]
+        if entries:
+            add = pd.DataFrame(entries, columns=MANIFEST_COLS)
+            man = add if man.empty else pd.concat([man, add], ignore_index=True)
+        man = man.sort_values(["ticker", "min_ts"]).reset_index(drop=True)
+        self.root.mkdir(parents=True, exist_ok=True)
+        _atomic_write(man, self.manifest_path)
+        self._manifest = man
+
+    def rebuild_manifest(self) -> pd.DataFrame:
+        """Reconstruye el manifiesto recorriendo el árbol (solo columna timestamp)."""
+        entries = []
+        if self.root.exists():
+            for f in sorted(self.root.glob("ticker=*/*=*/*.parquet")):
+                ts = pd.read_parquet(f, columns=["timestamp"])
+                if ts.empty:
+                    continue
+                ts["timestamp"] = pd.to_datetime(ts["timestamp"], utc=True, errors="coerce")
+                ticker = f.parent.parent.name.split("=", 1)[1]
+                entries.append(self._entry(ticker, f, ts))
+        man = pd.DataFrame(entries, columns=MANIFEST_COLS)
+        if self.root.exists():
+            _atomic_write(man, self.manifest_path)
+        self._manifest = man
+        return man
+
+    # ---------- escritura ----------
+    def _month_file(self, ticker: str, month: str) -> Path:
+        return self.root / f"ticker={ticker}" / f"month={month}" / "part-0.parquet"
+
+    def _date_file(self, ticker: str, day: str) -> Path:
+        return self.root / f"ticker={ticker}" / f"date={day}" / "part-0.parquet"
+
+    def merge_bars(self, df: pd.DataFrame) -> list:
+        """Mezcla barras (ticker, timestamp, ohlcv...) en sus particiones. Devuelve paths escritos."""
+        df = normalize_bars(df)
+        if df.empty:
+            return []
+        days = df["timestamp"].dt.strftime("%Y-%m-%d")
+        keys = pd.MultiIndex.from_arrays([df["ticker"], days])
+        out_of = {}
+        for t, d in keys.unique():
+            month_file = self._month_file(t, d[:7])
+            out_of[(t, d)] = str(month_file if month_file.exists() else self._date_file(t, d))
+        targets = pd.Series([out_of[k] for k in keys], index=df.index)
+        # un archivo por grupo: varios días tardíos de un mes compactado van juntos al mensual
+        entries, written = [], []
+        for (ticker, out), part in df.groupby([df["ticker"], targets], sort=True):
+            out = Path(out)
+            old = pd.read_parquet(out) if out.exists() else None
+            merged = _merge(old, part)
+            _atomic_write(merged, out, ROW_GROUP_SIZE if out.parent.name.startswith("month=") else None)
+            entries.append(self._entry(ticker, out, merged))
+            written.append(out)
+        self._save_manifest(entries)
+        return written
+
+    def compact(self, before=None, tickers=None) -> list:
+        """Compacta date= de meses < `before` (default: mes en curso) en archivos mensuales."""
+        cutoff = (_utc(before) if before is not None else pd.Timestamp.now(tz="UTC")).strftime("%Y-%m")
+        entries, removed, done = [], [], []
+        for tdir in sorted(self.root.glob("ticker=*")):
+            ticker = tdir.name.split("=", 1)[1]
+            if tickers is not None and ticker not in tickers:
+                continue
+            by_month: dict = {}
+            for ddir in sorted(tdir.glob("date=*")):
+                month = ddir.name.split("=", 1)[1][:7]
+                if month < cutoff:
+                    by_month.setdefault(month, []).append(ddir)
+            for month, ddirs in by_month.items():
+                month_file = self._month_file(ticker, month)
+                frames = [pd.read_parquet(month_file)] if month_file.exists() else []
+                files = [f for d in ddirs for f in sorted(d.glob("*.parquet"))]
+                frames += [pd.read_parquet(f) for f in files]
+                merged = _merge(None, normalize_bars(pd.concat(frames, ignore_index=True), ticker))
+                _atomic_write(merged, month_file, ROW_GROUP_SIZE)
+                entries.append(self._entry(ticker, month_file, merged))
+                for f in files:
+                    removed.append(f)
+                    f.unlink()
+                for d in ddirs:
+                    if not any(d.iterdir()):
+                        d.rmdir()
+                done.append(month_file)
+        if entries:
+            self._save_manifest(entries, removed)
+        return done
+
+    # ---------- lectura ----------
+    def locate(self, tickers=None, start=None, end=None) -> pd.DataFrame:
+        man = self.manifest()
+        if man.empty:
+            return man
+        mask = pd.Series(True, index=man.index)
+        if tickers is not None:
+            mask &= man["ticker"].isin([str(t).upper() for t in tickers])
+        if start is not None:
+            mask &= man["max_ts"] >= _utc(start)
+        if end is not None:
+            mask &= man["min_ts"] <= _utc(end)
+        return man[mask]
+
+    def read_bars(self, tickers=None, start=None, end=None, columns=None) -> pd.DataFrame:
+        """Barras con start <= timestamp <= end (UTC, inclusive) para `tickers`."""
+        import pyarrow.dataset as ds
+
+        hits = self.locate(tickers, start, end)
+        frames = []
+        for rel in hits["path"]:
+            dataset = ds.dataset(self.root / rel, format="parquet")
+            ts_type = dataset.schema.field("timestamp").type
+            flt = None
+            for bound, op in ((start, "ge"), (end, "le")):
+                if bound is None:
+                    continue
+                b = _utc(bound)
+                if getattr(ts_type, "tz", None) is None:
+                    b = b.tz_localize(None)
+                f = ds.field("timestamp") >= b if op == "ge" else ds.field("timestamp") <= b
+                flt = f if flt is None else flt & f
+            frames.append(dataset.to_table(columns=columns, filter=flt).to_pandas())
+        frames = [f for f in frames if not f.empty]
+        if not frames:
+            return pd.DataFrame(columns=columns or [])
+        out = pd.concat(frames, ignore_index=True)
+        if "timestamp" in out.columns:
+            out["timestamp"] = pd.to_datetime(out["timestamp"], utc=True)
+            out = out.sort_values(["ticker", "timestamp"] if "ticker" in out.columns else "timestamp")
+        return out.reset_index(drop=True)
+
+    def day_counts(self, ticker: str, start=None, end=None) -> pd.Series:
+        """Barras por día UTC del ticker (índice date) leyendo solo la columna timestamp."""
+        bars = self.read_bars([ticker], start, end, columns=["timestamp"])
+        if bars.empty:
+            return pd.Series(dtype="int64")
+        return bars["timestamp"].dt.date.value_counts().sort_index()
+
+    def read_day(self, ticker: str, day) -> pd.DataFrame:
+        d = _utc(pd.Timestamp(day).date())
+        return self.read_bars([ticker], d, d + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1))
+
+    def tickers(self) -> list:
+        man = self.manifest()
+        return sorted(man["ticker"].unique()) if not man.empty else []
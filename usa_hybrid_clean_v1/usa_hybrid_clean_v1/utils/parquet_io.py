@@ -0,0 +1,188 @@
+"""
+Lecturas acotadas de parquet (predicate/column pushdown).
+
+Soporta dos layouts para la misma tabla diaria:
+- archivo único (p.ej. data/daily/features_daily_enhanced.parquet): se filtra por
+  la columna timestamp y pyarrow descarta row groups con sus estadísticas.
+- dataset particionado por fecha (directorio con date=YYYY-MM-DD/part-*.parquet):
+  solo se abren las particiones del rango pedido.
+"""
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+PARTITION_KEY = "date"
+
+
+def _day(value) -> date:
+    return pd.Timestamp(value).date()
+
+
+def partitioned_path(path) -> Path:
+    """data/daily/x.parquet -> data/daily/x (directorio del dataset particionado)."""
+    p = Path(path)
+    return p.with_suffix("") if p.suffix == ".parquet" else p
+
+
+def resolve_dataset(path) -> Path:
+    """Prefiere el dataset particionado si existe; si no, el archivo único."""
+    part = partitioned_path(path)
+    return part if part.is_dir() else Path(path)
+
+
+def list_partition_dates(path, key: str = PARTITION_KEY) -> list:
+    p = Path(path)
+    if not p.is_dir():
+        return []
+    prefix = f"{key}="
+    return sorted(_day(d.name[len(prefix):]) for d in p.iterdir() if d.is_dir() and d.name.startswith(prefix))
+
+
+def _ts_bound(ts_type, day: date, next_day: bool = False):
+    import pyarrow as pa
+
+    ts = pd.Timestamp(day, tz="UTC") + pd.Timedelta(days=1 if next_day else 0)
+    if ts_type.tz is None:
+        ts = ts.tz_localize(None)
+    return pa.scalar(ts, type=ts_type)
+
+
+def _and(a, b):
+    return b if a is None else (a if b is None else a & b)
+
+
+def read_date_window(path, start=None, end=None, columns=None, ts_col: str = "timestamp",
+                     key: str = PARTITION_KEY, tickers=None) -> pd.DataFrame:
+    """Filas con start <= fecha UTC <= end (inclusive; None = sin límite) leyendo solo lo necesario.
+
+    `tickers` restringe además a esos tickers (filtro empujado a pyarrow).
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    start = _day(start) if start is not None else None
+    end = _day(end) if end is not None else None
+    p = Path(path)
+    tick_flt = ds.field("ticker").isin(sorted(tickers)) if tickers is not None else None
+    if p.is_dir():
+        part = ds.partitioning(pa.schema([(key, pa.string())]), flavor="hive")
+        dataset = ds.dataset(p, format="parquet", partitioning=part)
+        flt = tick_flt
+        if start is not None:
+            flt = _and(flt, ds.field(key) >= start.isoformat())
+        if end is not None:
+            flt = _and(flt, ds.field(key) <= end.isoformat())
+        cols = None if columns is None else [c for c in columns if c in dataset.schema.names]
+        df = dataset.to_table(columns=cols, filter=flt).to_pandas()
+        if key in df.columns and (columns is None or key not in columns):
+            df = df.drop(columns=[key])
+        return df
+
+    dataset = ds.dataset(p, format="parquet")
+    ts_type = dataset.schema.field(ts_col).type
+    if pa.types.is_timestamp(ts_type):
+        flt = tick_flt
+        if start is not None:
+            flt = _and(flt, ds.field(ts_col) >= _ts_bound(ts_type, start))
+        if end is not None:
+            flt = _and(flt, ds.field(ts_col) < _ts_bound(ts_type, end, next_day=True))
+        return dataset.to_table(columns=columns, filter=flt).to_pandas()
+
+    # timestamp guardado como texto: sin pushdown de fechas, se filtra en memoria
+    df = dataset.to_table(columns=columns, filter=tick_flt).to_pandas()
+    d = pd.to_datetime(df[ts_col], utc=True, errors="coerce").dt.date
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= d >= start
+    if end is not None:
+        mask &= d <= end
+    return df[mask]
+
+
+def latest_date(path, until=None, ts_col: str = "timestamp", key: str = PARTITION_KEY):
+    """Fecha UTC más reciente <= until sin leer la tabla completa.
+
+    Dataset particionado: nombre de partición. Archivo único: estadísticas
+    min/max de cada row group; solo se lee la columna timestamp de los row
+    groups que cruzan el límite.
+    """
+    import pyarrow.parquet as pq
+
+    until = _day(until) if until is not None else None
+    p = Path(path)
+    if p.is_dir():
+        dates = [d for d in list_partition_dates(p, key) if until is None or d <= until]
+        return dates[-1] if dates else None
+
+    pf = pq.ParquetFile(p)
+    col_idx = pf.schema_arrow.get_field_index(ts_col)
+    best = None
+    for i in range(pf.metadata.num_row_groups):
+        stats = pf.metadata.row_group(i).column(col_idx).statistics
+        rg_max = None
+        if stats is not None and stats.has_min_max:
+            rg_max = pd.Timestamp(stats.max)
+            rg_max = (rg_max.tz_localize("UTC") if rg_max.tzinfo is None else rg_max.tz_convert("UTC")).date()
+        if rg_max is not None and (until is None or rg_max <= until):
+            best = rg_max if best is None or rg_max > best else best
+            continue
+        ts = pd.to_datetime(pf.read_row_group(i, columns=[ts_col]).column(0).to_pandas(), utc=True, errors="coerce").dt.date
+        if until is not None:
+            ts = ts[ts <= until]
+        if ts.notna().any():
+            m = ts.max()
+            best = m if best is None or m > best else best
+    return best
+
+
+def column_stats(path) -> dict:
+    """{columna: (dtype_arrow, fracción no nula)} desde metadata, sin leer datos."""
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    meta = pf.metadata
+    n_rows = meta.num_rows or 1
+    out = {}
+    for j, field in enumerate(pf.schema_arrow):
+        nulls = 0
+        known = True
+        for i in range(meta.num_row_groups):
+            stats = meta.row_group(i).column(j).statistics
+            if stats is None or stats.null_count is None:
+                known = False
+                break
+            nulls += stats.null_count
+        out[field.name] = (field.type, (n_rows - nulls) / n_rows if known else None)
+    return out
+
+
+def write_date_partitions(df: pd.DataFrame, path, ts_col: str = "timestamp", key: str = PARTITION_KEY,
+                          sort_cols=None, merge_on=None) -> list:
+    """Escribe una partición date=YYYY-MM-DD por cada fecha UTC de df.
+
+    Sin `merge_on` la partición se reemplaza; con `merge_on` (p.ej. ["ticker", "timestamp"])
+    se combina con la existente y, ante duplicados, gana la fila nueva.
+    """
+    root = Path(path)
+    root.mkdir(parents=True, exist_ok=True)
+    days = pd.to_datetime(df[ts_col], utc=True, errors="coerce").dt.date
+    written = []
+    for day, part in df.groupby(days, sort=True):
+        out_dir = root / f"{key}={day.isoformat()}"
+        out_file = out_dir / "part-0.parquet"
+        if merge_on and out_file.exists():
+            old = pd.read_parquet(out_file)
+            part = pd.concat([old, part], ignore_index=True).drop_duplicates(subset=list(merge_on), keep="last")
+        if sort_cols:
+            part = part.sort_values(sort_cols)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        tmp = out_dir / "part-0.parquet.tmp"
+        part.to_parquet(tmp, index=False, compression="snappy")
+        tmp.replace(out_file)
+        written.append(day)
+    return written
+
+
+def days_back(day, n: int) -> date:
+    return _day(day) - timedelta(days=n)
@@ -0,0 +1,169 @@
+"""
+Selección de candidatos con guardrails de capital y diversificación (plan intraday).
+
+Entrada: arrays alineados con los candidatos ya rankeados (mejor primero). Salida:
+posiciones seleccionadas (en orden de ranking) y exposure de cada una.
+
+- greedy_select(): misma regla que el loop fila a fila de 40_make_trade_plan_intraday
+  (recorrer el ranking y aceptar si cabe: max_open, capital, max_per_ticker,
+  max_sector_share, qty entera >= 1), pero cada aceptación es un paso vectorizado
+  sobre todos los candidatos: a lo sumo max_open pasos, sin importar cuántos haya.
+- knapsack_select(): modo capital-aware; elige el subconjunto que maximiza el PnL
+  esperado en USD (valor × exposure) con las mismas restricciones, vía programación
+  dinámica sobre (número de trades, capital discretizado) con los sectores como
+  grupos. Es aproximado (ver su docstring).
+"""
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+KNAPSACK_POOL_MAX = 10  # candidatos por sector que entran a la enumeración de combinaciones
+KNAPSACK_CAPITAL_BUCKETS = 1000  # columnas de capital de la tabla de programación dinámica
+
+
+def _codes(values) -> np.ndarray:
+    return pd.factorize(pd.Series(values, dtype=object), use_na_sentinel=False)[0]
+
+
+def greedy_select(price, ticker, sector, per_trade_cash, capital_max, max_open,
+                  max_per_ticker=1, max_sector_share=1.0, verbose=True):
+    """
+    Selección greedy en orden de ranking → (posiciones, exposures).
+
+    Para cada candidato (en orden) se usa cash_for_trade = min(per_trade_cash, capital
+    restante); se salta si el ticker ya tiene max_per_ticker trades, si el sector
+    superaría capital_max * max_sector_share o si no alcanza 1 acción. Se detiene al
+    llegar a max_open trades o sin capital restante.
+    """
+    price = np.asarray(price, dtype=float)
+    n = len(price)
+    t_code, s_code = _codes(ticker), _codes(sector)
+    t_count = np.zeros(t_code.max() + 1 if n else 0, dtype=np.int64)
+    s_capital = np.zeros(s_code.max() + 1 if n else 0)
+    valid = np.isfinite(price) & (price > 0)
+    safe_price = np.where(valid, price, 1.0)
+    sector_cap = capital_max * max_sector_share
+
+    picked, exposures = [], []
+    total, start = 0.0, 0
+    while start < n:
+        if len(picked) >= max_open:
+            if verbose:
+                print(f"  Límite max_open alcanzado: {len(picked)}")
+            break
+        cash_left = max(capital_max - total, 0.0)
+        if cash_left < 1e-6:
+            if verbose and valid[start:].any():
+                print(f"  Límite de capital alcanzado: ${total:.2f}")
+            break
+        cash = min(per_trade_cash, cash_left)
+        qty = np.floor_divide(cash, safe_price[start:])
+        ok = (valid[start:] & (t_count[t_code[start:]] < max_per_ticker)
+              & (s_capital[s_code[start:]] + cash <= sector_cap) & (qty >= 1))
+        hit = np.flatnonzero(ok)
+        if not len(hit):
+            break
+        i = start + int(hit[0])
+        exposure = qty[hit[0]] * price[i]
+        picked.append(i)
+        exposures.append(exposure)
+        t_count[t_code[i]] += 1
+        s_capital[s_code[i]] += exposure
+        total += exposure
+        start = i + 1
+    return np.array(picked, dtype=np.int64), np.array(exposures, dtype=float)
+
+
+def _sector_options(idx, cost, exposure, gain, K, C, sector_cap):
+    """
+    Combinaciones de un sector que caben → [(k, costo, valor, combo)], sin dominadas.
+
+    Por (k, costo) queda la de mayor valor, y se descarta toda opción que otra con
+    k' <= k y costo' <= costo iguale o supere en valor (nunca conviene elegirla).
+    """
+    best = {}
+    for k in range(1, min(K, len(idx)) + 1):
+        for combo in combinations(idx, k):
+            combo = list(combo)
+            c = int(cost[combo].sum())
+            if c > C or exposure[combo].sum() > sector_cap:
+                continue
+            v = gain[combo].sum()
+            if v > best.get((k, c), (-np.inf,))[0]:
+                best[(k, c)] = (v, combo)
+    options = []
+    top = np.full(K + 1, -np.inf)  # mejor valor visto por k (costos <= actual)
+    for (k, c), (v, combo) in sorted(best.items(), key=lambda kv: (kv[0][1], kv[0][0])):
+        if v > top[:k + 1].max():
+            options.append((k, c, v, combo))
+            top[k] = max(top[k], v)
+    return options
+
+
+def knapsack_select(price, ticker, sector, value, per_trade_cash, capital_max, max_open,
+                    max_per_ticker=1, max_sector_share=1.0):
+    """
+    Selección capital-aware → (posiciones, exposures).
+
+    Cada candidato tiene exposure fija (qty entera con per_trade_cash) y valor
+    value × exposure (p.ej. exp_pnl_pct → PnL esperado en USD). Maximiza el valor
+    total con <= max_open trades, capital <= capital_max, <= max_per_ticker por
+    ticker y capital por sector <= capital_max * max_sector_share.
+
+    Es óptimo solo dentro de estas aproximaciones (pueden dejar fuera el óptimo real):
+    - por ticker solo compiten sus max_per_ticker candidatos mejor rankeados;
+    - por sector solo entran los KNAPSACK_POOL_MAX candidatos de mayor valor;
+    - el capital se discretiza en a lo sumo KNAPSACK_CAPITAL_BUCKETS unidades de
+      ceil(capital_max / KNAPSACK_CAPITAL_BUCKETS) USD, redondeando cada costo hacia
+      arriba: nunca excede el tope, pero puede descartar combinaciones que caben
+      justo (con capital_max <= KNAPSACK_CAPITAL_BUCKETS la unidad es 1 USD).
+    El tamaño de la tabla queda en (max_open + 1) × (KNAPSACK_CAPITAL_BUCKETS + 1)
+    sin importar el capital.
+    """
+    price = np.asarray(price, dtype=float)
+    value = np.asarray(value, dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        qty = np.floor_divide(per_trade_cash, price)
+    exposure = qty * price
+    gain = value * exposure
+    ok = np.isfinite(price) & (price > 0) & (qty >= 1) & np.isfinite(gain) & (gain > 0)
+    if not ok.any() or max_open < 1:
+        return np.array([], dtype=np.int64), np.array([], dtype=float)
+    t_code = _codes(ticker)[ok]
+    ok[ok] = pd.Series(t_code).groupby(t_code).cumcount().to_numpy() < max_per_ticker
+
+    dollars = int(np.floor(capital_max + 1e-9))
+    unit = max(1, -(-dollars // KNAPSACK_CAPITAL_BUCKETS))
+    C = dollars // unit
+    sector_cap = capital_max * max_sector_share
+    cost = np.where(ok, np.ceil(np.where(ok, exposure, 0) / unit - 1e-9), 0).astype(np.int64)
+    K = max_open
+    dp = np.full((K + 1, C + 1), -np.inf)
+    dp[0, 0] = 0.0
+    stages = []
+    s_code = _codes(sector)
+    for s in np.unique(s_code[ok]):
+        idx = np.flatnonzero(ok & (s_code == s))
+        idx = idx[np.argsort(-gain[idx], kind="stable")][:KNAPSACK_POOL_MAX]
+        options = _sector_options(idx, cost, exposure, gain, K, C, sector_cap)
+        new = dp.copy()
+        choice = np.full(dp.shape, -1, dtype=np.int64)
+        for j, (k, c, v, _) in enumerate(options):
+            cand = dp[:K + 1 - k, :C + 1 - c] + v
+            better = cand > new[k:, c:]
+            new[k:, c:][better] = cand[better]
+            choice[k:, c:][better] = j
+        stages.append((options, choice))
+        dp = new
+
+    k, c = np.unravel_index(int(np.argmax(dp)), dp.shape)
+    picked = []
+    for options, choice in reversed(stages):
+        j = choice[k, c]
+        if j >= 0:
+            dk, dc, _, combo = options[j]
+            picked.extend(combo)
+            k, c = k - dk, c - dc
+    picked = np.sort(np.array(picked, dtype=np.int64))
+    return picked, exposure[picked]
@@ -0,0 +1,42 @@
+import os, json
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+
+def quote_service_url() -> str:
+    """URL del servicio de cotizaciones compartido (bmv_hybrid_clean_v3/src/quote_service.py).
+    Vacío si no está configurado (QUOTE_SERVICE_URL)."""
+    return (os.getenv("QUOTE_SERVICE_URL") or "").strip().rstrip("/")
+
+
+def get_quotes(tickers, max_age: float | None = None, timeout: float = 5.0,
+               stale_after: float | None = None) -> dict:
+    """Devuelve {ticker: {price, ts, fetched_at, age_sec, stale, source}} o {} si el servicio no responde.
+
+    max_age: segundos tras los que el servicio vuelve a pedir la cotización (refresco).
+    stale_after: antigüedad de la hora del proveedor a partir de la cual stale=True
+    (default: QUOTE_STALE_SEC del servicio).
+    """
+    url = quote_service_url()
+    tickers = [t for t in tickers if t]
+    if not url or not tickers:
+        return {}
+    params = {"symbols": ",".join(tickers)}
+    if max_age is not None:
+        params["max_age"] = str(max_age)
+    if stale_after is not None:
+        params["stale_after"] = str(stale_after)
+    try:
+        with urlopen(f"{url}/quotes?{urlencode(params)}", timeout=timeout) as resp:
+            return json.loads(resp.read().decode("utf-8")).get("quotes", {}) or {}
+    except Exception:
+        return {}
+
+
+def get_prices(tickers, max_age: float | None = None, timeout: float = 5.0,
+               stale_after: float | None = None, allow_stale: bool = False) -> dict:
+    """Solo precios frescos: {ticker: float}. Tickers sin cotización o con stale=True se omiten
+    para que el llamador use su fallback; allow_stale=True los conserva (p.ej. con el mercado
+    cerrado, donde el último cierre es el precio válido)."""
+    quotes = get_quotes(tickers, max_age, timeout, stale_after)
+    return {t: q["price"] for t, q in quotes.items() if q and (allow_stale or not q.get("stale"))}
@@ -0,0 +1,692 @@
+"""
+Trade plan diario como librería (DataFrames de punta a punta):
+
+    forecast -> gates -> último día por ticker -> sizing -> tope de capital   (build_core_plan, antes 33_make_trade_plan)
+             -> ETTH (ATR14%) -> modo de ejecución + exposure cap            (antes post-proceso de run_trade_plan)
+
+make_trade_plan() encadena todo y devuelve (plan, info) sin archivos
+intermedios; scripts/33_make_trade_plan.py y scripts/run_trade_plan.py son
+envolturas CLI sobre estas funciones.
+"""
+import math
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PLAN_COLS = ["ticker", "side", "entry", "tp_price", "sl_price", "qty", "exposure", "prob_win", "strength"]
+PLAN_OPT_COLS = ["pattern_weight", "gate_ok", "gate_pattern_ok", "date"]
+ETTH_WINDOW = 14
+ETTH_CLAMP = (0.5, 10.0)
+
+
+# ========== CORE (antes 33_make_trade_plan.py) ==========
+
+def apply_forecast_gates(df: pd.DataFrame, source: str = "forecast") -> pd.DataFrame:
+    # Requerimiento: prob_win (probabilidad de ganancia)
+    if "prob_win" not in df.columns:
+        raise ValueError(f"Missing column 'prob_win' in {source}")
+    # Respetar gates si existen
+    if "gate_ok" in df.columns:
+        df = df[df["gate_ok"] == 1]
+    if "gate_pattern_ok" in df.columns:
+        df = df[df["gate_pattern_ok"] == 1]
+    return df
+
+
+def normalize_prices(prices: pd.DataFrame) -> pd.DataFrame:
+    """prices con columna 'date' datetime (acepta 'timestamp'); fechas naive como en el CSV legado."""
+    p = prices.copy()
+    if "date" not in p.columns:
+        if "timestamp" not in p.columns:
+            raise ValueError("prices debe tener columna 'date' o 'timestamp'")
+        p["date"] = p["timestamp"]
+    d = pd.to_datetime(p["date"], errors="coerce")
+    if getattr(d.dt, "tz", None) is not None:
+        d = d.dt.tz_localize(None)
+    p["date"] = d
+    return p
+
+
+def last_closes(prices: pd.DataFrame) -> pd.Series:
+    """Último close por ticker (orden por fecha)."""
+    p = prices.dropna(subset=["date"]).sort_values("date", kind="mergesort")
+    return p.groupby("ticker")["close"].last().astype(float)
+
+
+def limit_to_last_day(f: pd.DataFrame, px: pd.DataFrame, asof_date=None) -> pd.DataFrame:
+    """Limita el forecast al último día de mercado por ticker (o a asof_date si se indica)."""
+    try:
+        f0 = f.copy()
+        # Si se indicó asof_date, filtrar explícitamente por ese día primero
+        if asof_date:
+            try:
+                asof = pd.to_datetime(asof_date).date()
+                if "date" in f.columns:
+                    f = f.copy()
+                    f["date"] = pd.to_datetime(f["date"], errors="coerce")
+                    f = f[f["date"].dt.date == asof]
+            except Exception:
+                pass
+        last_dates = px.groupby("ticker")["date"].max().rename("last_date").reset_index()
+        if "date" in f.columns:
+            f = f.copy()
+            f["date"] = pd.to_datetime(f["date"], errors="coerce")
+            f = f.merge(last_dates, on="ticker", how="left")
+            # Comparar por fecha (sin tiempo)
+            f = f[f["date"].dt.date == f["last_date"].dt.date]
+            f = f.drop(columns=["last_date"])
+            # Fallback: si quedó vacío, usar el último día del forecast por ticker
+            if f.empty:
+                f = f0.copy()
+                f["date"] = pd.to_datetime(f["date"], errors="coerce")
+                last_f = f.groupby("ticker")["date"].max().rename("last_f").reset_index()
+                f = f.merge(last_f, on="ticker", how="left")
+                f = f[f["date"].dt.date == f["last_f"].dt.date]
+                f = f.drop(columns=["last_f"])
+    except Exception:
+        # Si algo falla, continuar sin filtrar (mejor que romper el plan)
+        pass
+    return f
+
+
+def build_core_plan(
+    forecast: pd.DataFrame,
+    prices: pd.DataFrame,
+    month: str,
+    capital: float = 1000.0,
+    max_open: int = 5,
+    tp_pct: float = 0.06,
+    sl_pct: float = 0.0015,
+    horizon_days: int = 3,
+    asof_date=None,
+) -> pd.DataFrame:
+    """Plan ejecutable (top por strength, sizing y tope de capital) a partir del forecast."""
+    # Guardrails
+    max_open = max(2, min(5, int(max_open)))
+    per_trade_cash = math.floor(capital / max_open)
+
+    f = apply_forecast_gates(forecast)
+    px = normalize_prices(prices)
+    f = limit_to_last_day(f, px, asof_date)
+
+    # Dirección y fuerza: prob_win como confianza de dirección
+    f = f.copy()
+    f["side"] = np.where(f["prob_win"] > 0.5, "BUY", "SELL")
+    f["strength"] = f["prob_win"]
+    if "pattern_weight" in f.columns:
+        f["strength"] *= (1.0 + 0.25 * f["pattern_weight"].fillna(0.0))
+
+    # Entradas con último close
+    f["entry"] = f["ticker"].map(last_closes(px))
+    f = f.dropna(subset=["entry"])  # eliminar tickers sin precio reciente
+
+    # TP/SL
+    buy = f["side"] == "BUY"
+    f["tp_price"] = np.where(buy, f["entry"] * (1 + tp_pct), f["entry"] * (1 - tp_pct))
+    f["sl_price"] = np.where(buy, f["entry"] * (1 - sl_pct), f["entry"] * (1 + sl_pct))
+
+    # Tamaño y exposición
+    f["qty"] = np.maximum(1, np.floor(per_trade_cash / f["entry"])).astype(int)
+    f["exposure"] = f["qty"] * f["entry"]
+
+    # Selección top por fuerza respetando max_open
+    opt = [c for c in PLAN_OPT_COLS if c in f.columns]
+    plan = f.sort_values("strength", ascending=False)[PLAN_COLS + opt].head(max_open).copy()
+
+    # Respetar capital total (greedy en orden de strength)
+    total_expo = float(plan["exposure"].sum()) if not plan.empty else 0.0
+    if total_expo > capital:
+        rows, run = [], 0.0
+        for _, r in plan.iterrows():
+            if run + r["exposure"] <= capital:
+                rows.append(r)
+                run += r["exposure"]
+        plan = pd.DataFrame(rows) if rows else plan.head(1)
+
+    plan["per_trade_cash"] = per_trade_cash
+    plan["capital_cap"] = capital
+    plan["horizon_days"] = horizon_days
+    plan["policy"] = f"Policy_Dynamic_V2_{month}"
+    plan["generated_at"] = datetime.utcnow().isoformat()
+    return plan.reset_index(drop=True)
+
+
+# ========== ETTH / EXECUTION MODE (antes post-proceso de run_trade_plan.py) ==========
+
+def _true_range(df: pd.DataFrame) -> pd.Series:
+    """True Range por fila (requiere high, low, prev_close)."""
+    prev_close = df["close"].shift(1)
+    tr1 = df["high"] - df["low"]
+    tr2 = (df["high"] - prev_close).abs()
+    tr3 = (df["low"] - prev_close).abs()
+    return pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+
+# Última tabla calculada: {"key": huella del contenido, "value": resultado}; no guarda el frame
+_ATR_CACHE: dict = {}
+
+
+def _prices_key(prices: pd.DataFrame, dt_col: str, window: int) -> tuple:
+    """Huella barata del contenido: largo, hash del índice y valores de la última fila."""
+    cols = [dt_col, "ticker", "high", "low", "close"]
+    last = tuple(str(v) for v in prices[cols].iloc[-1]) if len(prices) else ()
+    return (len(prices), window, int(pd.util.hash_pandas_object(prices.index).sum()), last)
+
+
+def atr_history(prices: pd.DataFrame, window: int = 14) -> dict:
+    """ATR(window) (SMA del True Range) para todo el historial, en una pasada columnar.
+
+    Devuelve {"rows": ticker/_date/atr14/close/n_obs por fila válida, "first_seen": primera
+    fecha de cada ticker}. Se memoiza la última tabla por huella de contenido (índice +
+    última fila): en un walk-forward diario el mismo historial se consulta para muchas
+    fechas as-of. Un frame editado in-place sin cambiar índice ni última fila no se
+    detecta; en ese caso llamar clear_atr_cache().
+    """
+    if "date" in prices.columns:
+        dt_col = "date"
+    elif "timestamp" in prices.columns:
+        dt_col = "timestamp"
+    else:
+        raise ValueError("prices debe tener columna 'date' o 'timestamp'")
+
+    key = _prices_key(prices, dt_col, window)
+    if _ATR_CACHE.get("key") == key:
+        return _ATR_CACHE["value"]
+
+    d = pd.to_datetime(prices[dt_col])
+    if d.dt.tz is not None:
+        d = d.dt.tz_localize(None)
+    p = pd.DataFrame({"ticker": prices["ticker"].to_numpy(), "_date": d.dt.normalize().to_numpy()})
+    for c in ["high", "low", "close"]:
+        p[c] = pd.to_numeric(prices[c], errors="coerce").to_numpy()
+    first_seen = p.groupby("ticker", sort=True)["_date"].min()
+
+    p = p.dropna(subset=["high", "low", "close"])
+    p = p.sort_values(["ticker", "_date"], kind="mergesort").reset_index(drop=True)
+    pos = p.groupby("ticker", sort=False).cumcount().to_numpy()
+    prev_close = p["close"].shift(1).to_numpy()
+    prev_close[pos == 0] = np.nan
+    h, l = p["high"].to_numpy(), p["low"].to_numpy()
+    p["tr"] = np.fmax(h - l, np.fmax(np.abs(h - prev_close), np.abs(l - prev_close)))
+    # rolling por ticker: sobre la columna completa la suma móvil arrastra el residuo del ticker anterior
+    atr = p.groupby("ticker", sort=False)["tr"].rolling(window, min_periods=window).mean()
+    p["atr14"] = atr.reset_index(level=0, drop=True).reindex(p.index)
+    p["n_obs"] = pos + 1
+    out = {"rows": p[["ticker", "_date", "atr14", "close", "n_obs"]], "first_seen": first_seen}
+    _ATR_CACHE.clear()
+    _ATR_CACHE.update(key=key, value=out)
+    return out
+
+
+def clear_atr_cache() -> None:
+    _ATR_CACHE.clear()
+
+
+def compute_atr14_pct(
+    prices: pd.DataFrame,
+    asof_date: str,
+    window: int = 14,
+) -> pd.DataFrame:
+    """
+    Calcula ATR(window) y ATR% por ticker usando historial <= asof_date.
+    prices: columnas esperadas: date/timestamp, ticker, open, high, low, close, volume.
+    Retorna DF: ticker, atr14, atr14_pct, last_close_used, n_obs
+
+    Toma la última fila <= asof_date de cada ticker de atr_history() (sin loops por ticker).
+    """
+    hist = atr_history(prices, window)
+    asof = pd.Timestamp(pd.to_datetime(asof_date).date())
+    rows = hist["rows"]
+    last = rows[rows["_date"] <= asof].groupby("ticker", sort=False).tail(1).set_index("ticker")
+
+    first_seen = hist["first_seen"]
+    tickers = first_seen.index[first_seen <= asof]
+    last = last.reindex(tickers)
+    n_obs = last["n_obs"].fillna(0).astype(int)
+    atr = last["atr14"].where(n_obs >= max(3, window))
+    close = last["close"]
+    atr_pct = (atr / close).where(close.notna() & (close != 0))
+    return pd.DataFrame({
+        "ticker": tickers,
+        "atr14": atr.to_numpy(),
+        "atr14_pct": atr_pct.to_numpy(),
+        "last_close_used": close.to_numpy(),
+        "n_obs": n_obs.to_numpy(),
+    })
+
+def add_etth_days_to_trade_plan(
+    trade_plan: pd.DataFrame,
+    atr_table: pd.DataFrame,
+    eps: float = 1e-6,
+    clamp_min: float = 0.5,
+    clamp_max: float = 10.0,
+) -> pd.DataFrame:
+    """
+    ETTH proxy: distancia a TP (%) / ATR% (ATR14_pct).
+    - BUY: dist_tp_pct = (tp_price-entry)/entry
+    - SELL (si existiera): dist_tp_pct = (entry-tp_price)/entry
+    """
+    tp = trade_plan.copy()
+    tp["entry"] = pd.to_numeric(tp["entry"], errors="coerce")
+    tp["tp_price"] = pd.to_numeric(tp["tp_price"], errors="coerce")
+
+    merged = tp.merge(atr_table[["ticker", "atr14_pct", "n_obs"]], on="ticker", how="left")
+
+    entry = merged["entry"].to_numpy(dtype=float)
+    tp_price = merged["tp_price"].to_numpy(dtype=float)
+    if "side" in merged.columns:
+        is_sell = merged["side"].astype(str).str.upper().to_numpy() == "SELL"
+    else:
+        is_sell = np.zeros(len(merged), dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dist = np.where(is_sell, entry - tp_price, tp_price - entry) / entry
+    dist[(entry == 0) | np.isnan(entry) | np.isnan(tp_price)] = np.nan
+    merged["dist_tp_pct"] = dist
+    merged["atr14_pct_safe"] = merged["atr14_pct"].clip(lower=eps)
+
+    merged["etth_days_raw"] = merged["dist_tp_pct"] / merged["atr14_pct_safe"]
+    merged["etth_days"] = merged["etth_days_raw"].clip(lower=clamp_min, upper=clamp_max)
+
+    # Quality flags
+    degraded_mask = merged["atr14_pct"].isna() | merged["dist_tp_pct"].isna()
+    merged["etth_degraded"] = degraded_mask.to_numpy()
+    merged.loc[degraded_mask, "etth_days"] = np.nan  # si está degradado, no inventamos
+
+    return merged
+
+# ========== HELPER: EXPOSURE CAP (GREEDY) ==========
+def apply_exposure_cap(df: pd.DataFrame, exposure_cap: float):
+    """
+    Greedy cap in existing row order (already strength order from 33).
+    Keeps trades until cap reached; sets qty=0 for remaining trades.
+    Returns: (df_out, cap_info dict)
+    """
+    if exposure_cap is None:
+        return df, {"cap_applied": False}
+
+    required = ["exposure", "qty", "entry"]
+    for col in required:
+        if col not in df.columns:
+            raise ValueError(f"trade_plan output missing required column: {col}")
+
+    exposure_before = float(df["exposure"].sum())
+    cap = float(exposure_cap)
+
+    # Nothing to do
+    if exposure_before <= cap:
+        return df, {
+            "cap_applied": False,
+            "exposure_before": exposure_before,
+            "exposure_after": exposure_before,
+            "exposure_cap": cap,
+            "removed_trades": 0,
+            "qty_modified_rows": 0,
+        }
+
+    running = 0.0
+    removed = 0
+    qty_changed = 0
+
+    out = df.copy()
+
+    for i in range(len(out)):
+        row_qty = float(out.loc[i, "qty"]) if not pd.isna(out.loc[i, "qty"]) else 0.0
+        row_exp = float(out.loc[i, "entry"]) * float(row_qty)
+
+        if row_qty <= 0 or row_exp <= 0:
+            out.loc[i, "qty"] = 0
+            out.loc[i, "exposure"] = 0.0
+            continue
+
+        if running + row_exp <= cap:
+            running += row_exp
+        else:
+            out.loc[i, "qty"] = 0
+            out.loc[i, "exposure"] = 0.0
+            removed += 1
+            qty_changed += 1
+
+    exposure_after = float(out["exposure"].sum())
+
+    if exposure_after > cap + 1e-6:
+        raise RuntimeError(f"Exposure cap failed: after={exposure_after} cap={cap}")
+
+    return out, {
+        "cap_applied": True,
+        "exposure_before": exposure_before,
+        "exposure_after": exposure_after,
+        "exposure_cap": cap,
+        "removed_trades": removed,
+        "qty_modified_rows": qty_changed,
+    }
+
+# ========== EXECUTION MODES (POST-PROCESO) ==========
+
+def _execution_defaults(mode: str) -> dict:
+    mode = (mode or "balanced").lower()
+    return {
+        "mode": mode,
+        "etth_max": {"intraday": 2.0, "fast": 3.5, "balanced": 6.0, "conservative": 10.0}.get(mode, 6.0),
+        "score_formula": {
+            "intraday": "strength / (0.5 + etth_days)",
+            "fast": "strength / etth_days",
+            "balanced": "0.7*strength + 0.3*(1/etth_days_norm)",
+            "conservative": "strength",
+        }.get(mode, "0.7*strength + 0.3*(1/etth_days_norm)"),
+    }
+
+
+def apply_execution_mode(
+    df: pd.DataFrame,
+    mode: str = "balanced",
+    exposure_cap: float = None,
+    etth_max_override: float = None,
+    min_strength: float = 0.0,
+    min_prob_win: float = 0.0,
+):
+    """
+    Aplica modo de ejecución como post-proceso (sin reordenar CSV final).
+    1) Calcula exec_score
+    2) Filtra elegibles (ETTH, min_strength, min_prob_win)
+    3) Aplica cap greedy PRIORITIZANDO exec_score (no el orden CSV)
+    4) Devuelve DF en orden original (strength del core)
+    Retorna: df_out, exec_info(dict)
+    """
+
+    if df.empty:
+        return df, {}
+
+    df = df.copy()
+    df["_orig_idx"] = np.arange(len(df))
+
+    defaults = _execution_defaults(mode)
+    mode_logic = defaults["mode"]
+
+    # Si no hay ETTH, forzamos balanced con warning
+    exec_info = {
+        "requested_mode": mode_logic,
+        "mode_used": mode_logic,
+        "etth_available": "etth_days" in df.columns and not df["etth_days"].isna().all(),
+        "warnings": [],
+    }
+    if not exec_info["etth_available"]:
+        exec_info["warnings"].append("ETTH no disponible; usando modo balanced")
+        mode_logic = "balanced"
+        defaults = _execution_defaults(mode_logic)
+
+    etth_max = etth_max_override if etth_max_override is not None else defaults["etth_max"]
+    score_formula = defaults["score_formula"]
+
+    reason_counts = {"etth": 0, "strength": 0, "prob": 0, "cap": 0, "missing_etth": 0}
+    drop_reasons_by_ticker = []
+
+    n = len(df)
+    etth = pd.to_numeric(df["etth_days"], errors="coerce").to_numpy(dtype=float) \
+        if "etth_days" in df.columns else np.full(n, np.nan)
+    strength = df["strength"].to_numpy(dtype=float) if "strength" in df.columns else np.zeros(n)
+    prob_win = df["prob_win"].to_numpy(dtype=float) if "prob_win" in df.columns else np.zeros(n)
+
+    # Motivos de descarte como máscaras; el primero en este orden es el drop_reason
+    masks = {}
+    if mode_logic != "conservative" or etth_max_override is not None:
+        masks["missing_etth"] = np.isnan(etth)
+        with np.errstate(invalid="ignore"):
+            masks["etth"] = ~np.isnan(etth) & (etth > etth_max) if etth_max is not None else np.zeros(n, bool)
+    masks["strength"] = strength < min_strength
+    masks["prob"] = prob_win < min_prob_win
+
+    drop_reason = np.full(n, None, dtype=object)
+    for r in ("missing_etth", "etth", "strength", "prob"):
+        m = masks.get(r)
+        if m is None:
+            continue
+        reason_counts[r] = reason_counts.get(r, 0) + int(m.sum())
+        drop_reason[m & pd.isna(drop_reason)] = r
+    eligible = pd.isna(drop_reason)
+
+    etth_norm = np.fmax(etth, 0.5)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if mode_logic == "intraday":
+            score = strength / (0.5 + etth_norm)
+        elif mode_logic == "fast":
+            score = strength / etth_norm
+        elif mode_logic == "balanced":
+            score = np.where(np.isnan(etth_norm), 0.7 * strength, 0.7 * strength + 0.3 * (1.0 / etth_norm))
+        else:
+            score = strength.copy()
+    score[~eligible] = np.nan
+
+    df["eligible"] = eligible
+    df["exec_score"] = score
+    df["drop_reason"] = drop_reason
+
+    # Filtrar elegibles y ordenar por prioridad
+    eligible_df = df[df["eligible"]]
+    sort_cols = ["exec_score", "strength", "prob_win"]
+    sort_orders = [False, False, False]
+    if "etth_days" in eligible_df.columns:
+        sort_cols.append("etth_days")
+        sort_orders.append(True)  # menor ETTH primero en empate
+    order = eligible_df.sort_values(sort_cols, ascending=sort_orders, na_position="last")["_orig_idx"].to_numpy()
+
+    exposure_before = float(df.get("exposure", pd.Series(dtype=float)).sum()) if "exposure" in df.columns else 0.0
+    exposure_after = exposure_before
+
+    qty = df["qty"].to_numpy(dtype=float).copy() if "qty" in df.columns else np.zeros(n)
+    expo = df["exposure"].to_numpy(dtype=float).copy() if "exposure" in df.columns else np.zeros(n)
+    zero = np.zeros(n, dtype=bool)
+    kept = np.zeros(n, dtype=bool)
+    tickers = df["ticker"].to_numpy() if "ticker" in df.columns else np.full(n, None, dtype=object)
+
+    # Cap greedy sobre arrays (solo los elegibles, en orden de prioridad)
+    cap = float(exposure_cap) if exposure_cap is not None else None
+    running = 0.0
+    for idx in order:
+        if qty[idx] <= 0 or expo[idx] <= 0:
+            zero[idx] = True
+            continue
+        if cap is None or running + expo[idx] <= cap:
+            running += expo[idx]
+            kept[idx] = True
+        else:
+            zero[idx] = True
+            eligible[idx] = False
+            drop_reason[idx] = "cap"
+            reason_counts["cap"] += 1
+            drop_reasons_by_ticker.append({"ticker": tickers[idx], "reason": "cap"})
+
+    # Los ineligibles se quedan con qty=0
+    zero |= ~eligible
+    drop_reasons_by_ticker.extend(
+        {"ticker": tickers[i], "reason": drop_reason[i]} for i in np.flatnonzero(~eligible)
+    )
+    if zero.any():
+        if "qty" in df.columns:
+            df.loc[zero, "qty"] = 0
+        else:
+            df["qty"] = np.where(zero, 0, np.nan)
+        if "exposure" in df.columns:
+            df.loc[zero, "exposure"] = 0.0
+        else:
+            df["exposure"] = np.where(zero, 0.0, np.nan)
+    df["eligible"] = eligible
+    df["drop_reason"] = drop_reason
+
+    # Restaura orden original
+    df = df.sort_values("_orig_idx").drop(columns=["_orig_idx"])
+    exposure_after = float(df.get("exposure", pd.Series(dtype=float)).sum()) if "exposure" in df.columns else 0.0
+
+    exec_info.update({
+        "etth_max_used": float(etth_max) if etth_max is not None else None,
+        "score_formula": score_formula,
+        "exposure_cap": float(exposure_cap) if exposure_cap is not None else None,
+        "exposure_before": exposure_before,
+        "exposure_after": exposure_after,
+        "eligible_trades": int(df["eligible"].sum()),
+        "kept_trades": int(kept.sum()),
+        "dropped_trades": int(len(df) - kept.sum()),
+        "reason_counts": reason_counts,
+        "dropped": drop_reasons_by_ticker,
+    })
+
+    return df, exec_info
+
+
+# ========== ENTRADA ==========
+
+def load_forecast_auto(path: str, asof_date=None, tickers=None, model=None, lookback_days: int = 7) -> tuple:
+    """Carga forecast desde CSV, Parquet o forecast store; retorna (df, formato_original).
+
+    Si `path` es un forecast store (utils/forecast_store.py) solo se leen las
+    particiones de [asof_date - lookback_days, asof_date] (default: última fecha).
+    """
+    from utils import forecast_store
+
+    path = Path(path)
+
+    if forecast_store.is_store(path):
+        model = model or forecast_store.DEFAULT_MODEL
+        asof = asof_date or forecast_store.latest_asof(model, root=path)
+        if asof is None:
+            return pd.DataFrame(columns=["ticker", "date", "prob_win"]), "store"
+        df = forecast_store.get_forecast(asof, tickers, model=model, lookback_days=lookback_days, root=path)
+        return df, "store"
+    if path.suffix.lower() == '.parquet':
+        df = pd.read_parquet(path)
+        return df, "parquet"
+    elif path.suffix.lower() == '.csv':
+        df = pd.read_csv(path)
+        return df, "csv"
+    else:
+        raise ValueError(f"Formato no soportado: {path.suffix}. Use .csv o .parquet")
+
+def validate_forecast_schema(df: pd.DataFrame) -> dict:
+    """Valida que el forecast tenga columnas críticas"""
+    required_cols = ["prob_win"]
+    optional_cols = ["prob_raw", "prob_temp", "ticker", "date", "side"]
+    
+    issues = []
+    missing_required = [c for c in required_cols if c not in df.columns]
+    if missing_required:
+        issues.append(f"Columnas requeridas FALTANTES: {missing_required}")
+    
+    missing_optional = [c for c in optional_cols if c not in df.columns]
+    if missing_optional:
+        print(f"[WARN] Columnas opcionales FALTANTES: {missing_optional}")
+    
+    return {"valid": len(issues) == 0, "issues": issues, "missing_optional": missing_optional}
+
+def prepare_forecast(df: pd.DataFrame):
+    """
+    Prepara forecast para build_core_plan
+    - Asegurar que tiene prob_win
+    - Imputar 'side' si falta (BUY si prob_win > 0.5, SELL si <= 0.5)
+    - NO agregar y_hat fake
+    """
+    # Validar
+    validation = validate_forecast_schema(df)
+    if not validation["valid"]:
+        raise ValueError(f"Schema inválido:\n" + "\n".join(validation["issues"]))
+    
+    # Imputar 'side' si falta
+    if "side" not in df.columns:
+        print("[INFO] Imputando columna 'side' basada en prob_win > 0.5")
+        df = df.copy()
+        df["side"] = df["prob_win"].apply(lambda x: "BUY" if x > 0.5 else "SELL")
+    
+    # Limpiar: remover y_hat si existe (no lo queremos)
+    if "y_hat" in df.columns:
+        print("[INFO] Removiendo columna y_hat (será derivada correctamente)")
+        df = df.drop(columns=["y_hat"])
+    
+    return df, validation
+
+
+# ========== PIPELINE COMPLETO ==========
+
+def etth_summary(tp_etth: pd.DataFrame, atr_tbl: pd.DataFrame) -> dict:
+    etth_valid = tp_etth["etth_days"].dropna()
+    stats = {
+        "etth_method": "atr14_proxy",
+        "etth_window": ETTH_WINDOW,
+        "etth_clamp_min": ETTH_CLAMP[0],
+        "etth_clamp_max": ETTH_CLAMP[1],
+        "etth_n": int(tp_etth.shape[0]),
+        "etth_nan_pct": float(tp_etth["etth_days"].isna().mean() * 100.0),
+        "etth_unique": int(tp_etth["etth_days"].nunique(dropna=True)),
+        "etth_mean": float(etth_valid.mean()) if len(etth_valid) else None,
+        "etth_min": float(etth_valid.min()) if len(etth_valid) else None,
+        "etth_max": float(etth_valid.max()) if len(etth_valid) else None,
+        "etth_degraded_count": int(tp_etth["etth_degraded"].sum()),
+        "atr14_pct_mean": float(atr_tbl["atr14_pct"].dropna().mean()) if not atr_tbl.empty and atr_tbl["atr14_pct"].notna().any() else None,
+        "atr14_pct_nan_pct": float(atr_tbl["atr14_pct"].isna().mean() * 100.0) if not atr_tbl.empty else None,
+    }
+    # Regla de seguridad: si etth no varía o está mayormente NaN, marcar degradado global
+    if stats["etth_unique"] <= 1 or (stats["etth_nan_pct"] is not None and stats["etth_nan_pct"] > 50.0):
+        stats["etth_global_warning"] = "ETTH degraded or non-informative (unique<=1 or NaN%>50)."
+    return stats
+
+
+def make_trade_plan(
+    forecast: pd.DataFrame,
+    prices: pd.DataFrame,
+    month: str,
+    capital: float = 100000,
+    max_open: int = 15,
+    tp_pct: float = 0.10,
+    sl_pct: float = 0.02,
+    asof_date=None,
+    execution_mode: str = "balanced",
+    exposure_cap: float = None,
+    etth_max: float = None,
+    min_strength: float = 0.0,
+    min_prob_win: float = 0.0,
+    horizon_days: int = 3,
+):
+    """forecast -> plan final. Devuelve (plan, info) con validation/etth_stats/exec_info/cap_info."""
+    forecast, validation = prepare_forecast(forecast)
+    plan = build_core_plan(
+        forecast, prices, month,
+        capital=capital, max_open=max_open, tp_pct=tp_pct, sl_pct=sl_pct,
+        horizon_days=horizon_days, asof_date=asof_date,
+    )
+    info = {"validation": validation, "etth_stats": {}, "exec_info": {}, "cap_info": {}, "warnings": []}
+
+    try:
+        if not asof_date:
+            info["warnings"].append("Sin asof_date, ETTH post-proceso omitido")
+            tp_etth = plan.copy()
+            atr_tbl = pd.DataFrame()
+        else:
+            atr_tbl = compute_atr14_pct(prices, asof_date=asof_date, window=ETTH_WINDOW)
+            tp_etth = add_etth_days_to_trade_plan(plan, atr_tbl, clamp_min=ETTH_CLAMP[0], clamp_max=ETTH_CLAMP[1])
+
+        # Modos de ejecución + cap (greedy por prioridad, sin reordenar el plan)
+        try:
+            plan, exec_info = apply_execution_mode(
+                tp_etth,
+                mode=execution_mode,
+                exposure_cap=exposure_cap,
+                etth_max_override=etth_max,
+                min_strength=min_strength,
+                min_prob_win=min_prob_win,
+            )
+            info["exec_info"] = exec_info
+            info["cap_info"] = {
+                "cap_applied": exec_info.get("exposure_cap") is not None and exec_info.get("exposure_after", 0) < exec_info.get("exposure_before", 0),
+                "exposure_before": exec_info.get("exposure_before"),
+                "exposure_after": exec_info.get("exposure_after"),
+                "exposure_cap": exec_info.get("exposure_cap"),
+                "removed_trades": exec_info.get("reason_counts", {}).get("cap", 0),
+            }
+        except Exception as e:
+            info["warnings"].append(f"Error aplicando execution-mode/cap: {type(e).__name__}: {e}")
+            plan = tp_etth
+
+        if asof_date:
+            info["etth_stats"] = etth_summary(tp_etth, atr_tbl)
+    except Exception as e:
+        # ETTH es post-proceso opcional: no rompe el plan
+        info["etth_stats"]["etth_error"] = f"{type(e).__name__}: {e}"
+    return plan, info